@@ -4,14 +4,24 @@ v4.1 - Arq. Multi-Pagina (Inicio unificado)
 """
 import streamlit as st
 import pandas as pd
+import io
 import os
 import json
+import time
+from datetime import datetime
 from src.motor_conciliacion import MotorConciliacion
+from src.conciliacion_incremental import ruta_estado as estado_incremental
+from src.conciliador_real import REAL_CONFIG
+from src.candidatos import LIMITES_CANDIDATOS, simular
+from src.cache_resultados import cache_global
+from src.jobs import gestor_trabajos, adjuntar_trabajo, trabajo_en_curso
+from src.compacto import compactar_resultado, memoria_sesion
+from src import tracing
 from src.ui.styles import load_css, render_header
 from src.ui.components import (
     format_money, kpi_hero, kpi_card, status_semaphore, alert_card,
     section_div, format_pct, donut_chart, horizontal_bar_chart,
-    stacked_bar_chart, no_data_warning,
+    stacked_bar_chart, no_data_warning, render_panel_perf,
 )
 from src.chatbot import render_chatbot_flotante
 
@@ -89,7 +99,10 @@ with st.sidebar:
         "Nivel de tolerancia",
         list(_niveles.keys()),
         index=2,
-        help="Controla que tan estricto es el cruce entre banco y Contagram.",
+        help="Controla que tan estricto es el cruce entre banco y Contagram en el modo demo "
+             "(tabla parametrica: tolerancias exacto / probable y umbrales de ID por nombre). "
+             "Con datos reales el cruce es por CUIT y sus tolerancias se simulan en el panel "
+             "what-if despues de ejecutar.",
     )
     cfg_umbral = _niveles[_nivel_sel]
 
@@ -121,6 +134,84 @@ with st.sidebar:
 # HELPERS DE CARGA
 # ═══════════════════════════════════════════════════════
 
+# Los loaders se cachean por (ruta, mtime) o por los bytes del archivo subido:
+# si el archivo no cambia, las interacciones con widgets no vuelven a leer disco.
+CACHE_TTL_SEG = 3600
+CACHE_MAX_ENTRADAS = 32
+
+_inicio_run = datetime.now()
+_cargas = []  # fecha de lectura real de cada archivo usado en este run
+
+
+def _mtime(path):
+    return os.path.getmtime(path) if os.path.exists(path) else 0.0
+
+
+@st.cache_data(ttl=CACHE_TTL_SEG, max_entries=CACHE_MAX_ENTRADAS, show_spinner=False)
+def _leer_csv_cache(path, mtime):
+    return pd.read_csv(path), datetime.now()
+
+
+@st.cache_data(ttl=CACHE_TTL_SEG, max_entries=CACHE_MAX_ENTRADAS, show_spinner=False)
+def _leer_bytes_cache(nombre, contenido):
+    buffer = io.BytesIO(contenido)
+    with tracing.span("carga.archivo", archivo=nombre, bytes=len(contenido)) as span:
+        if nombre.endswith(".xlsx") or nombre.endswith(".xls"):
+            df = pd.read_excel(buffer)
+        else:
+            df = pd.read_csv(buffer)
+        if span is not None:
+            span.atributo(filas=len(df))
+    return df, datetime.now()
+
+
+@st.cache_data(ttl=CACHE_TTL_SEG, max_entries=CACHE_MAX_ENTRADAS, show_spinner=False)
+def _leer_json_cache(path, mtime):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f), datetime.now()
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}, datetime.now()
+
+
+def _leer_csv(path):
+    df, leido = _leer_csv_cache(path, _mtime(path))
+    _cargas.append(leido)
+    return df
+
+
+def _render_estado_cache():
+    """Indica si los datos de este run salieron del cache o se leyeron recien."""
+    if not _cargas:
+        return
+    mas_vieja = min(_cargas)
+    if mas_vieja >= _inicio_run:
+        st.caption("🔄 Datos recién leídos de disco")
+    else:
+        minutos = int((datetime.now() - mas_vieja).total_seconds() // 60)
+        hace = "hace menos de 1 min" if minutos < 1 else f"hace {minutos} min"
+        st.caption(f"📦 Datos en caché (leídos {hace}). Se releen si el archivo cambia.")
+
+
+# La corrida va en un hilo (src/jobs.py); este fragmento se refresca solo y
+# recarga toda la app cuando el trabajo finaliza, para adjuntar el resultado.
+INTERVALO_PROGRESO_SEG = 1
+
+
+@st.fragment(run_every=INTERVALO_PROGRESO_SEG)
+def _render_progreso_trabajo():
+    """Barra de progreso + boton de cancelar del trabajo de la sesion."""
+    trabajo = gestor_trabajos.obtener(st.session_state.get("trabajo_id") or "")
+    if trabajo is None or trabajo.terminado:
+        st.rerun()
+    p = trabajo.progreso()
+    texto = f"{p['etapa'] or 'En cola'} {p['detalle']}".strip()
+    st.progress(p["fraccion"], text=f"⏳ {texto} — {p['segundos']} s")
+    if st.button("⏹️ Cancelar", key="trabajo_cancelar", disabled=trabajo.cancelacion_pedida):
+        trabajo.cancelar()
+        st.caption("Cancelando en el próximo punto de control...")
+
+
 def load_demo_data():
     base = os.path.dirname(os.path.abspath(__file__))
     data_dir = os.path.join(base, "data")
@@ -128,20 +219,19 @@ def load_demo_data():
     for fname in ["extracto_galicia_dic2025.csv", "extracto_santander_dic2025.csv", "extracto_mercadopago_dic2025.csv"]:
         path = os.path.join(data_dir, "test", fname)
         if os.path.exists(path):
-            extractos.append(pd.read_csv(path))
-    ventas = pd.read_csv(os.path.join(data_dir, "contagram", "ventas_pendientes_dic2025.csv"))
-    compras = pd.read_csv(os.path.join(data_dir, "contagram", "compras_pendientes_dic2025.csv"))
-    tabla_param = pd.read_csv(os.path.join(data_dir, "config", "tabla_parametrica.csv"))
+            extractos.append(_leer_csv(path))
+    ventas = _leer_csv(os.path.join(data_dir, "contagram", "ventas_pendientes_dic2025.csv"))
+    compras = _leer_csv(os.path.join(data_dir, "contagram", "compras_pendientes_dic2025.csv"))
+    tabla_param = _leer_csv(os.path.join(data_dir, "config", "tabla_parametrica.csv"))
     return extractos, ventas, compras, tabla_param
 
 
 def _leer_archivo(uploaded_file):
     if uploaded_file is None:
         return pd.DataFrame()
-    name = uploaded_file.name.lower()
-    if name.endswith(".xlsx") or name.endswith(".xls"):
-        return pd.read_excel(uploaded_file)
-    return pd.read_csv(uploaded_file)
+    df, leido = _leer_bytes_cache(uploaded_file.name.lower(), uploaded_file.getvalue())
+    _cargas.append(leido)
+    return df
 
 
 def _detectar_columna_medio(df):
@@ -157,11 +247,8 @@ def _detectar_columna_medio(df):
 def _cargar_mapeo_banco_medio():
     base = os.path.dirname(os.path.abspath(__file__))
     path = os.path.join(base, "data", "config", "mapeo_banco_medio_pago.json")
-    try:
-        with open(path, "r", encoding="utf-8") as f:
-            return json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
-        return {}
+    mapeo, _ = _leer_json_cache(path, _mtime(path))
+    return mapeo
 
 
 def _crear_mask_filtro(df, col_medio, seleccionados, filtro_contiene=False):
@@ -361,31 +448,211 @@ else:
     modo_real = "cobrado" in cols_ventas or "medio de cobro" in cols_ventas
     data_ready = len(extractos) > 0 and not ventas.empty
 
+_render_estado_cache()
+
 
 # ═══════════════════════════════════════════════════════
 # EJECUCION DEL MOTOR
 # ═══════════════════════════════════════════════════════
+trabajo_terminado = adjuntar_trabajo(st.session_state)
+
+if "resultado" in st.session_state:
+    with st.sidebar.expander("🧠 Memoria de la sesión", expanded=False):
+        _memoria = memoria_sesion(st.session_state)
+        st.caption(f"Total: {_memoria['MB'].sum():.2f} MB (tablas categóricas, vistas por índice)")
+        st.dataframe(_memoria, hide_index=True, use_container_width=True)
+
 if data_ready:
-    if st.button("🚀 Ejecutar Conciliación", type="primary", use_container_width=True):
-        with st.spinner("Procesando conciliación bancaria..."):
-            if modo_real:
-                motor = MotorConciliacion(pd.DataFrame())
-                resultado = motor.procesar_real(
-                    extractos, ventas,
-                    match_config=match_config_override,
-                    medios_pago_filtro=medios_pago_sel if modo == "Manual (subir archivos)" else None,
-                    filtro_medio_contiene=st.session_state.get("filtro_medio_contiene", False) if modo == "Manual (subir archivos)" else False,
-                    filtro_tipo_movimiento=st.session_state.get("filtro_tipo_movimiento", "Ambos") if modo == "Manual (subir archivos)" else "Ambos",
+    incremental = False
+    if modo_real:
+        incremental = st.toggle(
+            "Conciliacion incremental (reutilizar la corrida anterior)", value=False,
+            help="Solo concilia los movimientos nuevos del extracto; los ya procesados se "
+                 "toman del estado guardado. Cambiar umbrales o filtros fuerza una corrida completa.",
+        )
+
+    trabajo_activo = trabajo_en_curso(st.session_state)
+    if st.button(
+        "🚀 Ejecutar Conciliación", type="primary", use_container_width=True,
+        disabled=trabajo_activo is not None,
+    ):
+        if modo_real:
+            motor = MotorConciliacion(pd.DataFrame())
+            kwargs_real = dict(
+                match_config=match_config_override,
+                medios_pago_filtro=medios_pago_sel if modo == "Manual (subir archivos)" else None,
+                filtro_medio_contiene=st.session_state.get("filtro_medio_contiene", False) if modo == "Manual (subir archivos)" else False,
+                filtro_tipo_movimiento=st.session_state.get("filtro_tipo_movimiento", "Ambos") if modo == "Manual (subir archivos)" else "Ambos",
+            )
+            if incremental:
+                # Un estado por banco(s) + config + filtros: cuentas / filtros distintos no se pisan
+                ruta_estado = estado_incremental(
+                    os.path.join(os.path.dirname(os.path.abspath(__file__)), "output", "incremental"),
+                    extractos, **kwargs_real,
                 )
+
+                def _correr(trabajo):
+                    return compactar_resultado(motor.procesar_real_incremental(
+                        extractos, ventas, ruta_estado, **kwargs_real, progreso=trabajo.reportar,
+                    ))
             else:
-                motor = MotorConciliacion(tabla_param)
-                resultado = motor.procesar(extractos, ventas, compras, match_config=match_config_override)
-            st.session_state["resultado"] = resultado
-            st.session_state["stats"] = motor.stats
-            st.session_state["modo_real"] = modo_real
-            st.session_state["datos_ventas"] = ventas
-            st.session_state["datos_compras"] = compras
-        st.success("✅ Conciliación completada.")
+                def _correr(trabajo):
+                    # Los archivos se hashean una sola vez (run_id + firmas del pipeline)
+                    huellas = motor.huellas_real(extractos, ventas)
+                    resultado, trabajo.info["desde_cache"] = cache_global.obtener_o_calcular(
+                        motor.id_corrida_real(extractos, ventas, **kwargs_real, huellas=huellas),
+                        lambda: motor.procesar_real(
+                            extractos, ventas, **kwargs_real, progreso=trabajo.reportar, huellas=huellas,
+                        ),
+                    )
+                    return compactar_resultado(resultado)
+        else:
+            motor = MotorConciliacion(tabla_param)
+            kwargs_real = None
+
+            def _correr(trabajo):
+                resultado, trabajo.info["desde_cache"] = cache_global.obtener_o_calcular(
+                    motor.id_corrida_demo(extractos, ventas, compras, match_config_override),
+                    lambda: motor.procesar(
+                        extractos, ventas, compras, match_config=match_config_override, progreso=trabajo.reportar,
+                    ),
+                )
+                return compactar_resultado(resultado)
+
+        trabajo = gestor_trabajos.lanzar(
+            _correr,
+            descripcion="Conciliación " + ("real" if modo_real else "demo"),
+            sesion={
+                "modo_real": modo_real,
+                # En modo real detalle_facturas ya tiene todas las ventas
+                "datos_ventas": None if modo_real else ventas,
+                "datos_compras": compras,
+                "kwargs_real": kwargs_real,
+                "barrido_tolerancias": None,
+            },
+        )
+        st.session_state["trabajo_id"] = trabajo.id
+        st.rerun()
+
+    if trabajo_activo is not None:
+        _render_progreso_trabajo()
+
+    if trabajo_terminado is not None:
+        if trabajo_terminado.estado == "cancelado":
+            st.warning("⏹️ Conciliación cancelada. Se mantiene el resultado anterior.")
+        elif trabajo_terminado.estado == "error":
+            st.error(f"❌ La conciliación falló: {trabajo_terminado.error}")
+        else:
+            resultado = st.session_state["resultado"]
+            info_inc = resultado.get("incremental")
+            if info_inc and info_inc.get("recalculo_completo"):
+                st.success(
+                    f"✅ Conciliación completada (corrida completa: {info_inc['recalculo_completo']}; "
+                    "no se podía reutilizar el estado incremental)."
+                )
+            elif info_inc:
+                st.success(
+                    f"✅ Conciliación completada (incremental: {info_inc['movimientos_nuevos']} movimientos nuevos, "
+                    f"{info_inc['movimientos_reutilizados']} reutilizados)."
+                )
+            elif trabajo_terminado.info.get("desde_cache"):
+                st.success("✅ Conciliación completada (resultado en caché: mismos archivos y configuración).")
+            else:
+                st.success(f"✅ Conciliación completada en {trabajo_terminado.progreso()['segundos']} s.")
+            truncados = int(resultado["resultados"].get("busqueda_truncada", pd.Series(dtype=bool)).sum())
+            if truncados:
+                st.warning(
+                    f"⚠️ {truncados} movimientos se decidieron con una búsqueda de combinaciones cortada por el tope "
+                    "(columna busqueda_truncada): revisarlos a mano."
+                )
+
+    # Panel de administracion: tiempos y filas por etapa, caches, memoria (resultado["perf"])
+    if "resultado" in st.session_state and trabajo_activo is None:
+        render_panel_perf(
+            st.session_state["resultado"].get("perf"),
+            desde_cache=trabajo_terminado is not None and trabajo_terminado.info.get("desde_cache", False),
+        )
+
+    # ═══════════════════════════════════════════════════════
+    # WHAT-IF DE TOLERANCIAS (solo datos reales)
+    # ═══════════════════════════════════════════════════════
+    # Los KPIs se calculan con simular() sobre la tabla de candidatos de la
+    # corrida (solo Fase 1 + Fase 2, milisegundos) y solo cuando los sliders
+    # cambian: el resultado queda en session_state["whatif"] por config, asi
+    # los reruns de cualquier otro widget no recalculan nada. La corrida
+    # completa con las tolerancias nuevas se hace recien al aplicarlas.
+    if "resultado" in st.session_state and st.session_state.get("kwargs_real"):
+        with st.expander("🎚️ Simular tolerancias (what-if)", expanded=False):
+            kwargs_act = st.session_state["kwargs_real"]
+            cfg_base = {**REAL_CONFIG, **(kwargs_act.get("match_config") or {})}
+            st.caption(
+                "Simula las tolerancias del motor real (monto en % y $, ventanas de días). "
+                "El *Nivel de tolerancia* de la barra lateral (umbrales de ID por nombre, "
+                "tolerancias exacto / probable) es del modo demo: con datos reales no cambia el resultado."
+            )
+            c1, c2, c3, c4 = st.columns(4)
+            wi_pct = c1.slider(
+                "Tolerancia monto (%)", 0.0, LIMITES_CANDIDATOS["tolerancia_monto_pct"] * 100,
+                float(cfg_base["tolerancia_monto_pct"] * 100), step=0.1, key="wi_pct",
+            )
+            wi_abs = c2.slider(
+                "Tolerancia monto ($)", 0.0, float(LIMITES_CANDIDATOS["tolerancia_monto_abs"]),
+                float(cfg_base["tolerancia_monto_abs"]), step=1.0, key="wi_abs",
+            )
+            wi_n1 = c3.slider("Ventana nivel 1 (dias)", 0, 90, int(cfg_base["ventana_dias_nivel1"]), key="wi_n1")
+            wi_n2 = c4.slider("Ventana nivel 2 (dias)", 0, 120, int(cfg_base["ventana_dias_nivel2"]), key="wi_n2")
+
+            config_wi = {
+                **(kwargs_act.get("match_config") or {}),
+                "tolerancia_monto_pct": wi_pct / 100,
+                "tolerancia_monto_abs": float(wi_abs),
+                "ventana_dias_nivel1": int(wi_n1),
+                "ventana_dias_nivel2": int(wi_n2),
+            }
+            tabla_wi = st.session_state["resultado"].get("tabla_candidatos")
+            if {**REAL_CONFIG, **config_wi} == cfg_base:
+                st.caption("Mové las tolerancias para ver cómo cambiaría la conciliación.")
+            elif tabla_wi is None:
+                st.info("La simulación necesita una corrida completa (no incremental).")
+            else:
+                clave_wi = (st.session_state["resultado"].get("run_id"), json.dumps(config_wi, sort_keys=True))
+                whatif = st.session_state.get("whatif")
+                if whatif is None or whatif["clave"] != clave_wi:
+                    t0 = time.perf_counter()
+                    whatif = {"clave": clave_wi, "kpis": simular(tabla_wi, config_wi), "segundos": time.perf_counter() - t0}
+                    st.session_state["whatif"] = whatif
+
+                cb_act = st.session_state["stats"].get("cobros", {})
+                c1, c2, c3, c4 = st.columns(4)
+                for col, label, clave, clave_wi_kpi in [
+                    (c1, "Match exacto", "match_exacto", "matched"),
+                    (c2, "Probables", "probable_duda_id", "suggested"),
+                    (c3, "Sin identificar", "no_match", "excluded"),
+                    (c4, "% Conciliado", "tasa_conciliacion", "tasa_conciliacion"),
+                ]:
+                    valor = whatif["kpis"][clave_wi_kpi]
+                    delta = valor - cb_act.get(clave, 0)
+                    col.metric(
+                        label, valor, f"{delta:+.1f}" if clave == "tasa_conciliacion" else f"{delta:+d}",
+                        delta_color="inverse" if clave == "no_match" else "normal",
+                    )
+                st.caption(f"Simulado en {whatif['segundos'] * 1000:.0f} ms sobre la tabla de candidatos.")
+
+                if st.button("Aplicar estas tolerancias", key="wi_aplicar"):
+                    kwargs_wi = {**kwargs_act, "match_config": config_wi}
+                    motor_wi = MotorConciliacion(pd.DataFrame())
+                    with st.spinner("Aplicando tolerancias..."):
+                        huellas_wi = motor_wi.huellas_real(extractos, ventas)
+                        resultado_wi, _ = cache_global.obtener_o_calcular(
+                            motor_wi.id_corrida_real(extractos, ventas, **kwargs_wi, huellas=huellas_wi),
+                            lambda: motor_wi.procesar_real(extractos, ventas, **kwargs_wi, huellas=huellas_wi),
+                        )
+                    st.session_state["resultado"] = compactar_resultado(resultado_wi)
+                    st.session_state["stats"] = resultado_wi["stats"]
+                    st.session_state["kwargs_real"] = kwargs_wi
+                    st.session_state.pop("barrido_tolerancias", None)
+                    st.session_state.pop("whatif", None)
+                    st.rerun()
 
     # ═══════════════════════════════════════════════════════
     # DASHBOARD EJECUTIVO (INICIO)
@@ -0,0 +1,272 @@
+"""
+Benchmark del motor de conciliacion real por etapas y a escala.
+
+Arma entradas de 1x, 10x, 100x, 1000x los datos de diciembre (extracto
+Santander + ventas Contagram): cada replica es una copia con los CUIT
+remapeados (mismo CUIT en el banco y en Contagram), asi crece la cantidad de
+clientes y no el tamano de cada grupo por CUIT, como pasaria con mas meses o
+mas clientes reales.
+
+Corre procesar_real (sin etapas en cache) y toma tiempo y pico de memoria de
+cada etapa de PIPELINE_REAL: los segundos de resultado["perf"]["etapas"] y el
+pico (tracemalloc) de los eventos etapa_inicio / etapa_fin. Asi se mide el
+mismo pipeline que corre la app. Las corridas con factor grande (1000x) son
+largas: se piden a mano con --escalas.
+
+Uso:
+    python benchmark_conciliacion.py                       # escalas 1 y 10
+    python benchmark_conciliacion.py --escalas 1,10,100
+    python benchmark_conciliacion.py --baseline output/benchmark/baseline.json
+    python benchmark_conciliacion.py --guardar-baseline output/benchmark/baseline.json
+    python benchmark_conciliacion.py --escalas 10 --perfil-memoria
+
+--perfil-memoria agrega una corrida de procesar_real con el perfil de memoria
+por etapa (src/perfil_memoria.py) sobre la escala mas grande: pico por etapa
+y los sitios del codigo que mas memoria asignaron.
+
+Escribe el resultado en JSON (--salida). Con --baseline compara contra una
+corrida guardada y sale con codigo 1 si alguna etapa es mas lenta (o usa mas
+memoria) que la baseline por encima de --tolerancia.
+"""
+import argparse
+import json
+import os
+import platform
+import re
+import sys
+import tracemalloc
+from datetime import datetime
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from src.eventos import ETAPA_FIN, ETAPA_INICIO
+from src.motor_conciliacion import PIPELINE_REAL, VERSION_MOTOR, MotorConciliacion
+from src.pipeline import cache_etapas
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_REAL_DIR = os.path.join(BASE_DIR, "data", "Data_real_diciembre")
+SALIDA_DIR = os.path.join(BASE_DIR, "output", "benchmark")
+
+ESCALAS_DEFAULT = [1, 10]
+TOLERANCIA_DEFAULT = 0.25      # 25% mas lento que la baseline = regresion
+MIN_DIFERENCIA_SEG = 0.05      # ignorar diferencias de tiempo menores (ruido)
+MIN_DIFERENCIA_MB = 1.0        # idem para memoria
+
+ETAPAS = [etapa.nombre for etapa in PIPELINE_REAL.etapas]
+
+_CUIT_BANCO = re.compile(r"\b(\d{2})(\d{8})(\d)\b")
+_CUIT_CONTAGRAM = re.compile(r"^(\d{2})-?(\d{8})-?(\d)$")
+_SALTO_REPLICA = 7919          # primo: las replicas no pisan CUIT entre si
+
+
+def cargar_datos_diciembre() -> tuple[pd.DataFrame, pd.DataFrame]:
+    """(extracto Santander crudo, ventas Contagram crudas) de diciembre."""
+    banco = pd.read_excel(os.path.join(DATA_REAL_DIR, "Banco Ventas diciembre - Santander.xlsx"))
+    ventas = pd.read_excel(os.path.join(DATA_REAL_DIR, "Listado de Ventas Dic Dilcor - contagram.xlsx"))
+    return banco, ventas
+
+
+def _cuit_replica(prefijo: str, cuerpo: str, digito: str, replica: int, sep: str = "") -> str:
+    cuerpo = f"{(int(cuerpo) + replica * _SALTO_REPLICA) % 10**8:08d}"
+    return f"{prefijo}{sep}{cuerpo}{sep}{digito}"
+
+
+def escalar_datos(banco: pd.DataFrame, ventas: pd.DataFrame, factor: int) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Concatena `factor` replicas de banco y ventas. La replica 0 es el original;
+    en las demas cada CUIT se corre un salto fijo (en la descripcion bancaria y
+    en la columna CUIT de Contagram) y los Id de venta no se repiten.
+    """
+    if factor <= 1:
+        return banco.copy(), ventas.copy()
+    col_desc = banco.columns[4]
+    desc = banco[col_desc].astype(str)
+    cuits = ventas["CUIT"].astype(object).where(ventas["CUIT"].notna(), None)
+    bancos, listas_ventas = [banco], [ventas]
+    for replica in range(1, factor):
+        b = banco.copy()
+        b[col_desc] = desc.str.replace(
+            _CUIT_BANCO, lambda m: _cuit_replica(*m.groups(), replica), regex=True,
+        )
+        v = ventas.copy()
+        v["CUIT"] = cuits.map(
+            lambda c: c if c is None else _CUIT_CONTAGRAM.sub(
+                lambda m: _cuit_replica(*m.groups(), replica, sep="-"), str(c),
+            )
+        )
+        v["Id"] = v["Id"] + replica * 10**7
+        bancos.append(b)
+        listas_ventas.append(v)
+    return pd.concat(bancos, ignore_index=True), pd.concat(listas_ventas, ignore_index=True)
+
+
+def _picos_por_etapa(picos: dict):
+    """Suscriptor de eventos: pico de tracemalloc de cada etapa (sobre lo asignado al empezarla)."""
+    base = [0]
+
+    def callback(evento):
+        if evento["tipo"] == ETAPA_INICIO:
+            tracemalloc.reset_peak()
+            base[0] = tracemalloc.get_traced_memory()[0]
+        elif evento["tipo"] == ETAPA_FIN:
+            picos[evento["etapa"]] = round((tracemalloc.get_traced_memory()[1] - base[0]) / 1e6, 2)
+    return callback
+
+
+def medir_corrida(banco: pd.DataFrame, ventas: pd.DataFrame, medir_memoria: bool = True) -> dict:
+    """
+    Corre procesar_real una vez sin etapas en cache y devuelve {"etapas": {etapa:
+    {segundos, pico_mb}}, "match_exacto"}: los segundos son los de perf["etapas"]
+    y el pico se toma de los eventos de etapa (solo con medir_memoria).
+    """
+    cache_etapas.limpiar()
+    motor = MotorConciliacion(pd.DataFrame())
+    picos = {}
+    if medir_memoria:
+        motor.suscribir(_picos_por_etapa(picos))
+        tracemalloc.start()
+    try:
+        resultado = motor.procesar_real([banco], ventas)
+    finally:
+        if medir_memoria:
+            tracemalloc.stop()
+    etapas = {e["etapa"]: {"segundos": e["segundos"]} for e in resultado["perf"]["etapas"]}
+    for etapa, pico in picos.items():
+        etapas[etapa]["pico_mb"] = pico
+    return {"etapas": etapas, "match_exacto": resultado["stats"].get("match_exacto", 0)}
+
+
+def ejecutar_benchmark(
+    escalas: list[int] = None,
+    repeticiones: int = 1,
+    medir_memoria: bool = True,
+    datos: tuple[pd.DataFrame, pd.DataFrame] = None,
+) -> dict:
+    """
+    Benchmark completo. Con varias repeticiones se queda con el minimo de
+    tiempo (y de memoria) de cada etapa.
+    """
+    banco, ventas = datos if datos is not None else cargar_datos_diciembre()
+    resultado = {
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "version_motor": VERSION_MOTOR,
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "medir_memoria": medir_memoria,
+        "escalas": {},
+    }
+    for factor in escalas or ESCALAS_DEFAULT:
+        banco_x, ventas_x = escalar_datos(banco, ventas, factor)
+        corridas = [medir_corrida(banco_x, ventas_x, medir_memoria) for _ in range(max(repeticiones, 1))]
+        etapas = {}
+        for etapa in ETAPAS:
+            medidas = [c["etapas"][etapa] for c in corridas]
+            etapas[etapa] = {k: min(med[k] for med in medidas) for k in medidas[0]}
+        resultado["escalas"][str(factor)] = {
+            "filas_banco": len(banco_x),
+            "filas_ventas": len(ventas_x),
+            "match_exacto": corridas[0]["match_exacto"],
+            "total_segundos": round(sum(e["segundos"] for e in etapas.values()), 4),
+            "etapas": etapas,
+        }
+    return resultado
+
+
+def perfil_memoria(banco: pd.DataFrame, ventas: pd.DataFrame, factor: int) -> dict:
+    """procesar_real con el perfil de memoria prendido (sin etapas en cache) sobre la escala `factor`."""
+    banco_x, ventas_x = escalar_datos(banco, ventas, factor)
+    cache_etapas.limpiar()
+    resultado = MotorConciliacion(pd.DataFrame(), perfil_memoria=True).procesar_real([banco_x], ventas_x)
+    return {"escala": factor, **resultado["perf"]["perfil_memoria"]}
+
+
+def comparar_con_baseline(resultado: dict, baseline: dict, tolerancia: float = TOLERANCIA_DEFAULT) -> list[dict]:
+    """Regresiones (etapas mas lentas o con mas memoria que la baseline) en las escalas comunes."""
+    regresiones = []
+    for escala, datos in resultado["escalas"].items():
+        base = baseline.get("escalas", {}).get(escala)
+        if base is None:
+            continue
+        for etapa, medida in datos["etapas"].items():
+            ref = base["etapas"].get(etapa)
+            if ref is None:
+                continue
+            for clave, minimo in (("segundos", MIN_DIFERENCIA_SEG), ("pico_mb", MIN_DIFERENCIA_MB)):
+                if clave not in medida or clave not in ref:
+                    continue
+                actual, anterior = medida[clave], ref[clave]
+                if actual > anterior * (1 + tolerancia) and actual - anterior > minimo:
+                    regresiones.append({
+                        "escala": escala, "etapa": etapa, "medida": clave,
+                        "baseline": anterior, "actual": actual,
+                        "variacion_pct": round((actual / anterior - 1) * 100, 1) if anterior else None,
+                    })
+    return regresiones
+
+
+def _imprimir(resultado: dict):
+    for escala, datos in resultado["escalas"].items():
+        print(f"\n  Escala {escala}x: {datos['filas_banco']} movimientos, {datos['filas_ventas']} ventas "
+              f"({datos['total_segundos']:.2f} s)")
+        for etapa, medida in datos["etapas"].items():
+            memoria = f"  {medida['pico_mb']:>9.2f} MB" if "pico_mb" in medida else ""
+            print(f"    {etapa:<26}{medida['segundos']:>9.3f} s{memoria}")
+
+    perfil = resultado.get("perfil_memoria")
+    if perfil:
+        print(f"\n  Perfil de memoria (escala {perfil['escala']}x, pico {perfil['pico_mb']:.2f} MB)")
+        for etapa in perfil["etapas"]:
+            print(f"    {etapa['etapa']:<26}pico {etapa['pico_mb']:>8.2f} MB  neto {etapa['neto_mb']:>8.2f} MB")
+            for sitio in etapa["top"][:3]:
+                print(f"      {sitio['mb']:>8.3f} MB  {sitio['sitio']}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark del motor de conciliacion real")
+    parser.add_argument("--escalas", default=",".join(map(str, ESCALAS_DEFAULT)),
+                        help="factores separados por coma (ej. 1,10,100,1000)")
+    parser.add_argument("--repeticiones", type=int, default=1)
+    parser.add_argument("--sin-memoria", action="store_true",
+                        help="no medir memoria (tracemalloc agrega overhead a los tiempos)")
+    parser.add_argument("--salida", default=None, help="JSON de resultados (default: output/benchmark/)")
+    parser.add_argument("--baseline", default=None, help="JSON contra el cual comparar")
+    parser.add_argument("--guardar-baseline", default=None, help="guardar este resultado como baseline")
+    parser.add_argument("--tolerancia", type=float, default=TOLERANCIA_DEFAULT)
+    parser.add_argument("--perfil-memoria", action="store_true",
+                        help="agregar el perfil de memoria por etapa de procesar_real (escala mas grande)")
+    args = parser.parse_args(argv)
+
+    escalas = [int(e) for e in args.escalas.split(",") if e.strip()]
+    print("=" * 60)
+    print(f"BENCHMARK CONCILIACION (motor {VERSION_MOTOR}) escalas {escalas}")
+    print("=" * 60)
+    resultado = ejecutar_benchmark(escalas, args.repeticiones, medir_memoria=not args.sin_memoria)
+    if args.perfil_memoria:
+        resultado["perfil_memoria"] = perfil_memoria(*cargar_datos_diciembre(), max(escalas))
+    _imprimir(resultado)
+
+    salida = args.salida or os.path.join(SALIDA_DIR, f"benchmark_{datetime.now():%Y%m%d_%H%M%S}.json")
+    for ruta in filter(None, [salida, args.guardar_baseline]):
+        os.makedirs(os.path.dirname(os.path.abspath(ruta)), exist_ok=True)
+        with open(ruta, "w", encoding="utf-8") as f:
+            json.dump(resultado, f, indent=2, ensure_ascii=False)
+    print(f"\n  Resultado: {salida}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regresiones = comparar_con_baseline(resultado, baseline, args.tolerancia)
+        if regresiones:
+            print(f"\n  REGRESIONES vs {args.baseline} (tolerancia {args.tolerancia:.0%}):")
+            for r in regresiones:
+                print(f"    {r['escala']}x {r['etapa']:<26}{r['medida']}: {r['baseline']} -> {r['actual']} "
+                      f"(+{r['variacion_pct']}%)")
+            return 1
+        print(f"\n  Sin regresiones vs {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,255 @@
+"""
+Conciliacion real por linea de comandos (sin Streamlit).
+
+Corre MotorConciliacion.procesar_real sobre extractos bancarios (archivos o
+carpetas, CSV / XLSX) y un listado de ventas de Contagram, con los mismos
+filtros y overrides de tolerancias que la pagina principal, y escribe en la
+carpeta de salida:
+
+  - subir_cobranzas_contagram.csv: cobranzas para importar (por defecto solo
+    MATCHED y SUGGESTED, como la pagina Exportar; --estados todos para todas)
+  - excepciones.xlsx: movimientos bancarios a revisar
+  - stats.json: run_id, archivos, filtros, config, stats, tiempos y perf
+
+Uso:
+    python conciliar.py data/Data_real_diciembre/Banco*.xlsx \\
+        --contagram "data/Data_real_diciembre/Listado de Ventas Dic Dilcor - contagram.xlsx"
+    python conciliar.py extractos/ -c ventas.xlsx --medios-pago Santander --medio-contiene \\
+        --tipo-movimiento creditos --config tolerancia_monto_pct=0.01 --salida output/dic
+
+Sale con codigo 1 si no puede leer las entradas o la corrida falla. Con
+--trazas deja los spans de la corrida (ver src/tracing.py) y con
+--perfil-memoria agrega el perfil por etapa a stats.json.
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from src import tracing
+from src.conciliador_real import REAL_CONFIG
+from src.motor_conciliacion import MotorConciliacion
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+SALIDA_DIR = os.path.join(BASE_DIR, "output", "cli")
+
+EXTENSIONES = (".xlsx", ".xls", ".csv")
+TIPOS_MOVIMIENTO = {"ambos": "Ambos", "creditos": "Solo Créditos", "debitos": "Solo Débitos"}
+ESTADOS_DEFAULT = ["MATCHED", "SUGGESTED"]
+
+ARCHIVO_COBRANZAS = "subir_cobranzas_contagram.csv"
+ARCHIVO_EXCEPCIONES = "excepciones.xlsx"
+ARCHIVO_STATS = "stats.json"
+
+
+def leer_archivo(ruta: str) -> pd.DataFrame:
+    """CSV o XLSX a DataFrame (igual que los archivos subidos en la app)."""
+    with tracing.span("carga.archivo", archivo=os.path.basename(ruta), bytes=os.path.getsize(ruta)) as span:
+        if ruta.lower().endswith((".xlsx", ".xls")):
+            df = pd.read_excel(ruta)
+        else:
+            df = pd.read_csv(ruta, encoding="utf-8-sig")
+        if span is not None:
+            span.atributo(filas=len(df))
+    return df
+
+
+def expandir_extractos(rutas: list[str], excluir: str = None) -> list[str]:
+    """
+    Archivos de extracto: las carpetas se expanden a sus CSV / XLSX (sin los
+    temporales ~$ de Excel ni `excluir`, el listado de Contagram si esta en la misma carpeta).
+    """
+    excluido = os.path.abspath(excluir) if excluir else None
+    archivos = []
+    for ruta in rutas:
+        if os.path.isdir(ruta):
+            encontrados = sorted(
+                f for f in glob.glob(os.path.join(ruta, "*"))
+                if f.lower().endswith(EXTENSIONES) and not os.path.basename(f).startswith("~$")
+                and os.path.abspath(f) != excluido
+            )
+            if not encontrados:
+                raise ValueError(f"La carpeta {ruta} no tiene extractos (CSV / XLSX)")
+            archivos.extend(encontrados)
+        elif os.path.isfile(ruta):
+            archivos.append(ruta)
+        else:
+            raise ValueError(f"No existe el extracto: {ruta}")
+    return archivos
+
+
+def parsear_config(pares: list[str] = None, archivo_json: str = None) -> dict | None:
+    """
+    Overrides de REAL_CONFIG: primero el JSON (si hay), despues cada CLAVE=VALOR.
+    Solo se aceptan claves de REAL_CONFIG; los valores se leen como numeros.
+    """
+    config = {}
+    if archivo_json:
+        with open(archivo_json, encoding="utf-8") as f:
+            config.update(json.load(f))
+    for par in pares or []:
+        clave, sep, valor = par.partition("=")
+        if not sep:
+            raise ValueError(f"Override invalido '{par}': se espera CLAVE=VALOR")
+        try:
+            config[clave.strip()] = json.loads(valor)
+        except json.JSONDecodeError:
+            raise ValueError(f"Valor invalido para {clave.strip()}: {valor}") from None
+    return validar_config(config)
+
+
+def validar_config(config: dict) -> dict | None:
+    """Rechaza claves que no son de REAL_CONFIG. Devuelve None si no hay overrides."""
+    invalidas = sorted(set(config or {}) - set(REAL_CONFIG))
+    if invalidas:
+        raise ValueError(f"Claves de configuracion desconocidas: {invalidas}. Validas: {sorted(REAL_CONFIG)}")
+    return dict(config) if config else None
+
+
+def conciliar_archivos(
+    extractos: list[str],
+    contagram: str,
+    medios_pago: list[str] = None,
+    medio_contiene: bool = False,
+    tipo_movimiento: str = "Ambos",
+    config: dict = None,
+    perfil_memoria: bool = False,
+) -> dict:
+    """Lee los archivos y corre procesar_real. Devuelve el resultado del motor."""
+    dfs_extractos = [leer_archivo(ruta) for ruta in expandir_extractos(extractos, excluir=contagram)]
+    ventas = leer_archivo(contagram)
+    motor = MotorConciliacion(pd.DataFrame(), perfil_memoria=perfil_memoria)
+    return motor.procesar_real(
+        dfs_extractos, ventas,
+        match_config=config,
+        medios_pago_filtro=medios_pago or None,
+        filtro_medio_contiene=medio_contiene,
+        filtro_tipo_movimiento=tipo_movimiento,
+    )
+
+
+def escribir_excel(ruta: str, hojas: dict[str, pd.DataFrame]):
+    """Excel con una hoja por DataFrame y el encabezado de la app (ver download_excel en src/ui/components.py)."""
+    with pd.ExcelWriter(ruta, engine="xlsxwriter") as writer:
+        hfmt = writer.book.add_format({"bold": True, "bg_color": "#E30613", "font_color": "white", "border": 1})
+        for hoja, df in hojas.items():
+            df.to_excel(writer, index=False, sheet_name=hoja)
+            ws = writer.sheets[hoja]
+            for i, col in enumerate(df.columns):
+                ws.write(0, i, col, hfmt)
+                ws.set_column(i, i, max(15, len(str(col)) + 5))
+
+
+def json_default(valor):
+    # Escalares de numpy / pandas (stats) como numeros; el resto como texto
+    return valor.item() if hasattr(valor, "item") else str(valor)
+
+
+def filtrar_cobranzas(cobranzas: pd.DataFrame, estados: list[str] = None) -> pd.DataFrame:
+    """Cobranzas con Status en `estados` (None = todas), como el filtro de la pagina Exportar."""
+    if estados and "Status" in cobranzas.columns:
+        return cobranzas[cobranzas["Status"].isin(estados)]
+    return cobranzas
+
+
+def escribir_salidas(resultado: dict, directorio: str, estados: list[str] = None, extra: dict = None) -> dict:
+    """
+    Escribe cobranzas CSV, excepciones XLSX y stats JSON en `directorio`.
+    `estados` filtra las cobranzas por Status (None = todas); `extra` se agrega a stats.json.
+    Devuelve {"cobranzas", "excepciones", "stats"} con las rutas.
+    """
+    os.makedirs(directorio, exist_ok=True)
+    rutas = {
+        "cobranzas": os.path.join(directorio, ARCHIVO_COBRANZAS),
+        "excepciones": os.path.join(directorio, ARCHIVO_EXCEPCIONES),
+        "stats": os.path.join(directorio, ARCHIVO_STATS),
+    }
+
+    cobranzas = filtrar_cobranzas(resultado.get("cobranzas_csv", pd.DataFrame()), estados)
+    cobranzas.to_csv(rutas["cobranzas"], index=False, encoding="utf-8-sig")
+
+    escribir_excel(rutas["excepciones"], {"Excepciones": resultado.get("excepciones", pd.DataFrame())})
+
+    datos = {
+        **(extra or {}),
+        "run_id": resultado.get("run_id"),
+        "cobranzas_exportadas": len(cobranzas),
+        "excepciones": len(resultado.get("excepciones", [])),
+        "stats": resultado.get("stats", {}),
+        "tiempos_etapas": resultado.get("tiempos_etapas", []),
+        "perf": resultado.get("perf"),
+    }
+    with open(rutas["stats"], "w", encoding="utf-8") as f:
+        json.dump(datos, f, indent=2, ensure_ascii=False, default=json_default)
+    return rutas
+
+
+def lista_valores(valores: list[str]) -> list[str]:
+    """Acepta valores repetidos y / o separados por coma."""
+    return [v.strip() for valor in valores or [] for v in valor.split(",") if v.strip()]
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Conciliacion real (extractos bancarios vs ventas Contagram) sin UI")
+    parser.add_argument("extractos", nargs="+", help="archivos o carpetas de extractos bancarios (CSV / XLSX)")
+    parser.add_argument("-c", "--contagram", required=True, help="listado de ventas de Contagram (CSV / XLSX)")
+    parser.add_argument("--medios-pago", action="append", default=[],
+                        help="medios de pago a conciliar (repetible o separados por coma; default: todos)")
+    parser.add_argument("--medio-contiene", action="store_true",
+                        help="incluir ventas cuyo medio CONTENGA alguno de los elegidos (default: igualdad)")
+    parser.add_argument("--tipo-movimiento", choices=sorted(TIPOS_MOVIMIENTO), default="ambos")
+    parser.add_argument("--config", action="append", default=[], metavar="CLAVE=VALOR",
+                        help=f"override de tolerancias (repetible): {', '.join(REAL_CONFIG)}")
+    parser.add_argument("--config-json", default=None, help="JSON con overrides de tolerancias")
+    parser.add_argument("--estados", default=",".join(ESTADOS_DEFAULT),
+                        help="Status de cobranzas a exportar, separados por coma, o 'todos'")
+    parser.add_argument("--salida", default=None, help="carpeta de salida (default: output/cli/<run_id>)")
+    parser.add_argument("--perfil-memoria", action="store_true", help="perfil de memoria por etapa en stats.json")
+    parser.add_argument("--trazas", default=None, help="exportar spans de la corrida a este .jsonl")
+    args = parser.parse_args(argv)
+
+    if args.trazas:
+        tracing.configurar(args.trazas)
+    estados = None if args.estados.strip().lower() == "todos" else lista_valores([args.estados])
+    medios = lista_valores(args.medios_pago)
+    tipo = TIPOS_MOVIMIENTO[args.tipo_movimiento]
+
+    inicio = time.perf_counter()
+    try:
+        config = parsear_config(args.config, args.config_json)
+        extractos = expandir_extractos(args.extractos, excluir=args.contagram)
+        resultado = conciliar_archivos(
+            extractos, args.contagram, medios, args.medio_contiene, tipo, config, args.perfil_memoria,
+        )
+    except (OSError, ValueError, KeyError) as e:
+        print(f"ERROR: {e}", file=sys.stderr)
+        return 1
+
+    directorio = args.salida or os.path.join(SALIDA_DIR, resultado["run_id"])
+    rutas = escribir_salidas(resultado, directorio, estados, extra={
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "extractos": extractos,
+        "contagram": args.contagram,
+        "filtros": {"medios_pago": medios, "medio_contiene": args.medio_contiene, "tipo_movimiento": tipo},
+        "config": config,
+    })
+
+    stats = resultado["stats"]
+    print(f"Corrida {resultado['run_id']} en {time.perf_counter() - inicio:.2f} s")
+    print(f"  Movimientos: {stats['total_movimientos']}  Match exacto: {stats['match_exacto']}"
+          f"  Probables: {stats['probable_duda_id'] + stats['probable_dif_cambio']}  Sin match: {stats['no_match']}"
+          f"  ({stats['tasa_conciliacion_total']}% conciliado)")
+    for ruta in rutas.values():
+        print(f"  {ruta}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
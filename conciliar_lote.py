@@ -0,0 +1,323 @@
+"""
+Conciliacion en lote: varias cuentas / periodos en paralelo (sin Streamlit).
+
+Lee un manifiesto con pares (extractos bancarios, listado de Contagram del
+periodo) y corre cada conciliacion real independiente en su propio proceso,
+hasta --workers a la vez. Cada corrida deja sus salidas como conciliar.py en
+<salida>/<nombre>/ y al final se arma un reporte consolidado:
+
+  - resumen_lote.xlsx: hoja Resumen (una fila por corrida, con estado y error),
+    Cobranzas y Excepciones de todas las corridas con la columna Corrida
+  - lote.json: lo mismo que la hoja Resumen mas las rutas de cada corrida
+
+Una corrida que falla (archivo ilegible, banco no soportado) o cuyo proceso
+muere queda con estado ERROR en el resumen y no corta el resto del lote.
+
+Manifiesto JSON (las rutas relativas son relativas al manifiesto; "defaults"
+se aplica a todas las corridas):
+    {
+      "defaults": {"medios_pago": ["Santander"], "medio_contiene": true},
+      "corridas": [
+        {"nombre": "santander_2025_12", "extractos": ["dic/Banco Santander.xlsx"],
+         "contagram": "dic/Ventas.xlsx", "tipo_movimiento": "creditos",
+         "config": {"tolerancia_monto_pct": 0.01}},
+        ...
+      ]
+    }
+o CSV con columnas nombre, extractos, contagram y opcionales medios_pago,
+medio_contiene, tipo_movimiento (listas separadas por ';').
+
+Uso:
+    python conciliar_lote.py auditoria.json --workers 4 --salida output/lote/auditoria
+
+Sale con codigo 1 si el manifiesto es invalido o alguna corrida fallo.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import conciliar
+from src import tracing
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+SALIDA_DIR = os.path.join(BASE_DIR, "output", "lote")
+
+ARCHIVO_RESUMEN = "resumen_lote.xlsx"
+ARCHIVO_LOTE = "lote.json"
+
+CAMPOS_CORRIDA = {"nombre", "extractos", "contagram", "medios_pago", "medio_contiene", "tipo_movimiento", "config"}
+# Stats de cada corrida que van al resumen
+COLUMNAS_STATS = [
+    "total_movimientos", "match_exacto", "probable_duda_id", "probable_dif_cambio", "no_match",
+    "gastos_bancarios", "tasa_conciliacion_total", "monto_cobranzas", "monto_ventas_contagram",
+    "revenue_gap", "monto_no_conciliado",
+]
+
+
+# ─── MANIFIESTO ─────────────────────────────────────────────────────
+
+def _separar(valor) -> list[str]:
+    if isinstance(valor, list):
+        return [str(v) for v in valor]
+    if valor is None or (isinstance(valor, float) and pd.isna(valor)):
+        return []
+    return [v.strip() for v in str(valor).split(";") if v.strip()]
+
+
+def _tipo_movimiento(valor) -> str:
+    """Acepta las claves del CLI (ambos / creditos / debitos) o las etiquetas de la app."""
+    valor = str(valor or "ambos").strip()
+    if valor.lower() in conciliar.TIPOS_MOVIMIENTO:
+        return conciliar.TIPOS_MOVIMIENTO[valor.lower()]
+    if valor in conciliar.TIPOS_MOVIMIENTO.values():
+        return valor
+    raise ValueError(f"tipo_movimiento invalido: {valor}. Opciones: {sorted(conciliar.TIPOS_MOVIMIENTO)}")
+
+
+def leer_manifiesto(ruta: str) -> list[dict]:
+    """
+    Corridas del manifiesto (JSON o CSV) con rutas absolutas, filtros
+    normalizados y config. Valida estructura y nombres unicos; que los archivos
+    se puedan leer se ve en cada corrida (un archivo malo no invalida el lote).
+    """
+    base = os.path.dirname(os.path.abspath(ruta))
+    if ruta.lower().endswith(".csv"):
+        filas = pd.read_csv(ruta, encoding="utf-8-sig", dtype=str).to_dict("records")
+        defaults = {}
+    else:
+        with open(ruta, encoding="utf-8") as f:
+            datos = json.load(f)
+        if isinstance(datos, list):
+            datos = {"corridas": datos}
+        filas, defaults = datos.get("corridas", []), datos.get("defaults", {})
+    if not filas:
+        raise ValueError(f"El manifiesto {ruta} no tiene corridas")
+
+    corridas, nombres = [], set()
+    for i, fila in enumerate(filas, start=1):
+        fila = {k: v for k, v in {**defaults, **fila}.items() if not (isinstance(v, float) and pd.isna(v))}
+        desconocidos = sorted(set(fila) - CAMPOS_CORRIDA)
+        if desconocidos:
+            raise ValueError(f"Corrida {i}: campos desconocidos {desconocidos}")
+        nombre = str(fila.get("nombre") or f"corrida_{i:03d}").strip()
+        if os.path.basename(nombre) != nombre or nombre in (".", ".."):
+            raise ValueError(f"Corrida {i}: el nombre '{nombre}' no puede ser una ruta (es la carpeta de salida)")
+        if nombre in nombres:
+            raise ValueError(f"Corrida {i}: nombre repetido '{nombre}'")
+        nombres.add(nombre)
+        extractos = _separar(fila.get("extractos"))
+        if not extractos or not fila.get("contagram"):
+            raise ValueError(f"Corrida '{nombre}': faltan extractos o contagram")
+        medio_contiene = fila.get("medio_contiene", False)
+        if isinstance(medio_contiene, str):
+            medio_contiene = medio_contiene.strip().lower() in ("1", "true", "si", "yes")
+        corridas.append({
+            "nombre": nombre,
+            "extractos": [os.path.join(base, e) for e in extractos],
+            "contagram": os.path.join(base, fila["contagram"]),
+            "medios_pago": _separar(fila.get("medios_pago")),
+            "medio_contiene": bool(medio_contiene),
+            "tipo_movimiento": _tipo_movimiento(fila.get("tipo_movimiento")),
+            "config": dict(fila.get("config") or {}),
+        })
+    return corridas
+
+
+# ─── CORRIDAS ───────────────────────────────────────────────────────
+
+def correr_corrida(corrida: dict, directorio: str, estados: list[str] = None, trazas: str = None) -> dict:
+    """
+    Una conciliacion del lote (corre en un proceso del pool). Nunca levanta
+    excepcion: los errores quedan en el resumen con estado ERROR y traceback.
+    Devuelve el resumen de la corrida y, si salio bien, sus cobranzas y excepciones.
+    """
+    if trazas:
+        tracing.configurar(trazas)
+    resumen = {"nombre": corrida["nombre"], "estado": "OK", "run_id": None, "error": None, "pid": os.getpid()}
+    inicio = time.perf_counter()
+    try:
+        with tracing.span("lote.corrida", corrida=corrida["nombre"]):
+            config = conciliar.validar_config(corrida["config"])
+            extractos = conciliar.expandir_extractos(corrida["extractos"], excluir=corrida["contagram"])
+            resultado = conciliar.conciliar_archivos(
+                extractos, corrida["contagram"], corrida["medios_pago"], corrida["medio_contiene"],
+                corrida["tipo_movimiento"], config,
+            )
+            salida = os.path.join(directorio, corrida["nombre"])
+            rutas = conciliar.escribir_salidas(resultado, salida, estados, extra={
+                "fecha": datetime.now().isoformat(timespec="seconds"),
+                "extractos": extractos,
+                "contagram": corrida["contagram"],
+                "filtros": {
+                    "medios_pago": corrida["medios_pago"], "medio_contiene": corrida["medio_contiene"],
+                    "tipo_movimiento": corrida["tipo_movimiento"],
+                },
+                "config": config,
+            })
+    except Exception as e:
+        resumen.update(estado="ERROR", error=f"{type(e).__name__}: {e}", traceback=traceback.format_exc())
+        resumen["segundos"] = round(time.perf_counter() - inicio, 3)
+        return {"resumen": resumen}
+
+    stats = resultado["stats"]
+    resumen.update(
+        run_id=resultado["run_id"],
+        segundos=round(time.perf_counter() - inicio, 3),
+        salida=salida,
+        archivos=rutas,
+        **{k: stats.get(k) for k in COLUMNAS_STATS},
+    )
+    return {
+        "resumen": resumen,
+        "cobranzas": conciliar.filtrar_cobranzas(resultado["cobranzas_csv"], estados),
+        "excepciones": resultado["excepciones"],
+    }
+
+
+def correr_lote(
+    corridas: list[dict],
+    directorio: str,
+    workers: int = None,
+    estados: list[str] = None,
+    trazas: str = None,
+    progreso=None,
+) -> list[dict]:
+    """
+    Corre las corridas con hasta `workers` en paralelo (1 = en este proceso,
+    sin pool). Devuelve los resultados de correr_corrida en el orden del
+    manifiesto. `progreso(resumen)` se llama a medida que termina cada corrida.
+
+    Cada corrida usa su propio proceso (un ProcessPoolExecutor de un worker):
+    si el proceso muere (os._exit, falta de memoria, crash de una extension
+    en C) el pool roto es solo el de esa corrida, que queda con ERROR, y las
+    demas siguen. Con un pool compartido la caida rompe todas las pendientes.
+    """
+    workers = max(1, min(workers or os.cpu_count() or 1, len(corridas)))
+    resultados = {}
+    if workers == 1:
+        for corrida in corridas:
+            resultados[corrida["nombre"]] = correr_corrida(corrida, directorio, estados, trazas)
+            if progreso:
+                progreso(resultados[corrida["nombre"]]["resumen"])
+        return [resultados[corrida["nombre"]] for corrida in corridas]
+
+    pendientes = iter(corridas)
+    en_curso = {}       # futuro -> (nombre, pool)
+
+    def _lanzar():
+        corrida = next(pendientes, None)
+        if corrida is not None:
+            pool = ProcessPoolExecutor(max_workers=1)
+            en_curso[pool.submit(correr_corrida, corrida, directorio, estados, trazas)] = (corrida["nombre"], pool)
+
+    for _ in range(workers):
+        _lanzar()
+    while en_curso:
+        listos, _ = wait(en_curso, return_when=FIRST_COMPLETED)
+        for futuro in listos:
+            nombre, pool = en_curso.pop(futuro)
+            try:
+                resultados[nombre] = futuro.result()
+            except BrokenProcessPool as e:
+                resultados[nombre] = _resumen_error(nombre, f"El proceso de la corrida termino abruptamente ({e})")
+            except Exception as e:  # no se pudo serializar la corrida o su resultado
+                resultados[nombre] = _resumen_error(nombre, f"{type(e).__name__}: {e}")
+            pool.shutdown()
+            if progreso:
+                progreso(resultados[nombre]["resumen"])
+            _lanzar()
+    return [resultados[corrida["nombre"]] for corrida in corridas]
+
+
+def _resumen_error(nombre: str, error: str) -> dict:
+    return {"resumen": {"nombre": nombre, "estado": "ERROR", "run_id": None, "error": error, "pid": None}}
+
+
+# ─── REPORTE CONSOLIDADO ────────────────────────────────────────────
+
+def _con_corrida(resultados: list[dict], clave: str) -> pd.DataFrame:
+    partes = [
+        r[clave].assign(Corrida=r["resumen"]["nombre"])[["Corrida", *r[clave].columns]]
+        for r in resultados if clave in r and not r[clave].empty
+    ]
+    return pd.concat(partes, ignore_index=True) if partes else pd.DataFrame(columns=["Corrida"])
+
+
+def escribir_reporte(resultados: list[dict], directorio: str, extra: dict = None) -> dict:
+    """Resumen consolidado del lote (XLSX + JSON) en `directorio`. Devuelve {"resumen", "lote"} con las rutas."""
+    os.makedirs(directorio, exist_ok=True)
+    rutas = {"resumen": os.path.join(directorio, ARCHIVO_RESUMEN), "lote": os.path.join(directorio, ARCHIVO_LOTE)}
+    resumenes = [r["resumen"] for r in resultados]
+
+    columnas = ["nombre", "estado", "run_id", "segundos", *COLUMNAS_STATS, "error"]
+    tabla = pd.DataFrame(resumenes).reindex(columns=columnas)
+    conciliar.escribir_excel(rutas["resumen"], {
+        "Resumen": tabla,
+        "Cobranzas": _con_corrida(resultados, "cobranzas"),
+        "Excepciones": _con_corrida(resultados, "excepciones"),
+    })
+
+    datos = {
+        **(extra or {}),
+        "corridas": len(resumenes),
+        "ok": sum(r["estado"] == "OK" for r in resumenes),
+        "errores": sum(r["estado"] != "OK" for r in resumenes),
+        "resumen": resumenes,
+    }
+    with open(rutas["lote"], "w", encoding="utf-8") as f:
+        json.dump(datos, f, indent=2, ensure_ascii=False, default=conciliar.json_default)
+    return rutas
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Conciliacion real en lote (varias cuentas / periodos en paralelo)")
+    parser.add_argument("manifiesto", help="JSON o CSV con las corridas (extractos + contagram por periodo)")
+    parser.add_argument("-w", "--workers", type=int, default=None,
+                        help="corridas en paralelo, cada una en su proceso (default: CPUs; 1 = en este proceso)")
+    parser.add_argument("--salida", default=None, help="carpeta del lote (default: output/lote/<fecha>)")
+    parser.add_argument("--estados", default=",".join(conciliar.ESTADOS_DEFAULT),
+                        help="Status de cobranzas a exportar, separados por coma, o 'todos'")
+    parser.add_argument("--trazas", default=None, help="exportar spans de todas las corridas a este .jsonl")
+    args = parser.parse_args(argv)
+
+    try:
+        corridas = leer_manifiesto(args.manifiesto)
+    except (OSError, ValueError) as e:
+        print(f"ERROR: manifiesto invalido: {e}", file=sys.stderr)
+        return 1
+
+    estados = None if args.estados.strip().lower() == "todos" else conciliar.lista_valores([args.estados])
+    directorio = args.salida or os.path.join(SALIDA_DIR, datetime.now().strftime("%Y%m%d_%H%M%S"))
+
+    def _progreso(resumen):
+        detalle = f"{resumen.get('segundos', 0):.2f} s" if resumen["estado"] == "OK" else resumen["error"]
+        print(f"  [{resumen['estado']}] {resumen['nombre']}: {detalle}")
+
+    inicio = time.perf_counter()
+    print(f"Lote de {len(corridas)} corridas ({args.workers or 'CPUs'} workers)")
+    resultados = correr_lote(corridas, directorio, args.workers, estados, args.trazas, progreso=_progreso)
+    rutas = escribir_reporte(resultados, directorio, extra={
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "manifiesto": os.path.abspath(args.manifiesto),
+        "segundos": round(time.perf_counter() - inicio, 3),
+    })
+
+    errores = [r["resumen"] for r in resultados if r["resumen"]["estado"] != "OK"]
+    print(f"{len(resultados) - len(errores)} OK, {len(errores)} con error en {time.perf_counter() - inicio:.2f} s")
+    for ruta in rutas.values():
+        print(f"  {ruta}")
+    return 1 if errores else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -6,7 +6,7 @@ Keys usadas de session_state:
   resultado["resultados"]       → DataFrame movimientos (filtrar CREDITO)
   stats["cobros"]               → KPIs bancos
   stats["monto_ventas_contagram"] → Total facturado
-  datos_ventas                  → DataFrame original de ventas (para alertas)
+  datos_ventas                  → DataFrame original de ventas (solo demo; en real usar detalle_facturas)
   detalle_facturas              → Resultado procesado de facturas (modo real)
 """
 import streamlit as st
@@ -14,15 +14,19 @@ import pandas as pd
 from src.ui.styles import load_css
 from src.ui.components import (
     kpi_card, kpi_hero, section_div, page_header, format_money,
-    build_column_config, render_data_table, no_data_warning,
+    build_column_config, render_data_table, render_tabla_paginada, no_data_warning, render_trabajo_en_curso,
     donut_chart, alert_card,
 )
+from src.busqueda import indice_sesion
+from src.vistas import obtener_vistas
 
 st.set_page_config(page_title="Cobros - Dilcor", page_icon="💰", layout="wide")
 load_css()
 
 page_header("Cobros", "Conciliación de ingresos: créditos bancarios vs ventas Contagram", "💰")
 
+render_trabajo_en_curso()
+
 if "resultado" not in st.session_state:
     no_data_warning()
     st.stop()
@@ -32,17 +36,15 @@ stats = st.session_state["stats"]
 cb = stats.get("cobros", {})
 df_full = resultado.get("resultados", pd.DataFrame())
 
-# DataFrame Cobros
-df_cobros = pd.DataFrame()
-if not df_full.empty:
-    df_cobros = df_full.copy()
-    if "tipo" in df_cobros.columns:
-        df_cobros = df_cobros[df_cobros["tipo"] == "CREDITO"]
-    elif "clasificacion" in df_cobros.columns:
-        df_cobros = df_cobros[df_cobros["clasificacion"] == "cobranza"]
+# Vistas precalculadas de la corrida (solo lectura)
+vistas = obtener_vistas(resultado)
+df_cobros = vistas["cobros"]
 
 # Datos Contagram
-df_ventas = st.session_state.get("datos_ventas", pd.DataFrame())
+# En modo real la sesion guarda None (las ventas ya estan en detalle_facturas)
+df_ventas = st.session_state.get("datos_ventas")
+if df_ventas is None:
+    df_ventas = pd.DataFrame()
 df_det = resultado.get("detalle_facturas", pd.DataFrame())  # Processed invoice status
 
 
@@ -60,11 +62,10 @@ monto_conciliado = cb.get("match_exacto_monto", 0)
 monto_pendiente_banco = cb.get("monto_total", 0) - monto_conciliado
 
 if not df_det.empty and "Estado Conciliacion" in df_det.columns:
-    pendientes = df_det[df_det["Estado Conciliacion"] != "Conciliada"]
+    pendientes = vistas["facturas_pendientes"]
     n_pend = len(pendientes)
     m_pend = pendientes["Total Venta"].sum() if "Total Venta" in pendientes.columns else 0
-    conciliadas = df_det[df_det["Estado Conciliacion"] == "Conciliada"]
-    n_conc = len(conciliadas)
+    n_conc = len(vistas["facturas_conciliadas"])
 else:
     n_pend = "N/D"
     m_pend = 0
@@ -141,27 +142,9 @@ section_div("Alertas Prioritarias", "🚨")
 # Clientes con facturas pendientes pero SIN cobros identificados
 clientes_sin_match = pd.DataFrame()
 if not df_det.empty:
-    # Agrupar facturas por cliente
-    agg_dict = {
-        "Total Venta": "sum",
-        "Estado Conciliacion": lambda x: (x != "Conciliada").all()  # True si NINGUNA conciliada
-    }
-    # Agregar conteo y última fecha si existen
-    if "Nro Factura" in df_det.columns:
-        agg_dict["Nro Factura"] = "count"
-    if "Fecha Emision" in df_det.columns:
-        agg_dict["Fecha Emision"] = "max"
-    
-    facturas_por_cliente = df_det.groupby("Cliente").agg(agg_dict).reset_index()
-    
-    # Renombrar columnas
-    rename_map = {"Estado Conciliacion": "Sin Match Total", "Total Venta": "Monto Pendiente"}
-    if "Nro Factura" in facturas_por_cliente.columns:
-        rename_map["Nro Factura"] = "Cant. Facturas"
-    if "Fecha Emision" in facturas_por_cliente.columns:
-        rename_map["Fecha Emision"] = "Última Factura"
-    facturas_por_cliente = facturas_por_cliente.rename(columns=rename_map)
-    
+    # Facturas agrupadas por cliente ("Sin Match Total" = ninguna conciliada)
+    facturas_por_cliente = vistas["por_cliente"]
+
     # Filtrar: clientes donde NINGUNA factura fue conciliada
     pendientes_strict = facturas_por_cliente[
         (facturas_por_cliente["Sin Match Total"] == True) & 
@@ -169,7 +152,7 @@ if not df_det.empty:
     ].sort_values("Monto Pendiente", ascending=False)
     
     if not pendientes_strict.empty:
-        top_pend = pendientes_strict.head(10)
+        top_pend = pendientes_strict.head(10).copy()
         monto_riesgo = pendientes_strict["Monto Pendiente"].sum()
         
         # Formatear Monto Pendiente manualmente para evitar errores de sprintf
@@ -205,7 +188,7 @@ else:
 if not df_cobros.empty and not df_det.empty:
     cobros_match = df_cobros[df_cobros["nombre_contagram"].notna() & (df_cobros["nombre_contagram"] != "")]
     # Clientes con facturas pendientes
-    clientes_con_deuda = df_det[df_det["Estado Conciliacion"] != "Conciliada"]["Cliente"].unique()
+    clientes_con_deuda = vistas["facturas_pendientes"]["Cliente"].unique()
     
     # Cobros a clientes que NO estan en la lista de con deuda?
     # (Esto puede pasar si el cobro saldo la deuda y quedo 'Conciliada', ojo.
@@ -217,7 +200,7 @@ if not df_cobros.empty and not df_det.empty:
     # Implementación: Cobros donde el cliente NO tiene 'Total Venta' > 0 en el periodo analizado
     # (Si usamos solo ventas del periodo, esto detecta anticipos o pagos de facturas viejas no incluidas)
     clientes_ventas_periodo = df_det["Cliente"].unique()
-    cobros_sin_factura = cobros_match[~cobros_match["nombre_contagram"].isin(clientes_ventas_periodo)]
+    cobros_sin_factura = cobros_match[~cobros_match["nombre_contagram"].isin(clientes_ventas_periodo)].copy()
     
     if not cobros_sin_factura.empty:
         with st.expander(f"🔴 Cobros en Banco sin Factura en Contagram — {len(cobros_sin_factura)} movimientos", expanded=False):
@@ -255,13 +238,15 @@ if match_col in df_cobros.columns:
 
 # ── ALERTA 4: Clientes con Cobro Diferente ──
 if "diferencia_monto" in df_cobros.columns:
+    # Sin ninguna venta cruzada la columna queda toda en None (object)
+    dif_monto = pd.to_numeric(df_cobros["diferencia_monto"], errors="coerce")
     df_dif = df_cobros[
-        (df_cobros["diferencia_monto"].abs() > 0.01) & 
+        (dif_monto.abs() > 0.01) & 
         (df_cobros[match_col] != "no_match")
     ]
     if not df_dif.empty:
-        cob_mas = df_dif[df_dif["diferencia_monto"] > 0]
-        cob_menos = df_dif[df_dif["diferencia_monto"] < 0]
+        cob_mas = df_dif[dif_monto[df_dif.index] > 0]
+        cob_menos = df_dif[dif_monto[df_dif.index] < 0]
         
         # Columnas disponibles para la tabla de diferencias
         dif_cols = [c for c in ["nombre_contagram", "monto", "monto_factura", "diferencia_monto", "diferencia_pct"] if c in df_dif.columns]
@@ -340,7 +325,7 @@ with tab_ctg:
             search_ctg = st.text_input("Buscar cliente / nro factura", key="ctg_search")
 
         # --- Aplicar filtros ---
-        df_det_show = df_det.copy()
+        df_det_show = df_det
         if estado_sel:
             df_det_show = df_det_show[df_det_show["Estado Conciliacion"].isin(estado_sel)]
         if medio_sel and "Medio de Cobro" in df_det_show.columns:
@@ -354,10 +339,8 @@ with tab_ctg:
             except Exception:
                 pass
         if search_ctg:
-            mask = df_det_show.astype(str).apply(
-                lambda x: x.str.contains(search_ctg, case=False, na=False)
-            ).any(axis=1)
-            df_det_show = df_det_show[mask]
+            indice_det = indice_sesion(st.session_state, resultado.get("run_id", ""), "detalle_facturas", df_det)
+            df_det_show = indice_det.filtrar(df_det_show, search_ctg)
 
         # --- Columnas a mostrar ---
         det_cols = [
@@ -367,9 +350,7 @@ with tab_ctg:
         ]
         det_cols = [c for c in det_cols if c in df_det_show.columns]
 
-        # --- Colorear filas ---
-        df_det_disp = df_det_show[det_cols].copy().reset_index(drop=True)
-
+        # --- Colorear filas (solo la pagina visible) ---
         def _color_estado(row):
             if "Estado Conciliacion" in row.index:
                 if row["Estado Conciliacion"] == "Conciliada":
@@ -378,15 +359,7 @@ with tab_ctg:
                     return ["background-color: rgba(227, 6, 19, 0.10)"] * len(row)
             return [""] * len(row)
 
-        # Formatear montos
-        for mc in ["Total Venta", "Cobrado", "Diferencia Venta-Cobro"]:
-            if mc in df_det_disp.columns:
-                df_det_disp[mc] = df_det_disp[mc].apply(
-                    lambda x: f"$ {x:,.0f}" if pd.notnull(x) and isinstance(x, (int, float)) else x
-                )
-
-        styled = df_det_disp.style.apply(_color_estado, axis=1)
-        st.dataframe(styled, use_container_width=True, hide_index=True)
+        render_tabla_paginada(df_det_show, "cob_det", columnas=det_cols, estilo_fila=_color_estado)
 
         # --- Totales al pie ---
         total_facturado = df_det_show["Total Venta"].sum() if "Total Venta" in df_det_show.columns else 0
@@ -414,28 +387,19 @@ with tab_banco:
         with c4:
             search = st.text_input("Buscar cliente/importe", key="search_mov")
 
-        df_show = df_cobros.copy()
+        df_show = df_cobros
         if banco_sel:
             df_show = df_show[df_show["banco"].isin(banco_sel)]
         if nivel_sel:
             df_show = df_show[df_show[match_col].astype(str).isin(nivel_sel)]
         if search:
-            df_show = df_show[df_show.astype(str).apply(
-                lambda x: x.str.contains(search, case=False, na=False)
-            ).any(axis=1)]
+            indice_mov = indice_sesion(st.session_state, resultado.get("run_id", ""), "resultados", df_full)
+            df_show = indice_mov.filtrar(df_show, search)
 
         cols = ["fecha", "banco", "descripcion", "nombre_contagram", "monto", "monto_factura", "diferencia_monto", match_col]
         cols = [c for c in cols if c in df_show.columns]
 
-        df_disp = df_show[cols].copy()
-        num_cols = ["monto", "monto_factura", "diferencia_monto"]
-        for c in num_cols:
-            if c in df_disp.columns:
-                df_disp[c] = df_disp[c].apply(
-                    lambda x: f"$ {x:,.0f}" if pd.notnull(x) and isinstance(x, (int, float)) else x
-                )
-
-        st.dataframe(df_disp, use_container_width=True, hide_index=True)
+        render_tabla_paginada(df_show, "cob_mov", columnas=cols)
         st.markdown(f"**Total visible: {format_money(df_show['monto'].sum())}**")
     else:
         st.info("Sin movimientos bancarios de tipo crédito.")
@@ -445,14 +409,8 @@ with tab_banco:
 # SECCION D — Excepciones Banco (créditos sin identificar)
 # ═══════════════════════════════════════════════════════
 if not df_cobros.empty:
-    # Filtrar créditos no_match / EXCLUDED
-    _exc_mask = pd.Series(False, index=df_cobros.index)
-    if "conciliation_status" in df_cobros.columns:
-        _exc_mask = _exc_mask | (df_cobros["conciliation_status"] == "EXCLUDED")
-    if match_col in df_cobros.columns:
-        _exc_mask = _exc_mask | (df_cobros[match_col] == "no_match")
-
-    df_exc_banco = df_cobros[_exc_mask].copy()
+    # Créditos no_match / EXCLUDED
+    df_exc_banco = vistas["cobros_sin_identificar"]
 
     if not df_exc_banco.empty:
         n_exc = len(df_exc_banco)
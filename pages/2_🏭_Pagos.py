@@ -13,15 +13,19 @@ import pandas as pd
 from src.ui.styles import load_css
 from src.ui.components import (
     kpi_card, kpi_hero, section_div, page_header, format_money,
-    build_column_config, render_data_table, no_data_warning,
+    build_column_config, render_data_table, render_tabla_paginada, no_data_warning, render_trabajo_en_curso,
     alert_card,
 )
+from src.busqueda import indice_sesion
+from src.vistas import obtener_vistas
 
 st.set_page_config(page_title="Pagos - Dilcor", page_icon="🏭", layout="wide")
 load_css()
 
 page_header("Pagos a Proveedores", "Conciliación de egresos: débitos bancarios vs compras Contagram", "🏭")
 
+render_trabajo_en_curso()
+
 if "resultado" not in st.session_state:
     no_data_warning()
     st.stop()
@@ -31,16 +35,9 @@ stats = st.session_state["stats"]
 pg = stats.get("pagos_prov", {})
 df_full = resultado.get("resultados", pd.DataFrame())
 
-# DataFrame Pagos
-df_pagos = pd.DataFrame()
-if not df_full.empty:
-    df_pagos = df_full.copy()
-    if "tipo" in df_pagos.columns:
-        df_pagos = df_pagos[df_pagos["tipo"] == "DEBITO"]
-    elif "clasificacion" in df_pagos.columns:
-        df_pagos = df_pagos[df_pagos["clasificacion"] == "pago_proveedor"]
-    if "clasificacion" in df_pagos.columns:
-        df_pagos = df_pagos[df_pagos["clasificacion"] != "gasto_bancario"]
+# Vistas precalculadas de la corrida (solo lectura)
+vistas = obtener_vistas(resultado)
+df_pagos = vistas["pagos"]
 
 # Datos Contagram (OCs)
 df_compras = st.session_state.get("datos_compras", pd.DataFrame())
@@ -199,7 +196,7 @@ if "nombre_contagram" in df_pagos.columns:
 else:
     pagos_con_prov = pd.DataFrame()
 if not pagos_con_prov.empty and "factura_match" in pagos_con_prov.columns:
-    pagos_sin_oc = pagos_con_prov[pagos_con_prov["factura_match"].isna() | (pagos_con_prov["factura_match"] == "")]
+    pagos_sin_oc = pagos_con_prov[pagos_con_prov["factura_match"].isna() | (pagos_con_prov["factura_match"] == "")].copy()
     if not pagos_sin_oc.empty:
          with st.expander(f"🔴 Pagos en Banco sin OC en Contagram — {len(pagos_sin_oc)} pagos", expanded=False):
             st.caption("Pagos donde se identificó el proveedor, pero **no se encontró la OC específica**.")
@@ -237,13 +234,15 @@ else:
 
 # ── ALERTA 4: Proveedores Pagados Diferente a la OC ──
 if "diferencia_monto" in df_pagos.columns:
+    # Sin ninguna OC cruzada (ej. modo real) la columna queda toda en None (object)
+    dif_monto = pd.to_numeric(df_pagos["diferencia_monto"], errors="coerce")
     df_dif = df_pagos[
-        (df_pagos["diferencia_monto"].abs() > 0.01) & 
+        (dif_monto.abs() > 0.01) & 
         (df_pagos[match_col] != "no_match")
     ]
     if not df_dif.empty:
-        pag_mas = df_dif[df_dif["diferencia_monto"] > 0]
-        pag_menos = df_dif[df_dif["diferencia_monto"] < 0]
+        pag_mas = df_dif[dif_monto[df_dif.index] > 0]
+        pag_menos = df_dif[dif_monto[df_dif.index] < 0]
         
         # Columnas disponibles para la tabla de diferencias
         dif_cols = [c for c in ["nombre_contagram", "monto", "monto_factura", "diferencia_monto", "diferencia_pct"] if c in df_dif.columns]
@@ -325,20 +324,10 @@ with tab_ctg_p:
             except Exception:
                 pass
         if search_oc:
-            mask = df_oc_show.astype(str).apply(
-                lambda x: x.str.contains(search_oc, case=False, na=False)
-            ).any(axis=1)
-            df_oc_show = df_oc_show[mask]
-
-        # Formatear montos
-        df_oc_disp = df_oc_show.copy()
-        for mc in ["Monto Total", "monto"]:
-            if mc in df_oc_disp.columns:
-                df_oc_disp[mc] = df_oc_disp[mc].apply(
-                    lambda x: f"$ {x:,.0f}" if pd.notnull(x) and isinstance(x, (int, float)) else x
-                )
+            indice_oc = indice_sesion(st.session_state, resultado.get("run_id", ""), "compras", df_compras)
+            df_oc_show = indice_oc.filtrar(df_oc_show, search_oc)
 
-        st.dataframe(df_oc_disp.reset_index(drop=True), use_container_width=True, hide_index=True)
+        render_tabla_paginada(df_oc_show, "pag_oc")
 
         # Totales
         total_ocs_vis = df_oc_show["Monto Total"].sum() if "Monto Total" in df_oc_show.columns else 0
@@ -360,28 +349,19 @@ with tab_banco_p:
         with c4:
             search_p = st.text_input("Buscar proveedor/importe", key="search_pag")
 
-        df_show_p = df_pagos.copy()
+        df_show_p = df_pagos
         if banco_sel_p:
             df_show_p = df_show_p[df_show_p["banco"].isin(banco_sel_p)]
         if nivel_sel_p:
             df_show_p = df_show_p[df_show_p[match_col].astype(str).isin(nivel_sel_p)]
         if search_p:
-            df_show_p = df_show_p[df_show_p.astype(str).apply(
-                lambda x: x.str.contains(search_p, case=False, na=False)
-            ).any(axis=1)]
+            indice_mov = indice_sesion(st.session_state, resultado.get("run_id", ""), "resultados", df_full)
+            df_show_p = indice_mov.filtrar(df_show_p, search_p)
 
         cols = ["fecha", "banco", "descripcion", "nombre_contagram", "monto", "monto_factura", "diferencia_monto", match_col]
         cols = [c for c in cols if c in df_show_p.columns]
 
-        df_disp = df_show_p[cols].copy()
-        num_cols = ["monto", "monto_factura", "diferencia_monto"]
-        for c in num_cols:
-            if c in df_disp.columns:
-                df_disp[c] = df_disp[c].apply(
-                    lambda x: f"$ {x:,.0f}" if pd.notnull(x) and isinstance(x, (int, float)) else x
-                )
-
-        st.dataframe(df_disp, use_container_width=True, hide_index=True)
+        render_tabla_paginada(df_show_p, "pag_mov", columnas=cols)
         st.markdown(f"**Total visible: {format_money(df_show_p['monto'].sum())}**")
     else:
         st.info("Sin movimientos bancarios de tipo débito.")
@@ -391,14 +371,8 @@ with tab_banco_p:
 # SECCION D — Excepciones Banco (débitos sin identificar)
 # ═══════════════════════════════════════════════════════
 if not df_pagos.empty:
-    # Filtrar débitos no_match / EXCLUDED
-    _exc_mask_p = pd.Series(False, index=df_pagos.index)
-    if "conciliation_status" in df_pagos.columns:
-        _exc_mask_p = _exc_mask_p | (df_pagos["conciliation_status"] == "EXCLUDED")
-    if match_col in df_pagos.columns:
-        _exc_mask_p = _exc_mask_p | (df_pagos[match_col] == "no_match")
-
-    df_exc_pagos = df_pagos[_exc_mask_p].copy()
+    # Débitos no_match / EXCLUDED
+    df_exc_pagos = vistas["pagos_sin_identificar"]
 
     if not df_exc_pagos.empty:
         n_exc_p = len(df_exc_pagos)
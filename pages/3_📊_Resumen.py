@@ -6,6 +6,7 @@ Keys usadas de session_state:
   resultado["resultados"]       → DataFrame completo
   stats["por_banco"]            → dict desglosado
   stats (global)                → KPIs generales
+  resultado["tabla_candidatos"] → candidatos para el barrido de tolerancias (datos reales)
 """
 import streamlit as st
 import pandas as pd
@@ -13,21 +14,27 @@ import plotly.graph_objects as go
 from src.ui.styles import load_css
 from src.ui.components import (
     kpi_hero, kpi_card, section_div, page_header, format_money,
-    build_column_config, render_data_table, no_data_warning,
-    horizontal_bar_chart, donut_chart, alert_card, download_csv,
+    build_column_config, render_data_table, render_tabla_paginada, no_data_warning, render_trabajo_en_curso,
+    horizontal_bar_chart, donut_chart, alert_card, download_csv, download_excel,
 )
+from src.candidatos import GRILLA_DEFAULT, barrido_tolerancias
+from src.busqueda import indice_sesion
+from src.vistas import obtener_vistas
 
 st.set_page_config(page_title="Resumen - Dilcor", page_icon="📊", layout="wide")
 load_css()
 
 page_header("Resumen", "Vista técnica consolidada para auditoría", "📊")
 
+render_trabajo_en_curso()
+
 if "resultado" not in st.session_state:
     no_data_warning()
     st.stop()
 
 resultado = st.session_state["resultado"]
 stats = st.session_state["stats"]
+vistas = obtener_vistas(resultado)
 cb = stats.get("cobros", {})
 pg = stats.get("pagos_prov", {})
 
@@ -46,7 +53,7 @@ monto_ident = monto_exacto + cb.get("probable_duda_id_monto", 0)
 cob_total_pct = (monto_ident / monto_ventas * 100) if monto_ventas > 0 else 0
 
 if not df_det.empty and "Estado Conciliacion" in df_det.columns:
-    n_conc = len(df_det[df_det["Estado Conciliacion"] == "Conciliada"])
+    n_conc = len(vistas["facturas_conciliadas"])
     n_total_f = len(df_det)
 else:
     n_conc = 0
@@ -98,32 +105,23 @@ st.markdown("###")
 section_div("Calidad de Conciliación por Banco", "🏛️")
 
 por_banco = stats.get("por_banco", {})
+df_por_banco = vistas["por_banco"]
 
-if por_banco:
+if not df_por_banco.empty:
     col_metrics, col_chart = st.columns([1, 1])
     
     with col_metrics:
-        rows = []
-        for banco, data in por_banco.items():
-            total = max(data.get("movimientos", 1), 1)
-            me = data.get("match_exacto", 0)
-            nm = data.get("no_match", 0)
-            prob = data.get("probable_duda_id", 0) + data.get("probable_dif_cambio", 0)
-            
-            rows.append({
-                "Banco": banco,
-                "Movs": data.get("movimientos", 0),
-                "% Exacto": f"{round(me / total * 100, 1)}%",
-                "% Probable": f"{round(prob / total * 100, 1)}%",
-                "% Sin Match": f"{round(nm / total * 100, 1)}%",
-            })
-        st.dataframe(pd.DataFrame(rows), use_container_width=True, hide_index=True)
+        st.dataframe(
+            df_por_banco[["Banco", "Movs", "% Exacto", "% Probable", "% Sin Match"]],
+            use_container_width=True, hide_index=True,
+            column_config={c: st.column_config.NumberColumn(c, format="%.1f%%") for c in ["% Exacto", "% Probable", "% Sin Match"]},
+        )
 
     with col_chart:
-        bancos_names = [r["Banco"] for r in rows]
-        vals_exacto = [por_banco[b].get("match_exacto", 0) for b in bancos_names]
-        vals_prob = [por_banco[b].get("probable_duda_id", 0) + por_banco[b].get("probable_dif_cambio", 0) for b in bancos_names]
-        vals_no = [por_banco[b].get("no_match", 0) for b in bancos_names]
+        bancos_names = df_por_banco["Banco"].tolist()
+        vals_exacto = df_por_banco["Exacto"].tolist()
+        vals_prob = df_por_banco["Probable"].tolist()
+        vals_no = df_por_banco["Sin Match"].tolist()
 
         fig = go.Figure()
         fig.add_trace(go.Bar(name="Exacto", x=bancos_names, y=vals_exacto, marker_color="#0D7C3D"))
@@ -133,6 +131,42 @@ if por_banco:
         st.plotly_chart(fig, use_container_width=True)
 
 
+# ═══════════════════════════════════════════════════════
+# CALIBRACION DE TOLERANCIAS (barrido, solo datos reales)
+# ═══════════════════════════════════════════════════════
+tabla_candidatos = resultado.get("tabla_candidatos")
+if tabla_candidatos is not None:
+    st.markdown("###")
+    section_div("Calibración de Tolerancias", "🎯")
+    n_puntos = 1
+    for valores in GRILLA_DEFAULT.values():
+        n_puntos *= len(valores)
+    st.caption(
+        f"Evalúa {n_puntos} combinaciones de tolerancia de monto (% y $) y ventanas de días "
+        f"sobre la tabla de candidatos de esta corrida, sin volver a correr el motor."
+    )
+    if st.button("Ejecutar barrido", key="res_barrido"):
+        with st.spinner("Evaluando grilla de tolerancias..."):
+            config_actual = (st.session_state.get("kwargs_real") or {}).get("match_config")
+            st.session_state["barrido_tolerancias"] = barrido_tolerancias(tabla_candidatos, config=config_actual)
+
+    df_barrido = st.session_state.get("barrido_tolerancias")
+    if df_barrido is not None and not df_barrido.empty:
+        df_barrido = df_barrido.sort_values(
+            ["tasa_matched", "monto_matched"], ascending=False,
+        ).reset_index(drop=True)
+        st.dataframe(df_barrido, use_container_width=True, hide_index=True)
+        st.caption(
+            f"{len(df_barrido)} puntos evaluados en {df_barrido['segundos'].sum():.1f}s "
+            f"(ordenados por % match exacto)."
+        )
+        c1, c2 = st.columns(2)
+        with c1:
+            download_csv(df_barrido, "barrido_tolerancias.csv")
+        with c2:
+            download_excel(df_barrido, "barrido_tolerancias.xlsx", sheet_name="Barrido")
+
+
 # ═══════════════════════════════════════════════════════
 # TABS DE DETALLE
 # ═══════════════════════════════════════════════════════
@@ -150,18 +184,12 @@ with tab_banco:
         with c2: nivel_sel = st.multiselect("Nivel", df_full["match_nivel"].astype(str).unique(), key="res_nivel")
         with c3: search = st.text_input("Buscar...", key="res_search")
         
-        df_show = df_full.copy()
+        df_show = df_full
         if banco_sel != "Todos": df_show = df_show[df_show["banco"] == banco_sel]
         if nivel_sel: df_show = df_show[df_show["match_nivel"].astype(str).isin(nivel_sel)]
-        if search: df_show = df_show[df_show.astype(str).apply(lambda x: x.str.contains(search, case=False, na=False)).any(axis=1)]
-
-        # Formatear
-        num_cols = ["monto", "monto_factura", "diferencia_monto"]
-        for c in num_cols:
-            if c in df_show.columns:
-                df_show[c] = df_show[c].apply(lambda x: f"$ {x:,.0f}" if pd.notnull(x) and isinstance(x, (int, float)) else x)
+        if search: df_show = indice_sesion(st.session_state, resultado.get("run_id", ""), "resultados", df_full).filtrar(df_show, search)
 
-        st.dataframe(df_show, use_container_width=True, hide_index=True)
+        render_tabla_paginada(df_show, "res_tabla")
         st.caption(f"{len(df_show)} registros encontrados.")
 
 
@@ -169,27 +197,14 @@ with tab_banco:
 with tab_ctg:
     t1, t2, t3 = st.tabs(["Cobranzas Imputadas", "Pagos Imputados", "Auditoría Facturas"])
     with t1:
-        df_cob = resultado.get("cobranzas_csv", pd.DataFrame()).copy()
-        if not df_cob.empty:
-            for c in ["Importe", "Monto", "monto"]:
-                if c in df_cob.columns:
-                    df_cob[c] = df_cob[c].apply(lambda x: f"$ {x:,.0f}" if pd.notnull(x) and isinstance(x, (int, float)) else x)
-        st.dataframe(df_cob, use_container_width=True)
+        render_tabla_paginada(resultado.get("cobranzas_csv", pd.DataFrame()), "res_cob")
     with t2:
-        df_pag = resultado.get("pagos_csv", pd.DataFrame()).copy()
-        if not df_pag.empty:
-            for c in ["Importe", "Monto", "monto"]:
-                if c in df_pag.columns:
-                    df_pag[c] = df_pag[c].apply(lambda x: f"$ {x:,.0f}" if pd.notnull(x) and isinstance(x, (int, float)) else x)
-        st.dataframe(df_pag, use_container_width=True)
+        render_tabla_paginada(resultado.get("pagos_csv", pd.DataFrame()), "res_pag")
     with t3:
         # Auditoria Facturas (si existe en Detalle)
-        df_det = resultado.get("detalle_facturas", pd.DataFrame()).copy()
+        df_det = resultado.get("detalle_facturas", pd.DataFrame())
         if not df_det.empty:
-            for c in ["Total Venta", "Cobrado", "Saldo"]:
-                if c in df_det.columns:
-                    df_det[c] = df_det[c].apply(lambda x: f"$ {x:,.0f}" if pd.notnull(x) and isinstance(x, (int, float)) else x)
-            st.dataframe(df_det, use_container_width=True)
+            render_tabla_paginada(df_det, "res_det")
         else:
             st.info("No hay detalle de facturas (modo demo o sin datos).")
 
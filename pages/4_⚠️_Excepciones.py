@@ -7,9 +7,11 @@ import pandas as pd
 from src.ui.styles import load_css
 from src.ui.components import (
     kpi_hero, kpi_card, section_div, page_header, format_money,
-    build_column_config, render_data_table, no_data_warning,
+    build_column_config, render_data_table, no_data_warning, render_trabajo_en_curso,
     alert_card, download_excel, download_csv,
 )
+from src.busqueda import indice_sesion
+from src.vistas import obtener_vistas
 
 load_css()
 
@@ -19,6 +21,8 @@ page_header(
     "⚠️",
 )
 
+render_trabajo_en_curso()
+
 if "resultado" not in st.session_state:
     no_data_warning()
     st.stop()
@@ -26,13 +30,12 @@ if "resultado" not in st.session_state:
 resultado = st.session_state["resultado"]
 stats = st.session_state["stats"]
 
-df_exc = resultado.get("excepciones", pd.DataFrame())
+vistas = obtener_vistas(resultado)
+df_exc = vistas["excepciones_banco"]
 df_ctg = resultado.get("detalle_facturas", pd.DataFrame())
 
-# Filtrar excepciones de Contagram (Cobradas pero Sin Match)
-df_exc_ctg = pd.DataFrame()
-if not df_ctg.empty and "Estado Conciliacion" in df_ctg.columns:
-    df_exc_ctg = df_ctg[df_ctg["Estado Conciliacion"] == "Sin Match"]
+# Excepciones de Contagram (Cobradas pero Sin Match)
+df_exc_ctg = vistas["excepciones_contagram"]
 
 # ═══════════════════════════════════════════════════════
 # RESUMEN DE EXCEPCIONES
@@ -110,16 +113,13 @@ with tab_banco:
             else:
                 rango_monto = None
 
-        df_view = df_exc.copy()
+        df_view = df_exc
 
         # Aplicar busqueda
         if busqueda.strip():
-            term = busqueda.strip().lower()
-            mask = pd.Series(False, index=df_view.index)
-            for col in df_view.columns:
-                if df_view[col].dtype == object:
-                    mask = mask | df_view[col].fillna("").str.lower().str.contains(term, na=False)
-            df_view = df_view[mask]
+            nombre_tabla = "resultados" if mostrar_todo else "excepciones"
+            indice_exc = indice_sesion(st.session_state, resultado.get("run_id", ""), nombre_tabla, df_exc)
+            df_view = indice_exc.filtrar(df_view, busqueda)
 
         # Aplicar filtro de monto
         if rango_monto and monto_col:
@@ -172,15 +172,11 @@ with tab_ctg:
         with col_s_ctg:
             search_ctg = st.text_input("Buscar en Contagram...", placeholder="Cliente, CUIT...", key="search_ctg")
         
-        df_view_ctg = df_exc_ctg.copy()
+        df_view_ctg = df_exc_ctg
         
         if search_ctg.strip():
-            term = search_ctg.strip().lower()
-            mask = pd.Series(False, index=df_view_ctg.index)
-            for col in df_view_ctg.columns:
-                if df_view_ctg[col].dtype == object:
-                    mask = mask | df_view_ctg[col].fillna("").str.lower().str.contains(term, na=False)
-            df_view_ctg = df_view_ctg[mask]
+            indice_ctg = indice_sesion(st.session_state, resultado.get("run_id", ""), "detalle_facturas", df_ctg)
+            df_view_ctg = indice_ctg.filtrar(df_view_ctg, search_ctg)
             
         render_data_table(df_view_ctg, key="exc_ctg_table")
         
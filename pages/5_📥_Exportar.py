@@ -9,9 +9,10 @@ import zipfile
 from src.ui.styles import load_css
 from src.ui.components import (
     section_div, page_header, format_money, stepper,
-    render_data_table, no_data_warning,
+    render_data_table, no_data_warning, render_trabajo_en_curso,
     download_csv, download_excel, alert_card,
 )
+from src.vistas import obtener_vistas
 
 load_css()
 
@@ -21,6 +22,8 @@ page_header(
     "📥",
 )
 
+render_trabajo_en_curso()
+
 if "resultado" not in st.session_state:
     no_data_warning()
     st.stop()
@@ -32,7 +35,7 @@ stats = st.session_state["stats"]
 # ═══════════════════════════════════════════════════════
 # STEPPER VISUAL
 # ═══════════════════════════════════════════════════════
-df_exc = resultado.get("excepciones", pd.DataFrame())
+df_exc = obtener_vistas(resultado)["excepciones_banco"]
 exc_count = len(df_exc)
 
 steps = [
@@ -72,10 +75,10 @@ stepper(steps, current)
 # ═══════════════════════════════════════════════════════
 section_div("Cobranzas Conciliadas", "📥")
 df_cob = resultado.get("cobranzas_csv", pd.DataFrame())
-df_cob_filtered = df_cob.copy()
+df_cob_filtered = df_cob
 
 df_pag = resultado.get("pagos_csv", pd.DataFrame())
-df_pag_filtered = df_pag.copy()
+df_pag_filtered = df_pag
 
 if not df_cob.empty:
     # Filtro de estado
@@ -225,15 +228,81 @@ else:
             from src.db_connector import guardar_conciliacion
             secrets = st.secrets["tidb"]
             with st.spinner("Guardando en TiDB Cloud..."):
-                res = guardar_conciliacion(resultado["resultados"], secrets)
+                res = guardar_conciliacion(resultado["resultados"], secrets, run_id=resultado.get("run_id"))
             if res["status"] == "ok":
-                st.success(f"✅ Guardado: {res['registros_insertados']} registros en TiDB Cloud")
+                st.success(
+                    f"✅ Corrida {res['run_id']} guardada en TiDB Cloud: {res['registros_insertados']} nuevos, "
+                    f"{res['registros_actualizados']} actualizados, {res['registros_sin_cambios']} sin cambios "
+                    f"({res['filas_por_segundo']:,.0f} filas/s)"
+                )
             else:
                 st.error(f"Error TiDB: {res['mensaje']}")
         except Exception as e:
             st.error(f"Error de conexión: {e}")
             st.info("Verificar credenciales en `.streamlit/secrets.toml`")
 
+    with st.expander("🔎 Consultar histórico", expanded=False):
+        from src.db_connector import consultar_historico
+
+        hc1, hc2, hc3, hc4 = st.columns(4)
+        h_cuit = hc1.text_input("CUIT", key="hist_cuit").strip()
+        h_factura = hc2.text_input("Factura", key="hist_factura").strip()
+        h_desde = hc3.date_input("Desde", value=None, key="hist_desde")
+        h_hasta = hc4.date_input("Hasta", value=None, key="hist_hasta")
+        hc5, hc6 = st.columns([3, 1])
+        h_status = hc5.multiselect(
+            "Nivel de match", ["match_exacto", "probable_duda_id", "probable_dif_cambio", "no_match"],
+            key="hist_status",
+        )
+        h_limite = hc6.selectbox("Filas por página", [50, 100, 250, 500], index=1, key="hist_limite")
+
+        filtros_hist = dict(
+            cuit=h_cuit or None, factura=h_factura or None,
+            fecha_desde=h_desde, fecha_hasta=h_hasta,
+            status=h_status or None, limite=h_limite,
+        )
+        # Streamlit corre el expander aunque este cerrado: la base remota se
+        # consulta solo al pedirlo (Consultar / paginar), no en cada rerun
+        if st.button("Consultar", key="hist_consultar"):
+            st.session_state["hist_filtros"] = filtros_hist
+            st.session_state["hist_cursores"] = [None]
+            st.session_state.pop("hist_resultado", None)
+
+        if "hist_filtros" in st.session_state:
+            cursores = st.session_state["hist_cursores"]
+            if "hist_resultado" not in st.session_state:
+                st.session_state["hist_resultado"] = consultar_historico(
+                    st.secrets["tidb"], despues_de=cursores[-1], **st.session_state["hist_filtros"],
+                )
+            res_hist = st.session_state["hist_resultado"]
+            if st.session_state["hist_filtros"] != filtros_hist:
+                st.caption("Los filtros cambiaron: presioná **Consultar** para aplicarlos.")
+            if res_hist["status"] != "ok":
+                st.error(f"Error TiDB: {res_hist['mensaje']}")
+            else:
+                st.dataframe(res_hist["filas"], use_container_width=True, hide_index=True)
+                pc1, pc2, pc3 = st.columns([1, 2, 1])
+                pc2.caption(f"Página {len(cursores)}")
+                if pc1.button("← Anterior", disabled=len(cursores) == 1, key="hist_prev"):
+                    cursores.pop()
+                    st.session_state.pop("hist_resultado", None)
+                    st.rerun()
+                if pc3.button("Siguiente →", disabled=res_hist["siguiente"] is None, key="hist_next"):
+                    cursores.append(res_hist["siguiente"])
+                    st.session_state.pop("hist_resultado", None)
+                    st.rerun()
+
+
+st.markdown("##### Historico local")
+st.caption("Guarda la corrida en un archivo SQLite local (`output/historico_local.db`), sin servidor.")
+if st.button("💾 Guardar en histórico local", use_container_width=True):
+    from src.store_local import StoreLocal
+    modo_corrida = "real" if st.session_state.get("modo_real") else "demo"
+    with StoreLocal() as store:
+        corrida_id = store.guardar_corrida(resultado, modo=modo_corrida)
+        n_abiertas = len(store.facturas_abiertas())
+    st.success(f"✅ Corrida #{corrida_id} guardada. Facturas abiertas acumuladas: {n_abiertas}")
+
 
 # ═══════════════════════════════════════════════════════
 # INSTRUCCIONES
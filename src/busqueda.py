@@ -0,0 +1,93 @@
+"""
+Busqueda de texto libre sobre las tablas de resultados.
+
+Antes cada pagina filtraba con `df.astype(str).apply(str.contains)` sobre todas
+las columnas en cada tecla. Aca se arma UNA vez por corrida un "blob" por fila
+(texto en minusculas de las columnas de cliente, CUIT, descripcion, monto y
+factura) y cada consulta es un unico str.contains vectorizado sobre ese blob.
+
+  - Los CUIT tambien se indexan solo con digitos (30-50012345-6 → 30500123456).
+  - Los montos se indexan con 2 decimales, asi "150000" encuentra 150000.0.
+  - Varias palabras se buscan con AND (cada una en cualquier columna).
+"""
+import re
+
+import pandas as pd
+
+# Fragmentos de nombre de columna (en minusculas) que entran al indice
+CONCEPTOS_BUSQUEDA = (
+    "cliente", "nombre", "proveedor", "razon social",   # cliente / proveedor
+    "cuit",                                              # CUIT
+    "descripcion", "concepto", "referencia",             # descripcion bancaria
+    "monto", "importe", "total", "cobrado",              # montos
+    "factura", "nro",                                    # factura / OC
+)
+
+SEPARADOR = "\n"  # ninguna consulta lo contiene, asi no matchea entre columnas
+MAX_INDICES_SESION = 8
+
+
+def columnas_busqueda(df: pd.DataFrame) -> list[str]:
+    """Columnas de `df` que cubren cliente, CUIT, descripcion, monto y factura."""
+    columnas = [c for c in df.columns if any(k in str(c).lower() for k in CONCEPTOS_BUSQUEDA)]
+    return columnas or list(df.columns)
+
+
+def _texto_columna(serie: pd.Series, nombre: str) -> pd.Series:
+    """Texto en minusculas de una columna (montos con 2 decimales, CUIT con y sin guiones)."""
+    if pd.api.types.is_numeric_dtype(serie) and not pd.api.types.is_bool_dtype(serie):
+        texto = serie.map(lambda x: "" if pd.isna(x) else f"{x:.2f}")
+    else:
+        texto = serie.astype(object).where(serie.notna(), "").astype(str).str.lower()
+    if "cuit" in nombre.lower():
+        texto = texto + " " + texto.str.replace(r"\D", "", regex=True)
+    return texto
+
+
+class IndiceBusqueda:
+    """Blob de busqueda por fila, alineado al indice de la tabla original."""
+
+    def __init__(self, df: pd.DataFrame, columnas: list[str] = None):
+        self.columnas = columnas or columnas_busqueda(df)
+        self.n_filas = len(df)
+        if df.empty:
+            self.blob = pd.Series("", index=df.index, dtype=str)
+            return
+        partes = [_texto_columna(df[c], str(c)) for c in self.columnas if c in df.columns]
+        blob = partes[0]
+        for parte in partes[1:]:
+            blob = blob + SEPARADOR + parte
+        self.blob = blob.astype(str)
+
+    def mascara(self, texto: str) -> pd.Series:
+        """Mascara booleana (indice de la tabla original): filas que contienen todas las palabras."""
+        terminos = [t for t in re.split(r"\s+", (texto or "").strip().lower()) if t]
+        mascara = pd.Series(True, index=self.blob.index)
+        for termino in terminos:
+            mascara &= self.blob.str.contains(termino, regex=False)
+        return mascara
+
+    def filtrar(self, df: pd.DataFrame, texto: str) -> pd.DataFrame:
+        """Filtra `df` (la tabla indexada o un subconjunto de sus filas) por `texto`."""
+        if not (texto or "").strip():
+            return df
+        mascara = self.mascara(texto)
+        return df[mascara.reindex(df.index, fill_value=False)]
+
+
+def indice_sesion(estado, run_id: str, nombre: str, df: pd.DataFrame) -> IndiceBusqueda:
+    """
+    Indice de `df` cacheado en `estado` (st.session_state) por corrida y tabla.
+
+    Se reconstruye si cambia la corrida o la cantidad de filas de la tabla.
+    """
+    indices = estado.setdefault("indices_busqueda", {})
+    clave = f"{run_id}|{nombre}"
+    indice = indices.get(clave)
+    if indice is None or indice.n_filas != len(df):
+        indice = IndiceBusqueda(df)
+        indices.pop(clave, None)
+        while len(indices) >= MAX_INDICES_SESION:
+            indices.pop(next(iter(indices)))
+        indices[clave] = indice
+    return indice
@@ -0,0 +1,94 @@
+"""
+Cache de resultados de conciliacion por corrida.
+
+Ejecutar el motor con los mismos archivos, la misma configuracion y los mismos
+filtros da siempre el mismo resultado. Este cache guarda el `resultado` por
+run_id (hash de entradas + config + filtros + version del motor) y lo devuelve
+sin volver a procesar.
+
+Es un LRU acotado a nivel de proceso: Streamlit importa este modulo una sola
+vez, asi que el cache se comparte entre todas las sesiones (dos personas
+revisando el mismo mes pagan una sola corrida).
+
+Guardar y obtener arman contenedores nuevos (dict / list / set). Con pandas 3
+(Copy-on-Write siempre prendido) los DataFrames / Series se devuelven con
+copy(deep=False): comparten la memoria y se copian solo si alguien los
+modifica, asi que ninguna escritura (.loc, columnas nuevas) llega al cache.
+Con pandas 2 no hay esa garantia y se copian completos. Los demas objetos (ej.
+TablaCandidatos) se comparten tal cual: quien los recibe no debe modificarlos.
+"""
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+MAX_CORRIDAS_DEFAULT = 8
+
+# pandas >= 3: las copias superficiales no ven las escrituras del otro lado
+COPY_ON_WRITE = int(pd.__version__.split(".")[0]) >= 3
+
+
+def _compartir(valor):
+    """Copia del valor que comparte los datos si es seguro (ver docstring del modulo)."""
+    if isinstance(valor, (pd.DataFrame, pd.Series)):
+        return valor.copy(deep=not COPY_ON_WRITE)
+    if isinstance(valor, dict):
+        return {k: _compartir(v) for k, v in valor.items()}
+    if isinstance(valor, (list, tuple, set)):
+        return type(valor)(_compartir(v) for v in valor)
+    return valor
+
+
+class CacheResultados:
+    """LRU thread-safe de resultados por run_id."""
+
+    def __init__(self, max_corridas: int = MAX_CORRIDAS_DEFAULT):
+        self.max_corridas = max_corridas
+        self._datos = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def obtener(self, run_id: str) -> dict | None:
+        with self._lock:
+            if run_id not in self._datos:
+                self.misses += 1
+                return None
+            self._datos.move_to_end(run_id)
+            self.hits += 1
+            resultado = self._datos[run_id]
+        return _compartir(resultado)
+
+    def guardar(self, run_id: str, resultado: dict):
+        copia = _compartir(resultado)
+        with self._lock:
+            self._datos[run_id] = copia
+            self._datos.move_to_end(run_id)
+            while len(self._datos) > self.max_corridas:
+                self._datos.popitem(last=False)
+
+    def obtener_o_calcular(self, run_id: str, calcular) -> tuple[dict, bool]:
+        """
+        Devuelve (resultado, desde_cache). Si no esta cacheado, llama a
+        `calcular()` y guarda lo que devuelva.
+        """
+        resultado = self.obtener(run_id)
+        if resultado is not None:
+            return resultado, True
+        resultado = calcular()
+        self.guardar(run_id, resultado)
+        return resultado, False
+
+    def limpiar(self):
+        with self._lock:
+            self._datos.clear()
+
+    def __len__(self):
+        return len(self._datos)
+
+    def __contains__(self, run_id):
+        return run_id in self._datos
+
+
+# Instancia compartida por todo el proceso (todas las sesiones de Streamlit)
+cache_global = CacheResultados()
@@ -0,0 +1,376 @@
+"""
+Tabla de candidatos para re-umbralizar la conciliacion real al instante (what-if).
+
+La parte cara de conciliar_real no son las reglas sino armar, para cada
+credito, el conjunto de ventas del mismo CUIT (mascaras sobre todo el
+DataFrame + iterrows). Esta tabla lo hace UNA vez:
+
+  - Por CUIT: ventas PURAS y TODAS (en orden de indice) como dicts.
+  - Por credito: pares (credito, venta) 1:1 dentro de las tolerancias MAS
+    flojas permitidas, con su diferencia de monto. La fecha y el medio de
+    cobro los evalua la asignacion con las reglas de conciliar_real.
+  - Debitos ya clasificados (no dependen de la configuracion).
+
+`asignar(cfg)` re-aplica las mismas reglas de Fase 1 / Fase 2 que
+conciliar_real, pero filtrando la tabla por las tolerancias de `cfg` en vez de
+recorrer DataFrames; el resultado es identico al de conciliar_real. Los
+matches por suma de varias facturas dependen de que ventas siguen libres en
+cada paso, asi que se evaluan en la asignacion (sobre las listas ya armadas).
+"""
+import itertools
+import time
+
+import pandas as pd
+
+from src import metricas, tracing
+from src.conciliador_real import (
+    REAL_CONFIG,
+    _armar_resultados,
+    _clasificar_debito,
+    _evaluar_match,
+    _evaluar_sum_match,
+    _fase2_desglose,
+    _marcar_truncada,
+    _monto_match,
+    _separar_ventas,
+    _sum_match_disponibles,
+)
+from src.pipeline import PASO_PROGRESO
+
+# Tolerancias maximas que puede pedir el what-if sin reconstruir la tabla
+LIMITES_CANDIDATOS = {
+    "tolerancia_monto_pct": 0.05,
+    "tolerancia_monto_abs": 5000.0,
+}
+
+# Tope de entradas del memo de sum matching (se vacia al llenarse)
+MAX_MEMO_SUMA = 50_000
+
+
+def limites_para(config: dict = None) -> dict:
+    """Limites de la tabla que cubren `config` (los default, o mas si config los supera)."""
+    cfg = {**REAL_CONFIG, **(config or {})}
+    return {k: max(v, cfg[k]) for k, v in LIMITES_CANDIDATOS.items()}
+
+
+# Grilla default del barrido de calibracion (7 x 6 x 4 x 3 = 504 puntos)
+GRILLA_DEFAULT = {
+    "tolerancia_monto_pct": [0.001, 0.0025, 0.005, 0.01, 0.02, 0.03, 0.05],
+    "tolerancia_monto_abs": [0.5, 1.0, 10.0, 100.0, 500.0, 1000.0],
+    "ventana_dias_nivel1": [7, 15, 30, 45],
+    "ventana_dias_nivel2": [30, 45, 60],
+}
+
+
+class TablaCandidatos:
+    """
+    Candidatos (credito, venta) precalculados. Los datos no cambian despues de
+    construirse (asignar() solo llena un memo de sum matching que no altera
+    resultados), por eso se puede compartir: deepcopy devuelve la misma instancia.
+    """
+
+    def __init__(self, extracto: pd.DataFrame, ventas: pd.DataFrame, limites: dict = None, avance=None):
+        self.limites = limites or dict(LIMITES_CANDIDATOS)
+        tol_pct_max = self.limites["tolerancia_monto_pct"]
+        tol_abs_max = self.limites["tolerancia_monto_abs"]
+
+        self.ventas_santander, ventas_puras = _separar_ventas(ventas)
+        idx_puras = set(ventas_puras.index)
+
+        # ─── Ventas por CUIT (una sola pasada) ──────────────────────
+        self.ventas = {}                 # vidx -> dict de la venta
+        self.todas_por_cuit = {}         # cuit -> [vidx] en orden de indice
+        self.puras_por_cuit = {}
+        for vidx, venta in zip(ventas.index, ventas.to_dict("records")):
+            self.ventas[vidx] = venta
+            cuit = venta.get("cuit_limpio")
+            self.todas_por_cuit.setdefault(cuit, []).append(vidx)
+            if vidx in idx_puras:
+                self.puras_por_cuit.setdefault(cuit, []).append(vidx)
+
+        # ─── Creditos y candidatos 1:1 ──────────────────────────────
+        self.creditos = []               # (idx, base dict) en orden del extracto
+        self.candidatos = {}             # idx credito -> [candidato] en orden de indice de venta
+        filas = []
+        creditos = extracto[extracto["tipo"] == "CREDITO"]
+        for n, (idx, mov) in enumerate(zip(creditos.index, creditos.to_dict("records"))):
+            if avance is not None and n % PASO_PROGRESO == 0:
+                avance(n, len(creditos))
+            base = {**mov, "clasificacion": "cobranza"}
+            self.creditos.append((idx, base))
+            cuit = mov.get("cuit_banco", "")
+            if not cuit:
+                continue
+            monto = mov.get("monto", 0)
+            lista = []
+            for vidx in self.todas_por_cuit.get(cuit, []):
+                venta = self.ventas[vidx]
+                monto_venta = venta.get("Monto Total", 0)
+                if monto_venta <= 0 or not _monto_match(monto, monto_venta, tol_pct_max, tol_abs_max):
+                    continue
+                cand = {"vidx": vidx, "diff": abs(monto - monto_venta)}
+                lista.append(cand)
+                filas.append({"idx_mov": idx, **cand, "monto_banco": monto, "monto_venta": monto_venta})
+            self.candidatos[idx] = lista
+
+        self.tabla = pd.DataFrame(
+            filas, columns=["idx_mov", "vidx", "diff", "monto_banco", "monto_venta"],
+        )
+
+        # ─── Debitos (no dependen de la configuracion) ──────────────
+        debitos = extracto[extracto["tipo"] == "DEBITO"]
+        self.debitos = [(idx, _clasificar_debito(mov)) for idx, mov in debitos.iterrows()]
+
+        self._memo_suma = {}
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def cubre(self, config: dict = None) -> bool:
+        """True si las tolerancias de `config` estan dentro de los limites de la tabla."""
+        cfg = {**REAL_CONFIG, **(config or {})}
+        return all(cfg[k] <= v for k, v in self.limites.items())
+
+    def asignar(self, config: dict = None, avance=None) -> tuple[pd.DataFrame, set]:
+        """
+        Re-aplica las reglas de conciliar_real con las tolerancias de `config`.
+
+        `avance(hechos, total, fase)` se llama cada PASO_PROGRESO creditos (fase1)
+        y ventas mixtas (desglose).
+
+        Returns:
+            Tuple of (DataFrame con resultados, set de indices de ventas usadas)
+        """
+        cfg = {**REAL_CONFIG, **(config or {})}
+        if not self.cubre(cfg):
+            raise ValueError(
+                f"Tolerancias fuera de los limites de la tabla de candidatos: {self.limites}"
+            )
+
+        resultados, ventas_usadas = self._resultados(cfg, avance)
+        return _armar_resultados(resultados), ventas_usadas
+
+    def _resultados(self, cfg: dict, avance=None) -> tuple[dict, set]:
+        """Fase 1 + Fase 2 + debitos como dict idx -> result dict (sin armar el DataFrame)."""
+        ventas_usadas = set()
+        resultados = self._fase1(cfg, ventas_usadas, avance)
+
+        _fase2_desglose(resultados, self.ventas_santander, ventas_usadas, cfg, avance)
+
+        for idx, r in self.debitos:
+            resultados[idx] = {**r}
+
+        return resultados, ventas_usadas
+
+    def _fase1(self, cfg: dict, ventas_usadas: set, avance=None) -> dict:
+        """Fase 1: concilia cada credito en orden (marca en `ventas_usadas` las ventas tomadas)."""
+        resultados = {}
+        por_cliente = metricas.activo() or tracing.activo()
+        for n, (idx, base) in enumerate(self.creditos):
+            if avance is not None and n % PASO_PROGRESO == 0:
+                avance(n, len(self.creditos), "fase1")
+            if por_cliente:
+                t0 = time.perf_counter()
+                resultados[idx] = self._conciliar_credito(idx, base, ventas_usadas, cfg)
+                segundos = time.perf_counter() - t0
+                cuit = base.get("cuit_banco", "")
+                metricas.sumar_tiempo_cliente(cuit, segundos)
+                if segundos >= tracing.UMBRAL_CREDITO_SEG:
+                    tracing.registrar_span(
+                        "fase1.credito", t0, segundos,
+                        cuit=cuit, cuit_fragmento=tracing.fragmento_cuit(cuit), monto=base.get("monto"),
+                        candidatos=len(self.candidatos.get(idx, [])),
+                    )
+            else:
+                resultados[idx] = self._conciliar_credito(idx, base, ventas_usadas, cfg)
+        return resultados
+
+    def _sum_match(self, idx, monto: float, pool: list, tol_pct: float, tol_abs: float) -> tuple[dict | None, bool]:
+        """
+        Sum matching memoizado por (credito, ventas libres, tolerancias): en un
+        barrido muchos puntos llegan al mismo credito con el mismo pool.
+        Devuelve (match o None, truncada) como _sum_match_disponibles.
+        """
+        clave = (idx, tuple(pool), tol_pct, tol_abs)
+        metricas.sumar("memo_suma_consultas")
+        if clave in self._memo_suma:
+            metricas.sumar("memo_suma_aciertos")
+            return self._memo_suma[clave]
+
+        disponibles = [
+            {"idx": v, "venta": self.ventas[v], "monto": self.ventas[v].get("Monto Total", 0)}
+            for v in pool
+            if self.ventas[v].get("Monto Total", 0) > 0
+        ]
+        sum_result = _sum_match_disponibles(monto, disponibles, tol_pct, tol_abs)
+        if len(self._memo_suma) >= MAX_MEMO_SUMA:
+            self._memo_suma.clear()
+        self._memo_suma[clave] = sum_result
+        return sum_result
+
+    def _conciliar_credito(self, idx, base: dict, ventas_usadas: set, cfg: dict) -> dict:
+        """Misma logica que conciliador_real._conciliar_credito, sobre la tabla."""
+        cuit_banco = base.get("cuit_banco", "")
+        monto = base.get("monto", 0)
+
+        if not cuit_banco:
+            return {
+                **base,
+                "conciliation_status": "EXCLUDED",
+                "conciliation_tag": "SIN_CUIT_BANCO",
+                "conciliation_confidence": "BAJA",
+                "conciliation_reason": "No se pudo extraer CUIT de la descripcion bancaria",
+                "nombre_contagram": "",
+                "factura_match": None,
+                "diferencia_monto": None,
+                "confianza": 0,
+                "tipo_match_monto": None,
+                "facturas_count": 0,
+            }
+
+        # Pool: ventas puras libres del CUIT; si no hay, todas las libres
+        pool = [v for v in self.puras_por_cuit.get(cuit_banco, []) if v not in ventas_usadas]
+        if not pool:
+            pool = [v for v in self.todas_por_cuit.get(cuit_banco, []) if v not in ventas_usadas]
+
+        if not pool:
+            return {
+                **base,
+                "conciliation_status": "EXCLUDED",
+                "conciliation_tag": "CUIT_SIN_VENTA",
+                "conciliation_confidence": "BAJA",
+                "conciliation_reason": f"CUIT {cuit_banco} no encontrado en ventas Contagram",
+                "nombre_contagram": "",
+                "factura_match": None,
+                "diferencia_monto": None,
+                "confianza": 0,
+                "tipo_match_monto": None,
+                "facturas_count": 0,
+            }
+
+        tol_pct = cfg["tolerancia_monto_pct"]
+        tol_abs = cfg["tolerancia_monto_abs"]
+
+        # 1:1 sobre los candidatos (ya filtrados por las tolerancias maximas)
+        pool_set = set(pool)
+        best = None
+        best_diff = float("inf")
+        for cand in self.candidatos.get(idx, []):
+            vidx = cand["vidx"]
+            if vidx not in pool_set:
+                continue
+            monto_venta = self.ventas[vidx].get("Monto Total", 0)
+            if _monto_match(monto, monto_venta, tol_pct, tol_abs) and cand["diff"] < best_diff:
+                best = cand
+                best_diff = cand["diff"]
+
+        if best:
+            vidx = best["vidx"]
+            return _evaluar_match(
+                base, base, self.ventas[vidx], vidx, best["diff"], ventas_usadas, cfg, tipo_monto="directo",
+            )
+
+        # Suma de varias ventas del mismo CUIT
+        sum_result, truncada = self._sum_match(idx, monto, pool, tol_pct, tol_abs)
+        if sum_result:
+            return _evaluar_sum_match(base, base, sum_result, ventas_usadas, cfg)
+
+        primer_venta = self.ventas[pool[0]]
+        nombre_cliente = primer_venta.get("Nombre", "")
+        r = {
+            **base,
+            "conciliation_status": "SUGGESTED",
+            "conciliation_tag": "CUIT_OK_MONTO_DIFF",
+            "conciliation_confidence": "MEDIA",
+            "conciliation_reason": (
+                f"CUIT coincide con {nombre_cliente}, pero monto ${monto:,.2f} "
+                f"no matchea con ninguna venta"
+            ),
+            "nombre_contagram": nombre_cliente,
+            "id_contagram": primer_venta.get("ID Cliente", ""),
+            "factura_match": None,
+            "diferencia_monto": None,
+            "confianza": 60,
+            "tipo_match_monto": None,
+            "facturas_count": 0,
+        }
+        return _marcar_truncada(r) if truncada else r
+
+
+def _metricas(resultados: dict) -> dict:
+    """KPIs de cobranzas de una asignacion (mismos criterios que _stats_real en src/motor_conciliacion.py)."""
+    conteo = {"MATCHED": 0, "SUGGESTED": 0, "EXCLUDED": 0}
+    montos = {"MATCHED": 0.0, "SUGGESTED": 0.0, "EXCLUDED": 0.0}
+    for r in resultados.values():
+        if r.get("clasificacion") != "cobranza":
+            continue
+        status = r.get("conciliation_status")
+        if status in conteo:
+            conteo[status] += 1
+            montos[status] += r.get("monto", 0) or 0
+    total = sum(conteo.values())
+    conciliados = conteo["MATCHED"] + conteo["SUGGESTED"]
+    return {
+        "cobranzas": total,
+        "matched": conteo["MATCHED"],
+        "suggested": conteo["SUGGESTED"],
+        "excluded": conteo["EXCLUDED"],
+        "tasa_conciliacion": round(conciliados / max(total, 1) * 100, 1),
+        "tasa_matched": round(conteo["MATCHED"] / max(total, 1) * 100, 1),
+        "monto_matched": round(montos["MATCHED"], 2),
+        "monto_conciliado": round(montos["MATCHED"] + montos["SUGGESTED"], 2),
+        "monto_total": round(sum(montos.values()), 2),
+    }
+
+
+def simular(tabla: TablaCandidatos, config: dict = None) -> dict:
+    """
+    KPIs de cobranzas (ver _metricas) de una config sobre la tabla, sin armar el
+    DataFrame de resultados ni pasar por el pipeline: es lo que usa el what-if.
+    """
+    cfg = {**REAL_CONFIG, **(config or {})}
+    if not tabla.cubre(cfg):
+        raise ValueError(f"Tolerancias fuera de los limites de la tabla de candidatos: {tabla.limites}")
+    resultados, _ = tabla._resultados(cfg)
+    return _metricas(resultados)
+
+
+def barrido_tolerancias(
+    tabla: TablaCandidatos,
+    grilla: dict = None,
+    config: dict = None,
+) -> pd.DataFrame:
+    """
+    Evalua todas las combinaciones de `grilla` (param -> lista de valores) sobre
+    la tabla de candidatos, sin correr el motor completo por punto.
+
+    Args:
+        tabla: TablaCandidatos ya construida
+        grilla: Valores a barrer por parametro de REAL_CONFIG (default GRILLA_DEFAULT)
+        config: Config base para los parametros que no se barren
+
+    Returns:
+        DataFrame con una fila por punto: parametros + KPIs de cobranzas + segundos
+    """
+    grilla = grilla or GRILLA_DEFAULT
+    desconocidos = set(grilla) - set(REAL_CONFIG)
+    if desconocidos:
+        raise ValueError(f"Parametros desconocidos en la grilla: {sorted(desconocidos)}")
+
+    base = {**REAL_CONFIG, **(config or {})}
+    nombres = list(grilla)
+    filas = []
+    for valores in itertools.product(*(grilla[n] for n in nombres)):
+        cfg = {**base, **dict(zip(nombres, valores))}
+        if not tabla.cubre(cfg):
+            raise ValueError(
+                f"Tolerancias fuera de los limites de la tabla de candidatos: {tabla.limites}"
+            )
+        inicio = time.perf_counter()
+        resultados, _ = tabla._resultados(cfg)
+        filas.append({
+            **dict(zip(nombres, valores)),
+            **_metricas(resultados),
+            "segundos": round(time.perf_counter() - inicio, 4),
+        })
+    return pd.DataFrame(filas)
@@ -16,12 +16,16 @@ Seguridad:
 import streamlit as st
 import os
 
+from src import tracing
+
 try:
     from groq import Groq
     GROQ_AVAILABLE = True
 except ImportError:
     GROQ_AVAILABLE = False
 
+MODELO_CHAT = "llama-3.3-70b-versatile"
+
 
 # ═══════════════════════════════════════════════════════════════════════
 # SYSTEM PROMPT - Nucleo de seguridad y personalidad del asistente
@@ -149,13 +153,14 @@ def chat_con_asistente(mensajes: list[dict]) -> str:
         })
     
     try:
-        response = client.chat.completions.create(
-            model="llama-3.3-70b-versatile",
-            messages=messages,
-            max_tokens=1024,
-            temperature=0.3,  # Bajo para respuestas precisas y consistentes
-            top_p=0.9,
-        )
+        with tracing.span("chatbot.llamada", modelo=MODELO_CHAT, mensajes=len(messages)):
+            response = client.chat.completions.create(
+                model=MODELO_CHAT,
+                messages=messages,
+                max_tokens=1024,
+                temperature=0.3,  # Bajo para respuestas precisas y consistentes
+                top_p=0.9,
+            )
         return response.choices[0].message.content
     except Exception as e:
         error_msg = str(e)
@@ -0,0 +1,91 @@
+"""
+Claves estables para movimientos bancarios y ventas de Contagram.
+
+El indice del DataFrame cambia con cada carga de archivo, por lo que no sirve
+para reconocer el mismo registro entre corridas. Estas claves se derivan del
+contenido del registro y son identicas entre procesos y dias.
+
+  - Movimiento: banco + referencia + fecha + monto
+  - Venta:      id + nro factura + CUIT + fecha emision + monto cobrado
+
+Si dos registros comparten todos los campos, se desambiguan con el numero de
+ocurrencia (0, 1, 2...) en el orden del archivo.
+
+Tambien se define el identificador de corrida (hash de entradas + config).
+"""
+import hashlib
+import json
+
+import pandas as pd
+
+
+def hash_texto(texto: str) -> str:
+    """Hash corto (16 hex) y estable de un string."""
+    return hashlib.sha1(texto.encode("utf-8")).hexdigest()[:16]
+
+
+def _fecha_iso(serie: pd.Series) -> pd.Series:
+    return pd.to_datetime(serie, errors="coerce").dt.strftime("%Y-%m-%d").fillna("")
+
+
+def _monto_txt(serie: pd.Series) -> pd.Series:
+    return pd.to_numeric(serie, errors="coerce").fillna(0.0).round(2).map("{:.2f}".format)
+
+
+def _texto(df: pd.DataFrame, col: str) -> pd.Series:
+    if col not in df.columns:
+        return pd.Series("", index=df.index)
+    return df[col].fillna("").astype(str)
+
+
+def _claves(base: pd.Series) -> pd.Series:
+    """Agrega nro de ocurrencia a la base y la hashea."""
+    ocurrencia = base.groupby(base, sort=False).cumcount().astype(str)
+    return (base + "|" + ocurrencia).map(hash_texto)
+
+
+def claves_movimientos(extracto: pd.DataFrame) -> pd.Series:
+    """Clave estable por movimiento bancario normalizado (mismo indice que el extracto)."""
+    if extracto.empty:
+        return pd.Series(dtype=str)
+    base = (
+        _texto(extracto, "banco") + "|"
+        + _texto(extracto, "referencia") + "|"
+        + _fecha_iso(extracto["fecha"]) + "|"
+        + _monto_txt(extracto["monto"])
+    )
+    return _claves(base)
+
+
+def claves_ventas(ventas: pd.DataFrame) -> pd.Series:
+    """Clave estable por venta normalizada de Contagram (mismo indice que ventas)."""
+    if ventas.empty:
+        return pd.Series(dtype=str)
+    fecha = _fecha_iso(ventas["fecha_emision"]) if "fecha_emision" in ventas.columns else ""
+    base = (
+        _texto(ventas, "ID Cliente") + "|"
+        + _texto(ventas, "Nro Factura") + "|"
+        + _texto(ventas, "cuit_limpio") + "|"
+        + fecha + "|"
+        + _monto_txt(ventas.get("Monto Total", pd.Series(0.0, index=ventas.index)))
+    )
+    return _claves(base)
+
+
+def hash_dataframe(df: pd.DataFrame) -> str:
+    """Hash de contenido de un DataFrame completo (columnas + valores + orden)."""
+    h = hashlib.sha1()
+    h.update("|".join(map(str, df.columns)).encode("utf-8"))
+    if not df.empty:
+        h.update(pd.util.hash_pandas_object(df.astype(str), index=False).values.tobytes())
+    return h.hexdigest()[:16]
+
+
+def hash_corrida(dataframes: list[pd.DataFrame], parametros: dict = None, huellas: list[str] = None) -> str:
+    """
+    Identificador de corrida: hash de los archivos de entrada + configuracion.
+    `huellas` son los hash_dataframe de `dataframes` ya calculados (no se recalculan).
+    """
+    partes = list(huellas) if huellas is not None else [hash_dataframe(df) for df in dataframes]
+    partes.append(json.dumps(parametros or {}, sort_keys=True, default=str))
+    return hash_texto("|".join(partes))
@@ -0,0 +1,87 @@
+"""
+Presupuesto y conteo de combinaciones de las busquedas por suma.
+
+_sum_match_disponibles (via _buscar_sum_match y la tabla de candidatos),
+_match_monto_suma y _buscar_desglose prueban subconjuntos con
+itertools.combinations: con un cliente de 100 facturas pendientes o cientos
+de creditos del mismo CUIT eso son millones de combinaciones por movimiento.
+
+  - Cada busqueda recorre las combinaciones con Busqueda.combinaciones(), que
+    corta al llegar a MAX_COMBINACIONES (por llamada). Con datos normales no
+    se llega nunca; si se llega, la busqueda devuelve lo mejor que encontro
+    hasta ahi (o None) y avisa que quedo cortada: el movimiento sale con
+    busqueda_truncada=True y NOTA_TRUNCADA en la razon, para revisarlo a mano.
+  - contar_combinaciones() junta, por funcion, llamadas, combinaciones
+    evaluadas y cortes por presupuesto (lo usan los tests de estres y
+    perf["combinaciones"], ver src/metricas.py). Los bloques se pueden
+    anidar: al cerrar uno, sus contadores se suman al de afuera.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from itertools import combinations
+
+MAX_COMBINACIONES = 100_000
+
+NOTA_TRUNCADA = f" [Busqueda cortada en {MAX_COMBINACIONES:,} combinaciones: revisar a mano]"
+
+_contadores: ContextVar = ContextVar("contadores_combinaciones", default=None)
+
+
+def _contador(contadores: dict, nombre: str) -> dict:
+    return contadores.setdefault(nombre, {"llamadas": 0, "combinaciones": 0, "max_por_llamada": 0, "cortes": 0})
+
+
+class Busqueda:
+    """Una llamada a una busqueda combinatoria: cuenta combinaciones y aplica el presupuesto."""
+
+    def __init__(self, nombre: str, maximo: int = None):
+        self.nombre = nombre
+        self.maximo = MAX_COMBINACIONES if maximo is None else maximo
+        self.evaluadas = 0
+
+    @property
+    def agotada(self) -> bool:
+        return self.evaluadas >= self.maximo
+
+    def combinaciones(self, items, tamano: int):
+        """combinations(items, tamano) hasta agotar el presupuesto de la busqueda."""
+        for combo in combinations(items, tamano):
+            if self.evaluadas >= self.maximo:
+                return
+            self.evaluadas += 1
+            yield combo
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        contadores = _contadores.get()
+        if contadores is not None:
+            datos = _contador(contadores, self.nombre)
+            datos["llamadas"] += 1
+            datos["combinaciones"] += self.evaluadas
+            datos["max_por_llamada"] = max(datos["max_por_llamada"], self.evaluadas)
+            datos["cortes"] += int(self.agotada)
+        return False
+
+
+@contextmanager
+def contar_combinaciones():
+    """
+    Junta los contadores de las busquedas que corren dentro del bloque (en
+    este hilo / contexto): {funcion: {llamadas, combinaciones, max_por_llamada, cortes}}.
+    """
+    contadores = {}
+    token = _contadores.set(contadores)
+    try:
+        yield contadores
+    finally:
+        _contadores.reset(token)
+        externos = _contadores.get()
+        if externos is not None:
+            for nombre, datos in contadores.items():
+                total = _contador(externos, nombre)
+                total["llamadas"] += datos["llamadas"]
+                total["combinaciones"] += datos["combinaciones"]
+                total["max_por_llamada"] = max(total["max_por_llamada"], datos["max_por_llamada"])
+                total["cortes"] += datos["cortes"]
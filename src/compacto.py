@@ -0,0 +1,116 @@
+"""
+Representacion compacta de una corrida para guardar en session_state.
+
+Despues de una corrida cada sesion guardaba su propio `resultado` (resultados,
+cobranzas_csv, excepciones, detalle_facturas y las vistas, que son copias de
+subconjuntos de esas tablas) mas `datos_ventas` / `datos_compras`, todo con
+columnas object. Con varios usuarios a la vez eso se multiplica.
+
+compactar_resultado():
+  - Convierte a categorical las columnas de pocos valores repetidos (banco,
+    tipo, clasificacion, status, tag, nivel de match, estado de la factura).
+  - Reemplaza las vistas por VistasPorIndice: indices de fila sobre las tablas
+    base, que se arman al leerlas (ver src/vistas.py).
+
+memoria_sesion() reporta cuanto ocupa cada clave de session_state; los objetos
+compartidos (la misma tabla en dos claves) se cuentan una sola vez.
+"""
+import pandas as pd
+
+from src.busqueda import IndiceBusqueda
+from src.vistas import VistasPorIndice
+
+# Nombres de columna (en minusculas) que se guardan como categorical
+COLUMNAS_CATEGORICAS = {
+    "banco", "tipo", "clasificacion",
+    "conciliation_status", "status", "conciliation_tag", "tag",
+    "match_nivel", "estado conciliacion",
+}
+
+# Tablas del resultado que se compactan
+TABLAS_RESULTADO = ("resultados", "cobranzas_csv", "pagos_csv", "excepciones", "detalle_facturas")
+
+
+def a_categorias(df: pd.DataFrame) -> pd.DataFrame:
+    """Copia de `df` con las columnas de COLUMNAS_CATEGORICAS como categorical."""
+    if not isinstance(df, pd.DataFrame) or df.empty:
+        return df
+    columnas = {
+        c: "category" for c in df.columns
+        if str(c).lower() in COLUMNAS_CATEGORICAS
+        and not isinstance(df[c].dtype, pd.CategoricalDtype)
+        and (pd.api.types.is_object_dtype(df[c]) or pd.api.types.is_string_dtype(df[c]))
+    }
+    return df.astype(columnas) if columnas else df
+
+
+def compactar_resultado(resultado: dict) -> dict:
+    """Resultado con tablas categoricas y vistas por indice (las demas claves sin cambios)."""
+    if resultado.get("compacto"):
+        return resultado
+    compacto = dict(resultado)
+    for clave in TABLAS_RESULTADO:
+        if clave in compacto:
+            compacto[clave] = a_categorias(compacto[clave])
+
+    vistas = resultado.get("vistas")
+    if vistas is not None:
+        vistas = dict(vistas)
+        if "excepciones_banco" in vistas and "excepciones" in compacto:
+            # Es resultado["excepciones"] (ver construir_vistas); puede venir
+            # como copia aparte del cache de etapas
+            vistas["excepciones_banco"] = compacto["excepciones"]
+        compacto["vistas"] = VistasPorIndice(
+            vistas,
+            compacto.get("resultados", pd.DataFrame()),
+            compacto.get("detalle_facturas", pd.DataFrame()),
+        )
+    compacto["compacto"] = True
+    return compacto
+
+
+def _bytes_objeto(valor, vistos: set) -> tuple[int, int]:
+    """(bytes, filas) de un valor de la sesion, sin contar dos veces el mismo objeto."""
+    if id(valor) in vistos:
+        return 0, 0
+    vistos.add(id(valor))
+    if isinstance(valor, pd.DataFrame):
+        return int(valor.memory_usage(deep=True).sum()), len(valor)
+    if isinstance(valor, pd.Series):
+        return int(valor.memory_usage(deep=True)), len(valor)
+    if isinstance(valor, VistasPorIndice):
+        return valor.bytes_propios(), 0
+    if isinstance(valor, IndiceBusqueda):
+        return int(valor.blob.memory_usage(deep=True)), valor.n_filas
+    if isinstance(valor, dict):
+        total = filas = 0
+        for v in valor.values():
+            b, f = _bytes_objeto(v, vistos)
+            total += b
+            filas += f
+        return total, filas
+    return 0, 0
+
+
+def memoria_sesion(estado) -> pd.DataFrame:
+    """
+    Memoria por clave de `estado` (st.session_state): DataFrames, Series, vistas,
+    indices de busqueda y dicts que los contienen. Columnas: Clave, Filas, MB.
+    """
+    vistos = set()
+    filas = []
+    for clave in sorted(estado.keys(), key=str):
+        valor = estado[clave]
+        if clave == "resultado" and isinstance(valor, dict):
+            # Detalle por tabla del resultado (la tabla de candidatos es compartida por proceso)
+            for sub, v in valor.items():
+                if sub == "tabla_candidatos":
+                    continue
+                b, f = _bytes_objeto(v, vistos)
+                if b:
+                    filas.append({"Clave": f"resultado.{sub}", "Filas": f, "MB": round(b / 1e6, 3)})
+            continue
+        b, f = _bytes_objeto(valor, vistos)
+        if b:
+            filas.append({"Clave": str(clave), "Filas": f, "MB": round(b / 1e6, 3)})
+    return pd.DataFrame(filas, columns=["Clave", "Filas", "MB"])
@@ -0,0 +1,315 @@
+"""
+Conciliacion incremental diaria con estado persistido.
+
+La conciliacion real es un proceso de bucle cerrado: cada dia llega el extracto
+con los movimientos nuevos, pero el motor completo vuelve a evaluar el mes
+entero. Este modulo guarda entre corridas:
+
+  - El resultado de Fase 1 de cada movimiento ya procesado (por clave estable).
+  - Las ventas consumidas por Fase 1 (por clave estable).
+  - Las claves de las ventas de la corrida y la firma de ese conjunto.
+
+En la corrida siguiente solo los creditos NUEVOS pasan por Fase 1; los
+guardados se reutilizan en el mismo orden, marcando sus ventas como usadas al
+pasar por ellos. Si el listado de Contagram cambio (por ejemplo, llegaron
+facturas nuevas), tambien vuelven a Fase 1 los creditos guardados que no
+consumieron ninguna venta (sin match, sugeridos, excluidos) o cuyas ventas ya
+no estan: asi un credito que ayer no tenia factura se concilia hoy contra las
+ventas abiertas (y si se queda con la venta de un credito guardado posterior,
+ese tambien se re-evalua). Fase 2 (desglose de ventas mixtas) se recalcula
+siempre sobre el conjunto completo porque es barata y depende de todos los
+creditos sin match.
+
+Reutilizar el estado da lo mismo que una corrida completa siempre que:
+  - Las ventas nuevas no le cambien la eleccion a un credito ya conciliado.
+  - Los movimientos nuevos tengan fecha >= a los ya procesados (orden de Fase 1).
+Como un credito solo compite por ventas de su CUIT, antes de Fase 1 se revisa
+por CUIT: si llegaron ventas de un CUIT con creditos guardados ya conciliados,
+o un credito nuevo queda antes que uno guardado del mismo CUIT, el estado se
+descarta y se hace una corrida completa (info["recalculo_completo"] dice por que).
+
+Si cambia la configuracion, el filtro de medios o el tipo de movimiento, el
+estado se descarta y se hace una corrida completa. ruta_estado() da un archivo
+por banco(s) + configuracion + filtros, para que distintas cuentas o filtros
+no se pisen el estado.
+"""
+import hashlib
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from src import metricas
+from src.claves import claves_movimientos, claves_ventas, hash_texto
+from src.conciliador_real import (
+    REAL_CONFIG,
+    _separar_ventas,
+    _conciliar_credito,
+    _fase2_desglose,
+    _clasificar_debito,
+    _armar_resultados,
+)
+from src.normalizador import detectar_banco
+
+VERSION_ESTADO = 3
+
+
+def _json_default(obj):
+    """Serializa tipos de pandas/numpy que json no conoce."""
+    if isinstance(obj, pd.Timestamp):
+        return obj.isoformat()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    raise TypeError(f"Tipo no serializable: {type(obj).__name__}")
+
+
+def firma_config(config: dict = None, **filtros) -> str:
+    """Firma de la configuracion efectiva + filtros; si cambia, el estado no sirve."""
+    payload = {"config": {**REAL_CONFIG, **(config or {})}, "filtros": filtros}
+    texto = json.dumps(payload, sort_keys=True, default=str)
+    return hashlib.sha1(texto.encode("utf-8")).hexdigest()[:16]
+
+
+def firma_filtros(
+    match_config: dict = None,
+    medios_pago_filtro: list[str] = None,
+    filtro_medio_contiene: bool = False,
+    filtro_tipo_movimiento: str = "Ambos",
+) -> str:
+    """firma_config con los filtros de procesar_real (medios en orden estable)."""
+    return firma_config(
+        match_config,
+        medios_pago_filtro=sorted(medios_pago_filtro or []),
+        filtro_medio_contiene=filtro_medio_contiene,
+        filtro_tipo_movimiento=filtro_tipo_movimiento,
+    )
+
+
+def ruta_estado(directorio: str, extractos_bancarios: list[pd.DataFrame], **filtros) -> str:
+    """
+    Archivo de estado para estos extractos y filtros (kwargs de firma_filtros):
+    uno por banco(s) + firma, asi dos cuentas o dos juegos de filtros no
+    comparten (ni se pisan) el estado.
+    """
+    bancos = "_".join(sorted({detectar_banco(df) for df in extractos_bancarios})) or "sin_banco"
+    return os.path.join(directorio, f"estado_{bancos}_{firma_filtros(**filtros)}.json")
+
+
+def firma_ventas(claves_vta: pd.Series) -> str:
+    """Firma del conjunto de ventas (independiente del orden del archivo)."""
+    return hash_texto("|".join(sorted(claves_vta)))
+
+
+class EstadoIncremental:
+    """Estado persistido entre corridas diarias (archivo JSON)."""
+
+    def __init__(self, firma: str = ""):
+        self.firma = firma
+        self.firma_ventas = ""     # ventas de la ultima corrida; si cambian se re-evaluan los sin venta
+        self.movimientos = {}      # clave_mov -> result dict de Fase 1 (o debito)
+        self.ventas_usadas = {}    # clave_venta -> clave_mov que la consumio
+        self.claves_ventas = []    # ventas de la ultima corrida; las que no esten son nuevas
+        self.corridas = 0
+
+    @classmethod
+    def cargar(cls, ruta: str) -> "EstadoIncremental":
+        """Carga el estado desde disco. Si no existe o es invalido, arranca vacio."""
+        if not ruta or not os.path.exists(ruta):
+            return cls()
+        try:
+            with open(ruta, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return cls()
+        if data.get("version") != VERSION_ESTADO:
+            return cls()
+
+        estado = cls(data.get("firma", ""))
+        estado.corridas = data.get("corridas", 0)
+        estado.firma_ventas = data.get("firma_ventas", "")
+        estado.ventas_usadas = data.get("ventas_usadas", {})
+        estado.claves_ventas = data.get("claves_ventas", [])
+        for clave, r in data.get("movimientos", {}).items():
+            if r.get("fecha") is not None:
+                r["fecha"] = pd.Timestamp(r["fecha"])
+            estado.movimientos[clave] = r
+        return estado
+
+    def guardar(self, ruta: str):
+        """Persiste el estado (escritura atomica via archivo temporal)."""
+        directorio = os.path.dirname(ruta)
+        if directorio:
+            os.makedirs(directorio, exist_ok=True)
+        data = {
+            "version": VERSION_ESTADO,
+            "firma": self.firma,
+            "firma_ventas": self.firma_ventas,
+            "corridas": self.corridas,
+            "movimientos": self.movimientos,
+            "ventas_usadas": self.ventas_usadas,
+            "claves_ventas": self.claves_ventas,
+        }
+        tmp = ruta + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, default=_json_default, ensure_ascii=False)
+        os.replace(tmp, ruta)
+
+    def reiniciar(self, firma: str):
+        self.firma = firma
+        self.firma_ventas = ""
+        self.movimientos = {}
+        self.ventas_usadas = {}
+        self.claves_ventas = []
+
+
+def _motivo_recalculo(
+    creditos: pd.DataFrame,
+    claves_mov: pd.Series,
+    ventas: pd.DataFrame,
+    claves_vta: pd.Series,
+    estado: EstadoIncremental,
+) -> str | None:
+    """Motivo por el que reutilizar el estado no daria lo mismo que una corrida completa (o None)."""
+    # Orden de Fase 1: un credito nuevo antes que uno guardado del mismo CUIT
+    # le podria haber ganado las ventas
+    cuits_nuevos = set()
+    for idx, cuit in creditos.get("cuit_banco", pd.Series(dtype=str)).fillna("").items():
+        if not cuit:
+            continue
+        if claves_mov[idx] not in estado.movimientos:
+            cuits_nuevos.add(cuit)
+        elif cuit in cuits_nuevos:
+            return f"movimientos nuevos con fecha anterior a los ya procesados (CUIT {cuit})"
+
+    # Ventas nuevas de un CUIT con creditos ya conciliados: la eleccion de esos
+    # creditos podria cambiar
+    if estado.claves_ventas:
+        nuevas = ~claves_vta.isin(set(estado.claves_ventas))
+        cuits_ventas_nuevas = set(ventas.loc[nuevas, "cuit_limpio"])
+        for cm in estado.ventas_usadas.values():
+            cuit = estado.movimientos.get(cm, {}).get("cuit_banco")
+            if cuit and cuit in cuits_ventas_nuevas:
+                return f"ventas nuevas de un cliente ya conciliado (CUIT {cuit})"
+    return None
+
+
+def conciliar_incremental(
+    extracto: pd.DataFrame,
+    ventas: pd.DataFrame,
+    estado: EstadoIncremental,
+    config: dict = None,
+    firma: str = "",
+) -> tuple[pd.DataFrame, set, dict]:
+    """
+    Igual que conciliar_real, pero reutiliza el estado de corridas previas.
+
+    Actualiza `estado` en memoria (el llamador decide si lo guarda).
+
+    Returns:
+        Tuple of (DataFrame de resultados, set de indices de ventas usadas, info incremental)
+    """
+    cfg = {**REAL_CONFIG, **(config or {})}
+    if estado.firma != firma:
+        estado.reiniciar(firma)
+
+    claves_mov = claves_movimientos(extracto)
+    claves_vta = claves_ventas(ventas)
+    idx_por_clave_vta = {c: i for i, c in claves_vta.items()}
+
+    # Descartar del estado movimientos que ya no estan en el extracto
+    presentes = set(claves_mov)
+    for clave in [c for c in estado.movimientos if c not in presentes]:
+        del estado.movimientos[clave]
+    estado.ventas_usadas = {
+        cv: cm for cv, cm in estado.ventas_usadas.items() if cm in presentes
+    }
+
+    creditos = extracto[extracto["tipo"] == "CREDITO"]
+    debitos = extracto[extracto["tipo"] == "DEBITO"]
+
+    motivo = _motivo_recalculo(creditos, claves_mov, ventas, claves_vta, estado)
+    if motivo:
+        estado.reiniciar(firma)
+
+    # Si cambiaron las ventas, los creditos guardados que no quedaron anclados
+    # a ventas que siguen en el listado vuelven a Fase 1 (contra las abiertas)
+    reevaluados = 0
+    firma_vta = firma_ventas(claves_vta)
+    if estado.firma_ventas != firma_vta:
+        ventas_de = {}
+        for cv, cm in estado.ventas_usadas.items():
+            ventas_de.setdefault(cm, []).append(cv)
+        sueltos = {
+            clave for clave in claves_mov[extracto["tipo"] == "CREDITO"]
+            if clave in estado.movimientos
+            and not (ventas_de.get(clave) and all(cv in idx_por_clave_vta for cv in ventas_de[clave]))
+        }
+        for clave in sueltos:
+            del estado.movimientos[clave]
+        estado.ventas_usadas = {cv: cm for cv, cm in estado.ventas_usadas.items() if cm not in sueltos}
+        estado.firma_ventas = firma_vta
+        reevaluados = len(sueltos)
+
+    ventas_santander, ventas_puras = _separar_ventas(ventas)
+
+    # Ventas consumidas por cada credito guardado. Se marcan como usadas recien
+    # al pasar por ese credito (en el orden de Fase 1), como en una corrida completa
+    anclados = {}
+    for cv, cm in estado.ventas_usadas.items():
+        if cv in idx_por_clave_vta:
+            anclados.setdefault(cm, set()).add(idx_por_clave_vta[cv])
+    ventas_usadas = set()
+
+    # ═══ FASE 1: solo creditos nuevos (y los re-evaluados) ══════════
+    resultados = {}
+    reutilizados = 0
+    nuevos = 0
+    for idx, mov in creditos.iterrows():
+        clave = claves_mov[idx]
+        if clave in estado.movimientos:
+            propias = anclados.get(clave, set())
+            if not propias & ventas_usadas:
+                resultados[idx] = {**estado.movimientos[clave]}
+                ventas_usadas |= propias
+                reutilizados += 1
+                continue
+            # Un credito anterior re-evaluado se quedo con su venta: vuelve a Fase 1
+            del estado.movimientos[clave]
+            estado.ventas_usadas = {cv: cm for cv, cm in estado.ventas_usadas.items() if cm != clave}
+            reevaluados += 1
+        antes = set(ventas_usadas)
+        t0 = time.perf_counter()
+        r = _conciliar_credito(mov, ventas_puras, ventas, ventas_usadas, cfg)
+        metricas.sumar_tiempo_cliente(mov.get("cuit_banco", ""), time.perf_counter() - t0)
+        resultados[idx] = r
+        estado.movimientos[clave] = {**r}
+        for vidx in ventas_usadas - antes:
+            estado.ventas_usadas[claves_vta[vidx]] = clave
+        nuevos += 1
+
+    # ═══ FASE 2: desglose sobre el conjunto completo ════════════════
+    _fase2_desglose(resultados, ventas_santander, ventas_usadas, cfg)
+
+    # ─── Debitos (clasificacion determinista, tambien se cachea) ────
+    for idx, mov in debitos.iterrows():
+        clave = claves_mov[idx]
+        if clave in estado.movimientos:
+            resultados[idx] = {**estado.movimientos[clave]}
+            reutilizados += 1
+        else:
+            resultados[idx] = _clasificar_debito(mov)
+            estado.movimientos[clave] = {**resultados[idx]}
+            nuevos += 1
+
+    estado.claves_ventas = list(claves_vta)
+    estado.corridas += 1
+    info = {
+        "movimientos_reutilizados": reutilizados,
+        "movimientos_nuevos": nuevos - reevaluados,
+        "movimientos_reevaluados": reevaluados,
+        "corrida_nro": estado.corridas,
+        "recalculo_completo": motivo,
+    }
+    return _armar_resultados(resultados), ventas_usadas, info
@@ -13,7 +13,9 @@ Fase 2 - Desglose:
   Santander → PARCIAL_SANTANDER_OK (Caja pendiente de verificar).
 """
 import pandas as pd
+from src.combinatoria import NOTA_TRUNCADA, Busqueda
 from src.fuzzy_matcher import calcular_similitud
+from src.pipeline import PASO_PROGRESO
 
 
 # ─── CONFIGURACION ──────────────────────────────────────────────────
@@ -68,30 +70,17 @@ def conciliar_real(
         Tuple of (DataFrame con resultados de conciliacion, set de indices de ventas usadas)
     """
     cfg = {**REAL_CONFIG, **(config or {})}
-
-    # Ventas con Santander (excluir vencidas)
-    ventas_santander = ventas[
-        (ventas["contiene_santander"] == True) &
-        (ventas.get("estado", pd.Series(dtype=str)).str.lower() != "vencido")
-    ].copy() if "contiene_santander" in ventas.columns else ventas.copy()
-
-    # Separar ventas PURAS (sin caja) vs MIXTAS (con caja)
-    ventas_puras = ventas_santander[
-        ventas_santander.get("contiene_caja_grande", pd.Series(dtype=bool)) != True
-    ].copy()
+    ventas_santander, ventas_puras = _separar_ventas(ventas)
 
     # Track ventas ya usadas para evitar doble conciliacion
     ventas_usadas = set()
-    resultados = {}  # idx -> result dict
 
     # ─── Clasificar movimientos bancarios ────────────────────────────
     creditos = extracto[extracto["tipo"] == "CREDITO"].copy()
     debitos = extracto[extracto["tipo"] == "DEBITO"].copy()
 
     # ═══ FASE 1: Matching individual contra ventas SIN Caja GRANDE ═══
-    for idx, mov in creditos.iterrows():
-        result = _conciliar_credito(mov, ventas_puras, ventas, ventas_usadas, cfg)
-        resultados[idx] = result
+    resultados = _fase1_creditos(creditos, ventas_puras, ventas, ventas_usadas, cfg)
 
     # ═══ FASE 2: Desglose matching para ventas mixtas ════════════════
     _fase2_desglose(resultados, ventas_santander, ventas_usadas, cfg)
@@ -100,8 +89,46 @@ def conciliar_real(
     for idx, mov in debitos.iterrows():
         resultados[idx] = _clasificar_debito(mov)
 
+    return _armar_resultados(resultados), ventas_usadas
+
+
+def _separar_ventas(ventas: pd.DataFrame) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """Separa ventas con Santander (no vencidas) y, de esas, las PURAS (sin Caja GRANDE)."""
+    # Ventas con Santander (excluir vencidas)
+    ventas_santander = ventas[
+        (ventas["contiene_santander"] == True) &
+        (ventas.get("estado", pd.Series(dtype=str)).str.lower() != "vencido")
+    ].copy() if "contiene_santander" in ventas.columns else ventas.copy()
+
+    # Separar ventas PURAS (sin caja) vs MIXTAS (con caja)
+    ventas_puras = ventas_santander[
+        ventas_santander.get("contiene_caja_grande", pd.Series(dtype=bool)) != True
+    ].copy()
+    return ventas_santander, ventas_puras
+
+
+def _fase1_creditos(
+    creditos: pd.DataFrame,
+    ventas_puras: pd.DataFrame,
+    ventas: pd.DataFrame,
+    ventas_usadas: set,
+    cfg: dict,
+) -> dict:
+    """Fase 1: concilia cada credito en orden. Devuelve idx -> result dict."""
+    resultados = {}  # idx -> result dict
+    for idx, mov in creditos.iterrows():
+        resultados[idx] = _conciliar_credito(mov, ventas_puras, ventas, ventas_usadas, cfg)
+    return resultados
+
+
+def _armar_resultados(resultados: dict) -> pd.DataFrame:
+    """Arma el DataFrame final a partir de los result dicts (orden de insercion)."""
     df = pd.DataFrame(list(resultados.values()))
 
+    # Movimientos decididos por una busqueda combinatoria que llego al tope
+    truncada = df.pop("busqueda_truncada") if "busqueda_truncada" in df.columns else pd.Series(False, index=df.index)
+    df["busqueda_truncada"] = truncada.eq(True)
+
     # Mapear a match_nivel para compatibilidad con dashboard existente
     status_to_nivel = {
         "MATCHED": "match_exacto",
@@ -111,7 +138,7 @@ def conciliar_real(
     if "conciliation_status" in df.columns:
         df["match_nivel"] = df["conciliation_status"].map(status_to_nivel).fillna("no_match")
 
-    return df, ventas_usadas
+    return df
 
 
 def _fase2_desglose(
@@ -119,6 +146,7 @@ def _fase2_desglose(
     ventas_santander: pd.DataFrame,
     ventas_usadas: set,
     cfg: dict,
+    avance=None,
 ):
     """
     Fase 2: Desglose matching para ventas con medio mixto (Santander + Caja GRANDE).
@@ -129,6 +157,8 @@ def _fase2_desglose(
       es < Cobrado total, eso cubre la porcion Santander.
     - Diferencia = Cobrado - suma_banco = porcion Caja GRANDE (pendiente de verificar).
     - Tag: PARCIAL_SANTANDER_OK → SUGGESTED con confianza alta.
+
+    `avance(hechos, total, fase)` opcional, cada PASO_PROGRESO ventas mixtas.
     """
     # Identificar ventas mixtas (Santander + Caja GRANDE) no usadas
     ventas_mixtas = ventas_santander[
@@ -153,7 +183,9 @@ def _fase2_desglose(
             movs_sin_match.setdefault(cuit, []).append(idx)
 
     # Para cada venta mixta, intentar desglose
-    for vidx, venta in ventas_mixtas.iterrows():
+    for n, (vidx, venta) in enumerate(ventas_mixtas.iterrows()):
+        if avance is not None and n % PASO_PROGRESO == 0:
+            avance(n, len(ventas_mixtas), "desglose")
         cuit = venta.get("cuit_limpio", "")
         if not cuit or cuit not in movs_sin_match:
             continue
@@ -177,11 +209,15 @@ def _fase2_desglose(
 
         # Buscar la mejor combinacion de exactamente N_santander movimientos
         # cuya suma < cobrado_total (el resto es Caja GRANDE)
-        match_result = _buscar_desglose(
+        match_result, truncada = _buscar_desglose(
             movs_disponibles, n_santander, cobrado_total,
         )
 
         if not match_result:
+            # Sin desglose, pero la busqueda no llego a probar todo: marcar el pool
+            if truncada:
+                for mov_idx, _ in movs_disponibles:
+                    resultados[mov_idx] = _marcar_truncada(resultados[mov_idx])
             continue
 
         montos_matched, suma_banco = match_result
@@ -211,6 +247,7 @@ def _fase2_desglose(
 
         # Actualizar los movimientos bancarios involucrados
         for mov_idx, mov_monto in montos_matched:
+            previa = resultados[mov_idx].get("busqueda_truncada", False)
             resultados[mov_idx] = {
                 **resultados[mov_idx],
                 "conciliation_status": "SUGGESTED",
@@ -233,6 +270,8 @@ def _fase2_desglose(
                     "medio_cobro": medio,
                 },
             }
+            if truncada or previa:
+                resultados[mov_idx] = _marcar_truncada(resultados[mov_idx])
 
         # Marcar venta como usada y quitar movimientos del pool
         ventas_usadas.add(vidx)
@@ -250,7 +289,9 @@ def _buscar_desglose(
     Busca la mejor combinacion de movimientos bancarios para desglose.
 
     Intenta encontrar exactamente n_santander movimientos cuya suma < cobrado_total.
-    Si no hay match exacto por count, prueba con menos movimientos.
+    Si no hay match exacto por count, prueba con menos movimientos. Las
+    combinaciones probadas tienen el tope de src.combinatoria (si se agota,
+    devuelve la mejor encontrada hasta ahi, con truncada=True).
 
     Args:
         movs_disponibles: lista de (idx, monto) de movimientos bancarios
@@ -258,58 +299,65 @@ def _buscar_desglose(
         cobrado_total: monto total cobrado de la venta
 
     Returns:
-        (matched_list, suma) o None
+        ((matched_list, suma) o None, truncada)
     """
-    from itertools import combinations
-
     n_santander = int(n_santander)
     if n_santander <= 0 or not movs_disponibles:
-        return None
+        return None, False
 
-    # Caso 1: intentar exactamente n_santander movimientos
-    if len(movs_disponibles) >= n_santander:
-        best = None
-        best_gap = float("inf")
+    with Busqueda("_buscar_desglose") as busqueda:
+        # Caso 1: intentar exactamente n_santander movimientos
+        if len(movs_disponibles) >= n_santander:
+            best = None
+            best_gap = float("inf")
 
-        if n_santander == len(movs_disponibles):
-            # Solo hay una combinacion posible
-            combo = movs_disponibles
-            suma = sum(m for _, m in combo)
+            if n_santander == len(movs_disponibles):
+                # Solo hay una combinacion posible
+                combo = movs_disponibles
+                suma = sum(m for _, m in combo)
+                if 0 < suma < cobrado_total:
+                    return (combo, suma), False
+            else:
+                for combo in busqueda.combinaciones(movs_disponibles, n_santander):
+                    suma = sum(m for _, m in combo)
+                    if 0 < suma < cobrado_total:
+                        gap = cobrado_total - suma
+                        if gap < best_gap:
+                            best = (list(combo), suma)
+                            best_gap = gap
+
+            if best:
+                return best, busqueda.agotada
+
+        # Caso 2: si n_santander > disponibles, usar todos los disponibles
+        if len(movs_disponibles) < n_santander:
+            suma = sum(m for _, m in movs_disponibles)
             if 0 < suma < cobrado_total:
-                return combo, suma
-        else:
-            for combo in combinations(movs_disponibles, n_santander):
+                return (movs_disponibles, suma), False
+
+        # Caso 3: probar con menos movimientos (1 a n_santander-1)
+        for size in range(min(n_santander - 1, len(movs_disponibles)), 0, -1):
+            best = None
+            best_gap = float("inf")
+            for combo in busqueda.combinaciones(movs_disponibles, size):
                 suma = sum(m for _, m in combo)
                 if 0 < suma < cobrado_total:
                     gap = cobrado_total - suma
                     if gap < best_gap:
                         best = (list(combo), suma)
                         best_gap = gap
+            if best:
+                return best, busqueda.agotada
+
+    return None, busqueda.agotada
 
-        if best:
-            return best
-
-    # Caso 2: si n_santander > disponibles, usar todos los disponibles
-    if len(movs_disponibles) < n_santander:
-        suma = sum(m for _, m in movs_disponibles)
-        if 0 < suma < cobrado_total:
-            return movs_disponibles, suma
-
-    # Caso 3: probar con menos movimientos (1 a n_santander-1)
-    for size in range(min(n_santander - 1, len(movs_disponibles)), 0, -1):
-        best = None
-        best_gap = float("inf")
-        for combo in combinations(movs_disponibles, size):
-            suma = sum(m for _, m in combo)
-            if 0 < suma < cobrado_total:
-                gap = cobrado_total - suma
-                if gap < best_gap:
-                    best = (list(combo), suma)
-                    best_gap = gap
-        if best:
-            return best
 
-    return None
+def _marcar_truncada(r: dict) -> dict:
+    """Copia del result dict marcada como decidida por una busqueda cortada (nota en la razon)."""
+    razon = r.get("conciliation_reason") or ""
+    if not razon.endswith(NOTA_TRUNCADA):
+        razon += NOTA_TRUNCADA
+    return {**r, "busqueda_truncada": True, "conciliation_reason": razon}
 
 
 def _conciliar_credito(
@@ -399,14 +447,14 @@ def _conciliar_credito(
         return _evaluar_match(mov, base, venta, vidx, diff, ventas_usadas, cfg, tipo_monto="directo")
 
     # Sum matching: sumar varias ventas del mismo cliente
-    sum_result = _buscar_sum_match(monto, ventas_cuit, ventas_usadas, tol_pct, tol_abs)
+    sum_result, truncada = _buscar_sum_match(monto, ventas_cuit, ventas_usadas, tol_pct, tol_abs)
     if sum_result:
         return _evaluar_sum_match(mov, base, sum_result, ventas_usadas, cfg)
 
     # CUIT encontrado pero monto no matchea
     primer_venta = ventas_cuit.iloc[0]
     nombre_cliente = primer_venta.get("Nombre", "")
-    return {
+    r = {
         **base,
         "conciliation_status": "SUGGESTED",
         "conciliation_tag": "CUIT_OK_MONTO_DIFF",
@@ -423,6 +471,7 @@ def _conciliar_credito(
         "tipo_match_monto": None,
         "facturas_count": 0,
     }
+    return _marcar_truncada(r) if truncada else r
 
 
 def _evaluar_match(
@@ -559,18 +608,33 @@ def _buscar_sum_match(
     tol_pct: float,
     tol_abs: float,
 ) -> dict | None:
-    """Busca combinacion de ventas del mismo CUIT que sumen el monto bancario."""
-    from itertools import combinations
-
+    """Busca combinacion de ventas del mismo CUIT que sumen el monto bancario (ver _sum_match_disponibles)."""
     disponibles = []
     for vidx, v in ventas_cuit.iterrows():
         if vidx not in ventas_usadas:
             m = v.get("Monto Total", 0)
             if m > 0:
                 disponibles.append({"idx": vidx, "venta": v, "monto": m})
+    return _sum_match_disponibles(monto_banco, disponibles, tol_pct, tol_abs)
+
+
+def _sum_match_disponibles(
+    monto_banco: float,
+    disponibles: list[dict],
+    tol_pct: float,
+    tol_abs: float,
+) -> dict | None:
+    """
+    Sum matching sobre ventas disponibles ({"idx", "venta", "monto"}, en orden
+    de indice). Primero la suma total, despues subconjuntos de 2 a 6, con el
+    tope de combinaciones de src.combinatoria.
 
+    Returns:
+        (dict del match o None, truncada): truncada=True si no encontro match
+        pero la busqueda se corto antes de probar todos los subconjuntos.
+    """
     if len(disponibles) < 2:
-        return None
+        return None, False
 
     # Suma total
     total = sum(d["monto"] for d in disponibles)
@@ -580,25 +644,26 @@ def _buscar_sum_match(
             "suma": total,
             "diferencia": round(monto_banco - total, 2),
             "tipo": "suma_total",
-        }
+        }, False
 
     # Subconjuntos de 2 a min(6, n-1)
     n = len(disponibles)
     max_size = min(n, 6)
     disponibles.sort(key=lambda x: x["monto"], reverse=True)
 
-    for size in range(2, max_size + 1):
-        for combo in combinations(disponibles, size):
-            combo_sum = sum(d["monto"] for d in combo)
-            if combo_sum > 0 and _monto_match(monto_banco, combo_sum, tol_pct, tol_abs):
-                return {
-                    "ventas": list(combo),
-                    "suma": combo_sum,
-                    "diferencia": round(monto_banco - combo_sum, 2),
-                    "tipo": "suma_parcial",
-                }
-
-    return None
+    with Busqueda("_sum_match_disponibles") as busqueda:
+        for size in range(2, max_size + 1):
+            for combo in busqueda.combinaciones(disponibles, size):
+                combo_sum = sum(d["monto"] for d in combo)
+                if combo_sum > 0 and _monto_match(monto_banco, combo_sum, tol_pct, tol_abs):
+                    return {
+                        "ventas": list(combo),
+                        "suma": combo_sum,
+                        "diferencia": round(monto_banco - combo_sum, 2),
+                        "tipo": "suma_parcial",
+                    }, False
+
+    return None, busqueda.agotada
 
 
 def _evaluar_sum_match(
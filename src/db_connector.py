@@ -1,9 +1,23 @@
 """
 Conector a TiDB Cloud para persistencia de resultados de conciliación.
 Usa st.secrets para credenciales (nunca hardcodeadas).
+
+Las conexiones se reutilizan con un pool por proceso (compartido entre sesiones
+de Streamlit) y la creacion del esquema se hace una sola vez por base.
 """
+import hashlib
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
 import pandas as pd
 
+from src import tracing
+from src.claves import claves_movimientos, hash_dataframe
+
 try:
     import pymysql
     PYMYSQL_AVAILABLE = True
@@ -52,9 +66,17 @@ def _crear_tabla_si_no_existe(conn):
         diferencia_monto DECIMAL(18, 2),
         diferencia_pct DECIMAL(8, 2),
         referencia VARCHAR(100),
+        run_id VARCHAR(32),
+        clave_movimiento VARCHAR(32),
+        hash_fila VARCHAR(32),
         INDEX idx_fecha_ejecucion (fecha_ejecucion),
         INDEX idx_match_nivel (match_nivel),
-        INDEX idx_banco (banco)
+        INDEX idx_banco (banco),
+        INDEX idx_fecha_mov (fecha_movimiento, id),
+        INDEX idx_cuit_fecha (cuit, fecha_movimiento),
+        INDEX idx_factura_fecha (factura_match, fecha_movimiento),
+        INDEX idx_nivel_fecha (match_nivel, fecha_movimiento),
+        UNIQUE INDEX uk_run_movimiento (run_id, clave_movimiento)
     );
     """
     with conn.cursor() as cursor:
@@ -62,113 +84,452 @@ def _crear_tabla_si_no_existe(conn):
     conn.commit()
 
 
-def guardar_conciliacion(df: pd.DataFrame, secrets: dict) -> dict:
+# Columnas agregadas despues de la version inicial de la tabla
+_COLUMNAS_MIGRACION = [
+    ("run_id", "run_id VARCHAR(32)"),
+    ("clave_movimiento", "clave_movimiento VARCHAR(32)"),
+    ("hash_fila", "hash_fila VARCHAR(32)"),
+]
+
+# Indices compuestos para las consultas del historico (leer_historico)
+_INDICES_MIGRACION = [
+    ("uk_run_movimiento", "UNIQUE INDEX uk_run_movimiento (run_id, clave_movimiento)"),
+    ("idx_fecha_mov", "INDEX idx_fecha_mov (fecha_movimiento, id)"),
+    ("idx_cuit_fecha", "INDEX idx_cuit_fecha (cuit, fecha_movimiento)"),
+    ("idx_factura_fecha", "INDEX idx_factura_fecha (factura_match, fecha_movimiento)"),
+    ("idx_nivel_fecha", "INDEX idx_nivel_fecha (match_nivel, fecha_movimiento)"),
+]
+
+
+def _migrar_esquema(conn):
+    """Agrega columnas/indices nuevos a tablas creadas con versiones anteriores."""
+    with conn.cursor() as cursor:
+        cursor.execute(
+            "SELECT COLUMN_NAME FROM information_schema.COLUMNS "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'historico_conciliaciones'"
+        )
+        existentes = {r[0].lower() for r in cursor.fetchall()}
+        for col, ddl in _COLUMNAS_MIGRACION:
+            if col not in existentes:
+                cursor.execute(f"ALTER TABLE historico_conciliaciones ADD COLUMN {ddl}")
+
+        cursor.execute(
+            "SELECT INDEX_NAME FROM information_schema.STATISTICS "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'historico_conciliaciones'"
+        )
+        indices = {r[0].lower() for r in cursor.fetchall()}
+        for nombre, ddl in _INDICES_MIGRACION:
+            if nombre not in indices:
+                cursor.execute(f"ALTER TABLE historico_conciliaciones ADD {ddl}")
+    conn.commit()
+
+
+# ─── POOL DE CONEXIONES ─────────────────────────────────────────────
+POOL_MAX_CONEXIONES = 4
+
+_pools: dict[tuple, queue.LifoQueue] = {}
+_pools_lock = threading.Lock()
+_esquemas_listos: set[tuple] = set()
+_esquemas_lock = threading.Lock()
+
+
+def _clave_conexion(secrets: dict) -> tuple:
+    return (secrets["host"], int(secrets["port"]), secrets["user"], secrets["database"])
+
+
+def _pool_para(clave: tuple) -> queue.LifoQueue:
+    with _pools_lock:
+        if clave not in _pools:
+            _pools[clave] = queue.LifoQueue(maxsize=POOL_MAX_CONEXIONES)
+        return _pools[clave]
+
+
+def _cerrar_silencioso(conn):
+    try:
+        conn.close()
+    except Exception:
+        pass
+
+
+def _obtener_conexion(secrets: dict):
+    """Toma una conexion sana del pool (ping con reconexion) o abre una nueva."""
+    pool = _pool_para(_clave_conexion(secrets))
+    while True:
+        try:
+            conn = pool.get_nowait()
+        except queue.Empty:
+            return _get_connection(secrets)
+        try:
+            conn.ping(reconnect=True)
+            return conn
+        except Exception:
+            _cerrar_silencioso(conn)
+
+
+def _devolver_conexion(secrets: dict, conn, descartar: bool = False):
+    """Devuelve la conexion al pool; si fallo o el pool esta lleno, la cierra."""
+    if descartar:
+        _cerrar_silencioso(conn)
+        return
+    try:
+        conn.rollback()  # no dejar transacciones (ni snapshots de lectura) abiertas
+        _pool_para(_clave_conexion(secrets)).put_nowait(conn)
+    except Exception:  # pool lleno o conexion rota
+        _cerrar_silencioso(conn)
+
+
+@contextmanager
+def conexion(secrets: dict):
+    """Context manager: conexion del pool, devuelta al salir (descartada si hubo error)."""
+    conn = _obtener_conexion(secrets)
+    ok = False
+    try:
+        yield conn
+        ok = True
+    finally:
+        _devolver_conexion(secrets, conn, descartar=not ok)
+
+
+def cerrar_pool():
+    """Cierra todas las conexiones del pool y olvida el esquema (p.ej. al cambiar credenciales)."""
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        while True:
+            try:
+                _cerrar_silencioso(pool.get_nowait())
+            except queue.Empty:
+                break
+    with _esquemas_lock:
+        _esquemas_listos.clear()
+
+
+def _asegurar_esquema(conn, secrets: dict):
+    """Crea/migra el esquema una sola vez por proceso y base de datos."""
+    clave = (secrets["host"], int(secrets["port"]), secrets["database"])
+    if clave in _esquemas_listos:
+        return
+    with _esquemas_lock:
+        if clave not in _esquemas_listos:
+            _crear_tabla_si_no_existe(conn)
+            _migrar_esquema(conn)
+            _esquemas_listos.add(clave)
+
+
+# Columnas de historico_conciliaciones en orden de INSERT:
+# (columna destino, columna del DataFrame, default si falta/NaN, largo maximo texto)
+_COLUMNAS_HISTORICO = [
+    ("fecha_movimiento", "fecha", None, None),
+    ("banco", "banco", "", None),
+    ("tipo", "tipo", "", None),
+    ("clasificacion", "clasificacion", "", None),
+    ("descripcion", "descripcion", "", 500),
+    ("monto", "monto", 0, None),
+    ("match_nivel", "match_nivel", "", None),
+    ("match_detalle", "match_detalle", "", 500),
+    ("confianza", "confianza", 0, None),
+    ("nombre_contagram", "nombre_contagram", "", None),
+    ("id_contagram", "id_contagram", None, None),
+    ("cuit", "cuit", "", None),
+    ("factura_match", "factura_match", "", None),
+    ("monto_factura", "monto_factura", None, None),
+    ("diferencia_monto", "diferencia_monto", None, None),
+    ("diferencia_pct", "diferencia_pct", None, None),
+    ("referencia", "referencia", "", None),
+]
+
+BATCH_SIZE_DEFAULT = 1000
+
+
+def _valores_columna(df: pd.DataFrame, col: str, default, largo: int | None) -> list:
+    """Convierte una columna completa a valores Python listos para el driver."""
+    if col not in df.columns:
+        valor = str(default)[:largo] if largo else default
+        return [valor] * len(df)
+
+    serie = df[col]
+    if col == "fecha":
+        fechas = pd.to_datetime(serie, errors="coerce")
+        return fechas.dt.strftime("%Y-%m-%d").astype(object).where(fechas.notna(), None).tolist()
+
+    # astype(object) devuelve escalares Python (int/float/str), no numpy
+    valores = serie.astype(object).where(serie.notna(), default)
+    if largo:
+        valores = valores.astype(str).str[:largo]
+    return valores.tolist()
+
+
+def _preparar_filas(df: pd.DataFrame) -> list[tuple]:
+    """Arma las tuplas de valores (sin metadatos de corrida) columna por columna."""
+    # En modo real el CUIT viene en cuit_banco
+    if "cuit" not in df.columns and "cuit_banco" in df.columns:
+        df = df.assign(cuit=df["cuit_banco"])
+    columnas = [_valores_columna(df, col, default, largo) for _, col, default, largo in _COLUMNAS_HISTORICO]
+    return list(zip(*columnas))
+
+
+def _hashes_existentes(cursor, run_id: str, placeholder: str) -> dict:
+    """clave_movimiento -> hash_fila de lo ya guardado para esta corrida."""
+    cursor.execute(
+        "SELECT clave_movimiento, hash_fila FROM historico_conciliaciones "
+        f"WHERE run_id = {placeholder}",
+        (run_id,),
+    )
+    return {clave: h for clave, h in cursor.fetchall()}
+
+
+def insertar_conciliacion(
+    conn,
+    df: pd.DataFrame,
+    run_id: str = None,
+    batch_size: int = BATCH_SIZE_DEFAULT,
+    fecha_ejecucion: str = None,
+) -> dict:
     """
-    Guarda el DataFrame de resultados en TiDB Cloud.
-    Hace append a la tabla historico_conciliaciones.
+    Upsert idempotente del DataFrame en historico_conciliaciones.
+
+    Cada fila se identifica por (run_id, clave_movimiento). Las filas cuyo
+    hash no cambio respecto de lo ya guardado para la corrida se omiten; el
+    resto se escribe con INSERTs multi-fila de `batch_size` filas
+    (ON DUPLICATE KEY UPDATE), todo dentro de una unica transaccion.
+
+    Acepta una conexion pymysql o sqlite3 (para pruebas locales); la tabla
+    debe existir.
 
     Args:
-        df: DataFrame con resultados de la conciliación
-        secrets: dict con credenciales TiDB (de st.secrets["tidb"])
+        run_id: id de la corrida (ver claves.hash_corrida). Si falta, se usa
+            el hash del propio DataFrame.
 
     Returns:
-        dict con status y cantidad de registros insertados
+        dict con registros_insertados, registros_actualizados,
+        registros_sin_cambios, segundos y filas_por_segundo
     """
-    conn = None
-    try:
-        conn = _get_connection(secrets)
-        _crear_tabla_si_no_existe(conn)
-
-        from datetime import datetime
+    if batch_size < 1:
+        raise ValueError("batch_size debe ser >= 1")
+    if fecha_ejecucion is None:
         fecha_ejecucion = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    if run_id is None:
+        run_id = hash_dataframe(df)
+
+    es_sqlite = isinstance(conn, sqlite3.Connection)
+    placeholder = "?" if es_sqlite else "%s"
+    columnas = (
+        ["fecha_ejecucion", "run_id", "clave_movimiento", "hash_fila"]
+        + [c[0] for c in _COLUMNAS_HISTORICO]
+    )
+    fila_sql = "(" + ", ".join([placeholder] * len(columnas)) + ")"
+    prefijo = f"INSERT INTO historico_conciliaciones ({', '.join(columnas)}) VALUES "
+    actualizar = [c for c in columnas if c not in ("run_id", "clave_movimiento")]
+    if es_sqlite:
+        sufijo = " ON CONFLICT(run_id, clave_movimiento) DO UPDATE SET " + ", ".join(
+            f"{c} = excluded.{c}" for c in actualizar
+        )
+    else:
+        sufijo = " ON DUPLICATE KEY UPDATE " + ", ".join(f"{c} = VALUES({c})" for c in actualizar)
 
-        columnas_map = {
-            "fecha": "fecha_movimiento",
-            "banco": "banco",
-            "tipo": "tipo",
-            "clasificacion": "clasificacion",
-            "descripcion": "descripcion",
-            "monto": "monto",
-            "match_nivel": "match_nivel",
-            "match_detalle": "match_detalle",
-            "confianza": "confianza",
-            "nombre_contagram": "nombre_contagram",
-            "id_contagram": "id_contagram",
-            "cuit": "cuit",
-            "factura_match": "factura_match",
-            "monto_factura": "monto_factura",
-            "diferencia_monto": "diferencia_monto",
-            "diferencia_pct": "diferencia_pct",
-            "referencia": "referencia",
-        }
-
-        insert_sql = """
-        INSERT INTO historico_conciliaciones
-        (fecha_ejecucion, fecha_movimiento, banco, tipo, clasificacion,
-         descripcion, monto, match_nivel, match_detalle, confianza,
-         nombre_contagram, id_contagram, cuit, factura_match,
-         monto_factura, diferencia_monto, diferencia_pct, referencia)
-        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-        """
-
-        rows_inserted = 0
-        with conn.cursor() as cursor:
-            for _, row in df.iterrows():
-                fecha_mov = None
-                if pd.notna(row.get("fecha")):
-                    try:
-                        fecha_mov = pd.to_datetime(row["fecha"]).strftime("%Y-%m-%d")
-                    except Exception:
-                        fecha_mov = None
-
-                def safe_val(key, default=None):
-                    v = row.get(key, default)
-                    if pd.isna(v) if isinstance(v, float) else v is None:
-                        return default
-                    return v
-
-                values = (
-                    fecha_ejecucion,
-                    fecha_mov,
-                    safe_val("banco", ""),
-                    safe_val("tipo", ""),
-                    safe_val("clasificacion", ""),
-                    str(safe_val("descripcion", ""))[:500],
-                    safe_val("monto", 0),
-                    safe_val("match_nivel", ""),
-                    str(safe_val("match_detalle", ""))[:500],
-                    safe_val("confianza", 0),
-                    safe_val("nombre_contagram", ""),
-                    safe_val("id_contagram"),
-                    safe_val("cuit", ""),
-                    safe_val("factura_match", ""),
-                    safe_val("monto_factura"),
-                    safe_val("diferencia_monto"),
-                    safe_val("diferencia_pct"),
-                    safe_val("referencia", ""),
-                )
-                cursor.execute(insert_sql, values)
-                rows_inserted += 1
+    inicio = time.perf_counter()
+    valores = _preparar_filas(df)
+    claves = claves_movimientos(df).tolist() if not df.empty else []
 
+    cursor = conn.cursor()
+    try:
+        existentes = _hashes_existentes(cursor, run_id, placeholder)
+        filas = []
+        insertados = actualizados = 0
+        for clave, fila in zip(claves, valores):
+            h = hashlib.sha1(repr(fila).encode("utf-8")).hexdigest()[:16]
+            previo = existentes.get(clave)
+            if previo == h:
+                continue
+            if previo is None:
+                insertados += 1
+            else:
+                actualizados += 1
+            filas.append((fecha_ejecucion, run_id, clave, h) + fila)
+
+        for i in range(0, len(filas), batch_size):
+            lote = filas[i:i + batch_size]
+            params = [v for fila in lote for v in fila]
+            cursor.execute(prefijo + ", ".join([fila_sql] * len(lote)) + sufijo, params)
         conn.commit()
-        return {"status": "ok", "registros_insertados": rows_inserted}
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+    segundos = time.perf_counter() - inicio
+    return {
+        "run_id": run_id,
+        "registros_insertados": insertados,
+        "registros_actualizados": actualizados,
+        "registros_sin_cambios": len(valores) - len(filas),
+        "segundos": round(segundos, 3),
+        "filas_por_segundo": round(len(valores) / segundos, 1) if segundos > 0 else float(len(valores)),
+    }
+
+
+def guardar_conciliacion(
+    df: pd.DataFrame,
+    secrets: dict,
+    run_id: str = None,
+    batch_size: int = BATCH_SIZE_DEFAULT,
+) -> dict:
+    """
+    Guarda el DataFrame de resultados en TiDB Cloud.
+    Upsert en historico_conciliaciones por (run_id, movimiento): guardar dos
+    veces la misma corrida no duplica filas ni reescribe las que no cambiaron.
+
+    Args:
+        df: DataFrame con resultados de la conciliación
+        secrets: dict con credenciales TiDB (de st.secrets["tidb"])
+        run_id: id de la corrida (resultado["run_id"])
+        batch_size: filas por INSERT multi-fila
+
+    Returns:
+        dict con status, registros insertados/actualizados/sin cambios y filas por segundo
+    """
+    try:
+        with tracing.span("db.guardar_conciliacion", run_id=run_id, filas=len(df)) as span, conexion(secrets) as conn:
+            _asegurar_esquema(conn, secrets)
+            res = insertar_conciliacion(conn, df, run_id=run_id, batch_size=batch_size)
+            if span is not None:
+                span.atributo(insertados=res["registros_insertados"], actualizados=res["registros_actualizados"])
+        return {"status": "ok", **res}
 
     except ImportError as e:
         return {"status": "error", "mensaje": str(e)}
     except Exception as e:
         return {"status": "error", "mensaje": str(e)}
+
+
+# ─── LECTURA DEL HISTORICO ──────────────────────────────────────────
+COLUMNAS_CONSULTA = (
+    ["id", "fecha_ejecucion", "run_id"]
+    + [c[0] for c in _COLUMNAS_HISTORICO]
+)
+COLUMNAS_CONSULTA_DEFAULT = [
+    "id", "fecha_movimiento", "banco", "tipo", "monto", "match_nivel",
+    "nombre_contagram", "cuit", "factura_match", "referencia",
+]
+
+
+def leer_historico(
+    conn,
+    cuit: str = None,
+    factura: str = None,
+    fecha_desde=None,
+    fecha_hasta=None,
+    status: list[str] | str = None,
+    run_id: str = None,
+    columnas: list[str] = None,
+    limite: int = 100,
+    despues_de: tuple = None,
+) -> dict:
+    """
+    Lee una pagina del historico, ordenada por (fecha_movimiento, id) descendente.
+
+    Paginacion por keyset: `despues_de` es el cursor (fecha_movimiento, id) que
+    devolvio la pagina anterior en "siguiente". Cada pagina es una query
+    acotada por indice, sin OFFSET, asi que el costo no crece con la
+    antiguedad de la pagina. Las filas sin fecha_movimiento van al final.
+
+    Args:
+        status: valor o lista de valores de match_nivel
+        columnas: proyeccion (subconjunto de COLUMNAS_CONSULTA)
+        limite: filas por pagina
+
+    Returns:
+        dict con "filas" (DataFrame) y "siguiente" (cursor o None si no hay mas)
+    """
+    columnas = list(columnas or COLUMNAS_CONSULTA_DEFAULT)
+    invalidas = [c for c in columnas if c not in COLUMNAS_CONSULTA]
+    if invalidas:
+        raise ValueError(f"Columnas no validas: {invalidas}")
+    # id y fecha_movimiento se necesitan para armar el cursor
+    seleccion = list(dict.fromkeys(["id", "fecha_movimiento"] + columnas))
+
+    ph = "?" if isinstance(conn, sqlite3.Connection) else "%s"
+    condiciones, params = [], []
+    if cuit:
+        condiciones.append(f"cuit = {ph}")
+        params.append(cuit)
+    if factura:
+        condiciones.append(f"factura_match = {ph}")
+        params.append(str(factura))
+    if fecha_desde is not None:
+        condiciones.append(f"fecha_movimiento >= {ph}")
+        params.append(pd.Timestamp(fecha_desde).strftime("%Y-%m-%d"))
+    if fecha_hasta is not None:
+        condiciones.append(f"fecha_movimiento <= {ph}")
+        params.append(pd.Timestamp(fecha_hasta).strftime("%Y-%m-%d"))
+    if status:
+        valores = [status] if isinstance(status, str) else list(status)
+        condiciones.append(f"match_nivel IN ({', '.join([ph] * len(valores))})")
+        params.extend(valores)
+    if run_id:
+        condiciones.append(f"run_id = {ph}")
+        params.append(run_id)
+
+    if despues_de is not None:
+        fecha_cursor, id_cursor = despues_de
+        if fecha_cursor is None:
+            condiciones.append(f"(fecha_movimiento IS NULL AND id < {ph})")
+            params.append(id_cursor)
+        else:
+            condiciones.append(
+                f"(fecha_movimiento < {ph} OR (fecha_movimiento = {ph} AND id < {ph}) "
+                "OR fecha_movimiento IS NULL)"
+            )
+            params.extend([fecha_cursor, fecha_cursor, id_cursor])
+
+    sql = f"SELECT {', '.join(seleccion)} FROM historico_conciliaciones"
+    if condiciones:
+        sql += " WHERE " + " AND ".join(condiciones)
+    sql += f" ORDER BY fecha_movimiento DESC, id DESC LIMIT {int(limite) + 1}"
+
+    cursor = conn.cursor()
+    try:
+        cursor.execute(sql, params)
+        registros = cursor.fetchall()
     finally:
-        if conn:
-            conn.close()
+        cursor.close()
+
+    hay_mas = len(registros) > limite
+    registros = registros[:limite]
+    filas = pd.DataFrame([tuple(r) for r in registros], columns=seleccion)
+
+    siguiente = None
+    if hay_mas:
+        fecha_ult = filas["fecha_movimiento"].iloc[-1]
+        siguiente = (None if pd.isna(fecha_ult) else str(fecha_ult), int(filas["id"].iloc[-1]))
+    return {"filas": filas[columnas], "siguiente": siguiente}
+
+
+def consultar_historico(secrets: dict, **filtros) -> dict:
+    """
+    Lee una pagina de historico_conciliaciones en TiDB Cloud.
+    Acepta los mismos filtros que leer_historico.
+
+    Returns:
+        dict con status, filas (DataFrame) y siguiente (cursor de la proxima pagina)
+    """
+    try:
+        with conexion(secrets) as conn:
+            _asegurar_esquema(conn, secrets)
+            res = leer_historico(conn, **filtros)
+        return {"status": "ok", **res}
+    except Exception as e:
+        return {"status": "error", "mensaje": str(e)}
 
 
 def test_conexion(secrets: dict) -> dict:
     """Testea la conexión a TiDB Cloud."""
     try:
-        conn = _get_connection(secrets)
-        with conn.cursor() as cursor:
-            cursor.execute("SELECT 1")
-        conn.close()
+        with conexion(secrets) as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
         return {"status": "ok", "mensaje": "Conexion exitosa a TiDB Cloud"}
     except Exception as e:
         return {"status": "error", "mensaje": str(e)}
@@ -0,0 +1,260 @@
+"""
+Escenarios de estres (peores casos) para el matching combinatorio.
+
+Cada escenario arma entradas chicas pero adversariales para una de las
+busquedas por suma (ver src/combinatoria.py) o para el normalizador:
+
+  - tabla_parametrica_grande: tabla de 5k filas (demo; cada movimiento
+    recorre la tabla entera en match_por_tabla_parametrica)
+  - cliente_muchas_facturas: un CUIT con 100 facturas pendientes y creditos
+    que no suman ningun subconjunto (real: _buscar_sum_match; demo:
+    _match_monto_suma)
+  - textos_unicode_largos: nombres y descripciones de miles de caracteres con
+    acentos combinados, emojis, CJK y espacios raros (normalizador + fuzzy)
+  - creditos_mismo_cuit: cientos de creditos sin match del mismo CUIT y
+    ventas mixtas de ese CUIT (_buscar_desglose en Fase 2)
+  - muchas_mixtas: cientos de ventas Santander + Caja GRANDE repartidas en
+    pocos CUIT (_fase2_desglose con muchas ventas por CUIT)
+
+correr_escenario() lo ejecuta por el motor (procesar / procesar_real) y
+devuelve segundos y combinaciones evaluadas por funcion; los tests de estres
+comparan eso contra un tope de tiempo y contra MAX_COMBINACIONES.
+"""
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.combinatoria import contar_combinaciones
+from src.generador_datos import (
+    COLUMNAS_EXTRACTO, COLUMNAS_VENTAS, MEDIO_MIXTO, MEDIO_SANTANDER, generar_clientes,
+)
+from src.motor_conciliacion import MotorConciliacion
+
+FECHA_BASE = pd.Timestamp(2025, 12, 1)
+
+
+def _extracto_real(descripciones: list[str], importes: list[float], dias: list[int] = None) -> pd.DataFrame:
+    """Extracto Santander en formato real (fechas como texto dd/mm/yyyy)."""
+    n = len(descripciones)
+    dias = dias if dias is not None else [i % 28 for i in range(n)]
+    fechas = [(FECHA_BASE + pd.Timedelta(days=int(d))).strftime("%d/%m/%Y") for d in dias]
+    return pd.DataFrame(
+        list(zip(fechas, ["Casa Central"] * n, [4805] * n, range(10**6, 10**6 + n), descripciones, importes)),
+        columns=COLUMNAS_EXTRACTO,
+    )
+
+
+def _ventas_reales(clientes: list[str], cuits: list[str], cobrados: list[float], medios: list[str]) -> pd.DataFrame:
+    """Listado de ventas Contagram en formato real (todas Cobrado, emitidas el dia base)."""
+    n = len(clientes)
+    return pd.DataFrame({
+        "Id": np.arange(30_000, 30_000 + n),
+        "Emisión": [FECHA_BASE] * n,
+        "Cliente": clientes,
+        "CUIT": cuits,
+        "Tipo": "A",
+        "N° de Factura": np.arange(1, n + 1),
+        "Vendedor": "Franco Garcia",
+        "Total Venta": cobrados,
+        "Cobrado": cobrados,
+        "Estado": "Cobrado",
+        "Medio de Cobro": medios,
+        "Nota Cliente": np.nan,
+    }, columns=COLUMNAS_VENTAS)
+
+
+def _transferencia(nombre: str, cuit: str) -> str:
+    return f"Transferencia Recibida  - De {nombre} / - Var / {cuit} "
+
+
+def _con_guiones(cuit: str) -> str:
+    return f"{cuit[:2]}-{cuit[2:10]}-{cuit[10]}"
+
+
+def tabla_parametrica_grande(n_filas: int = 5000, n_movimientos: int = 60, semilla: int = 0) -> dict:
+    """Demo con una tabla parametrica de `n_filas` clientes y un extracto Galicia chico."""
+    rng = np.random.default_rng(semilla)
+    clientes = generar_clientes(rng, n_filas)
+    nombres = clientes["nombre"].str.upper()
+    tabla = pd.DataFrame({
+        "tipo": "Cliente",
+        "nombre_contagram": nombres,
+        "alias_banco": "TRANSF " + nombres.str[:25],
+        "cuit": clientes["cuit_guiones"],
+        "id_contagram": np.arange(1000, 1000 + n_filas),
+        "banco_principal": "galicia",
+        "monto_mensual": 0.0,
+    })
+    elegidos = rng.choice(n_filas, size=n_movimientos, replace=False)
+    montos = np.round(rng.uniform(50_000, 2_000_000, n_movimientos), 2)
+    fechas = [(FECHA_BASE + pd.Timedelta(days=int(d))).strftime("%d/%m/%Y") for d in rng.integers(0, 28, n_movimientos)]
+    extracto = pd.DataFrame({
+        "Fecha": fechas,
+        "Fecha Valor": fechas,
+        "Descripcion": tabla["alias_banco"].values[elegidos],
+        "Referencia": [f"REF{i:06d}" for i in range(n_movimientos)],
+        "Debito": "",
+        "Credito": montos,
+        "Saldo": np.cumsum(montos),
+    })
+    ventas = pd.DataFrame({
+        "Nro Factura": [f"A-{i + 1:05d}" for i in range(n_movimientos)],
+        "Fecha": fechas,
+        "Cliente": tabla["nombre_contagram"].values[elegidos],
+        "ID Cliente": tabla["id_contagram"].values[elegidos],
+        "CUIT": tabla["cuit"].values[elegidos],
+        "Monto Total": montos,
+        "Estado": "Pendiente",
+    })
+    compras = pd.DataFrame(columns=["Nro OC", "Fecha", "Proveedor", "ID Proveedor", "CUIT", "Monto Total", "Estado"])
+    return {
+        "nombre": "tabla_parametrica_grande",
+        "modo": "demo",
+        "entradas": {"tabla_param": tabla, "extractos": [extracto], "ventas": ventas, "compras": compras},
+    }
+
+
+def cliente_muchas_facturas(n_facturas: int = 100, n_creditos: int = 20, modo: str = "real") -> dict:
+    """
+    Un cliente con `n_facturas` pendientes y `n_creditos` transferencias de un
+    monto menor a cualquier factura: ninguna factura ni suma de facturas lo
+    cubre, asi que el sum matching recorre todos los subconjuntos que puede.
+    """
+    montos = [100_000.0 + 1_000.37 * i for i in range(n_facturas)]
+    credito = 12_345.67
+    cuit = "30712345678"
+    nombre = "Distribuidora Estres Sa"
+    if modo == "real":
+        return {
+            "nombre": "cliente_muchas_facturas",
+            "modo": "real",
+            "entradas": {
+                "extractos": [_extracto_real([_transferencia(nombre, cuit)] * n_creditos, [credito] * n_creditos)],
+                "ventas": _ventas_reales(
+                    [nombre] * n_facturas, [_con_guiones(cuit)] * n_facturas, montos, [MEDIO_SANTANDER] * n_facturas,
+                ),
+            },
+        }
+
+    tabla = pd.DataFrame([{
+        "tipo": "Cliente", "nombre_contagram": nombre.upper(), "alias_banco": f"TRANSF {nombre.upper()}",
+        "cuit": _con_guiones(cuit), "id_contagram": 1000, "banco_principal": "galicia", "monto_mensual": 0.0,
+    }])
+    extracto = pd.DataFrame({
+        "Fecha": "01/12/2025", "Fecha Valor": "01/12/2025",
+        "Descripcion": [f"TRANSF {nombre.upper()}"] * n_creditos,
+        "Referencia": [f"REF{i:06d}" for i in range(n_creditos)],
+        "Debito": "", "Credito": credito, "Saldo": credito,
+    })
+    ventas = pd.DataFrame({
+        "Nro Factura": [f"A-{i + 1:05d}" for i in range(n_facturas)],
+        "Fecha": "01/12/2025", "Cliente": nombre.upper(), "ID Cliente": 1000,
+        "CUIT": _con_guiones(cuit), "Monto Total": montos, "Estado": "Pendiente",
+    })
+    compras = pd.DataFrame(columns=["Nro OC", "Fecha", "Proveedor", "ID Proveedor", "CUIT", "Monto Total", "Estado"])
+    return {
+        "nombre": "cliente_muchas_facturas_demo",
+        "modo": "demo",
+        "entradas": {"tabla_param": tabla, "extractos": [extracto], "ventas": ventas, "compras": compras},
+    }
+
+
+def textos_unicode_largos(n_filas: int = 200, largo: int = 5000, semilla: int = 0) -> dict:
+    """Nombres y descripciones de `largo` caracteres con unicode de todo tipo."""
+    rng = np.random.default_rng(semilla)
+    piezas = [
+        "Ñandú", "Müller", "é", "à̈", "🍷", "🧾", "北京", "Ωμέγα",
+        "​", " ", "\t", "S.A.", "Distribuidora", "ﬁ", "Ⅻ", "‐‑–—",
+    ]
+    filas_desc, filas_nombre, cuits = [], [], []
+    for i in range(n_filas):
+        partes = rng.choice(piezas, size=largo // 4)
+        texto = " ".join(partes)[:largo]
+        cuit = f"30{70_000_000 + i:08d}{i % 10}"
+        filas_nombre.append(texto)
+        filas_desc.append(_transferencia(texto, cuit) + texto)
+        cuits.append(cuit)
+    montos = [1_000.0 + i for i in range(n_filas)]
+    return {
+        "nombre": "textos_unicode_largos",
+        "modo": "real",
+        "entradas": {
+            "extractos": [_extracto_real(filas_desc, montos)],
+            "ventas": _ventas_reales(filas_nombre, [_con_guiones(c) for c in cuits], montos, [MEDIO_SANTANDER] * n_filas),
+        },
+    }
+
+
+def creditos_mismo_cuit(n_creditos: int = 300, n_mixtas: int = 5, partes_santander: int = 3) -> dict:
+    """
+    `n_creditos` transferencias sin match de un mismo CUIT y `n_mixtas` ventas
+    mixtas de ese CUIT con `partes_santander` partes Santander: el desglose de
+    cada una prueba combinaciones de `partes_santander` creditos entre todos.
+    """
+    cuit = "30787654321"
+    nombre = "Bodega Combinatoria Srl"
+    montos_cred = [10_000.0 + 17.31 * i for i in range(n_creditos)]
+    medio = " - ".join(["Caja GRANDE"] + [MEDIO_SANTANDER] * partes_santander)
+    # Cobrado chico: ninguna combinacion de creditos queda por debajo (peor caso)
+    cobrados = [5_000.0 + i for i in range(n_mixtas)]
+    return {
+        "nombre": "creditos_mismo_cuit",
+        "modo": "real",
+        "entradas": {
+            "extractos": [_extracto_real([_transferencia(nombre, cuit)] * n_creditos, montos_cred)],
+            "ventas": _ventas_reales([nombre] * n_mixtas, [_con_guiones(cuit)] * n_mixtas, cobrados, [medio] * n_mixtas),
+        },
+    }
+
+
+def muchas_mixtas(n_cuits: int = 30, mixtas_por_cuit: int = 10, creditos_por_cuit: int = 25) -> dict:
+    """Ventas Santander + Caja GRANDE repartidas en pocos CUIT, con creditos sueltos de cada uno."""
+    descripciones, importes, clientes, cuits, cobrados = [], [], [], [], []
+    for c in range(n_cuits):
+        cuit = f"30{71_000_000 + c * 7919:08d}{c % 10}"
+        nombre = f"Almacen Mixto {c} Sa"
+        for i in range(creditos_por_cuit):
+            descripciones.append(_transferencia(nombre, cuit))
+            importes.append(20_000.0 + 101.3 * i + c)
+        for i in range(mixtas_por_cuit):
+            clientes.append(nombre)
+            cuits.append(_con_guiones(cuit))
+            cobrados.append(900_000.0 + 1_234.5 * i)
+    return {
+        "nombre": "muchas_mixtas",
+        "modo": "real",
+        "entradas": {
+            "extractos": [_extracto_real(descripciones, importes)],
+            "ventas": _ventas_reales(clientes, cuits, cobrados, [MEDIO_MIXTO] * len(clientes)),
+        },
+    }
+
+
+def escenarios_default() -> list[dict]:
+    """Todos los escenarios con sus tamanos default."""
+    return [
+        tabla_parametrica_grande(),
+        cliente_muchas_facturas(modo="real"),
+        cliente_muchas_facturas(modo="demo"),
+        textos_unicode_largos(),
+        creditos_mismo_cuit(),
+        muchas_mixtas(),
+    ]
+
+
+def correr_escenario(escenario: dict) -> dict:
+    """
+    Corre el escenario por el motor y devuelve {"segundos", "combinaciones",
+    "resultado"}; combinaciones es el conteo de src.combinatoria por funcion.
+    """
+    entradas = escenario["entradas"]
+    with contar_combinaciones() as combinaciones:
+        inicio = time.perf_counter()
+        if escenario["modo"] == "demo":
+            motor = MotorConciliacion(entradas["tabla_param"])
+            resultado = motor.procesar(entradas["extractos"], entradas["ventas"], entradas["compras"])
+        else:
+            resultado = MotorConciliacion(pd.DataFrame()).procesar_real(entradas["extractos"], entradas["ventas"])
+        segundos = time.perf_counter() - inicio
+    return {"segundos": segundos, "combinaciones": combinaciones, "resultado": resultado}
@@ -0,0 +1,152 @@
+"""
+Eventos estructurados del motor de conciliacion.
+
+MotorConciliacion tiene un Emisor: cualquiera puede suscribirse (la UI, una
+barra de progreso de consola, un exportador de metricas) y recibe cada evento
+como un dict {"tipo", "etapa", "ts", ...}:
+
+  - corrida_inicio / corrida_fin: {"modo", "run_id"}; corrida_fin agrega "segundos"
+  - etapa_inicio: {"indice", "total_etapas", "fraccion", "filas_entrada"}
+  - etapa_fin:    {"segundos", "cache", "fraccion", "filas_salida"}
+  - progreso:     {"fase", "hechos", "total", "fraccion"} cada PASO_PROGRESO
+                  movimientos del matcher y del desglose
+
+"fraccion" es el avance de toda la corrida (0-1, nunca baja) y filas_* son
+{nombre: filas} de las entradas/salidas que son DataFrames.
+
+Sin suscriptores no se arma ningun evento: el pipeline y los loops solo
+chequean `emisor.activo` / `avance is not None`. Una excepcion en un
+suscriptor corta la corrida (asi cancela un trabajo, ver src/jobs.py).
+"""
+import time
+from contextlib import contextmanager
+
+import pandas as pd
+
+CORRIDA_INICIO = "corrida_inicio"
+CORRIDA_FIN = "corrida_fin"
+ETAPA_INICIO = "etapa_inicio"
+ETAPA_FIN = "etapa_fin"
+PROGRESO = "progreso"
+
+
+def contar_filas(valores: dict, nombres: list[str]) -> dict:
+    """{nombre: filas} de los valores que son DataFrames (o listas de DataFrames)."""
+    filas = {}
+    for nombre in nombres:
+        valor = valores.get(nombre)
+        if isinstance(valor, pd.DataFrame):
+            filas[nombre] = len(valor)
+        elif isinstance(valor, (list, tuple)) and valor and all(isinstance(v, pd.DataFrame) for v in valor):
+            filas[nombre] = sum(len(v) for v in valor)
+    return filas
+
+
+class Emisor:
+    """Lista de suscriptores; emitir() llama a cada uno con el evento."""
+
+    def __init__(self):
+        self._suscriptores = []
+
+    @property
+    def activo(self) -> bool:
+        return bool(self._suscriptores)
+
+    def suscribir(self, callback):
+        """Agrega `callback(evento: dict)`. Devuelve una funcion que lo desuscribe."""
+        self._suscriptores.append(callback)
+        return lambda: self.desuscribir(callback)
+
+    def desuscribir(self, callback):
+        if callback in self._suscriptores:
+            self._suscriptores.remove(callback)
+
+    def emitir(self, tipo: str, **datos):
+        if not self._suscriptores:
+            return
+        evento = {"tipo": tipo, "ts": time.time(), **datos}
+        for callback in list(self._suscriptores):
+            callback(evento)
+
+
+def adaptar_progreso(progreso):
+    """
+    Suscriptor que traduce eventos a progreso(etapa, fraccion, detalle), la
+    firma que usan los trabajos en segundo plano (Trabajo.reportar).
+    """
+    def callback(evento):
+        tipo = evento["tipo"]
+        if tipo == ETAPA_INICIO:
+            progreso(evento["etapa"], evento["fraccion"], "")
+        elif tipo == PROGRESO:
+            detalle = f"{evento['hechos']}/{evento['total']}"
+            if evento.get("fase"):
+                detalle += f" ({evento['fase']})"
+            progreso(evento["etapa"], evento["fraccion"], detalle)
+        elif tipo == CORRIDA_FIN:
+            progreso("fin", 1.0, "")
+    return callback
+
+
+@contextmanager
+def suscripto(emisor: Emisor, callback):
+    """Suscribe `callback` mientras dura el bloque (nada si es None)."""
+    if callback is None:
+        yield
+        return
+    quitar = emisor.suscribir(callback)
+    try:
+        yield
+    finally:
+        quitar()
+
+
+class SeguidorEtapas:
+    """
+    Emite etapa_inicio / etapa_fin / progreso para codigo que no corre como
+    Pipeline (demo, incremental). La fraccion reparte las etapas en partes iguales.
+    """
+
+    def __init__(self, emisor: Emisor, etapas: list[str]):
+        self.emisor = emisor
+        self.etapas = etapas
+        self.activo = emisor.activo
+        self._actual = None
+        self._inicio = 0.0
+
+    def iniciar(self, nombre: str, filas_entrada: dict = None):
+        self.terminar()
+        self._actual = nombre
+        self._inicio = time.perf_counter()
+        if self.activo:
+            i = self.etapas.index(nombre)
+            self.emisor.emitir(
+                ETAPA_INICIO, etapa=nombre, indice=i, total_etapas=len(self.etapas),
+                fraccion=i / len(self.etapas), filas_entrada=filas_entrada or {},
+            )
+
+    def terminar(self, filas_salida: dict = None):
+        if self._actual is None:
+            return
+        nombre, self._actual = self._actual, None
+        if self.activo:
+            self.emisor.emitir(
+                ETAPA_FIN, etapa=nombre, segundos=round(time.perf_counter() - self._inicio, 4),
+                cache=False, fraccion=(self.etapas.index(nombre) + 1) / len(self.etapas),
+                filas_salida=filas_salida or {},
+            )
+
+    @property
+    def avance(self):
+        """Callback avance(hechos, total, fase) de la etapa actual, o None sin suscriptores."""
+        if not self.activo or self._actual is None:
+            return None
+        nombre = self._actual
+        i = self.etapas.index(nombre)
+
+        def avance(hechos, total, fase=""):
+            self.emisor.emitir(
+                PROGRESO, etapa=nombre, fase=fase, hechos=hechos, total=total,
+                fraccion=(i + hechos / max(total, 1)) / len(self.etapas),
+            )
+        return avance
@@ -11,9 +11,12 @@ Uso desde matcher.py:
 """
 import re
 import unicodedata
+from functools import lru_cache
 
 from rapidfuzz import fuzz
 
+from src import metricas
+
 
 # ─── PESOS CONFIGURABLES ──────────────────────────────────────────
 # Cada algoritmo aporta un % al score final de texto.
@@ -25,6 +28,7 @@ PESOS_SIMILITUD = {
 }
 
 
+@lru_cache(maxsize=65_536)
 def _normalizar_texto(texto: str) -> str:
     """
     Normaliza texto para comparacion:
@@ -60,6 +64,9 @@ def _normalizar_texto(texto: str) -> str:
     return " ".join(words)
 
 
+metricas.registrar_cache("normalizar_texto", _normalizar_texto)
+
+
 def calcular_similitud(a: str, b: str) -> float:
     """
     Calcula similitud entre dos strings usando rapidfuzz (0.0 a 1.0).
@@ -91,6 +98,7 @@ def calcular_similitud(a: str, b: str) -> float:
         return 1.0
 
     # Calcular scores parciales (rapidfuzz devuelve 0-100)
+    metricas.sumar("comparaciones_fuzzy")
     s_token_set = fuzz.token_set_ratio(na, nb) / 100.0
     s_token_sort = fuzz.token_sort_ratio(na, nb) / 100.0
     s_partial = fuzz.partial_ratio(na, nb) / 100.0
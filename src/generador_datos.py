@@ -0,0 +1,311 @@
+"""
+Generador parametrico de datos sinteticos en el formato real.
+
+Produce un extracto Santander (6 columnas, fechas mixtas serial Excel / texto
+dd/mm/yyyy, CUIT en la descripcion) y un listado de ventas de Contagram
+(Id, Emisión, Cliente, CUIT, ..., Cobrado, Estado, Medio de Cobro) tal como
+los devuelve pd.read_excel de los archivos reales, asi entran directo a
+MotorConciliacion.procesar_real.
+
+Todo se arma con numpy/pandas vectorizado (sin loops por cliente ni por
+pago): 1M de ventas se generan en segundos. Misma semilla = mismos datos.
+
+Parametros (ver generar_datos):
+  - n_clientes, facturas_por_cliente, meses
+  - pct_pagos_divididos: facturas Santander cobradas en 2-3 transferencias
+    ("Santander Río PRINCA aa - Santander Río PRINCA aa")
+  - pct_mixtos: facturas cobradas parte Santander y parte Caja GRANDE
+    (la transferencia cubre solo la porcion Santander, ver Fase 2)
+  - pct_otros_medios: facturas cobradas por medios sin movimiento en el
+    extracto (Caja LOCAL, Mercado Pago, Getnet, Echeq)
+  - ruido_nombres: fraccion de transferencias con el nombre del cliente
+    deformado (sin espacios, truncado, mayusculas, sin sufijo, typo)
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+COLUMNAS_EXTRACTO = [
+    "Movimientos del Día", "Unnamed: 1", "Unnamed: 2", "Unnamed: 3", "Unnamed: 4", "Unnamed: 5",
+]
+COLUMNAS_VENTAS = [
+    "Id", "Emisión", "Cliente", "CUIT", "Tipo", "N° de Factura", "Vendedor",
+    "Total Venta", "Cobrado", "Estado", "Medio de Cobro", "Nota Cliente",
+]
+
+MEDIO_SANTANDER = "Santander Río PRINCA aa"
+MEDIO_MIXTO = f"Caja GRANDE - {MEDIO_SANTANDER}"
+OTROS_MEDIOS = ["Caja LOCAL", "mercado pago PEREYRA", "Getnet", "Echeq terceros"]
+
+NOMBRES = [
+    "Juan", "Maria", "Lucas", "Florencia", "Martin", "Sofia", "Federico", "Noelia",
+    "Patricio", "Valentina", "Nestor", "Julieta", "Francisco", "Camila", "Matias", "Lujan",
+]
+APELLIDOS = [
+    "Gonzalez", "Rodriguez", "Fernandez", "Lopez", "Martinez", "Perez", "Garcia", "Sanchez",
+    "Romero", "Sosa", "Torres", "Alvarez", "Ruarte", "Pizarro", "Mascan", "Dorado",
+]
+RUBROS = [
+    "Distribuidora", "Bodega", "Cerveceria", "Bar", "Almacen", "Gintoneria",
+    "Hacienda", "Eventos", "Producciones", "Pizzeria", "Resto", "Vinoteca",
+]
+LUGARES = [
+    "Cordoba", "Del Sur", "La Madura", "Norte", "Alta Gracia", "Villa Belgrano",
+    "San Martin", "Del Valle", "Italia", "Los Andes", "Mendoza", "Central",
+]
+SUFIJOS = ["S.a.", "Srl", "S.a.s.", "S.r.l.", "Sa"]
+VENDEDORES = ["Franco Garcia", "Tomas Peña", "Lucia Diaz"]
+SUCURSALES = ["Casa Central", "Villa Belgrano", "Cordoba", "Palmares Mendoza", "Villa Maria - Cordoba"]
+
+# Formatos de transferencia recibida: (codigo de transaccion, plantilla); {n} nombre, {c} CUIT
+FORMATOS_CREDITO = [
+    (4805, "Transferencia Recibida  - De {n} / - Var / {c} "),
+    (3413, "Transf Recibida Cvu Dif Titular  - De {n} / Mercado Pago /{c} "),
+    (3043, "Pago A Proveedores Recibido  - {n} {c} 03 {r} "),
+]
+PESOS_FORMATOS_CREDITO = [0.6, 0.25, 0.15]
+DEBITOS_FIJOS = [
+    (4633, "Impuesto Ley 25.413 Debito 0,6%"),
+    (4637, "Impuesto Ley 25.413 Credito 0,6%"),
+    (1743, "Regimen De Recaudacion Sircreb U  - Resp:30717105733 / 2,50%"),
+]
+DEBITOS_POR_CREDITO = 0.35
+_EPOCA_EXCEL = np.datetime64("1899-12-30")
+
+
+def _elegir(rng: np.random.Generator, opciones: list, n: int, pesos: list = None) -> np.ndarray:
+    return np.asarray(opciones, dtype=object)[rng.choice(len(opciones), size=n, p=pesos)]
+
+
+def _texto(*partes) -> pd.Series:
+    """Concatena arrays / escalares de texto elemento a elemento."""
+    serie = None
+    for parte in partes:
+        if not isinstance(parte, str):
+            parte = pd.Series(np.asarray(parte, dtype=object))
+        serie = parte if serie is None else serie + parte
+    return serie
+
+
+def generar_clientes(rng: np.random.Generator, n_clientes: int) -> pd.DataFrame:
+    """Clientes con nombre, CUIT unico (11 digitos) y CUIT con guiones."""
+    empresa = rng.random(n_clientes) < 0.6
+    nombre_empresa = _texto(
+        _elegir(rng, RUBROS, n_clientes), " ", _elegir(rng, LUGARES, n_clientes), " ",
+        _elegir(rng, SUFIJOS, n_clientes),
+    )
+    nombre_persona = _texto(
+        _elegir(rng, NOMBRES, n_clientes), " ", _elegir(rng, APELLIDOS, n_clientes), " ",
+        _elegir(rng, APELLIDOS, n_clientes),
+    )
+    # Numero correlativo para que no haya dos clientes con el mismo nombre
+    nombre = pd.Series(np.where(empresa, nombre_empresa, nombre_persona), dtype=object)
+    nombre = nombre + " " + pd.Series(np.arange(1, n_clientes + 1)).astype(str)
+
+    prefijo = np.where(empresa, _elegir(rng, ["30", "33"], n_clientes), _elegir(rng, ["20", "23", "27"], n_clientes))
+    # Cuerpo unico: salto primo sobre 10**8 (no se repite mientras n_clientes < 10**8)
+    cuerpo = (int(rng.integers(10**7, 10**8)) + np.arange(n_clientes, dtype=np.int64) * 7919) % 10**8
+    cuerpo = pd.Series(cuerpo).astype(str).str.zfill(8)
+    digito = pd.Series(rng.integers(0, 10, n_clientes)).astype(str)
+    prefijo = pd.Series(prefijo, dtype=object)
+    return pd.DataFrame({
+        "nombre": nombre,
+        "cuit": prefijo + cuerpo + digito,
+        "cuit_guiones": prefijo + "-" + cuerpo + "-" + digito,
+        "tipo": np.where(empresa, "A", "B"),
+    })
+
+
+def _deformar_nombres(rng: np.random.Generator, nombres: pd.Series, fraccion: float) -> pd.Series:
+    """Deforma una `fraccion` de los nombres con una de cinco variantes (vectorizado)."""
+    nombres = nombres.copy()
+    elegidos = np.flatnonzero(rng.random(len(nombres)) < fraccion)
+    variante = rng.integers(0, 5, len(elegidos))
+    deformaciones = [
+        lambda s: s.str.replace(" ", "", regex=False),
+        lambda s: s.str[:12],
+        lambda s: s.str.upper(),
+        lambda s: s.str.replace(r"\s+(S\.a\.s\.|S\.r\.l\.|S\.a\.|Srl|Sa)\b", "", regex=True),
+        lambda s: s.str.replace("a", "e", n=1, regex=False),
+    ]
+    for i, deformar in enumerate(deformaciones):
+        filas = nombres.index[elegidos[variante == i]]
+        if len(filas):
+            nombres.loc[filas] = deformar(nombres.loc[filas])
+    return nombres
+
+
+def _fechas_extracto(fechas: np.ndarray) -> np.ndarray:
+    """Fechas como en el extracto real: serial Excel si el dia es <= 12, texto dd/mm/yyyy si no."""
+    # Se formatean solo las fechas distintas (pocas: dias del periodo)
+    unicas, inversa = np.unique(fechas.astype("datetime64[D]"), return_inverse=True)
+    dias = pd.DatetimeIndex(unicas)
+    serial = (unicas - _EPOCA_EXCEL).astype(np.int64).astype(object)
+    texto = np.asarray(dias.strftime("%d/%m/%Y"), dtype=object)
+    return np.where(dias.day <= 12, serial, texto)[inversa]
+
+
+def generar_datos(
+    semilla: int = 42,
+    n_clientes: int = 500,
+    facturas_por_cliente: int = 4,
+    meses: int = 1,
+    pct_pagos_divididos: float = 0.10,
+    pct_mixtos: float = 0.05,
+    ruido_nombres: float = 0.10,
+    pct_otros_medios: float = 0.45,
+    anio: int = 2025,
+    mes: int = 12,
+) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Genera (extracto Santander, ventas Contagram) en el formato de los archivos
+    reales. Ventas: n_clientes * facturas_por_cliente * meses filas, desde
+    `mes`/`anio`. Cada factura Santander genera sus transferencias 0-7 dias
+    despues de la emision; ademas hay debitos (impuestos y transferencias
+    enviadas) que no concilian.
+    """
+    if pct_pagos_divididos + pct_mixtos + pct_otros_medios > 1:
+        raise ValueError("pct_pagos_divididos + pct_mixtos + pct_otros_medios no puede superar 1")
+    rng = np.random.default_rng(semilla)
+    clientes = generar_clientes(rng, n_clientes)
+
+    # ─── Ventas ──────────────────────────────────────────────────────
+    por_cliente = facturas_por_cliente * meses
+    n = n_clientes * por_cliente
+    cliente = np.repeat(np.arange(n_clientes), por_cliente)
+    mes_idx = np.tile(np.repeat(np.arange(meses), facturas_por_cliente), n_clientes)
+    inicios = pd.date_range(pd.Timestamp(anio, mes, 1), periods=meses, freq="MS")
+    dias_mes = np.asarray(inicios.days_in_month)
+    emision = inicios.values[mes_idx] + (rng.random(n) * dias_mes[mes_idx]).astype("timedelta64[D]")
+    orden = np.argsort(emision, kind="stable")
+    cliente, emision = cliente[orden], emision[orden]
+
+    cobrado = np.round(np.clip(rng.lognormal(np.log(250_000), 1.0, n), 1_000, None), 2)
+    u = rng.random(n)
+    otros = u < pct_otros_medios
+    mixto = ~otros & (u < pct_otros_medios + pct_mixtos)
+    dividido = ~otros & ~mixto & (u < pct_otros_medios + pct_mixtos + pct_pagos_divididos)
+    partes = np.where(dividido, rng.integers(2, 4, n), np.where(otros, 0, 1))
+
+    medio = np.full(n, MEDIO_SANTANDER, dtype=object)
+    medio[otros] = _elegir(rng, OTROS_MEDIOS, int(otros.sum()))
+    medio[mixto] = MEDIO_MIXTO
+    for k in (2, 3):
+        medio[dividido & (partes == k)] = " - ".join([MEDIO_SANTANDER] * k)
+
+    ventas = pd.DataFrame({
+        "Id": np.arange(20_000, 20_000 + n),
+        "Emisión": emision,
+        "Cliente": clientes["nombre"].values[cliente],
+        "CUIT": clientes["cuit_guiones"].values[cliente],
+        "Tipo": clientes["tipo"].values[cliente],
+        "N° de Factura": np.arange(1, n + 1),
+        "Vendedor": _elegir(rng, VENDEDORES, n),
+        # Total Venta trae decimales de mas (el real viene sin redondear)
+        "Total Venta": cobrado + rng.random(n) * 0.005,
+        "Cobrado": cobrado,
+        "Estado": "Cobrado",
+        "Medio de Cobro": medio,
+        "Nota Cliente": np.nan,
+    }, columns=COLUMNAS_VENTAS)
+
+    # ─── Creditos: una fila por transferencia ────────────────────────
+    factura = np.repeat(np.arange(n), partes)
+    m = len(factura)
+    inicio_grupo = np.repeat(np.cumsum(partes) - partes, partes)
+    posicion = np.arange(m) - inicio_grupo
+    ultima = posicion == partes[factura] - 1
+
+    # Pagos divididos: pesos al azar normalizados por factura; la ultima
+    # transferencia se lleva el redondeo para que la suma de exacto
+    pesos = rng.uniform(0.2, 1.0, m)
+    pesos = pesos / np.bincount(factura, pesos, minlength=n)[factura]
+    montos = np.round(cobrado[factura] * pesos, 2)
+    resto = cobrado - np.bincount(factura, montos, minlength=n)
+    montos[ultima] = np.round(montos[ultima] + resto[factura[ultima]], 2)
+    # Mixtos: la transferencia cubre la porcion Santander (30-80%), el resto es Caja
+    es_mixto = mixto[factura]
+    montos[es_mixto] = np.round(cobrado[factura[es_mixto]] * rng.uniform(0.3, 0.8, int(es_mixto.sum())), 2)
+
+    fechas_cred = emision[factura] + rng.integers(0, 8, m).astype("timedelta64[D]")
+    cliente_cred = cliente[factura]
+    # Nombre como lo muestra el banco (Title case, 25 caracteres), uno por cliente
+    nombre_banco = np.asarray(clientes["nombre"].str.title().str[:25], dtype=object)
+    nombres_banco = _deformar_nombres(rng, pd.Series(nombre_banco[cliente_cred], dtype=object), ruido_nombres)
+    cuits = pd.Series(np.asarray(clientes["cuit"], dtype=object)[cliente_cred], dtype=object)
+    formato = rng.choice(len(FORMATOS_CREDITO), size=m, p=PESOS_FORMATOS_CREDITO)
+    desc_cred = pd.Series("", index=range(m), dtype=object)
+    codigos_cred = np.zeros(m, dtype=np.int64)
+    for i, (codigo, plantilla) in enumerate(FORMATOS_CREDITO):
+        filas = np.flatnonzero(formato == i)
+        if not len(filas):
+            continue
+        antes, resto_plantilla = plantilla.split("{n}")
+        medio_plantilla, despues = resto_plantilla.split("{c}")
+        texto = antes + nombres_banco.iloc[filas].reset_index(drop=True) + medio_plantilla \
+            + cuits.iloc[filas].reset_index(drop=True)
+        if "{r}" in despues:
+            ref = pd.Series(rng.integers(10**6, 10**7, len(filas))).astype(str)
+            pre, post = despues.split("{r}")
+            texto = texto + pre + ref + post
+        else:
+            texto = texto + despues
+        desc_cred.iloc[filas] = texto.values
+        codigos_cred[filas] = codigo
+
+    # ─── Debitos: impuestos y transferencias enviadas ────────────────
+    d = int(m * DEBITOS_POR_CREDITO)
+    fijo = rng.random(d) < 0.5
+    idx_fijo = rng.integers(0, len(DEBITOS_FIJOS), d)
+    desc_fijos = np.asarray([t for _, t in DEBITOS_FIJOS], dtype=object)[idx_fijo]
+    codigos_fijos = np.asarray([c for c, _ in DEBITOS_FIJOS])[idx_fijo]
+    destinatario = rng.integers(0, n_clientes, d)
+    desc_envio = _texto(
+        "Transferencia Inmediata  - A ",
+        nombre_banco[destinatario], " / - Var / ", np.asarray(clientes["cuit"], dtype=object)[destinatario], " ",
+    )
+    desc_deb = np.where(fijo, desc_fijos, desc_envio.values)
+    codigos_deb = np.where(fijo, codigos_fijos, 2822)
+    montos_deb = -np.round(np.where(fijo, rng.uniform(500, 100_000, d), rng.lognormal(np.log(800_000), 0.8, d)), 2)
+    fin = inicios[-1] + pd.offsets.MonthEnd(0)
+    dias_total = (fin - inicios[0]).days + 1
+    fechas_deb = inicios.values[0] + rng.integers(0, dias_total, d).astype("timedelta64[D]")
+
+    # ─── Extracto en formato real ordenado por fecha ─────────────────
+    fechas = np.concatenate([fechas_cred, fechas_deb])
+    orden = np.argsort(fechas, kind="stable")
+    total = m + d
+    extracto = pd.DataFrame({
+        COLUMNAS_EXTRACTO[0]: _fechas_extracto(fechas[orden]),
+        COLUMNAS_EXTRACTO[1]: _elegir(rng, SUCURSALES, total, [0.55, 0.35, 0.04, 0.03, 0.03]),
+        COLUMNAS_EXTRACTO[2]: np.concatenate([codigos_cred, codigos_deb])[orden],
+        COLUMNAS_EXTRACTO[3]: rng.integers(10**6, 10**8, total),
+        COLUMNAS_EXTRACTO[4]: np.concatenate([desc_cred.values, desc_deb])[orden],
+        COLUMNAS_EXTRACTO[5]: np.concatenate([montos, montos_deb])[orden],
+    })
+    return extracto, ventas
+
+
+def guardar_datos(extracto: pd.DataFrame, ventas: pd.DataFrame, directorio: str, formato: str = "xlsx") -> list[str]:
+    """
+    Escribe extracto y ventas en `directorio` (xlsx como los archivos reales, o
+    csv para volumenes grandes). Devuelve las rutas escritas.
+    """
+    os.makedirs(directorio, exist_ok=True)
+    if formato == "csv":
+        rutas = [os.path.join(directorio, "extracto_santander.csv"), os.path.join(directorio, "ventas_contagram.csv")]
+        extracto.to_csv(rutas[0], index=False, encoding="utf-8-sig")
+        ventas.to_csv(rutas[1], index=False, encoding="utf-8-sig")
+        return rutas
+    if formato != "xlsx":
+        raise ValueError(f"Formato no soportado: {formato}. Opciones: xlsx, csv")
+
+    rutas = [os.path.join(directorio, "extracto_santander.xlsx"), os.path.join(directorio, "ventas_contagram.xlsx")]
+    with pd.ExcelWriter(rutas[0], engine="xlsxwriter") as writer:
+        # El extracto real tiene solo el titulo en la primera fila (el resto de
+        # los encabezados vacios): pd.read_excel lo lee con las mismas columnas
+        extracto.to_excel(writer, sheet_name="Movimientos", index=False, header=False, startrow=1)
+        writer.sheets["Movimientos"].write(0, 0, COLUMNAS_EXTRACTO[0])
+    ventas.to_excel(rutas[1], index=False, engine="xlsxwriter")
+    return rutas
@@ -0,0 +1,192 @@
+"""
+Corridas de conciliacion en segundo plano, con progreso y cancelacion.
+
+Con st.spinner la sesion quedaba bloqueada hasta que procesar_real devolvia.
+Aca la corrida se lanza como un Trabajo en un hilo (pool compartido por el
+proceso) con un id; la sesion solo guarda ese id en session_state["trabajo_id"]
+y consulta el progreso en cada rerun, asi que las demas paginas siguen
+respondiendo mientras corre.
+
+  - Progreso: la funcion del trabajo llama trabajo.reportar(etapa, fraccion,
+    detalle); pasandolo como `progreso=` al motor, se alimenta de sus eventos
+    de etapa y de progreso por credito (ver src/eventos.py).
+  - Cancelacion cooperativa: cancelar() solo marca el pedido; el proximo
+    reportar() levanta TrabajoCancelado y la corrida se corta ahi. Como la
+    excepcion sale antes de guardar la etapa en curso, los caches no quedan
+    con resultados a medias.
+  - Al terminar, adjuntar_trabajo() copia el resultado a session_state (lo
+    llaman Inicio y todas las paginas al cargarse).
+"""
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+MAX_TRABAJOS_SIMULTANEOS = 2
+MAX_TRABAJOS_GUARDADOS = 16
+
+ESTADOS_FINALES = ("terminado", "cancelado", "error")
+
+
+class TrabajoCancelado(Exception):
+    """La corrida se corto porque se pidio cancelar el trabajo."""
+
+
+class Trabajo:
+    """Una corrida en segundo plano: estado, progreso y resultado."""
+
+    def __init__(self, descripcion: str = "", sesion: dict = None):
+        self.id = uuid.uuid4().hex[:12]
+        self.descripcion = descripcion
+        self.sesion = dict(sesion or {})  # claves extra de session_state (None = borrar)
+        self.info = {}                    # datos que deja la funcion (ej. desde_cache)
+        self.estado = "pendiente"
+        self.etapa = ""
+        self.detalle = ""
+        self.fraccion = 0.0
+        self.resultado = None
+        self.error = None
+        self.creado = time.time()
+        self.finalizado = None
+        self._cancelar = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def terminado(self) -> bool:
+        return self.estado in ESTADOS_FINALES
+
+    @property
+    def cancelacion_pedida(self) -> bool:
+        return self._cancelar.is_set()
+
+    def cancelar(self):
+        """Pide cortar la corrida en el proximo punto de control."""
+        self._cancelar.set()
+
+    def reportar(self, etapa: str, fraccion: float, detalle: str = ""):
+        """Actualiza el progreso; punto de control de la cancelacion."""
+        if self._cancelar.is_set():
+            raise TrabajoCancelado(f"Trabajo {self.id} cancelado en la etapa {etapa}")
+        with self._lock:
+            self.etapa = etapa
+            self.detalle = detalle
+            self.fraccion = min(max(float(fraccion), 0.0), 1.0)
+
+    def progreso(self) -> dict:
+        """Foto del estado para mostrar en la UI."""
+        with self._lock:
+            fin = self.finalizado or time.time()
+            return {
+                "id": self.id,
+                "descripcion": self.descripcion,
+                "estado": self.estado,
+                "etapa": self.etapa,
+                "detalle": self.detalle,
+                "fraccion": self.fraccion,
+                "segundos": round(fin - self.creado, 1),
+                "error": self.error,
+            }
+
+    def _correr(self, funcion):
+        logger = logging.getLogger(__name__)
+        try:
+            if self._cancelar.is_set():
+                raise TrabajoCancelado(f"Trabajo {self.id} cancelado antes de empezar")
+            self.estado = "corriendo"
+            resultado = funcion(self)
+        except TrabajoCancelado as e:
+            logger.info("%s", e)
+            self.estado = "cancelado"
+        except Exception as e:
+            logger.exception("Trabajo %s fallo", self.id)
+            self.error = f"{type(e).__name__}: {e}"
+            self.estado = "error"
+        else:
+            with self._lock:
+                self.resultado = resultado
+                self.fraccion = 1.0
+            self.estado = "terminado"
+        finally:
+            self.finalizado = time.time()
+
+
+class GestorTrabajos:
+    """Pool de hilos + registro de trabajos por id (compartido por todas las sesiones)."""
+
+    def __init__(self, max_simultaneos: int = MAX_TRABAJOS_SIMULTANEOS,
+                 max_guardados: int = MAX_TRABAJOS_GUARDADOS):
+        self.max_guardados = max_guardados
+        self._pool = ThreadPoolExecutor(max_workers=max_simultaneos, thread_name_prefix="conciliacion")
+        self._trabajos = OrderedDict()
+        self._lock = threading.Lock()
+
+    def lanzar(self, funcion, descripcion: str = "", sesion: dict = None) -> Trabajo:
+        """
+        Encola `funcion(trabajo)` y devuelve el Trabajo (su id va a session_state).
+
+        `funcion` recibe el trabajo para reportar progreso y dejar datos en
+        trabajo.info; lo que devuelve queda en trabajo.resultado.
+        """
+        trabajo = Trabajo(descripcion, sesion)
+        with self._lock:
+            self._trabajos[trabajo.id] = trabajo
+            # Descarta los finalizados mas viejos (los que corren no se tocan)
+            for tid in [t for t, tr in self._trabajos.items() if tr.terminado]:
+                if len(self._trabajos) <= self.max_guardados:
+                    break
+                del self._trabajos[tid]
+        self._pool.submit(trabajo._correr, funcion)
+        return trabajo
+
+    def obtener(self, trabajo_id: str) -> Trabajo | None:
+        with self._lock:
+            return self._trabajos.get(trabajo_id)
+
+    def cancelar(self, trabajo_id: str) -> bool:
+        trabajo = self.obtener(trabajo_id)
+        if trabajo is None or trabajo.terminado:
+            return False
+        trabajo.cancelar()
+        return True
+
+
+# Gestor compartido por proceso (Streamlit importa este modulo una sola vez)
+gestor_trabajos = GestorTrabajos()
+
+
+def adjuntar_trabajo(estado, gestor: GestorTrabajos = None) -> Trabajo | None:
+    """
+    Si el trabajo de la sesion (estado["trabajo_id"]) finalizo, lo saca de la
+    sesion y, si termino bien, copia resultado, stats y trabajo.sesion a
+    `estado` (st.session_state). Devuelve el trabajo finalizado; None si no hay
+    trabajo o sigue corriendo.
+    """
+    gestor = gestor or gestor_trabajos
+    trabajo_id = estado.get("trabajo_id")
+    if not trabajo_id:
+        return None
+    trabajo = gestor.obtener(trabajo_id)
+    if trabajo is None:
+        estado.pop("trabajo_id", None)  # el proceso se reinicio: el trabajo se perdio
+        return None
+    if not trabajo.terminado:
+        return None
+
+    estado.pop("trabajo_id", None)
+    if trabajo.estado == "terminado":
+        estado["resultado"] = trabajo.resultado
+        estado["stats"] = trabajo.resultado["stats"]
+        for clave, valor in trabajo.sesion.items():
+            if valor is None:
+                estado.pop(clave, None)
+            else:
+                estado[clave] = valor
+    return trabajo
+
+
+def trabajo_en_curso(estado, gestor: GestorTrabajos = None) -> Trabajo | None:
+    """Trabajo de la sesion que todavia no finalizo (o None)."""
+    trabajo = (gestor or gestor_trabajos).obtener(estado.get("trabajo_id") or "")
+    return trabajo if trabajo is not None and not trabajo.terminado else None
@@ -10,7 +10,11 @@ Umbrales configurables vía diccionario MATCH_CONFIG.
 """
 import pandas as pd
 import re
+from functools import lru_cache
+from src import metricas
+from src.combinatoria import NOTA_TRUNCADA, Busqueda
 from src.fuzzy_matcher import calcular_similitud
+from src.pipeline import PASO_PROGRESO
 
 
 # ─── UMBRALES CONFIGURABLES ─────────────────────────────────────────
@@ -29,9 +33,9 @@ MATCH_CONFIG = {
 }
 
 
-def get_config(key: str) -> float:
-    """Obtiene valor de config. Permite override en runtime."""
-    return MATCH_CONFIG.get(key, 0)
+def get_config(key: str, cfg: dict = None) -> float:
+    """Valor de `cfg` (la config de la corrida, ver ejecutar_matching) o de MATCH_CONFIG."""
+    return (cfg if cfg is not None else MATCH_CONFIG).get(key, 0)
 
 
 def _similitud(a: str, b: str) -> float:
@@ -39,8 +43,9 @@ def _similitud(a: str, b: str) -> float:
     return calcular_similitud(a, b)
 
 
+@lru_cache(maxsize=65_536)
 def _extraer_nombre_banco(descripcion: str) -> str:
-    """Extrae el nombre relevante de una descripción bancaria."""
+    """Extrae el nombre relevante de una descripción bancaria (memoizado: los alias se repiten)."""
     desc = descripcion.upper().strip()
     prefijos = [
         "MERPAG\\*", "MP\\*", "MERCPAGO\\*", "MERPAGO ",
@@ -54,8 +59,11 @@ def _extraer_nombre_banco(descripcion: str) -> str:
     return desc.strip()
 
 
+metricas.registrar_cache("extraer_nombre_banco", _extraer_nombre_banco)
+
+
 def _match_identidad(desc: str, desc_orig: str, nombre_banco: str,
-                     alias_limpio: str, nombre: str) -> tuple[float, str]:
+                     alias_limpio: str, nombre: str, cfg: dict = None) -> tuple[float, str]:
     """
     Evalúa match de identidad (alias/nombre).
     Returns: (score, tipo_match_id)
@@ -79,15 +87,15 @@ def _match_identidad(desc: str, desc_orig: str, nombre_banco: str,
                 score = max(score, 0.85)
                 break
 
-    if score >= get_config("umbral_id_exacto"):
+    if score >= get_config("umbral_id_exacto", cfg):
         return score, "exacto"
-    elif score >= get_config("umbral_id_probable"):
+    elif score >= get_config("umbral_id_probable", cfg):
         return score, "fuzzy"
     else:
         return score, "none"
 
 
-def _match_monto(monto_banco: float, monto_factura: float) -> tuple[str, float, float]:
+def _match_monto(monto_banco: float, monto_factura: float, cfg: dict = None) -> tuple[str, float, float]:
     """
     Evalúa match de monto.
     Returns: (tipo_match_monto, diferencia_abs, diferencia_pct)
@@ -99,9 +107,9 @@ def _match_monto(monto_banco: float, monto_factura: float) -> tuple[str, float,
     diff_abs = abs(monto_banco - monto_factura)
     diff_pct = diff_abs / monto_factura
 
-    tol_exacto = get_config("tolerancia_monto_exacto_pct")
-    tol_prob_pct = get_config("tolerancia_monto_probable_pct")
-    tol_prob_abs = get_config("tolerancia_monto_probable_abs")
+    tol_exacto = get_config("tolerancia_monto_exacto_pct", cfg)
+    tol_prob_pct = get_config("tolerancia_monto_probable_pct", cfg)
+    tol_prob_abs = get_config("tolerancia_monto_probable_abs", cfg)
 
     if diff_pct <= tol_exacto:
         return "exacto", diff_abs, diff_pct
@@ -112,13 +120,14 @@ def _match_monto(monto_banco: float, monto_factura: float) -> tuple[str, float,
 
 
 def _match_monto_suma(monto_banco: float, facturas_entidad: pd.DataFrame,
-                      nro_col: str, tolerancia_pct: float) -> dict | None:
+                      nro_col: str, tolerancia_pct: float) -> tuple[dict | None, bool]:
     """
     Busca combinacion de facturas que sumen el monto bancario (± tolerancia).
-    Estrategia: 1) suma total, 2) subconjuntos de 2 a max_size facturas.
+    Estrategia: 1) suma total, 2) subconjuntos de 2 a max_size facturas (con
+    el tope de combinaciones de src.combinatoria).
+    Devuelve (match o None, truncada): truncada si no hubo match y la busqueda
+    se corto antes de probar todos los subconjuntos.
     """
-    from itertools import combinations
-
     facturas_list = []
     for _, f in facturas_entidad.iterrows():
         m = float(f.get("Monto Total", 0))
@@ -126,7 +135,7 @@ def _match_monto_suma(monto_banco: float, facturas_entidad: pd.DataFrame,
             facturas_list.append({"nro": str(f.get(nro_col, "")), "monto": m})
 
     if len(facturas_list) < 2:
-        return None
+        return None, False
 
     # 1. Suma total de todas las facturas
     total = sum(f["monto"] for f in facturas_list)
@@ -140,7 +149,7 @@ def _match_monto_suma(monto_banco: float, facturas_entidad: pd.DataFrame,
                 "diferencia_pct": round(diff_pct * 100, 2),
                 "tipo": "suma_total",
                 "count": len(facturas_list),
-            }
+            }, False
 
     # 2. Subconjuntos (limitar segun cantidad de facturas)
     n = len(facturas_list)
@@ -153,27 +162,29 @@ def _match_monto_suma(monto_banco: float, facturas_entidad: pd.DataFrame,
 
     facturas_list.sort(key=lambda x: x["monto"], reverse=True)
 
-    for size in range(2, max_size + 1):
-        for combo in combinations(facturas_list, size):
-            combo_sum = sum(f["monto"] for f in combo)
-            if combo_sum > 0:
-                diff_pct = abs(monto_banco - combo_sum) / combo_sum
-                if diff_pct <= tolerancia_pct:
-                    return {
-                        "facturas": list(combo),
-                        "suma": round(combo_sum, 2),
-                        "diferencia": round(monto_banco - combo_sum, 2),
-                        "diferencia_pct": round(diff_pct * 100, 2),
-                        "tipo": "suma_parcial",
-                        "count": size,
-                    }
-
-    return None
+    with Busqueda("_match_monto_suma") as busqueda:
+        for size in range(2, max_size + 1):
+            for combo in busqueda.combinaciones(facturas_list, size):
+                combo_sum = sum(f["monto"] for f in combo)
+                if combo_sum > 0:
+                    diff_pct = abs(monto_banco - combo_sum) / combo_sum
+                    if diff_pct <= tolerancia_pct:
+                        return {
+                            "facturas": list(combo),
+                            "suma": round(combo_sum, 2),
+                            "diferencia": round(monto_banco - combo_sum, 2),
+                            "diferencia_pct": round(diff_pct * 100, 2),
+                            "tipo": "suma_parcial",
+                            "count": size,
+                        }, False
+
+    return None, busqueda.agotada
 
 
 def match_por_tabla_parametrica(
     movimiento: pd.Series,
     tabla_param: pd.DataFrame,
+    cfg: dict = None,
 ) -> dict:
     """
     Intenta matchear un movimiento usando la tabla paramétrica.
@@ -196,13 +207,13 @@ def match_por_tabla_parametrica(
 
     nombre_banco = _extraer_nombre_banco(desc_orig)
 
-    for _, param in filtro.iterrows():
+    for param in filtro.to_dict("records"):
         alias = str(param.get("alias_banco", "")).upper()
         nombre = str(param.get("nombre_contagram", "")).upper()
         alias_limpio = _extraer_nombre_banco(alias)
 
         score, tipo_id = _match_identidad(desc, desc_orig, nombre_banco,
-                                          alias_limpio, nombre)
+                                          alias_limpio, nombre, cfg)
 
         if score > best_score:
             best_score = score
@@ -235,6 +246,7 @@ def match_contra_facturas(
     movimiento: pd.Series,
     match_info: dict,
     facturas: pd.DataFrame,
+    cfg: dict = None,
 ) -> dict:
     """
     Cruza un movimiento contra facturas y determina el nivel ternario final:
@@ -276,7 +288,7 @@ def match_contra_facturas(
 
     for _, f in facturas_entidad.iterrows():
         monto_factura = f.get("Monto Total", 0)
-        tipo_monto, diff_abs, diff_pct = _match_monto(monto, monto_factura)
+        tipo_monto, diff_abs, diff_pct = _match_monto(monto, monto_factura, cfg)
 
         # Prioridad: exacto > probable > no_match, luego menor diff
         prioridad = {"exacto": 0, "probable": 1, "no_match": 2}
@@ -303,6 +315,7 @@ def match_contra_facturas(
     # ─── Resolución ternaria final (con sum matching) ───
     tipo_match_monto = None
     facturas_count = 1
+    truncada = False
 
     if tipo_id == "exacto" and best_monto_tipo == "exacto":
         # Caso ideal: ID exacto + monto exacto 1:1
@@ -312,9 +325,9 @@ def match_contra_facturas(
 
     elif tipo_id == "exacto" and best_monto_tipo in ("probable", "no_match"):
         # ID exacto pero monto no matchea 1:1 → intentar suma de facturas
-        sum_result = _match_monto_suma(
+        sum_result, truncada = _match_monto_suma(
             monto, facturas_entidad, nro_col,
-            get_config("tolerancia_monto_exacto_pct"),
+            get_config("tolerancia_monto_exacto_pct", cfg),
         )
         if sum_result:
             nivel = "match_exacto"
@@ -336,6 +349,8 @@ def match_contra_facturas(
                 detalle = f"ID exacto, mejor factura dif ${best_factura['diferencia']:+,.2f} ({best_factura['diferencia_pct']:.2f}%)"
             else:
                 detalle = f"ID exacto, sin coincidencia de monto (mejor dif ${best_factura['diferencia']:+,.2f})"
+            if truncada:
+                detalle += NOTA_TRUNCADA
 
     elif tipo_id == "fuzzy" and best_monto_tipo in ("exacto", "probable"):
         nivel = "probable_duda_id"
@@ -356,6 +371,7 @@ def match_contra_facturas(
         "diferencia_pct": best_factura["diferencia_pct"],
         "tipo_match_monto": tipo_match_monto,
         "facturas_count": facturas_count,
+        "busqueda_truncada": truncada,
     }
 
 
@@ -365,23 +381,27 @@ def ejecutar_matching(
     ventas: pd.DataFrame,
     compras: pd.DataFrame,
     config: dict = None,
+    avance=None,
 ) -> pd.DataFrame:
     """
     Ejecuta el matching completo sobre un extracto normalizado y clasificado.
-    config: dict opcional para override de MATCH_CONFIG.
+    config: dict opcional para override de MATCH_CONFIG (solo para esta corrida:
+        MATCH_CONFIG no se modifica, las corridas de otras sesiones corren en paralelo).
+    avance: callable(hechos, total) opcional, llamado cada PASO_PROGRESO movimientos.
     """
-    if config:
-        MATCH_CONFIG.update(config)
+    cfg = {**MATCH_CONFIG, **(config or {})}
 
     resultados = []
 
-    for idx, mov in extracto.iterrows():
-        match_info = match_por_tabla_parametrica(mov, tabla_param)
+    for n, (idx, mov) in enumerate(extracto.iterrows()):
+        if avance is not None and n % PASO_PROGRESO == 0:
+            avance(n, len(extracto))
+        match_info = match_por_tabla_parametrica(mov, tabla_param, cfg)
 
         if mov.get("clasificacion") == "cobranza":
-            match_info = match_contra_facturas(mov, match_info, ventas)
+            match_info = match_contra_facturas(mov, match_info, ventas, cfg)
         elif mov.get("clasificacion") == "pago_proveedor":
-            match_info = match_contra_facturas(mov, match_info, compras)
+            match_info = match_contra_facturas(mov, match_info, compras, cfg)
         elif mov.get("clasificacion") == "gasto_bancario":
             match_info["match_nivel"] = "gasto_bancario"
             match_info["match_detalle"] = "Gasto/comision bancaria"
@@ -390,4 +410,7 @@ def ejecutar_matching(
         resultado = {**mov.to_dict(), **match_info}
         resultados.append(resultado)
 
-    return pd.DataFrame(resultados)
+    df = pd.DataFrame(resultados)
+    # Movimientos cuya suma de facturas no se encontro porque la busqueda llego al tope
+    df["busqueda_truncada"] = df.get("busqueda_truncada", pd.Series(False, index=df.index)).eq(True)
+    return df
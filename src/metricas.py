@@ -0,0 +1,190 @@
+"""
+Metricas de performance de una corrida (resultado["perf"]).
+
+procesar / procesar_real / procesar_real_incremental corren dentro de
+medir_corrida(), que junta en un RegistroPerf:
+
+  - etapas: segundos, cache y filas de entrada / salida de cada etapa (de los
+    eventos etapa_inicio / etapa_fin, ver src/eventos.py)
+  - comparaciones_fuzzy: llamadas a calcular_similitud que compararon texto
+  - combinaciones: subconjuntos evaluados por las busquedas por suma (por
+    funcion, ver src/combinatoria.py)
+  - caches: aciertos / consultas de las etapas cacheadas, del memo de sum
+    matching y de los lru_cache registrados con registrar_cache()
+  - memoria: pico de RSS del proceso al terminar (y cuanto lo subio la corrida)
+  - clientes_lentos: los CUIT que mas tiempo de Fase 1 consumieron
+  - perfil_memoria: solo con el perfil de memoria prendido, pico y sitios de
+    asignacion por etapa (ver src/perfil_memoria.py)
+
+Todo queda en tipos JSON, asi se guarda con la corrida (StoreLocal). Fuera de
+medir_corrida los contadores no hacen nada: sumar() solo lee una ContextVar.
+"""
+import sys
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+import pandas as pd
+
+from src.combinatoria import contar_combinaciones
+from src.eventos import ETAPA_FIN, ETAPA_INICIO, suscripto
+from src.perfil_memoria import perfilar_memoria
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+MAX_CLIENTES_LENTOS = 10
+
+_registro: ContextVar = ContextVar("registro_perf", default=None)
+
+# nombre -> funcion con cache_info() (functools.lru_cache)
+_CACHES_LRU = {}
+
+
+def registrar_cache(nombre: str, funcion):
+    """Incluye el lru_cache de `funcion` en perf["caches"]. Devuelve la funcion (sirve de decorador)."""
+    _CACHES_LRU[nombre] = funcion
+    return funcion
+
+
+def activo() -> bool:
+    """True si hay una corrida midiendose en este contexto."""
+    return _registro.get() is not None
+
+
+def sumar(contador: str, n: int = 1):
+    """Suma `n` al contador de la corrida en curso (nada fuera de medir_corrida)."""
+    registro = _registro.get()
+    if registro is not None:
+        registro.contadores[contador] = registro.contadores.get(contador, 0) + n
+
+
+def sumar_tiempo_cliente(cuit: str, segundos: float):
+    """Acumula el tiempo de conciliar un credito del CUIT `cuit`."""
+    registro = _registro.get()
+    if registro is not None and cuit:
+        datos = registro.clientes.setdefault(cuit, [0.0, 0])
+        datos[0] += segundos
+        datos[1] += 1
+
+
+def _rss_pico_mb() -> float | None:
+    if resource is None:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux lo reporta en KB, macOS en bytes
+    divisor = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return round(pico / divisor, 1)
+
+
+def _tasa(aciertos: int, consultas: int) -> dict:
+    return {
+        "aciertos": int(aciertos),
+        "consultas": int(consultas),
+        "tasa": round(aciertos / consultas, 4) if consultas else None,
+    }
+
+
+def _estado_lru() -> dict:
+    return {nombre: f.cache_info() for nombre, f in _CACHES_LRU.items()}
+
+
+class RegistroPerf:
+    """Suscriptor de eventos + contadores de una corrida; `perf` queda armado al salir de medir_corrida."""
+
+    def __init__(self):
+        self.etapas = {}
+        self.contadores = {}
+        self.clientes = {}          # cuit -> [segundos, creditos]
+        self.perf = None
+
+    def __call__(self, evento: dict):
+        if evento["tipo"] == ETAPA_INICIO:
+            self.etapas[evento["etapa"]] = {
+                "etapa": evento["etapa"],
+                "segundos": None,
+                "cache": False,
+                "filas_entrada": dict(evento.get("filas_entrada") or {}),
+                "filas_salida": {},
+            }
+        elif evento["tipo"] == ETAPA_FIN:
+            etapa = self.etapas.setdefault(evento["etapa"], {"etapa": evento["etapa"], "filas_entrada": {}})
+            etapa["segundos"] = evento["segundos"]
+            etapa["cache"] = bool(evento.get("cache"))
+            etapa["filas_salida"] = dict(evento.get("filas_salida") or {})
+
+    def _armar(self, segundos: float, combinaciones: dict, lru_antes: dict, rss_antes: float | None) -> dict:
+        etapas = list(self.etapas.values())
+
+        caches = {
+            "etapas": _tasa(sum(e["cache"] for e in etapas), len(etapas)),
+            "memo_suma": _tasa(
+                self.contadores.get("memo_suma_aciertos", 0), self.contadores.get("memo_suma_consultas", 0),
+            ),
+        }
+        for nombre, info in _estado_lru().items():
+            antes = lru_antes.get(nombre)
+            aciertos = info.hits - (antes.hits if antes else 0)
+            fallos = info.misses - (antes.misses if antes else 0)
+            caches[nombre] = _tasa(aciertos, aciertos + fallos)
+
+        rss = _rss_pico_mb()
+        clientes = sorted(self.clientes.items(), key=lambda kv: kv[1][0], reverse=True)[:MAX_CLIENTES_LENTOS]
+
+        return {
+            "segundos": round(segundos, 4),
+            "etapas": etapas,
+            "comparaciones_fuzzy": int(self.contadores.get("comparaciones_fuzzy", 0)),
+            "combinaciones": {
+                "total": sum(d["combinaciones"] for d in combinaciones.values()),
+                "cortes": sum(d["cortes"] for d in combinaciones.values()),
+                "por_funcion": {k: dict(v) for k, v in combinaciones.items()},
+            },
+            "caches": caches,
+            "memoria": {
+                "rss_pico_mb": rss,
+                "rss_pico_subio_mb": round(rss - rss_antes, 1) if rss is not None and rss_antes is not None else None,
+            },
+            "clientes_lentos": [
+                {"cuit": cuit, "segundos": round(seg, 4), "creditos": n} for cuit, (seg, n) in clientes
+            ],
+        }
+
+
+@contextmanager
+def medir_corrida(emisor, perfil_memoria: bool = False):
+    """
+    Mide la corrida que corre dentro del bloque: se suscribe a `emisor` y activa
+    los contadores. Al salir (sin error) deja el resumen en registro.perf.
+    Con `perfil_memoria` agrega perf["perfil_memoria"] (tracemalloc por etapa).
+    """
+    registro = RegistroPerf()
+    lru_antes = _estado_lru()
+    rss_antes = _rss_pico_mb()
+    inicio = time.perf_counter()
+    token = _registro.set(registro)
+    try:
+        with suscripto(emisor, registro), contar_combinaciones() as combinaciones, \
+                perfilar_memoria(emisor, perfil_memoria) as perfil:
+            yield registro
+    finally:
+        _registro.reset(token)
+    registro.perf = registro._armar(time.perf_counter() - inicio, combinaciones, lru_antes, rss_antes)
+    if perfil is not None:
+        registro.perf["perfil_memoria"] = perfil.reporte()
+
+
+def tabla_etapas(perf: dict) -> pd.DataFrame:
+    """perf["etapas"] como DataFrame (una fila por etapa, filas como texto)."""
+    return pd.DataFrame([
+        {
+            "etapa": e["etapa"],
+            "segundos": e.get("segundos"),
+            "cache": e.get("cache", False),
+            "filas_entrada": ", ".join(f"{k}={v}" for k, v in (e.get("filas_entrada") or {}).items()),
+            "filas_salida": ", ".join(f"{k}={v}" for k, v in (e.get("filas_salida") or {}).items()),
+        }
+        for e in perf.get("etapas", [])
+    ], columns=["etapa", "segundos", "cache", "filas_entrada", "filas_salida"])
@@ -8,20 +8,118 @@ Motor de Conciliacion - Orquesta el proceso completo:
 """
 import pandas as pd
 import logging
+import time
+from contextlib import contextmanager
 from datetime import datetime
 
 from src.normalizador import normalizar, detectar_banco
 from src.clasificador import clasificar_extracto
 from src.matcher import ejecutar_matching
 from src.normalizador_contagram import normalizar_ventas_contagram
-from src.conciliador_real import conciliar_real
+from src.candidatos import TablaCandidatos, limites_para
+from src.conciliacion_incremental import EstadoIncremental, conciliar_incremental, firma_filtros
+from src.claves import hash_corrida, hash_dataframe
+from src.pipeline import Etapa, Pipeline, firma_lista
+from src.eventos import CORRIDA_FIN, CORRIDA_INICIO, Emisor, SeguidorEtapas, adaptar_progreso, suscripto
+from src.metricas import medir_corrida
+from src.perfil_memoria import activo_por_entorno
+from src import tracing
+from src.vistas import construir_vistas
+
+# Cambiar al modificar reglas del motor: invalida run_id y resultados cacheados
+VERSION_MOTOR = "4.1"
 
 
 class MotorConciliacion:
-    def __init__(self, tabla_parametrica: pd.DataFrame):
+    def __init__(self, tabla_parametrica: pd.DataFrame, perfil_memoria: bool = None):
+        """
+        `perfil_memoria` prende el perfil de memoria por etapa (resultado["perf"]
+        ["perfil_memoria"], ver src/perfil_memoria.py); None lo toma de la
+        variable de entorno DILCOR_PERFIL_MEMORIA.
+        """
         self.tabla_param = tabla_parametrica
         self.resultados = None
         self.stats = {}
+        self.run_id = None
+        self.eventos = Emisor()
+        self.perfil_memoria = activo_por_entorno() if perfil_memoria is None else perfil_memoria
+
+    def suscribir(self, callback):
+        """
+        Suscribe `callback(evento: dict)` a los eventos de las corridas (inicio /
+        fin de corrida y de etapa, filas, progreso; ver src/eventos.py).
+        Devuelve una funcion que lo desuscribe.
+        """
+        return self.eventos.suscribir(callback)
+
+    @contextmanager
+    def _instrumentar(self, modo: str, progreso, extractos_bancarios: list[pd.DataFrame], ventas_contagram: pd.DataFrame):
+        """
+        Lo que se suscribe a una corrida: `progreso` (si hay), el span
+        motor.<modo> con un span por etapa (src/tracing.py) y las metricas de
+        resultado["perf"] (src/metricas.py). Devuelve el RegistroPerf.
+        """
+        atributos = {"run_id": self.run_id}
+        if tracing.activo():
+            atributos.update(
+                bancos=[detectar_banco(df) for df in extractos_bancarios],
+                filas_extracto=sum(len(df) for df in extractos_bancarios),
+                filas_ventas=len(ventas_contagram),
+            )
+        with suscripto(self.eventos, adaptar_progreso(progreso) if progreso is not None else None), \
+                tracing.span(f"motor.{modo}", **atributos), tracing.trazar_etapas(self.eventos), \
+                medir_corrida(self.eventos, self.perfil_memoria) as perf:
+            yield perf
+
+    def id_corrida_demo(
+        self,
+        extractos_bancarios: list[pd.DataFrame],
+        ventas_contagram: pd.DataFrame,
+        compras_contagram: pd.DataFrame,
+        match_config: dict = None,
+    ) -> str:
+        """run_id de procesar() sin ejecutarlo (hash de entradas + config + version)."""
+        return hash_corrida(
+            list(extractos_bancarios) + [ventas_contagram, compras_contagram, self.tabla_param],
+            {"modo": "demo", "config": match_config, "version": VERSION_MOTOR},
+        )
+
+    @staticmethod
+    def huellas_real(extractos_bancarios: list[pd.DataFrame], ventas_contagram: pd.DataFrame) -> dict:
+        """
+        Hash de contenido de los archivos de una corrida real. Se calcula una vez
+        y se pasa como `huellas` a id_corrida_real / procesar_real (run_id y
+        firmas del pipeline) para no volver a hashear los mismos DataFrames.
+        """
+        return {
+            "extractos": [hash_dataframe(df) for df in extractos_bancarios],
+            "ventas_contagram": hash_dataframe(ventas_contagram),
+        }
+
+    def id_corrida_real(
+        self,
+        extractos_bancarios: list[pd.DataFrame],
+        ventas_contagram: pd.DataFrame,
+        match_config: dict = None,
+        medios_pago_filtro: list[str] = None,
+        filtro_medio_contiene: bool = False,
+        filtro_tipo_movimiento: str = "Ambos",
+        huellas: dict = None,
+    ) -> str:
+        """run_id de procesar_real() sin ejecutarlo (hash de entradas + config + filtros + version)."""
+        huellas = huellas or self.huellas_real(extractos_bancarios, ventas_contagram)
+        return hash_corrida(
+            list(extractos_bancarios) + [ventas_contagram],
+            {
+                "modo": "real",
+                "config": match_config,
+                "medios_pago_filtro": sorted(medios_pago_filtro or []),
+                "filtro_medio_contiene": filtro_medio_contiene,
+                "filtro_tipo_movimiento": filtro_tipo_movimiento,
+                "version": VERSION_MOTOR,
+            },
+            huellas=huellas["extractos"] + [huellas["ventas_contagram"]],
+        )
 
     def procesar(
         self,
@@ -29,355 +127,235 @@ class MotorConciliacion:
         ventas_contagram: pd.DataFrame,
         compras_contagram: pd.DataFrame,
         match_config: dict = None,
+        progreso=None,
     ) -> dict:
-        # 1. Normalizar
-        extractos_normalizados = []
-        for df in extractos_bancarios:
-            banco = detectar_banco(df)
-            normalizado = normalizar(df, banco)
-            extractos_normalizados.append(normalizado)
+        """
+        Procesa la demo (tabla parametrica + matching ternario).
+
+        Emite eventos por paso y cada PASO_PROGRESO movimientos del matching (ver
+        suscribir); `progreso(etapa, fraccion, detalle)` es un atajo para
+        suscribirse solo durante esta corrida (ver src/jobs.py). resultado["perf"]
+        tiene las metricas de performance (ver src/metricas.py).
+        """
+        self.run_id = self.id_corrida_demo(extractos_bancarios, ventas_contagram, compras_contagram, match_config)
+        with self._instrumentar("demo", progreso, extractos_bancarios, ventas_contagram) as perf:
+            inicio = time.perf_counter()
+            self.eventos.emitir(CORRIDA_INICIO, modo="demo", run_id=self.run_id)
+            etapas = SeguidorEtapas(self.eventos, ["normalizar", "clasificar", "matching", "salidas"])
+
+            # 1. Normalizar
+            etapas.iniciar("normalizar", {"extractos": sum(len(df) for df in extractos_bancarios)})
+            extractos_normalizados = []
+            for df in extractos_bancarios:
+                banco = detectar_banco(df)
+                with tracing.span("normalizar.extracto", banco=banco, filas=len(df)):
+                    normalizado = normalizar(df, banco)
+                extractos_normalizados.append(normalizado)
+
+            extracto_unificado = pd.concat(extractos_normalizados, ignore_index=True)
+            extracto_unificado = extracto_unificado.sort_values("fecha").reset_index(drop=True)
+            etapas.terminar({"extracto": len(extracto_unificado)})
+
+            # 2. Clasificar
+            etapas.iniciar("clasificar", {"extracto": len(extracto_unificado)})
+            extracto_clasificado = clasificar_extracto(extracto_unificado)
+            etapas.terminar({"extracto_clasificado": len(extracto_clasificado)})
+
+            # 3. Matching ternario
+            etapas.iniciar("matching", {
+                "extracto_clasificado": len(extracto_clasificado),
+                "ventas_contagram": len(ventas_contagram),
+                "compras_contagram": len(compras_contagram),
+            })
+            self.resultados = ejecutar_matching(
+                extracto_clasificado,
+                self.tabla_param,
+                ventas_contagram,
+                compras_contagram,
+                config=match_config,
+                avance=etapas.avance,
+            )
+            etapas.terminar({"resultados": len(self.resultados)})
+
+            # 4. Stats y KPIs
+            etapas.iniciar("salidas", {"resultados": len(self.resultados)})
+            self._calcular_stats(ventas_contagram, compras_contagram)
+
+            excepciones = self._generar_excepciones()
+            salida = {
+                "run_id": self.run_id,
+                "resultados": self.resultados,
+                "stats": self.stats,
+                "cobranzas_csv": self._generar_cobranzas_csv(),
+                "pagos_csv": self._generar_pagos_csv(),
+                "excepciones": excepciones,
+                "vistas": construir_vistas(self.resultados, None, excepciones, self.stats),
+            }
+            etapas.terminar({"excepciones": len(excepciones)})
+            self.eventos.emitir(
+                CORRIDA_FIN, modo="demo", run_id=self.run_id, segundos=round(time.perf_counter() - inicio, 4),
+            )
+        salida["perf"] = perf.perf
+        return salida
 
-        extracto_unificado = pd.concat(extractos_normalizados, ignore_index=True)
-        extracto_unificado = extracto_unificado.sort_values("fecha").reset_index(drop=True)
+    def procesar_real(
+        self,
+        extractos_bancarios: list[pd.DataFrame],
+        ventas_contagram: pd.DataFrame,
+        match_config: dict = None,
+        medios_pago_filtro: list[str] = None,
+        filtro_medio_contiene: bool = False,
+        filtro_tipo_movimiento: str = "Ambos",
+        progreso=None,
+        huellas: dict = None,
+    ) -> dict:
+        """
+        Procesa datos reales: usa CUIT + flags de medio de cobro.
 
-        # 2. Clasificar
-        extracto_clasificado = clasificar_extracto(extracto_unificado)
+        Corre como pipeline por etapas (ver PIPELINE_REAL): cada etapa se cachea
+        por el hash de sus entradas, asi que cambiar una tolerancia solo re-ejecuta
+        la asignacion sobre la tabla de candidatos (src/candidatos.py) y las salidas. resultado["tiempos_etapas"] tiene el detalle.
 
-        # 3. Matching ternario
-        self.resultados = ejecutar_matching(
-            extracto_clasificado,
-            self.tabla_param,
-            ventas_contagram,
-            compras_contagram,
-            config=match_config,
+        Emite eventos por etapa y por credito (ver suscribir); `progreso(etapa,
+        fraccion, detalle)` es un atajo para suscribirse solo durante esta
+        corrida (lo usan los trabajos en segundo plano, ver src/jobs.py).
+
+        resultado["perf"] tiene las metricas de performance de la corrida
+        (tiempos y filas por etapa, comparaciones, caches, memoria; ver src/metricas.py).
+
+        `huellas` (ver huellas_real) evita re-hashear los archivos si quien llama
+        ya calculo el run_id.
+        """
+        huellas = huellas or self.huellas_real(extractos_bancarios, ventas_contagram)
+        self.run_id = self.id_corrida_real(
+            extractos_bancarios, ventas_contagram, match_config,
+            medios_pago_filtro, filtro_medio_contiene, filtro_tipo_movimiento, huellas,
         )
+        with self._instrumentar("real", progreso, extractos_bancarios, ventas_contagram) as perf:
+            inicio = time.perf_counter()
+            self.eventos.emitir(CORRIDA_INICIO, modo="real", run_id=self.run_id)
+            valores, tiempos = PIPELINE_REAL.ejecutar({
+                "extractos": list(extractos_bancarios),
+                "ventas_contagram": ventas_contagram,
+                "filtro_tipo_movimiento": filtro_tipo_movimiento,
+                "medios_pago_filtro": sorted(medios_pago_filtro or []),
+                "filtro_medio_contiene": filtro_medio_contiene,
+                "match_config": match_config,
+                "limites_candidatos": limites_para(match_config),
+            }, emisor=self.eventos, firmas={
+                "extractos": firma_lista(huellas["extractos"]),
+                "ventas_contagram": huellas["ventas_contagram"],
+            })
+            self.eventos.emitir(
+                CORRIDA_FIN, modo="real", run_id=self.run_id, segundos=round(time.perf_counter() - inicio, 4),
+            )
 
-        # 4. Stats y KPIs
-        self._calcular_stats(ventas_contagram, compras_contagram)
+        self.resultados = valores["resultados"]
+        self._ventas_usadas = valores["ventas_usadas"]
+        self._ventas_norm = valores["ventas_norm"]
+        self._ventas_norm_todas = valores["ventas_norm_todas"]
+        self._ventas_excluidas = valores["ventas_excluidas"]
+        self.stats = valores["stats"]
 
         return {
+            "run_id": self.run_id,
             "resultados": self.resultados,
             "stats": self.stats,
-            "cobranzas_csv": self._generar_cobranzas_csv(),
-            "pagos_csv": self._generar_pagos_csv(),
-            "excepciones": self._generar_excepciones(),
+            "cobranzas_csv": valores["cobranzas_csv"],
+            "pagos_csv": pd.DataFrame(),
+            "excepciones": valores["excepciones"],
+            "detalle_facturas": valores["detalle_facturas"],
+            "tiempos_etapas": tiempos,
+            "tabla_candidatos": valores["tabla_candidatos"],
+            "vistas": valores["vistas"],
+            "perf": perf.perf,
         }
 
-    def procesar_real(
+    def procesar_real_incremental(
         self,
         extractos_bancarios: list[pd.DataFrame],
         ventas_contagram: pd.DataFrame,
+        ruta_estado: str,
         match_config: dict = None,
         medios_pago_filtro: list[str] = None,
         filtro_medio_contiene: bool = False,
         filtro_tipo_movimiento: str = "Ambos",
+        progreso=None,
     ) -> dict:
-        """Procesa datos reales: usa CUIT + flags de medio de cobro."""
-        logger = logging.getLogger(__name__)
-
-        # 1. Normalizar extracto bancario
-        extractos_normalizados = []
-        for df in extractos_bancarios:
-            banco = detectar_banco(df)
-            normalizado = normalizar(df, banco)
-            extractos_normalizados.append(normalizado)
-
-        extracto_unificado = pd.concat(extractos_normalizados, ignore_index=True)
-        extracto_unificado = extracto_unificado.sort_values("fecha").reset_index(drop=True)
-
-        # 1b. Filtrar por tipo de movimiento (Créditos / Débitos / Ambos)
-        if filtro_tipo_movimiento == "Solo Créditos":
-            extracto_unificado = extracto_unificado[extracto_unificado["tipo"] == "CREDITO"].copy()
-            logger.info("Extracto filtrado: solo CREDITOS (%d movimientos)", len(extracto_unificado))
-        elif filtro_tipo_movimiento == "Solo Débitos":
-            extracto_unificado = extracto_unificado[extracto_unificado["tipo"] == "DEBITO"].copy()
-            logger.info("Extracto filtrado: solo DEBITOS (%d movimientos)", len(extracto_unificado))
-
-        # 2. Normalizar ventas Contagram (agrega flags de medio de cobro)
-        ventas_norm = normalizar_ventas_contagram(ventas_contagram)
-        self._ventas_norm_todas = ventas_norm  # Guardar todas antes de filtrar
-
-        # 2b. Filtrar ventas por medio de pago (si se especifica filtro)
-        self._ventas_excluidas = pd.DataFrame()
-        if medios_pago_filtro and len(medios_pago_filtro) > 0:
-            total_antes = len(ventas_norm)
-            if filtro_medio_contiene:
-                mask = ventas_norm["medio_cobro"].fillna("").apply(
-                    lambda x: any(sel.lower() in str(x).lower() for sel in medios_pago_filtro)
-                )
-            else:
-                mask = ventas_norm["medio_cobro"].isin(medios_pago_filtro)
-            self._ventas_excluidas = ventas_norm[~mask].copy()
-            ventas_norm = ventas_norm[mask].copy()
-            modo_txt = "contiene" if filtro_medio_contiene else "exacto"
-            logger.info(
-                "Ventas filtradas: %d de %d filas (modo: %s, medios de pago: %s)",
-                len(ventas_norm), total_antes, modo_txt, medios_pago_filtro,
+        """
+        Igual que procesar_real, pero solo concilia (Fase 1) los movimientos que no
+        estaban en la corrida anterior. El estado se guarda en `ruta_estado` (JSON).
+        """
+        self.run_id = self.id_corrida_real(
+            extractos_bancarios, ventas_contagram, match_config,
+            medios_pago_filtro, filtro_medio_contiene, filtro_tipo_movimiento,
+        )
+        with self._instrumentar("incremental", progreso, extractos_bancarios, ventas_contagram) as perf:
+            inicio = time.perf_counter()
+            self.eventos.emitir(CORRIDA_INICIO, modo="incremental", run_id=self.run_id)
+            etapas = SeguidorEtapas(self.eventos, ["preparar", "conciliar", "salidas"])
+            etapas.iniciar("preparar", {"extractos": sum(len(df) for df in extractos_bancarios)})
+            extracto_unificado, ventas_norm = self._preparar_real(
+                extractos_bancarios, ventas_contagram, match_config,
+                medios_pago_filtro, filtro_medio_contiene, filtro_tipo_movimiento,
             )
+            etapas.terminar({"extracto": len(extracto_unificado), "ventas_norm": len(ventas_norm)})
 
-        # 3. Conciliar con motor real (CUIT-based, 3 niveles)
-        self.resultados, self._ventas_usadas = conciliar_real(extracto_unificado, ventas_norm, match_config)
-        self._ventas_norm = ventas_norm
+            etapas.iniciar("conciliar", {"extracto": len(extracto_unificado), "ventas_norm": len(ventas_norm)})
+            firma = firma_filtros(match_config, medios_pago_filtro, filtro_medio_contiene, filtro_tipo_movimiento)
+            estado = EstadoIncremental.cargar(ruta_estado)
+            self.resultados, self._ventas_usadas, info = conciliar_incremental(
+                extracto_unificado, ventas_norm, estado, match_config, firma,
+            )
+            estado.guardar(ruta_estado)
+            self._ventas_norm = ventas_norm
+            etapas.terminar({"resultados": len(self.resultados)})
+
+            etapas.iniciar("salidas", {"resultados": len(self.resultados)})
+            self.stats = _stats_real(self.resultados, ventas_norm)
+
+            salida = self._salida_real()
+            salida["incremental"] = info
+            etapas.terminar({"excepciones": len(salida["excepciones"])})
+            self.eventos.emitir(
+                CORRIDA_FIN, modo="incremental", run_id=self.run_id,
+                segundos=round(time.perf_counter() - inicio, 4),
+            )
+        salida["perf"] = perf.perf
+        return salida
 
-        # 4. Stats
-        self._calcular_stats_real(ventas_norm)
+    def _preparar_real(
+        self,
+        extractos_bancarios: list[pd.DataFrame],
+        ventas_contagram: pd.DataFrame,
+        match_config: dict = None,
+        medios_pago_filtro: list[str] = None,
+        filtro_medio_contiene: bool = False,
+        filtro_tipo_movimiento: str = "Ambos",
+    ) -> tuple[pd.DataFrame, pd.DataFrame]:
+        """Normaliza y filtra extracto + ventas. Devuelve (extracto, ventas_norm)."""
+        extracto = _filtrar_tipo_movimiento(_normalizar_extractos(extractos_bancarios), filtro_tipo_movimiento)
+        self._ventas_norm_todas = normalizar_ventas_contagram(ventas_contagram)
+        ventas_norm, self._ventas_excluidas = _filtrar_medios_pago(
+            self._ventas_norm_todas, medios_pago_filtro, filtro_medio_contiene,
+        )
+        return extracto, ventas_norm
 
+    def _salida_real(self) -> dict:
+        """Arma el dict de salida de una corrida real ya conciliada."""
+        excepciones = _excepciones_real(self.resultados)
+        detalle_facturas = _detalle_facturas_real(self._ventas_norm, self._ventas_usadas)
         return {
+            "run_id": self.run_id,
             "resultados": self.resultados,
             "stats": self.stats,
-            "cobranzas_csv": self._generar_cobranzas_csv_real(),
+            "cobranzas_csv": _cobranzas_csv_real(self.resultados),
             "pagos_csv": pd.DataFrame(),
-            "excepciones": self._generar_excepciones_real(),
-            "detalle_facturas": self._generar_detalle_facturas(),
-        }
-
-    def _calcular_stats_real(self, ventas: pd.DataFrame):
-        """Calcula stats para conciliacion real con tags de 3 niveles."""
-        df = self.resultados
-        total = len(df)
-
-        matched = df[df.get("conciliation_status", pd.Series(dtype=str)) == "MATCHED"]
-        suggested = df[df.get("conciliation_status", pd.Series(dtype=str)) == "SUGGESTED"]
-        excluded = df[df.get("conciliation_status", pd.Series(dtype=str)) == "EXCLUDED"]
-
-        cobranzas = df[df.get("clasificacion", pd.Series(dtype=str)) == "cobranza"]
-        gastos = df[df.get("clasificacion", pd.Series(dtype=str)) == "gasto_bancario"]
-        pagos_prov = df[df.get("clasificacion", pd.Series(dtype=str)) == "pago_proveedor"]
-
-        # Desglose por nivel
-        match_exacto = len(matched)
-        probable = len(suggested)
-        no_match = len(excluded[excluded.get("clasificacion", pd.Series(dtype=str)) != "gasto_bancario"])
-        gastos_count = len(gastos)
-        conciliables = max(total - gastos_count, 1)
-
-        # Desglose cobranzas
-        cob_matched = cobranzas[cobranzas.get("conciliation_status", pd.Series(dtype=str)) == "MATCHED"]
-        cob_suggested = cobranzas[cobranzas.get("conciliation_status", pd.Series(dtype=str)) == "SUGGESTED"]
-        cob_excluded = cobranzas[cobranzas.get("conciliation_status", pd.Series(dtype=str)) == "EXCLUDED"]
-
-        # Stats cobros
-        cobros_stats = {
-            "total": len(cobranzas),
-            "match_exacto": len(cob_matched),
-            "match_exacto_monto": round(cob_matched["monto"].sum(), 2) if not cob_matched.empty else 0,
-            "match_directo": len(cob_matched[cob_matched.get("tipo_match_monto", pd.Series(dtype=str)) == "directo"]) if not cob_matched.empty else 0,
-            "match_directo_monto": round(cob_matched[cob_matched.get("tipo_match_monto", pd.Series(dtype=str)) == "directo"]["monto"].sum(), 2) if not cob_matched.empty else 0,
-            "match_suma": len(cob_matched[cob_matched.get("tipo_match_monto", pd.Series(dtype=str)).isin(["suma_total", "suma_parcial"])]) if not cob_matched.empty else 0,
-            "match_suma_monto": round(cob_matched[cob_matched.get("tipo_match_monto", pd.Series(dtype=str)).isin(["suma_total", "suma_parcial"])]["monto"].sum(), 2) if not cob_matched.empty else 0,
-            "probable_duda_id": len(cob_suggested),
-            "probable_duda_id_monto": round(cob_suggested["monto"].sum(), 2) if not cob_suggested.empty else 0,
-            "probable_dif_cambio": 0,
-            "probable_dif_cambio_monto": 0,
-            "no_match": len(cob_excluded),
-            "no_match_monto": round(cob_excluded["monto"].sum(), 2) if not cob_excluded.empty else 0,
-            "conciliados": len(cob_matched) + len(cob_suggested),
-            "tasa_conciliacion": round((len(cob_matched) + len(cob_suggested)) / max(len(cobranzas), 1) * 100, 1),
-            "monto_total": round(cobranzas["monto"].sum(), 2),
-            "monto_conciliado": round(cob_matched["monto"].sum() + cob_suggested["monto"].sum(), 2),
-            "de_mas": 0, "de_menos": 0, "diferencia_neta": 0,
+            "excepciones": excepciones,
+            "detalle_facturas": detalle_facturas,
+            "vistas": construir_vistas(self.resultados, detalle_facturas, excepciones, self.stats),
         }
 
-        # Pagos (solo informativos para real data)
-        pagos_stats = {
-            "total": len(pagos_prov), "match_exacto": 0, "match_exacto_monto": 0,
-            "match_directo": 0, "match_directo_monto": 0,
-            "match_suma": 0, "match_suma_monto": 0,
-            "probable_duda_id": 0, "probable_duda_id_monto": 0,
-            "probable_dif_cambio": 0, "probable_dif_cambio_monto": 0,
-            "no_match": len(pagos_prov),
-            "no_match_monto": round(pagos_prov["monto"].sum(), 2) if not pagos_prov.empty else 0,
-            "conciliados": 0, "tasa_conciliacion": 0,
-            "monto_total": round(pagos_prov["monto"].sum(), 2) if not pagos_prov.empty else 0,
-            "monto_conciliado": 0,
-            "de_mas": 0, "de_menos": 0, "diferencia_neta": 0,
-        }
-
-        # Monto ventas contagram (ventas ya filtradas por medio de pago)
-        monto_ventas = round(ventas["Monto Total"].sum(), 2) if not ventas.empty else 0
-
-        self.stats = {
-            "total_movimientos": total,
-            "match_exacto": match_exacto,
-            "probable_duda_id": probable,
-            "probable_dif_cambio": 0,
-            "no_match": no_match,
-            "gastos_bancarios": gastos_count,
-            "tasa_match_exacto": round(match_exacto / conciliables * 100, 1),
-            "tasa_probable": round(probable / conciliables * 100, 1),
-            "tasa_no_match": round(no_match / conciliables * 100, 1),
-            "tasa_conciliacion_total": round((match_exacto + probable) / conciliables * 100, 1),
-            "total_cobranzas": len(cobranzas),
-            "monto_cobranzas": round(cobranzas["monto"].sum(), 2),
-            "total_pagos": len(pagos_prov),
-            "monto_pagos": round(pagos_prov["monto"].sum(), 2) if not pagos_prov.empty else 0,
-            "monto_gastos_bancarios": round(gastos["monto"].sum(), 2) if not gastos.empty else 0,
-            "monto_ventas_contagram": monto_ventas,
-            "monto_compras_contagram": 0,
-            "revenue_gap": round(cobranzas["monto"].sum() - monto_ventas, 2),
-            "payment_gap": 0,
-            "monto_dif_cambio_neto": 0, "monto_a_favor": 0, "monto_en_contra": 0,
-            "monto_no_conciliado": round(cob_excluded["monto"].sum(), 2) if not cob_excluded.empty else 0,
-            "cobros": cobros_stats,
-            "pagos_prov": pagos_stats,
-            "por_banco": {},
-            # Stats especificos real
-            "matched_count": len(matched),
-            "matched_monto": round(matched["monto"].sum(), 2) if not matched.empty else 0,
-            "suggested_count": len(suggested),
-            "suggested_monto": round(suggested["monto"].sum(), 2) if not suggested.empty else 0,
-            "excluded_count": len(excluded),
-            # Desglose stats
-            "desglose_count": len(df[df.get("conciliation_tag", pd.Series(dtype=str)).str.startswith("PARCIAL_SANTANDER")]) if "conciliation_tag" in df.columns else 0,
-            "desglose_monto": round(df[df.get("conciliation_tag", pd.Series(dtype=str)).str.startswith("PARCIAL_SANTANDER")]["monto"].sum(), 2) if "conciliation_tag" in df.columns else 0,
-        }
-
-        for banco in df["banco"].unique():
-            db = df[df["banco"] == banco]
-            self.stats["por_banco"][banco] = {
-                "movimientos": len(db),
-                "match_exacto": len(db[db.get("conciliation_status", pd.Series(dtype=str)) == "MATCHED"]),
-                "probable_duda_id": len(db[db.get("conciliation_status", pd.Series(dtype=str)) == "SUGGESTED"]),
-                "probable_dif_cambio": 0,
-                "no_match": len(db[db.get("conciliation_status", pd.Series(dtype=str)) == "EXCLUDED"]),
-                "monto_creditos": round(db[db["tipo"] == "CREDITO"]["monto"].sum(), 2),
-                "monto_debitos": round(db[db["tipo"] == "DEBITO"]["monto"].sum(), 2),
-            }
-
-    def _generar_cobranzas_csv_real(self) -> pd.DataFrame:
-        """Genera CSV de cobranzas para datos reales.
-        
-        Desglosa sum-matches en filas individuales por factura,
-        respetando el formato de importacion de Contagram (1 fila = 1 factura).
-        """
-        df = self.resultados
-        cobranzas = df[
-            (df.get("clasificacion", pd.Series(dtype=str)) == "cobranza")
-        ].copy()
-
-        if cobranzas.empty:
-            return pd.DataFrame()
-
-        rows = []
-        for _, row in cobranzas.iterrows():
-            # Campos compartidos del movimiento bancario
-            fecha = row["fecha"].strftime("%d/%m/%Y") if hasattr(row["fecha"], "strftime") else str(row["fecha"])
-            base = {
-                "Fecha": fecha,
-                "Cliente": row.get("nombre_contagram", ""),
-                "CUIT Banco": row.get("cuit_banco", ""),
-                "Status": row.get("conciliation_status", ""),
-                "Tag": row.get("conciliation_tag", ""),
-                "Confianza": row.get("conciliation_confidence", ""),
-                "Razon": row.get("conciliation_reason", ""),
-                "Tipo Match": row.get("tipo_match_monto", "—") or "—",
-                "Cant Facturas": row.get("facturas_count", 0),
-                "Diferencia $": row.get("diferencia_monto", 0),
-                "Banco": row.get("banco", ""),
-                "Referencia": row.get("referencia", ""),
-                "Descripcion": row.get("descripcion", ""),
-                "Nombre Banco Extraido": row.get("nombre_banco_extraido", ""),
-                "Monto Banco": row.get("monto", 0),
-            }
-
-            detalle = row.get("facturas_detalle")
-
-            if detalle and isinstance(detalle, list) and len(detalle) > 0:
-                # Expandir: 1 fila por factura
-                for d in detalle:
-                    rows.append({
-                        **base,
-                        "ID Cliente": d.get("id", ""),
-                        "Nro Factura": d.get("nro_factura", ""),
-                        "Monto Cobrado": d.get("monto", 0),
-                    })
-            else:
-                # Sin detalle (fallback): usar datos del movimiento
-                rows.append({
-                    **base,
-                    "ID Cliente": row.get("id_contagram", ""),
-                    "Nro Factura": row.get("factura_match", ""),
-                    "Monto Cobrado": row.get("monto", 0),
-                })
-
-        result = pd.DataFrame(rows)
-        
-        # Ordenar columnas: poner las mas importantes primero
-        priority = [
-            "Fecha", "ID Cliente", "Cliente", "CUIT Banco",
-            "Monto Cobrado", "Nro Factura", "Status", "Tag",
-            "Confianza", "Razon", "Tipo Match", "Cant Facturas",
-            "Diferencia $", "Monto Banco", "Banco", "Referencia",
-            "Descripcion", "Nombre Banco Extraido",
-        ]
-        ordered = [c for c in priority if c in result.columns]
-        remaining = [c for c in result.columns if c not in ordered]
-        return result[ordered + remaining]
-
-    def _generar_excepciones_real(self) -> pd.DataFrame:
-        """Genera excepciones para datos reales con campos extendidos para analisis."""
-        df = self.resultados
-        exc = df[
-            (df.get("conciliation_status", pd.Series(dtype=str)) == "EXCLUDED") &
-            (df.get("clasificacion", pd.Series(dtype=str)) != "gasto_bancario")
-        ].copy()
-
-        if exc.empty:
-            return pd.DataFrame()
-
-        return pd.DataFrame({
-            "Fecha": exc["fecha"].dt.strftime("%d/%m/%Y") if hasattr(exc["fecha"], "dt") else exc["fecha"],
-            "Banco": exc["banco"],
-            "Tipo": exc["tipo"],
-            "Clasificacion": exc.get("clasificacion", ""),
-            "Descripcion": exc["descripcion"],
-            "Monto": exc["monto"],
-            "CUIT Banco": exc.get("cuit_banco", ""),
-            "Cliente/Nombre Extraido": exc.get("nombre_banco_extraido", ""),
-            "Cliente Contagram": exc.get("nombre_contagram", ""),
-            "Tag": exc.get("conciliation_tag", ""),
-            "Razon": exc.get("conciliation_reason", ""),
-            "Confianza": exc.get("conciliation_confidence", 0),
-            "Tipo Match": exc.get("tipo_match_monto", "").fillna("—") if "tipo_match_monto" in exc.columns else "—",
-            "Factura": exc.get("factura_match", ""),
-            "Diferencia $": exc.get("diferencia_monto", 0),
-            "Cant Facturas": exc.get("facturas_count", 0),
-            "Referencia": exc["referencia"],
-        })
-
-    def _generar_detalle_facturas(self) -> pd.DataFrame:
-        """Genera DataFrame de TODAS las facturas de Contagram con su estado de conciliacion."""
-        if not hasattr(self, '_ventas_norm') or not hasattr(self, '_ventas_usadas'):
-            return pd.DataFrame()
-
-        ventas = self._ventas_norm
-        usadas = self._ventas_usadas
-
-        if ventas.empty:
-            return pd.DataFrame()
-
-        # Determinar estado
-        ventas["estado_conciliacion"] = ventas.index.isin(usadas)
-        ventas["estado_conciliacion"] = ventas["estado_conciliacion"].map({True: "Conciliada", False: "Sin Match"})
-
-        return pd.DataFrame({
-            "Estado Conciliacion": ventas["estado_conciliacion"],
-            "ID": ventas.get("ID Cliente", ""),
-            "Fecha Emision": ventas["fecha_emision"].dt.strftime("%d/%m/%Y") if "fecha_emision" in ventas.columns and hasattr(ventas["fecha_emision"], "dt") else ventas.get("fecha_emision", ""),
-            "Cliente": ventas.get("Nombre", ""),
-            "CUIT": ventas.get("CUIT", ""),
-            "Nro Factura": ventas.get("Nro Factura", ""),
-            "Tipo": ventas.get("tipo_comprobante", ""),
-            "Total Venta": ventas.get("total_venta", 0),
-            "Cobrado": ventas.get("Monto Total", 0),
-            "Diferencia Venta-Cobro": round(ventas.get("total_venta", 0) - ventas.get("Monto Total", 0), 2),
-            "Estado": ventas.get("estado", ""),
-            "Medio de Cobro": ventas.get("medio_cobro", ""),
-            "Contiene Santander": ventas.get("contiene_santander", False),
-            "Contiene Caja Grande": ventas.get("contiene_caja_grande", False),
-            "CUIT Limpio": ventas.get("cuit_limpio", ""),
-        })
-
     def _calcular_stats(self, ventas: pd.DataFrame, compras: pd.DataFrame):
         df = self.resultados
         total = len(df)
@@ -596,3 +574,365 @@ class MotorConciliacion:
                 axis=1
             ),
         })
+
+
+# ═══════════════════════════════════════════════════════
+# ETAPAS DEL PIPELINE REAL
+# ═══════════════════════════════════════════════════════
+
+def _normalizar_extractos(extractos: list[pd.DataFrame]) -> pd.DataFrame:
+    """Normaliza cada extracto (detectando banco) y los une ordenados por fecha."""
+    extractos_normalizados = []
+    for df in extractos:
+        banco = detectar_banco(df)
+        with tracing.span("normalizar.extracto", banco=banco, filas=len(df)):
+            normalizado = normalizar(df, banco)
+        extractos_normalizados.append(normalizado)
+
+    extracto_unificado = pd.concat(extractos_normalizados, ignore_index=True)
+    return extracto_unificado.sort_values("fecha").reset_index(drop=True)
+
+
+def _filtrar_tipo_movimiento(extracto: pd.DataFrame, filtro_tipo_movimiento: str) -> pd.DataFrame:
+    """Filtra por tipo de movimiento (Créditos / Débitos / Ambos)."""
+    logger = logging.getLogger(__name__)
+    if filtro_tipo_movimiento == "Solo Créditos":
+        extracto = extracto[extracto["tipo"] == "CREDITO"].copy()
+        logger.info("Extracto filtrado: solo CREDITOS (%d movimientos)", len(extracto))
+    elif filtro_tipo_movimiento == "Solo Débitos":
+        extracto = extracto[extracto["tipo"] == "DEBITO"].copy()
+        logger.info("Extracto filtrado: solo DEBITOS (%d movimientos)", len(extracto))
+    return extracto
+
+
+def _filtrar_medios_pago(
+    ventas_norm: pd.DataFrame,
+    medios_pago_filtro: list[str],
+    filtro_medio_contiene: bool,
+) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """Filtra ventas por medio de pago. Devuelve (ventas filtradas, ventas excluidas)."""
+    if not medios_pago_filtro:
+        return ventas_norm, pd.DataFrame()
+
+    logger = logging.getLogger(__name__)
+    total_antes = len(ventas_norm)
+    if filtro_medio_contiene:
+        mask = ventas_norm["medio_cobro"].fillna("").apply(
+            lambda x: any(sel.lower() in str(x).lower() for sel in medios_pago_filtro)
+        )
+    else:
+        mask = ventas_norm["medio_cobro"].isin(medios_pago_filtro)
+    excluidas = ventas_norm[~mask].copy()
+    ventas_norm = ventas_norm[mask].copy()
+    modo_txt = "contiene" if filtro_medio_contiene else "exacto"
+    logger.info(
+        "Ventas filtradas: %d de %d filas (modo: %s, medios de pago: %s)",
+        len(ventas_norm), total_antes, modo_txt, medios_pago_filtro,
+    )
+    return ventas_norm, excluidas
+
+
+def _stats_real(resultados: pd.DataFrame, ventas: pd.DataFrame) -> dict:
+    """Calcula stats para conciliacion real con tags de 3 niveles."""
+    df = resultados
+    total = len(df)
+
+    matched = df[df.get("conciliation_status", pd.Series(dtype=str)) == "MATCHED"]
+    suggested = df[df.get("conciliation_status", pd.Series(dtype=str)) == "SUGGESTED"]
+    excluded = df[df.get("conciliation_status", pd.Series(dtype=str)) == "EXCLUDED"]
+
+    cobranzas = df[df.get("clasificacion", pd.Series(dtype=str)) == "cobranza"]
+    gastos = df[df.get("clasificacion", pd.Series(dtype=str)) == "gasto_bancario"]
+    pagos_prov = df[df.get("clasificacion", pd.Series(dtype=str)) == "pago_proveedor"]
+
+    # Desglose por nivel
+    match_exacto = len(matched)
+    probable = len(suggested)
+    no_match = len(excluded[excluded.get("clasificacion", pd.Series(dtype=str)) != "gasto_bancario"])
+    gastos_count = len(gastos)
+    conciliables = max(total - gastos_count, 1)
+
+    # Desglose cobranzas
+    cob_matched = cobranzas[cobranzas.get("conciliation_status", pd.Series(dtype=str)) == "MATCHED"]
+    cob_suggested = cobranzas[cobranzas.get("conciliation_status", pd.Series(dtype=str)) == "SUGGESTED"]
+    cob_excluded = cobranzas[cobranzas.get("conciliation_status", pd.Series(dtype=str)) == "EXCLUDED"]
+
+    # Stats cobros
+    cobros_stats = {
+        "total": len(cobranzas),
+        "match_exacto": len(cob_matched),
+        "match_exacto_monto": round(cob_matched["monto"].sum(), 2) if not cob_matched.empty else 0,
+        "match_directo": len(cob_matched[cob_matched.get("tipo_match_monto", pd.Series(dtype=str)) == "directo"]) if not cob_matched.empty else 0,
+        "match_directo_monto": round(cob_matched[cob_matched.get("tipo_match_monto", pd.Series(dtype=str)) == "directo"]["monto"].sum(), 2) if not cob_matched.empty else 0,
+        "match_suma": len(cob_matched[cob_matched.get("tipo_match_monto", pd.Series(dtype=str)).isin(["suma_total", "suma_parcial"])]) if not cob_matched.empty else 0,
+        "match_suma_monto": round(cob_matched[cob_matched.get("tipo_match_monto", pd.Series(dtype=str)).isin(["suma_total", "suma_parcial"])]["monto"].sum(), 2) if not cob_matched.empty else 0,
+        "probable_duda_id": len(cob_suggested),
+        "probable_duda_id_monto": round(cob_suggested["monto"].sum(), 2) if not cob_suggested.empty else 0,
+        "probable_dif_cambio": 0,
+        "probable_dif_cambio_monto": 0,
+        "no_match": len(cob_excluded),
+        "no_match_monto": round(cob_excluded["monto"].sum(), 2) if not cob_excluded.empty else 0,
+        "conciliados": len(cob_matched) + len(cob_suggested),
+        "tasa_conciliacion": round((len(cob_matched) + len(cob_suggested)) / max(len(cobranzas), 1) * 100, 1),
+        "monto_total": round(cobranzas["monto"].sum(), 2),
+        "monto_conciliado": round(cob_matched["monto"].sum() + cob_suggested["monto"].sum(), 2),
+        "de_mas": 0, "de_menos": 0, "diferencia_neta": 0,
+    }
+
+    # Pagos (solo informativos para real data)
+    pagos_stats = {
+        "total": len(pagos_prov), "match_exacto": 0, "match_exacto_monto": 0,
+        "match_directo": 0, "match_directo_monto": 0,
+        "match_suma": 0, "match_suma_monto": 0,
+        "probable_duda_id": 0, "probable_duda_id_monto": 0,
+        "probable_dif_cambio": 0, "probable_dif_cambio_monto": 0,
+        "no_match": len(pagos_prov),
+        "no_match_monto": round(pagos_prov["monto"].sum(), 2) if not pagos_prov.empty else 0,
+        "conciliados": 0, "tasa_conciliacion": 0,
+        "monto_total": round(pagos_prov["monto"].sum(), 2) if not pagos_prov.empty else 0,
+        "monto_conciliado": 0,
+        "de_mas": 0, "de_menos": 0, "diferencia_neta": 0,
+    }
+
+    # Monto ventas contagram (ventas ya filtradas por medio de pago)
+    monto_ventas = round(ventas["Monto Total"].sum(), 2) if not ventas.empty else 0
+
+    stats = {
+        "total_movimientos": total,
+        "match_exacto": match_exacto,
+        "probable_duda_id": probable,
+        "probable_dif_cambio": 0,
+        "no_match": no_match,
+        "gastos_bancarios": gastos_count,
+        "tasa_match_exacto": round(match_exacto / conciliables * 100, 1),
+        "tasa_probable": round(probable / conciliables * 100, 1),
+        "tasa_no_match": round(no_match / conciliables * 100, 1),
+        "tasa_conciliacion_total": round((match_exacto + probable) / conciliables * 100, 1),
+        "total_cobranzas": len(cobranzas),
+        "monto_cobranzas": round(cobranzas["monto"].sum(), 2),
+        "total_pagos": len(pagos_prov),
+        "monto_pagos": round(pagos_prov["monto"].sum(), 2) if not pagos_prov.empty else 0,
+        "monto_gastos_bancarios": round(gastos["monto"].sum(), 2) if not gastos.empty else 0,
+        "monto_ventas_contagram": monto_ventas,
+        "monto_compras_contagram": 0,
+        "revenue_gap": round(cobranzas["monto"].sum() - monto_ventas, 2),
+        "payment_gap": 0,
+        "monto_dif_cambio_neto": 0, "monto_a_favor": 0, "monto_en_contra": 0,
+        "monto_no_conciliado": round(cob_excluded["monto"].sum(), 2) if not cob_excluded.empty else 0,
+        "cobros": cobros_stats,
+        "pagos_prov": pagos_stats,
+        "por_banco": {},
+        # Stats especificos real
+        "matched_count": len(matched),
+        "matched_monto": round(matched["monto"].sum(), 2) if not matched.empty else 0,
+        "suggested_count": len(suggested),
+        "suggested_monto": round(suggested["monto"].sum(), 2) if not suggested.empty else 0,
+        "excluded_count": len(excluded),
+        # Desglose stats
+        "desglose_count": len(df[df.get("conciliation_tag", pd.Series(dtype=str)).str.startswith("PARCIAL_SANTANDER")]) if "conciliation_tag" in df.columns else 0,
+        "desglose_monto": round(df[df.get("conciliation_tag", pd.Series(dtype=str)).str.startswith("PARCIAL_SANTANDER")]["monto"].sum(), 2) if "conciliation_tag" in df.columns else 0,
+    }
+
+    for banco in df["banco"].unique():
+        db = df[df["banco"] == banco]
+        stats["por_banco"][banco] = {
+            "movimientos": len(db),
+            "match_exacto": len(db[db.get("conciliation_status", pd.Series(dtype=str)) == "MATCHED"]),
+            "probable_duda_id": len(db[db.get("conciliation_status", pd.Series(dtype=str)) == "SUGGESTED"]),
+            "probable_dif_cambio": 0,
+            "no_match": len(db[db.get("conciliation_status", pd.Series(dtype=str)) == "EXCLUDED"]),
+            "monto_creditos": round(db[db["tipo"] == "CREDITO"]["monto"].sum(), 2),
+            "monto_debitos": round(db[db["tipo"] == "DEBITO"]["monto"].sum(), 2),
+        }
+    return stats
+
+def _cobranzas_csv_real(resultados: pd.DataFrame) -> pd.DataFrame:
+    """Genera CSV de cobranzas para datos reales.
+
+    Desglosa sum-matches en filas individuales por factura,
+    respetando el formato de importacion de Contagram (1 fila = 1 factura).
+    """
+    df = resultados
+    cobranzas = df[
+        (df.get("clasificacion", pd.Series(dtype=str)) == "cobranza")
+    ].copy()
+
+    if cobranzas.empty:
+        return pd.DataFrame()
+
+    rows = []
+    for _, row in cobranzas.iterrows():
+        # Campos compartidos del movimiento bancario
+        fecha = row["fecha"].strftime("%d/%m/%Y") if hasattr(row["fecha"], "strftime") else str(row["fecha"])
+        base = {
+            "Fecha": fecha,
+            "Cliente": row.get("nombre_contagram", ""),
+            "CUIT Banco": row.get("cuit_banco", ""),
+            "Status": row.get("conciliation_status", ""),
+            "Tag": row.get("conciliation_tag", ""),
+            "Confianza": row.get("conciliation_confidence", ""),
+            "Razon": row.get("conciliation_reason", ""),
+            "Tipo Match": row.get("tipo_match_monto", "—") or "—",
+            "Cant Facturas": row.get("facturas_count", 0),
+            "Diferencia $": row.get("diferencia_monto", 0),
+            "Banco": row.get("banco", ""),
+            "Referencia": row.get("referencia", ""),
+            "Descripcion": row.get("descripcion", ""),
+            "Nombre Banco Extraido": row.get("nombre_banco_extraido", ""),
+            "Monto Banco": row.get("monto", 0),
+        }
+
+        detalle = row.get("facturas_detalle")
+
+        if detalle and isinstance(detalle, list) and len(detalle) > 0:
+            # Expandir: 1 fila por factura
+            for d in detalle:
+                rows.append({
+                    **base,
+                    "ID Cliente": d.get("id", ""),
+                    "Nro Factura": d.get("nro_factura", ""),
+                    "Monto Cobrado": d.get("monto", 0),
+                })
+        else:
+            # Sin detalle (fallback): usar datos del movimiento
+            rows.append({
+                **base,
+                "ID Cliente": row.get("id_contagram", ""),
+                "Nro Factura": row.get("factura_match", ""),
+                "Monto Cobrado": row.get("monto", 0),
+            })
+
+    result = pd.DataFrame(rows)
+
+    # Ordenar columnas: poner las mas importantes primero
+    priority = [
+        "Fecha", "ID Cliente", "Cliente", "CUIT Banco",
+        "Monto Cobrado", "Nro Factura", "Status", "Tag",
+        "Confianza", "Razon", "Tipo Match", "Cant Facturas",
+        "Diferencia $", "Monto Banco", "Banco", "Referencia",
+        "Descripcion", "Nombre Banco Extraido",
+    ]
+    ordered = [c for c in priority if c in result.columns]
+    remaining = [c for c in result.columns if c not in ordered]
+    return result[ordered + remaining]
+
+def _excepciones_real(resultados: pd.DataFrame) -> pd.DataFrame:
+    """Genera excepciones para datos reales con campos extendidos para analisis."""
+    df = resultados
+    exc = df[
+        (df.get("conciliation_status", pd.Series(dtype=str)) == "EXCLUDED") &
+        (df.get("clasificacion", pd.Series(dtype=str)) != "gasto_bancario")
+    ].copy()
+
+    if exc.empty:
+        return pd.DataFrame()
+
+    return pd.DataFrame({
+        "Fecha": exc["fecha"].dt.strftime("%d/%m/%Y") if hasattr(exc["fecha"], "dt") else exc["fecha"],
+        "Banco": exc["banco"],
+        "Tipo": exc["tipo"],
+        "Clasificacion": exc.get("clasificacion", ""),
+        "Descripcion": exc["descripcion"],
+        "Monto": exc["monto"],
+        "CUIT Banco": exc.get("cuit_banco", ""),
+        "Cliente/Nombre Extraido": exc.get("nombre_banco_extraido", ""),
+        "Cliente Contagram": exc.get("nombre_contagram", ""),
+        "Tag": exc.get("conciliation_tag", ""),
+        "Razon": exc.get("conciliation_reason", ""),
+        "Confianza": exc.get("conciliation_confidence", 0),
+        "Tipo Match": exc.get("tipo_match_monto", "").fillna("—") if "tipo_match_monto" in exc.columns else "—",
+        "Factura": exc.get("factura_match", ""),
+        "Diferencia $": exc.get("diferencia_monto", 0),
+        "Cant Facturas": exc.get("facturas_count", 0),
+        "Referencia": exc["referencia"],
+    })
+
+def _detalle_facturas_real(ventas: pd.DataFrame, usadas: set) -> pd.DataFrame:
+    """TODAS las facturas de Contagram con su estado de conciliacion (`usadas`: indices conciliados)."""
+    if ventas is None or usadas is None or ventas.empty:
+        return pd.DataFrame()
+
+    # Determinar estado (sin modificar ventas: puede venir del cache de etapas)
+    estado_conciliacion = pd.Series(ventas.index.isin(usadas), index=ventas.index).map(
+        {True: "Conciliada", False: "Sin Match"}
+    )
+
+    return pd.DataFrame({
+        "Estado Conciliacion": estado_conciliacion,
+        "ID": ventas.get("ID Cliente", ""),
+        "Fecha Emision": ventas["fecha_emision"].dt.strftime("%d/%m/%Y") if "fecha_emision" in ventas.columns and hasattr(ventas["fecha_emision"], "dt") else ventas.get("fecha_emision", ""),
+        "Cliente": ventas.get("Nombre", ""),
+        "CUIT": ventas.get("CUIT", ""),
+        "Nro Factura": ventas.get("Nro Factura", ""),
+        "Tipo": ventas.get("tipo_comprobante", ""),
+        "Total Venta": ventas.get("total_venta", 0),
+        "Cobrado": ventas.get("Monto Total", 0),
+        "Diferencia Venta-Cobro": round(ventas.get("total_venta", 0) - ventas.get("Monto Total", 0), 2),
+        "Estado": ventas.get("estado", ""),
+        "Medio de Cobro": ventas.get("medio_cobro", ""),
+        "Contiene Santander": ventas.get("contiene_santander", False),
+        "Contiene Caja Grande": ventas.get("contiene_caja_grande", False),
+        "CUIT Limpio": ventas.get("cuit_limpio", ""),
+    })
+
+
+def _generar_salidas_real(resultados: pd.DataFrame, ventas_norm: pd.DataFrame, ventas_usadas: set):
+    """Stats + CSV de cobranzas + excepciones + detalle de facturas."""
+    return (
+        _stats_real(resultados, ventas_norm),
+        _cobranzas_csv_real(resultados),
+        _excepciones_real(resultados),
+        _detalle_facturas_real(ventas_norm, ventas_usadas),
+    )
+
+
+PIPELINE_REAL = Pipeline(
+    [
+        Etapa("normalizar_extracto", _normalizar_extractos, ["extractos"], ["extracto"]),
+        Etapa(
+            "filtrar_tipo_movimiento", _filtrar_tipo_movimiento,
+            ["extracto", "filtro_tipo_movimiento"], ["extracto_filtrado"],
+        ),
+        Etapa(
+            "normalizar_ventas", lambda ventas_contagram: normalizar_ventas_contagram(ventas_contagram),
+            ["ventas_contagram"], ["ventas_norm_todas"],
+        ),
+        Etapa(
+            "filtrar_medios_pago",
+            lambda ventas_norm_todas, medios_pago_filtro, filtro_medio_contiene: _filtrar_medios_pago(
+                ventas_norm_todas, medios_pago_filtro, filtro_medio_contiene,
+            ),
+            ["ventas_norm_todas", "medios_pago_filtro", "filtro_medio_contiene"],
+            ["ventas_norm", "ventas_excluidas"],
+        ),
+        # La tabla de candidatos no depende de las tolerancias (solo de sus
+        # limites), asi que un what-if de tolerancias solo re-ejecuta la asignacion
+        Etapa(
+            "candidatos",
+            lambda extracto_filtrado, ventas_norm, limites_candidatos, avance: TablaCandidatos(
+                extracto_filtrado, ventas_norm, limites_candidatos, avance=avance,
+            ),
+            ["extracto_filtrado", "ventas_norm", "limites_candidatos"],
+            ["tabla_candidatos"],
+            con_progreso=True,
+        ),
+        Etapa(
+            "conciliar",
+            lambda tabla_candidatos, match_config, avance: tabla_candidatos.asignar(match_config, avance),
+            ["tabla_candidatos", "match_config"],
+            ["resultados", "ventas_usadas"],
+            con_progreso=True,
+        ),
+        Etapa(
+            "salidas", _generar_salidas_real,
+            ["resultados", "ventas_norm", "ventas_usadas"],
+            ["stats", "cobranzas_csv", "excepciones", "detalle_facturas"],
+        ),
+        Etapa(
+            "vistas", construir_vistas,
+            ["resultados", "detalle_facturas", "excepciones", "stats"],
+            ["vistas"],
+        ),
+    ],
+    version=VERSION_MOTOR,
+)
@@ -0,0 +1,135 @@
+"""
+Perfil de memoria por etapa (opcional, con tracemalloc).
+
+El informe de performance marca como riesgo la memoria de extracto_unificado y
+del armado de resultados. Con el perfil activo, cada etapa de la corrida
+reporta:
+
+  - pico_mb: pico de memoria asignada durante la etapa (sobre lo que habia al empezar)
+  - neto_mb: lo que quedo asignado al terminar (lo que la etapa deja vivo)
+  - top: los sitios que mas memoria sumaron, agrupados por la linea de codigo
+    del repo mas cercana a la asignacion (si no hay, la linea donde ocurrio)
+
+tracemalloc solo ve lo que asigna Python (objetos, buffers de numpy): las
+columnas de texto de pandas respaldadas por pyarrow usan el allocator de Arrow
+y no entran en estos numeros (ver perf["memoria"] para el RSS del proceso).
+
+Se prende con MotorConciliacion(perfil_memoria=True), la variable de entorno
+DILCOR_PERFIL_MEMORIA=1 o `--perfil-memoria` en benchmark_conciliacion.py. Apagado
+no hay costo: no se suscribe nada ni se arranca tracemalloc. Prendido, tracemalloc
+y los snapshots por etapa hacen la corrida varias veces mas lenta.
+
+tracemalloc es global al proceso y las corridas pueden ser concurrentes (los
+trabajos en segundo plano de src/jobs.py usan un pool de hilos): las corridas
+perfiladas se serializan con un lock del modulo, asi ninguna para tracemalloc ni
+resetea el pico de otra. Las corridas sin perfil no esperan; si corren a la vez
+que una perfilada, sus asignaciones entran en los numeros de esa corrida.
+"""
+import os
+import threading
+import tracemalloc
+from contextlib import contextmanager
+
+from src.eventos import ETAPA_FIN, ETAPA_INICIO, suscripto
+
+VARIABLE_ENTORNO = "DILCOR_PERFIL_MEMORIA"
+TOP_SITIOS = 10
+FRAMES = 8
+
+MB = 1024 * 1024
+RAIZ_REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Asignaciones que no son de la corrida (los propios snapshots, imports). Se
+# descartan al agrupar las diferencias: Snapshot.filter_traces es Python puro
+# sobre cada traza y costaria mas que la corrida.
+_IGNORAR = (tracemalloc.__file__, "<frozen importlib._bootstrap>", "<frozen importlib._bootstrap_external>")
+
+# Una corrida perfilada a la vez por proceso (ver docstring del modulo)
+_LOCK_PERFIL = threading.RLock()
+
+
+def activo_por_entorno() -> bool:
+    """True si DILCOR_PERFIL_MEMORIA pide el perfil (1 / true / si)."""
+    return os.environ.get(VARIABLE_ENTORNO, "").strip().lower() in ("1", "true", "si", "yes")
+
+
+def _sitio(traceback) -> str | None:
+    """Linea del repo mas cercana a la asignacion (los frames van del mas viejo al mas reciente)."""
+    if any(frame.filename in _IGNORAR for frame in traceback):
+        return None
+    for frame in reversed(traceback):
+        if frame.filename.startswith(RAIZ_REPO) and frame.filename != __file__:
+            return f"{os.path.relpath(frame.filename, RAIZ_REPO)}:{frame.lineno}"
+    frame = traceback[-1]
+    return f"{frame.filename}:{frame.lineno}"
+
+
+class PerfilMemoria:
+    """Suscriptor de eventos: snapshot de tracemalloc al inicio y al fin de cada etapa."""
+
+    def __init__(self, top: int = TOP_SITIOS):
+        self.top = top
+        self.etapas = []
+        self._snapshot = None       # el del fin de la etapa anterior sirve de inicio de la siguiente
+        self._base = 0
+
+    def __call__(self, evento: dict):
+        if evento["tipo"] == ETAPA_INICIO:
+            if self._snapshot is None:
+                self._snapshot = tracemalloc.take_snapshot()
+            self._base = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        elif evento["tipo"] == ETAPA_FIN and self._snapshot is not None:
+            actual, pico = tracemalloc.get_traced_memory()
+            snapshot = tracemalloc.take_snapshot()
+            antes, base = self._snapshot, self._base
+            self._snapshot = snapshot
+            self.etapas.append({
+                "etapa": evento["etapa"],
+                "cache": bool(evento.get("cache")),
+                "pico_mb": round((pico - base) / MB, 3),
+                "neto_mb": round((actual - base) / MB, 3),
+                "top": self._top(snapshot.compare_to(antes, "traceback")),
+            })
+
+    def _top(self, diferencias) -> list[dict]:
+        sitios = {}
+        for d in diferencias:
+            sitio = _sitio(d.traceback) if d.size_diff > 0 else None
+            if sitio is None:
+                continue
+            datos = sitios.setdefault(sitio, [0, 0])
+            datos[0] += d.size_diff
+            datos[1] += max(d.count_diff, 0)
+        mayores = sorted(sitios.items(), key=lambda kv: kv[1][0], reverse=True)[:self.top]
+        return [{"sitio": sitio, "mb": round(b / MB, 3), "bloques": n} for sitio, (b, n) in mayores]
+
+    def reporte(self) -> dict:
+        return {
+            "pico_mb": max((e["pico_mb"] for e in self.etapas), default=0.0),
+            "etapas": self.etapas,
+        }
+
+
+@contextmanager
+def perfilar_memoria(emisor, activo: bool):
+    """
+    Perfila las etapas que emite `emisor` dentro del bloque. Devuelve el
+    PerfilMemoria (o None si `activo` es False, sin ningun costo). Si
+    tracemalloc no estaba corriendo lo arranca y lo para al salir. Espera a
+    que termine otra corrida perfilada del proceso si la hay.
+    """
+    if not activo:
+        yield None
+        return
+    with _LOCK_PERFIL:
+        arrancado = not tracemalloc.is_tracing()
+        if arrancado:
+            tracemalloc.start(FRAMES)
+        perfil = PerfilMemoria()
+        try:
+            with suscripto(emisor, perfil):
+                yield perfil
+        finally:
+            if arrancado:
+                tracemalloc.stop()
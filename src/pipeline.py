@@ -0,0 +1,142 @@
+"""
+Pipeline por etapas con memoizacion independiente por etapa.
+
+Cada etapa declara sus entradas y salidas por nombre. Su firma es el hash de la
+firma de cada entrada (y de la version del motor), asi que si cambia solo un
+parametro de matching, las etapas de normalizacion encuentran la misma firma y
+se sirven del cache; solo se re-ejecutan la etapa afectada y las posteriores.
+
+Las entradas iniciales (DataFrames, listas de DataFrames, dicts de config) se
+hashean por contenido una vez (o llegan ya hasheadas en `firmas`); las salidas
+heredan la firma de su etapa.
+
+`ejecutar(entradas, emisor)` emite etapa_inicio / etapa_fin por etapa (ver
+src/eventos.py); las etapas con `con_progreso=True` reciben ademas un callback
+avance(hechos, total, fase) que emite eventos de progreso dentro de la etapa.
+"""
+import json
+import logging
+import time
+
+import pandas as pd
+
+from src.cache_resultados import CacheResultados
+from src.claves import hash_texto, hash_dataframe
+from src.eventos import ETAPA_FIN, ETAPA_INICIO, PROGRESO, Emisor, contar_filas
+
+MAX_ETAPAS_CACHEADAS = 32
+
+# Cada cuantos movimientos reportan avance los loops largos (progreso / cancelacion)
+PASO_PROGRESO = 25
+
+# Cache compartido por proceso: clave = firma de la etapa, valor = dict de salidas
+cache_etapas = CacheResultados(max_corridas=MAX_ETAPAS_CACHEADAS)
+
+
+def firma_lista(huellas: list[str]) -> str:
+    """Firma de una entrada que es lista de DataFrames, a partir de sus hash_dataframe."""
+    return hash_texto("|".join(huellas))
+
+
+def _firma_valor(valor) -> str:
+    """Hash de contenido de una entrada inicial."""
+    if isinstance(valor, pd.DataFrame):
+        return hash_dataframe(valor)
+    if isinstance(valor, (list, tuple)) and valor and all(isinstance(v, pd.DataFrame) for v in valor):
+        return firma_lista([hash_dataframe(v) for v in valor])
+    return hash_texto(json.dumps(valor, sort_keys=True, default=str))
+
+
+class Etapa:
+    """
+    Paso del pipeline: funcion(**entradas) -> valor (o tupla si hay varias salidas).
+
+    Con con_progreso=True la funcion recibe tambien `avance` (callable o None).
+    """
+
+    def __init__(self, nombre: str, funcion, entradas: list[str], salidas: list[str],
+                 con_progreso: bool = False):
+        self.nombre = nombre
+        self.funcion = funcion
+        self.entradas = entradas
+        self.salidas = salidas
+        self.con_progreso = con_progreso
+
+    def ejecutar(self, valores: dict, avance=None) -> dict:
+        kwargs = {e: valores[e] for e in self.entradas}
+        if self.con_progreso:
+            kwargs["avance"] = avance
+        salida = self.funcion(**kwargs)
+        if len(self.salidas) == 1:
+            salida = (salida,)
+        return dict(zip(self.salidas, salida))
+
+
+class Pipeline:
+    def __init__(self, etapas: list[Etapa], version: str = "", cache: CacheResultados = None):
+        self.etapas = etapas
+        self.version = version
+        self.cache = cache if cache is not None else cache_etapas
+
+    def ejecutar(self, entradas: dict, emisor: Emisor = None, firmas: dict = None) -> tuple[dict, list[dict]]:
+        """
+        Ejecuta las etapas en orden, salteando las que ya estan en cache.
+
+        Args:
+            emisor: recibe los eventos de etapa y progreso (nada si no tiene
+                suscriptores). Si un suscriptor levanta una excepcion (ej.
+                cancelacion) la corrida se corta sin guardar la etapa en curso.
+            firmas: firmas ya calculadas de algunas entradas (ej. el hash de los
+                archivos que el motor uso para el run_id); el resto se hashea aca.
+
+        Returns:
+            (valores: entradas + todas las salidas, reporte de tiempos por etapa)
+        """
+        logger = logging.getLogger(__name__)
+        valores = dict(entradas)
+        precalculadas = firmas or {}
+        firmas = {nombre: precalculadas.get(nombre) or _firma_valor(v) for nombre, v in entradas.items()}
+        reporte = []
+        emitir = emisor is not None and emisor.activo
+        n_etapas = len(self.etapas)
+        avance_corrida = [0.0]  # fraccion ya emitida (no baja entre fases de una etapa)
+
+        for i, etapa in enumerate(self.etapas):
+            if emitir:
+                avance_corrida[0] = max(avance_corrida[0], i / n_etapas)
+                emisor.emitir(
+                    ETAPA_INICIO, etapa=etapa.nombre, indice=i, total_etapas=n_etapas,
+                    fraccion=avance_corrida[0], filas_entrada=contar_filas(valores, etapa.entradas),
+                )
+            firma = hash_texto("|".join(
+                [self.version, etapa.nombre] + [firmas[e] for e in etapa.entradas]
+            ))
+            inicio = time.perf_counter()
+            salidas = self.cache.obtener(firma)
+            desde_cache = salidas is not None
+            if not desde_cache:
+                avance = None
+                if emitir and etapa.con_progreso:
+                    def avance(hechos, total, fase="", _i=i, _nombre=etapa.nombre):
+                        avance_corrida[0] = max(avance_corrida[0], (_i + hechos / max(total, 1)) / n_etapas)
+                        emisor.emitir(
+                            PROGRESO, etapa=_nombre, fase=fase, hechos=hechos, total=total,
+                            fraccion=avance_corrida[0],
+                        )
+                salidas = etapa.ejecutar(valores, avance)
+                self.cache.guardar(firma, salidas)
+            segundos = time.perf_counter() - inicio
+
+            valores.update(salidas)
+            for nombre in etapa.salidas:
+                firmas[nombre] = hash_texto(firma + "|" + nombre)
+            reporte.append({"etapa": etapa.nombre, "segundos": round(segundos, 4), "cache": desde_cache})
+            logger.info("Etapa %s: %.3fs%s", etapa.nombre, segundos, " (cache)" if desde_cache else "")
+            if emitir:
+                avance_corrida[0] = (i + 1) / n_etapas
+                emisor.emitir(
+                    ETAPA_FIN, etapa=etapa.nombre, segundos=round(segundos, 4), cache=desde_cache,
+                    fraccion=avance_corrida[0], filas_salida=contar_filas(salidas, etapa.salidas),
+                )
+
+        return valores, reporte
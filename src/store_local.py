@@ -0,0 +1,351 @@
+"""
+Almacen local embebido (SQLite) para el historico de conciliaciones.
+
+Alternativa sin servidor a TiDB: cada corrida se guarda en un archivo .db con
+tablas indexadas, asi las consultas entre meses (facturas que siguen abiertas,
+creditos sin match viejos) son queries en lugar de volver a leer planillas.
+
+Tablas:
+  - corridas:     una fila por ejecucion del motor (+ stats y perf en JSON)
+  - movimientos:  movimientos bancarios con su status/tag de conciliacion
+  - facturas:     ventas de Contagram con su estado (conciliada o no)
+  - matches:      relacion movimiento → factura(s) asignadas
+
+Movimientos y facturas llevan la clave estable de src.claves, por lo que el
+mismo registro se reconoce en corridas distintas.
+"""
+import json
+import os
+import sqlite3
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from src import tracing
+from src.claves import claves_movimientos, claves_ventas
+
+RUTA_DEFAULT = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "output", "historico_local.db"
+)
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS corridas (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    fecha_ejecucion TEXT NOT NULL,
+    modo TEXT,
+    fecha_desde TEXT,
+    fecha_hasta TEXT,
+    total_movimientos INTEGER,
+    total_facturas INTEGER,
+    stats_json TEXT,
+    perf_json TEXT
+);
+
+CREATE TABLE IF NOT EXISTS movimientos (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    corrida_id INTEGER NOT NULL REFERENCES corridas(id),
+    clave TEXT NOT NULL,
+    fecha TEXT,
+    banco TEXT,
+    tipo TEXT,
+    clasificacion TEXT,
+    descripcion TEXT,
+    monto REAL,
+    referencia TEXT,
+    cuit TEXT,
+    nombre_banco TEXT,
+    status TEXT,
+    tag TEXT,
+    confianza TEXT,
+    razon TEXT,
+    tipo_match TEXT,
+    nombre_contagram TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_mov_cuit ON movimientos(cuit);
+CREATE INDEX IF NOT EXISTS idx_mov_fecha ON movimientos(fecha);
+CREATE INDEX IF NOT EXISTS idx_mov_referencia ON movimientos(referencia);
+CREATE INDEX IF NOT EXISTS idx_mov_status ON movimientos(status);
+CREATE INDEX IF NOT EXISTS idx_mov_clave ON movimientos(clave, corrida_id);
+
+CREATE TABLE IF NOT EXISTS facturas (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    corrida_id INTEGER NOT NULL REFERENCES corridas(id),
+    clave TEXT NOT NULL,
+    id_cliente TEXT,
+    nro_factura TEXT,
+    cuit TEXT,
+    cliente TEXT,
+    fecha_emision TEXT,
+    total_venta REAL,
+    cobrado REAL,
+    medio_cobro TEXT,
+    estado TEXT,
+    conciliada INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_fac_cuit ON facturas(cuit);
+CREATE INDEX IF NOT EXISTS idx_fac_fecha ON facturas(fecha_emision);
+CREATE INDEX IF NOT EXISTS idx_fac_nro ON facturas(nro_factura);
+CREATE INDEX IF NOT EXISTS idx_fac_clave ON facturas(clave, corrida_id);
+
+CREATE TABLE IF NOT EXISTS matches (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    corrida_id INTEGER NOT NULL REFERENCES corridas(id),
+    movimiento_id INTEGER NOT NULL REFERENCES movimientos(id),
+    id_cliente TEXT,
+    nro_factura TEXT,
+    monto REAL,
+    tipo_match TEXT,
+    status TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_match_factura ON matches(nro_factura);
+CREATE INDEX IF NOT EXISTS idx_match_movimiento ON matches(movimiento_id);
+"""
+
+# Columnas agregadas despues de crear el esquema: los .db viejos las reciben con ALTER TABLE
+_COLUMNAS_NUEVAS = [
+    ("corridas", "perf_json", "TEXT"),
+]
+
+
+def _fecha_iso(valor) -> str | None:
+    fecha = pd.to_datetime(valor, errors="coerce")
+    return None if pd.isna(fecha) else fecha.strftime("%Y-%m-%d")
+
+
+def _txt(valor) -> str | None:
+    if valor is None or (isinstance(valor, float) and pd.isna(valor)):
+        return None
+    return str(valor)
+
+
+def _num(valor) -> float | None:
+    v = pd.to_numeric(valor, errors="coerce")
+    return None if pd.isna(v) else float(v)
+
+
+class StoreLocal:
+    """Historico local de conciliaciones sobre un archivo SQLite."""
+
+    def __init__(self, ruta: str = RUTA_DEFAULT):
+        self.ruta = ruta
+        if ruta != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(ruta)), exist_ok=True)
+        self.conn = sqlite3.connect(ruta)
+        self.conn.execute("PRAGMA foreign_keys = ON")
+        self.conn.executescript(_ESQUEMA)
+        self._migrar()
+
+    def _migrar(self):
+        for tabla, columna, tipo in _COLUMNAS_NUEVAS:
+            existentes = {fila[1] for fila in self.conn.execute(f"PRAGMA table_info({tabla})")}
+            if columna not in existentes:
+                with self.conn:
+                    self.conn.execute(f"ALTER TABLE {tabla} ADD COLUMN {columna} {tipo}")
+
+    def cerrar(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cerrar()
+
+    # ─── ESCRITURA ───────────────────────────────────────────────────
+
+    def guardar_corrida(self, resultado: dict, modo: str = "real") -> int:
+        """
+        Guarda una corrida completa (salida de procesar / procesar_real).
+
+        Returns:
+            id de la corrida creada
+        """
+        df = resultado.get("resultados", pd.DataFrame())
+        facturas = resultado.get("detalle_facturas", pd.DataFrame())
+        fechas = pd.to_datetime(df["fecha"], errors="coerce") if "fecha" in df.columns else pd.Series(dtype="datetime64[ns]")
+
+        with tracing.span(
+            "db.guardar_corrida", run_id=resultado.get("run_id"), modo=modo, movimientos=len(df),
+            facturas=len(facturas) if facturas is not None else 0,
+        ), self.conn:
+            cur = self.conn.execute(
+                "INSERT INTO corridas (fecha_ejecucion, modo, fecha_desde, fecha_hasta, "
+                "total_movimientos, total_facturas, stats_json, perf_json) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                    modo,
+                    _fecha_iso(fechas.min()) if not fechas.empty else None,
+                    _fecha_iso(fechas.max()) if not fechas.empty else None,
+                    len(df),
+                    len(facturas) if facturas is not None else 0,
+                    json.dumps(resultado.get("stats", {}), default=str),
+                    json.dumps(resultado["perf"], default=str) if resultado.get("perf") else None,
+                ),
+            )
+            corrida_id = cur.lastrowid
+            if not df.empty:
+                self._insertar_movimientos(corrida_id, df)
+            if facturas is not None and not facturas.empty:
+                self._insertar_facturas(corrida_id, facturas)
+        return corrida_id
+
+    def _insertar_movimientos(self, corrida_id: int, df: pd.DataFrame):
+        claves = claves_movimientos(df)
+        status_col = "conciliation_status" if "conciliation_status" in df.columns else "match_nivel"
+        cuit_col = "cuit_banco" if "cuit_banco" in df.columns else "cuit"
+
+        for idx, row in df.iterrows():
+            status = _txt(row.get(status_col))
+            cur = self.conn.execute(
+                "INSERT INTO movimientos (corrida_id, clave, fecha, banco, tipo, clasificacion, "
+                "descripcion, monto, referencia, cuit, nombre_banco, status, tag, confianza, "
+                "razon, tipo_match, nombre_contagram) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    corrida_id, claves[idx], _fecha_iso(row.get("fecha")),
+                    _txt(row.get("banco")), _txt(row.get("tipo")), _txt(row.get("clasificacion")),
+                    _txt(row.get("descripcion")), _num(row.get("monto")), _txt(row.get("referencia")),
+                    _txt(row.get(cuit_col)) or None, _txt(row.get("nombre_banco_extraido")),
+                    status, _txt(row.get("conciliation_tag")),
+                    _txt(row.get("conciliation_confidence", row.get("confianza"))),
+                    _txt(row.get("conciliation_reason", row.get("match_detalle"))),
+                    _txt(row.get("tipo_match_monto")), _txt(row.get("nombre_contagram")),
+                ),
+            )
+            if status not in ("MATCHED", "SUGGESTED", "match_exacto", "probable_duda_id", "probable_dif_cambio"):
+                continue
+
+            # Facturas asignadas: lista (suma de facturas) o una sola
+            detalle = row.get("facturas_detalle")
+            if isinstance(detalle, list) and detalle:
+                asignadas = [(d.get("id"), d.get("nro_factura"), d.get("monto")) for d in detalle]
+            elif _txt(row.get("factura_match")):
+                asignadas = [(row.get("id_contagram"), row.get("factura_match"), row.get("monto"))]
+            else:
+                asignadas = []
+            self.conn.executemany(
+                "INSERT INTO matches (corrida_id, movimiento_id, id_cliente, nro_factura, monto, "
+                "tipo_match, status) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (corrida_id, cur.lastrowid, _txt(i), _txt(n), _num(m),
+                     _txt(row.get("tipo_match_monto")), status)
+                    for i, n, m in asignadas
+                ],
+            )
+
+    def _insertar_facturas(self, corrida_id: int, facturas: pd.DataFrame):
+        fecha_emision = pd.to_datetime(facturas.get("Fecha Emision"), format="%d/%m/%Y", errors="coerce")
+        # Mismas columnas que usa claves_ventas sobre las ventas normalizadas
+        claves = claves_ventas(pd.DataFrame({
+            "ID Cliente": facturas.get("ID", ""),
+            "Nro Factura": facturas.get("Nro Factura", ""),
+            "cuit_limpio": facturas.get("CUIT Limpio", ""),
+            "fecha_emision": fecha_emision,
+            "Monto Total": facturas.get("Cobrado", 0),
+        }, index=facturas.index))
+
+        filas = []
+        for idx, row in facturas.iterrows():
+            filas.append((
+                corrida_id, claves[idx], _txt(row.get("ID")), _txt(row.get("Nro Factura")),
+                _txt(row.get("CUIT Limpio")) or None, _txt(row.get("Cliente")),
+                _fecha_iso(fecha_emision[idx]), _num(row.get("Total Venta")), _num(row.get("Cobrado")),
+                _txt(row.get("Medio de Cobro")), _txt(row.get("Estado")),
+                1 if row.get("Estado Conciliacion") == "Conciliada" else 0,
+            ))
+        self.conn.executemany(
+            "INSERT INTO facturas (corrida_id, clave, id_cliente, nro_factura, cuit, cliente, "
+            "fecha_emision, total_venta, cobrado, medio_cobro, estado, conciliada) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            filas,
+        )
+
+    # ─── CONSULTAS ───────────────────────────────────────────────────
+
+    def _query(self, sql: str, params: tuple = ()) -> pd.DataFrame:
+        return pd.read_sql_query(sql, self.conn, params=params)
+
+    def corridas(self) -> pd.DataFrame:
+        """Listado de corridas guardadas (mas reciente primero)."""
+        return self._query(
+            "SELECT id, fecha_ejecucion, modo, fecha_desde, fecha_hasta, total_movimientos, "
+            "total_facturas FROM corridas ORDER BY id DESC"
+        )
+
+    def perf_corrida(self, corrida_id: int) -> dict | None:
+        """Metricas de performance guardadas con la corrida (resultado["perf"]), o None."""
+        fila = self.conn.execute("SELECT perf_json FROM corridas WHERE id = ?", (corrida_id,)).fetchone()
+        return json.loads(fila[0]) if fila and fila[0] else None
+
+    def facturas_abiertas(self, cuit: str = None) -> pd.DataFrame:
+        """
+        Facturas que no fueron conciliadas en NINGUNA corrida guardada.
+        Toma la version mas reciente de cada factura (por clave estable).
+        """
+        sql = """
+            SELECT f.clave, f.id_cliente, f.nro_factura, f.cuit, f.cliente, f.fecha_emision,
+                   f.total_venta, f.cobrado, f.medio_cobro, f.estado, f.corrida_id
+            FROM facturas f
+            JOIN (SELECT clave, MAX(corrida_id) AS ultima FROM facturas GROUP BY clave) u
+              ON u.clave = f.clave AND u.ultima = f.corrida_id
+            WHERE NOT EXISTS (
+                SELECT 1 FROM facturas g WHERE g.clave = f.clave AND g.conciliada = 1
+            )
+        """
+        params = ()
+        if cuit:
+            sql += " AND f.cuit = ?"
+            params = (cuit,)
+        sql += " ORDER BY f.fecha_emision, f.nro_factura"
+        return self._query(sql, params)
+
+    def creditos_sin_match(self, dias: int = 0, hoy=None) -> pd.DataFrame:
+        """
+        Creditos que siguen EXCLUDED / no_match (en su version mas reciente)
+        con fecha de hace mas de `dias` dias respecto de `hoy`.
+        """
+        hoy = pd.Timestamp(hoy) if hoy is not None else pd.Timestamp(datetime.now().date())
+        limite = (hoy - timedelta(days=dias)).strftime("%Y-%m-%d")
+        return self._query(
+            """
+            SELECT m.clave, m.fecha, m.banco, m.descripcion, m.monto, m.referencia, m.cuit,
+                   m.nombre_banco, m.tag, m.razon, m.corrida_id
+            FROM movimientos m
+            JOIN (SELECT clave, MAX(corrida_id) AS ultima FROM movimientos GROUP BY clave) u
+              ON u.clave = m.clave AND u.ultima = m.corrida_id
+            WHERE m.tipo = 'CREDITO'
+              AND m.status IN ('EXCLUDED', 'no_match')
+              AND m.fecha <= ?
+            ORDER BY m.fecha, m.referencia
+            """,
+            (limite,),
+        )
+
+    def movimientos_por_cuit(self, cuit: str) -> pd.DataFrame:
+        """Todos los movimientos de un CUIT en todas las corridas."""
+        return self._query(
+            "SELECT corrida_id, fecha, banco, tipo, monto, referencia, status, tag, nombre_contagram "
+            "FROM movimientos WHERE cuit = ? ORDER BY fecha, corrida_id",
+            (cuit,),
+        )
+
+    def buscar_referencia(self, referencia: str) -> pd.DataFrame:
+        """Movimientos con una referencia bancaria dada (todas las corridas)."""
+        return self._query(
+            "SELECT corrida_id, fecha, banco, tipo, monto, cuit, status, tag "
+            "FROM movimientos WHERE referencia = ? ORDER BY corrida_id",
+            (referencia,),
+        )
+
+    def matches_de_factura(self, nro_factura: str) -> pd.DataFrame:
+        """Movimientos bancarios a los que se asigno una factura."""
+        return self._query(
+            """
+            SELECT x.corrida_id, x.nro_factura, x.id_cliente, x.monto, x.tipo_match, x.status,
+                   m.fecha, m.banco, m.monto AS monto_banco, m.referencia
+            FROM matches x JOIN movimientos m ON m.id = x.movimiento_id
+            WHERE x.nro_factura = ?
+            ORDER BY x.corrida_id
+            """,
+            (nro_factura,),
+        )
@@ -0,0 +1,241 @@
+"""
+Trazas (spans anidados) de las corridas, exportadas a un archivo local.
+
+Sin backend de tracing: cada span terminado es una linea JSON en el archivo
+configurado (DILCOR_TRAZAS=ruta.jsonl o configurar(ruta)):
+
+  {"trace_id", "span_id", "padre_id", "nombre", "inicio" (epoch s),
+   "segundos", "pid", "hilo", "atributos": {...}, "error"?}
+
+Que se traza:
+  - motor.<modo>: la corrida (run_id, bancos, filas de extracto y ventas)
+    con un span hijo por etapa (etapa.<nombre>: filas de entrada / salida,
+    cache) y, dentro, normalizar.extracto por banco
+  - fase1.credito: solo los creditos que tardan mas de UMBRAL_CREDITO_SEG,
+    con su CUIT y fragmento de CUIT (fragmento_cuit)
+  - carga.archivo (XLSX / CSV subidos), db.guardar_* (SQLite / TiDB) y
+    chatbot.llamada
+
+Para verlo como timeline / flame chart:
+    python -m src.tracing output/trazas.jsonl -o output/trazas.json
+y abrir el .json en chrome://tracing o https://ui.perfetto.dev.
+
+Sin archivo configurado span() no hace nada (una lectura de variable global).
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from src.eventos import CORRIDA_FIN, ETAPA_FIN, ETAPA_INICIO, suscripto
+
+VARIABLE_ENTORNO = "DILCOR_TRAZAS"
+UMBRAL_CREDITO_SEG = 0.05      # creditos mas lentos que esto generan su propio span
+FRAGMENTOS_CUIT = 16
+
+_span_actual: ContextVar = ContextVar("span_actual", default=None)
+
+
+class ExportadorJsonl:
+    """Agrega cada span terminado como una linea JSON (thread-safe)."""
+
+    def __init__(self, ruta: str):
+        self.ruta = ruta
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(ruta)), exist_ok=True)
+
+    def exportar(self, datos: dict):
+        linea = json.dumps(datos, default=str, ensure_ascii=False)
+        with self._lock, open(self.ruta, "a", encoding="utf-8") as f:
+            f.write(linea + "\n")
+
+
+_exportador = ExportadorJsonl(os.environ[VARIABLE_ENTORNO]) if os.environ.get(VARIABLE_ENTORNO) else None
+
+
+def configurar(ruta: str | None):
+    """Exporta los spans a `ruta` (JSON lines). None desactiva el tracing."""
+    global _exportador
+    _exportador = ExportadorJsonl(ruta) if ruta else None
+
+
+def activo() -> bool:
+    return _exportador is not None
+
+
+def fragmento_cuit(cuit: str, fragmentos: int = FRAGMENTOS_CUIT) -> int | None:
+    """Fragmento estable (0..fragmentos-1) de un CUIT, para agrupar spans por grupo de clientes."""
+    digitos = "".join(c for c in str(cuit or "") if c.isdigit())
+    return int(digitos) % fragmentos if digitos else None
+
+
+class Span:
+    def __init__(self, nombre: str, padre=None, atributos: dict = None, inicio: float = None):
+        self.nombre = nombre
+        self.trace_id = padre.trace_id if padre is not None else uuid.uuid4().hex[:16]
+        self.span_id = uuid.uuid4().hex[:16]
+        self.padre_id = padre.span_id if padre is not None else None
+        self.atributos = dict(atributos or {})
+        self.inicio = time.time() if inicio is None else inicio
+        self._t0 = time.perf_counter()
+        self.error = None
+
+    def atributo(self, **atributos):
+        """Agrega atributos al span (ej. filas de salida, conocidas al final)."""
+        self.atributos.update(atributos)
+
+    def terminar(self, segundos: float = None):
+        if _exportador is None:
+            return
+        datos = {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "padre_id": self.padre_id,
+            "nombre": self.nombre,
+            "inicio": round(self.inicio, 6),
+            "segundos": round(time.perf_counter() - self._t0 if segundos is None else segundos, 6),
+            "pid": os.getpid(),
+            "hilo": threading.get_ident(),
+            "atributos": self.atributos,
+        }
+        if self.error:
+            datos["error"] = self.error
+        _exportador.exportar(datos)
+
+
+def span_actual() -> Span | None:
+    return _span_actual.get()
+
+
+@contextmanager
+def span(nombre: str, **atributos):
+    """Span hijo del span actual (o raiz de una traza nueva). Devuelve el Span, o None sin tracing."""
+    if _exportador is None:
+        yield None
+        return
+    s = Span(nombre, _span_actual.get(), atributos)
+    token = _span_actual.set(s)
+    try:
+        yield s
+    except BaseException as e:
+        s.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _span_actual.reset(token)
+        s.terminar()
+
+
+def registrar_span(nombre: str, t0: float, segundos: float, **atributos):
+    """Span ya terminado que empezo en `t0` (time.perf_counter) y duro `segundos`."""
+    if _exportador is None:
+        return
+    inicio = time.time() - (time.perf_counter() - t0)
+    Span(nombre, _span_actual.get(), atributos, inicio=inicio).terminar(segundos)
+
+
+class SpansEtapas:
+    """
+    Suscriptor de eventos del motor: un span etapa.<nombre> por etapa, hijo del
+    span actual. Los spans abiertos dentro de la etapa quedan como hijos suyos.
+    """
+
+    def __init__(self):
+        self._abierto = None        # (span, token)
+
+    def __call__(self, evento: dict):
+        tipo = evento["tipo"]
+        if tipo == ETAPA_INICIO:
+            self._cerrar()
+            s = Span(f"etapa.{evento['etapa']}", _span_actual.get(), {
+                "etapa": evento["etapa"], "filas_entrada": evento.get("filas_entrada") or {},
+            })
+            self._abierto = (s, _span_actual.set(s))
+        elif tipo == ETAPA_FIN and self._abierto is not None:
+            self._abierto[0].atributo(cache=bool(evento.get("cache")), filas_salida=evento.get("filas_salida") or {})
+            self._cerrar()
+        elif tipo == CORRIDA_FIN:
+            self._cerrar()
+
+    def _cerrar(self):
+        if self._abierto is None:
+            return
+        s, token = self._abierto
+        self._abierto = None
+        _span_actual.reset(token)
+        s.terminar()
+
+
+@contextmanager
+def trazar_etapas(emisor):
+    """Spans por etapa de las corridas de `emisor` dentro del bloque (nada sin tracing)."""
+    if _exportador is None:
+        yield
+        return
+    spans = SpansEtapas()
+    try:
+        with suscripto(emisor, spans):
+            yield
+    finally:
+        spans._cerrar()
+
+
+# ─── LECTURA / CHROME TRACE ─────────────────────────────────────────
+
+def leer_spans(ruta: str, trace_id: str = None, run_id: str = None) -> list[dict]:
+    """Spans del archivo, opcionalmente de una traza o de la corrida con `run_id`."""
+    with open(ruta, encoding="utf-8") as f:
+        spans = [json.loads(linea) for linea in f if linea.strip()]
+    if run_id is not None:
+        trazas = {s["trace_id"] for s in spans if s["atributos"].get("run_id") == run_id}
+        spans = [s for s in spans if s["trace_id"] in trazas]
+    if trace_id is not None:
+        spans = [s for s in spans if s["trace_id"] == trace_id]
+    return spans
+
+
+def a_chrome_trace(spans: list[dict]) -> dict:
+    """
+    Formato Trace Event de Chrome (eventos "X" con inicio y duracion en
+    microsegundos). Los spans anidados del mismo hilo se ven como flame chart.
+    """
+    eventos = []
+    for s in sorted(spans, key=lambda s: s["inicio"]):
+        args = {**s["atributos"], "trace_id": s["trace_id"], "span_id": s["span_id"]}
+        if s.get("error"):
+            args["error"] = s["error"]
+        eventos.append({
+            "name": s["nombre"],
+            "cat": s["nombre"].split(".")[0],
+            "ph": "X",
+            "ts": round(s["inicio"] * 1e6),
+            "dur": max(round(s["segundos"] * 1e6), 1),
+            "pid": s["pid"],
+            "tid": s["hilo"],
+            "args": args,
+        })
+    return {"traceEvents": eventos, "displayTimeUnit": "ms"}
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Convierte trazas JSON lines a Chrome trace (chrome://tracing, Perfetto)")
+    parser.add_argument("trazas", help="archivo .jsonl exportado")
+    parser.add_argument("-o", "--salida", default=None, help="JSON de salida (default: mismo nombre con .json)")
+    parser.add_argument("--run-id", default=None, help="solo la corrida con este run_id")
+    parser.add_argument("--trace-id", default=None, help="solo esta traza")
+    args = parser.parse_args(argv)
+
+    spans = leer_spans(args.trazas, trace_id=args.trace_id, run_id=args.run_id)
+    salida = args.salida or os.path.splitext(args.trazas)[0] + ".json"
+    with open(salida, "w", encoding="utf-8") as f:
+        json.dump(a_chrome_trace(spans), f, ensure_ascii=False)
+    print(f"{len(spans)} spans -> {salida}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -6,6 +6,9 @@ import streamlit as st
 import pandas as pd
 import plotly.graph_objects as go
 
+from src.jobs import adjuntar_trabajo, trabajo_en_curso
+from src.metricas import tabla_etapas
+
 
 # ═══════════════════════════════════════════════════════
 # FORMATO
@@ -381,7 +384,7 @@ def build_column_config(df):
     _bool_cols = {
         "Contiene Santander", "Contiene Caja Grande",
         "contiene_santander", "contiene_caja_grande",
-        "es_santander_puro", "es_pago_unico",
+        "es_santander_puro", "es_pago_unico", "busqueda_truncada",
     }
 
     for col in df.columns:
@@ -415,11 +418,65 @@ def build_column_config(df):
     return config
 
 
+FILAS_POR_PAGINA = 50
+_OPCIONES_FILAS = [25, 50, 100, 250]
+
+
+def render_tabla_paginada(df, key, columnas=None, estilo_fila=None, filas_por_pagina=FILAS_POR_PAGINA):
+    """
+    Tabla paginada del lado del servidor: ordena el DataFrame completo (numerico,
+    sin convertir a string) y manda al navegador solo la pagina visible. Los
+    montos se formatean con column_config; `estilo_fila(row) -> list[str]` se
+    aplica solo a las filas de la pagina.
+
+    Returns:
+        DataFrame de la pagina visible
+    """
+    if df is None or df.empty:
+        st.info("Sin datos para mostrar.")
+        return df
+    if columnas:
+        df = df[[c for c in columnas if c in df.columns]]
+
+    c1, c2, c3, c4 = st.columns([3, 1, 1, 1])
+    orden = c1.selectbox("Ordenar por", ["(original)"] + list(df.columns), key=f"{key}_orden")
+    descendente = c2.toggle("Desc.", value=False, key=f"{key}_desc")
+    opciones = sorted(set(_OPCIONES_FILAS + [filas_por_pagina]))
+    tam = c3.selectbox("Filas", opciones, index=opciones.index(filas_por_pagina), key=f"{key}_filas")
+
+    n_paginas = max(1, -(-len(df) // tam))
+    if st.session_state.get(f"{key}_pagina", 1) > n_paginas:
+        st.session_state[f"{key}_pagina"] = n_paginas
+    pagina = c4.number_input("Pagina", min_value=1, max_value=n_paginas, step=1, key=f"{key}_pagina")
+
+    if orden != "(original)":
+        try:
+            df = df.sort_values(orden, ascending=not descendente, kind="stable", na_position="last")
+        except TypeError:
+            st.caption(f"La columna {orden} no se puede ordenar (valores mixtos).")
+
+    inicio = (int(pagina) - 1) * tam
+    vista = df.iloc[inicio:inicio + tam].reset_index(drop=True)
+    datos = vista.style.apply(estilo_fila, axis=1) if estilo_fila else vista
+    st.dataframe(
+        datos,
+        use_container_width=True,
+        hide_index=True,
+        column_config=build_column_config(vista),
+        key=f"{key}_tabla",
+    )
+    st.caption(f"Filas {inicio + 1}–{inicio + len(vista)} de {len(df)} (pagina {int(pagina)} de {n_paginas})")
+    return vista
+
+
 def render_data_table(df, key=None):
-    """Renderiza dataframe con column_config automatico."""
+    """Renderiza dataframe con column_config automatico (paginado si es largo y tiene key)."""
     if df is None or df.empty:
         st.info("Sin datos para mostrar.")
         return
+    if key and len(df) > FILAS_POR_PAGINA:
+        render_tabla_paginada(df, key)
+        return
     st.dataframe(
         df,
         use_container_width=True,
@@ -471,3 +528,70 @@ def no_data_warning():
         <p>Ejecutá la conciliación desde la página principal para ver los resultados aquí.</p>
     </div>
     """, unsafe_allow_html=True)
+
+
+def render_trabajo_en_curso():
+    """Adjunta el resultado de un trabajo en segundo plano ya terminado, o avisa que sigue corriendo."""
+    adjuntar_trabajo(st.session_state)
+    trabajo = trabajo_en_curso(st.session_state)
+    if trabajo is not None:
+        p = trabajo.progreso()
+        st.info(
+            f"⏳ Conciliación en curso ({p['fraccion'] * 100:.0f}% — {p['etapa']}). "
+            "Los resultados se actualizan al terminar."
+        )
+
+
+def render_panel_perf(perf, desde_cache=False):
+    """Panel de administracion con resultado["perf"] (ver src/metricas.py)."""
+    if not perf:
+        return
+    with st.expander("🛠️ Admin — Performance de la corrida", expanded=False):
+        if desde_cache:
+            st.caption("Resultado en caché: las métricas son de la corrida original.")
+        memoria = perf.get("memoria", {})
+        combinaciones = perf.get("combinaciones", {})
+        c1, c2, c3, c4 = st.columns(4)
+        c1.metric("Tiempo total", f"{perf.get('segundos', 0):.2f} s")
+        c2.metric("Comparaciones fuzzy", f"{perf.get('comparaciones_fuzzy', 0):,}".replace(",", "."))
+        c3.metric(
+            "Combinaciones (suma)", f"{combinaciones.get('total', 0):,}".replace(",", "."),
+            delta=f"{combinaciones['cortes']} cortes" if combinaciones.get("cortes") else None,
+            delta_color="inverse",
+        )
+        c4.metric(
+            "Memoria pico",
+            f"{memoria['rss_pico_mb']:.0f} MB" if memoria.get("rss_pico_mb") is not None else "n/d",
+        )
+
+        st.markdown("**Etapas**")
+        st.dataframe(tabla_etapas(perf), hide_index=True, use_container_width=True)
+
+        caches = perf.get("caches", {})
+        if caches:
+            st.markdown("**Caches**")
+            st.dataframe(pd.DataFrame([
+                {"cache": nombre, **datos} for nombre, datos in caches.items()
+            ]), hide_index=True, use_container_width=True)
+
+        if combinaciones.get("por_funcion"):
+            st.markdown("**Búsquedas por suma**")
+            st.dataframe(pd.DataFrame([
+                {"funcion": nombre, **datos} for nombre, datos in combinaciones["por_funcion"].items()
+            ]), hide_index=True, use_container_width=True)
+
+        if perf.get("clientes_lentos"):
+            st.markdown("**Clientes más lentos (Fase 1)**")
+            st.dataframe(pd.DataFrame(perf["clientes_lentos"]), hide_index=True, use_container_width=True)
+
+        perfil = perf.get("perfil_memoria")
+        if perfil:
+            st.markdown(f"**Perfil de memoria por etapa** (pico {perfil['pico_mb']:.2f} MB)")
+            st.dataframe(pd.DataFrame([
+                {
+                    "etapa": e["etapa"], "pico_mb": e["pico_mb"], "neto_mb": e["neto_mb"],
+                    "sitio_principal": e["top"][0]["sitio"] if e["top"] else "",
+                    "mb_sitio": e["top"][0]["mb"] if e["top"] else 0.0,
+                }
+                for e in perfil["etapas"]
+            ]), hide_index=True, use_container_width=True)
@@ -0,0 +1,199 @@
+"""
+Vistas precalculadas de una corrida, compartidas por todas las paginas.
+
+Cada pagina re-derivaba en cada rerun sus subconjuntos de
+resultado["resultados"] / detalle_facturas (copias + mascaras + groupby). Aca
+se calculan una sola vez al terminar la corrida y se guardan en
+resultado["vistas"]; las paginas solo las leen (no las modifican).
+
+Vistas:
+  - cobros / pagos: movimientos de credito / debito (sin gastos bancarios)
+  - cobros_sin_identificar / pagos_sin_identificar: EXCLUDED o no_match
+  - excepciones_banco: resultado["excepciones"]
+  - excepciones_contagram: facturas "Sin Match"
+  - facturas_pendientes / facturas_conciliadas: detalle por estado
+  - por_cliente: facturas agrupadas por cliente (monto, cantidad, ultima factura)
+  - por_banco: KPIs por banco (de stats["por_banco"])
+"""
+from collections.abc import Mapping
+
+import pandas as pd
+
+
+def _cobros(df: pd.DataFrame) -> pd.DataFrame:
+    if df.empty:
+        return pd.DataFrame()
+    if "tipo" in df.columns:
+        return df[df["tipo"] == "CREDITO"]
+    if "clasificacion" in df.columns:
+        return df[df["clasificacion"] == "cobranza"]
+    return df
+
+
+def _pagos(df: pd.DataFrame) -> pd.DataFrame:
+    if df.empty:
+        return pd.DataFrame()
+    if "tipo" in df.columns:
+        df = df[df["tipo"] == "DEBITO"]
+    elif "clasificacion" in df.columns:
+        df = df[df["clasificacion"] == "pago_proveedor"]
+    if "clasificacion" in df.columns:
+        df = df[df["clasificacion"] != "gasto_bancario"]
+    return df
+
+
+def columna_match(df: pd.DataFrame) -> str:
+    """Columna de nivel de match: match_nivel (dashboard) o conciliation_status."""
+    return "match_nivel" if "match_nivel" in df.columns else "conciliation_status"
+
+
+def _sin_identificar(df: pd.DataFrame) -> pd.DataFrame:
+    """Movimientos EXCLUDED o no_match."""
+    if df.empty:
+        return df
+    mascara = pd.Series(False, index=df.index)
+    if "conciliation_status" in df.columns:
+        mascara = mascara | (df["conciliation_status"] == "EXCLUDED")
+    col = columna_match(df)
+    if col in df.columns:
+        mascara = mascara | (df[col] == "no_match")
+    return df[mascara]
+
+
+def _por_cliente(detalle: pd.DataFrame) -> pd.DataFrame:
+    """Facturas por cliente; "Sin Match Total" es True si ninguna factura esta conciliada."""
+    if detalle.empty or "Cliente" not in detalle.columns or "Estado Conciliacion" not in detalle.columns:
+        return pd.DataFrame()
+    agg = {
+        "Total Venta": "sum",
+        "Estado Conciliacion": lambda x: (x != "Conciliada").all(),
+    }
+    if "Nro Factura" in detalle.columns:
+        agg["Nro Factura"] = "count"
+    if "Fecha Emision" in detalle.columns:
+        agg["Fecha Emision"] = "max"
+    por_cliente = detalle.groupby("Cliente").agg(agg).reset_index()
+    return por_cliente.rename(columns={
+        "Estado Conciliacion": "Sin Match Total",
+        "Total Venta": "Monto Pendiente",
+        "Nro Factura": "Cant. Facturas",
+        "Fecha Emision": "Última Factura",
+    })
+
+
+def _por_banco(stats: dict) -> pd.DataFrame:
+    filas = []
+    for banco, data in (stats or {}).get("por_banco", {}).items():
+        total = max(data.get("movimientos", 1), 1)
+        probable = data.get("probable_duda_id", 0) + data.get("probable_dif_cambio", 0)
+        filas.append({
+            "Banco": banco,
+            "Movs": data.get("movimientos", 0),
+            "Exacto": data.get("match_exacto", 0),
+            "Probable": probable,
+            "Sin Match": data.get("no_match", 0),
+            "% Exacto": round(data.get("match_exacto", 0) / total * 100, 1),
+            "% Probable": round(probable / total * 100, 1),
+            "% Sin Match": round(data.get("no_match", 0) / total * 100, 1),
+            "Monto Creditos": data.get("monto_creditos", 0),
+            "Monto Debitos": data.get("monto_debitos", 0),
+        })
+    return pd.DataFrame(filas)
+
+
+def construir_vistas(
+    resultados: pd.DataFrame,
+    detalle_facturas: pd.DataFrame,
+    excepciones: pd.DataFrame,
+    stats: dict,
+) -> dict:
+    """Calcula todas las vistas de una corrida (una sola vez)."""
+    resultados = resultados if resultados is not None else pd.DataFrame()
+    detalle = detalle_facturas if detalle_facturas is not None else pd.DataFrame()
+
+    cobros = _cobros(resultados)
+    pagos = _pagos(resultados)
+
+    if not detalle.empty and "Estado Conciliacion" in detalle.columns:
+        estado = detalle["Estado Conciliacion"]
+        pendientes = detalle[estado != "Conciliada"]
+        conciliadas = detalle[estado == "Conciliada"]
+        sin_match = detalle[estado == "Sin Match"]
+    else:
+        pendientes = conciliadas = sin_match = pd.DataFrame()
+
+    return {
+        "cobros": cobros,
+        "pagos": pagos,
+        "cobros_sin_identificar": _sin_identificar(cobros),
+        "pagos_sin_identificar": _sin_identificar(pagos),
+        "excepciones_banco": excepciones if excepciones is not None else pd.DataFrame(),
+        "excepciones_contagram": sin_match,
+        "facturas_pendientes": pendientes,
+        "facturas_conciliadas": conciliadas,
+        "por_cliente": _por_cliente(detalle),
+        "por_banco": _por_banco(stats),
+    }
+
+
+def obtener_vistas(resultado: dict) -> dict:
+    """Vistas de la corrida; si el resultado no las trae (corridas viejas), las calcula y guarda."""
+    vistas = resultado.get("vistas")
+    if vistas is None:
+        vistas = construir_vistas(
+            resultado.get("resultados"),
+            resultado.get("detalle_facturas"),
+            resultado.get("excepciones"),
+            resultado.get("stats"),
+        )
+        resultado["vistas"] = vistas
+    return vistas
+
+
+# Vistas que son un subconjunto de filas de una tabla base del resultado
+VISTAS_DE_RESULTADOS = ("cobros", "pagos", "cobros_sin_identificar", "pagos_sin_identificar")
+VISTAS_DE_DETALLE = ("facturas_pendientes", "facturas_conciliadas", "excepciones_contagram")
+
+
+class VistasPorIndice(Mapping):
+    """
+    Vistas guardadas como indices de filas sobre las tablas base del resultado.
+
+    En vez de retener una copia de cada subconjunto (cobros, pagos, facturas
+    pendientes...), guarda solo sus etiquetas de fila y arma el DataFrame al
+    leerlo (un .loc sobre la tabla base, sin recalcular mascaras ni groupby).
+    Las vistas que no son subconjuntos (agregados, excepciones) se guardan tal cual.
+    """
+
+    def __init__(self, vistas: dict, resultados: pd.DataFrame, detalle_facturas: pd.DataFrame):
+        self._bases = {"resultados": resultados, "detalle_facturas": detalle_facturas}
+        self._indices = {}
+        self._directas = {}
+        for nombre, vista in vistas.items():
+            base = "resultados" if nombre in VISTAS_DE_RESULTADOS else (
+                "detalle_facturas" if nombre in VISTAS_DE_DETALLE else None
+            )
+            tabla = self._bases.get(base)
+            if tabla is not None and not vista.empty and list(vista.columns) == list(tabla.columns):
+                self._indices[nombre] = (base, vista.index)
+            else:
+                self._directas[nombre] = vista
+
+    def __getitem__(self, nombre):
+        if nombre in self._directas:
+            return self._directas[nombre]
+        base, indice = self._indices[nombre]
+        return self._bases[base].loc[indice]
+
+    def __iter__(self):
+        return iter([*self._indices, *self._directas])
+
+    def __len__(self):
+        return len(self._indices) + len(self._directas)
+
+    def bytes_propios(self) -> int:
+        """Memoria de lo que guarda la vista (indices + vistas directas), sin las tablas base."""
+        total = sum(indice.memory_usage(deep=True) for _, indice in self._indices.values())
+        return total + sum(
+            v.memory_usage(deep=True).sum() for v in self._directas.values() if isinstance(v, pd.DataFrame)
+        )
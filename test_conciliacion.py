@@ -1,18 +1,52 @@
 """
 Test end-to-end del motor de conciliacion con logica ternaria.
 """
+import copy
+import json
+import multiprocessing
+import numpy as np
 import pandas as pd
 import os
+import sqlite3
 import sys
+import tempfile
+import time
 
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from src.normalizador import normalizar, detectar_banco
 from src.clasificador import clasificar_extracto
 from src.motor_conciliacion import MotorConciliacion
+from src.matcher import MATCH_CONFIG
+from src.conciliacion_incremental import ruta_estado as estado_incremental
+from src.store_local import StoreLocal
+from src.cache_resultados import CacheResultados
+import src.cache_resultados as modulo_cache
+from src.pipeline import cache_etapas
+from src.candidatos import TablaCandidatos, barrido_tolerancias, simular
+from src.conciliador_real import conciliar_real
+from src.normalizador_contagram import normalizar_ventas_contagram
+from src.busqueda import IndiceBusqueda, indice_sesion
+from src.vistas import obtener_vistas
+from src.jobs import GestorTrabajos, adjuntar_trabajo
+from src.compacto import compactar_resultado, memoria_sesion
+from src.eventos import CORRIDA_FIN, CORRIDA_INICIO, ETAPA_FIN, ETAPA_INICIO, PROGRESO
+from benchmark_conciliacion import (
+    ETAPAS, cargar_datos_diciembre, comparar_con_baseline, ejecutar_benchmark, escalar_datos,
+)
+from src.generador_datos import generar_datos, guardar_datos
+from src.combinatoria import MAX_COMBINACIONES, NOTA_TRUNCADA, Busqueda, contar_combinaciones
+from src.escenarios_estres import correr_escenario, escenarios_default, textos_unicode_largos
+from src.fuzzy_matcher import calcular_similitud
+from src.perfil_memoria import VARIABLE_ENTORNO
+from src import tracing
+from src.db_connector import insertar_conciliacion, leer_historico
+import conciliar
+import conciliar_lote
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DATA_DIR = os.path.join(BASE_DIR, "data")
+DATA_REAL_DIR = os.path.join(DATA_DIR, "Data_real_diciembre")
 
 
 def test_normalizacion():
@@ -119,6 +153,12 @@ def test_motor_ternario():
     assert stats['tasa_conciliacion_total'] > 80, f"FAIL: tasa total baja ({stats['tasa_conciliacion_total']}%)"
     assert stats['match_exacto'] > 0, "FAIL: no hay matches exactos"
 
+    # Un override de tolerancias no debe filtrarse a la corrida siguiente
+    config_original = dict(MATCH_CONFIG)
+    motor.procesar(extractos, ventas, compras, match_config={"umbral_id_exacto": 0.99})
+    assert MATCH_CONFIG == config_original, "FAIL: match_config modifico MATCH_CONFIG global"
+    assert motor.procesar(extractos, ventas, compras)["stats"] == stats, "FAIL: override filtrado a otra corrida"
+
     output_dir = os.path.join(BASE_DIR, "output")
     os.makedirs(output_dir, exist_ok=True)
     df_cob.to_csv(os.path.join(output_dir, "subir_cobranzas_contagram.csv"), index=False, encoding="utf-8-sig")
@@ -130,10 +170,1198 @@ def test_motor_ternario():
     print("  PASSED\n")
 
 
+def _cargar_datos_reales():
+    banco = pd.read_excel(os.path.join(DATA_REAL_DIR, "Banco Ventas diciembre - Santander.xlsx"))
+    ventas = pd.read_excel(os.path.join(DATA_REAL_DIR, "Listado de Ventas Dic Dilcor - contagram.xlsx"))
+    return banco, ventas
+
+
+def test_conciliacion_incremental():
+    print("=" * 60)
+    print("TEST 4: Conciliacion incremental vs corrida completa")
+    print("=" * 60)
+
+    banco, ventas = _cargar_datos_reales()
+
+    completo = MotorConciliacion(pd.DataFrame()).procesar_real([banco], ventas)
+
+    # Dia 1: primera mitad del mes. Dia 2: extracto completo.
+    fechas = normalizar(banco, detectar_banco(banco))["fecha"]
+    corte = fechas.sort_values().iloc[len(fechas) // 2]
+    primera_mitad = banco[(fechas <= corte).values]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        ruta_estado = os.path.join(tmp, "estado.json")
+        dia1 = MotorConciliacion(pd.DataFrame()).procesar_real_incremental([primera_mitad], ventas, ruta_estado)
+        dia2 = MotorConciliacion(pd.DataFrame()).procesar_real_incremental([banco], ventas, ruta_estado)
+
+    info = dia2["incremental"]
+    print(f"  Dia 1: {dia1['incremental']['movimientos_nuevos']} movimientos nuevos")
+    print(f"  Dia 2: {info['movimientos_nuevos']} nuevos, {info['movimientos_reutilizados']} reutilizados")
+
+    assert info["movimientos_reutilizados"] == len(primera_mitad)
+    assert info["movimientos_nuevos"] == len(banco) - len(primera_mitad)
+    assert info["recalculo_completo"] is None
+    pd.testing.assert_frame_equal(dia2["resultados"], completo["resultados"])
+    assert dia2["stats"] == completo["stats"]
+
+    # Contagram del dia 1 sin las facturas de algunos clientes ya cobrados: esos
+    # creditos quedan sin match y al dia siguiente se concilian contra las nuevas
+    res = completo["resultados"]
+    cuits = sorted(set(res.loc[(res["fecha"] <= corte) & (res["conciliation_status"] == "MATCHED"), "cuit_banco"]))[:5]
+    ventas_dia1 = ventas[~ventas["CUIT"].astype(str).str.replace(r"\D", "", regex=True).isin(cuits)]
+    with tempfile.TemporaryDirectory() as tmp:
+        ruta_estado = os.path.join(tmp, "estado.json")
+        dia1 = MotorConciliacion(pd.DataFrame()).procesar_real_incremental([primera_mitad], ventas_dia1, ruta_estado)
+        dia2 = MotorConciliacion(pd.DataFrame()).procesar_real_incremental([banco], ventas, ruta_estado)
+    sin_factura = dia1["resultados"]["cuit_banco"].isin(cuits)
+    assert sin_factura.any() and (dia1["resultados"].loc[sin_factura, "conciliation_status"] != "MATCHED").all()
+    assert dia2["incremental"]["movimientos_reevaluados"] > 0
+    pd.testing.assert_frame_equal(dia2["resultados"], completo["resultados"])
+    assert dia2["stats"] == completo["stats"]
+
+    # Movimientos nuevos con fecha anterior a los guardados: corrida completa
+    segunda_mitad = banco[(fechas > corte).values]
+    with tempfile.TemporaryDirectory() as tmp:
+        ruta_estado = os.path.join(tmp, "estado.json")
+        MotorConciliacion(pd.DataFrame()).procesar_real_incremental([segunda_mitad], ventas, ruta_estado)
+        dia2 = MotorConciliacion(pd.DataFrame()).procesar_real_incremental([banco], ventas, ruta_estado)
+    assert dia2["incremental"]["recalculo_completo"].startswith("movimientos nuevos con fecha anterior")
+    assert dia2["incremental"]["movimientos_reutilizados"] == 0
+    pd.testing.assert_frame_equal(dia2["resultados"], completo["resultados"])
+
+    # Factura nueva de un cliente que ya tenia creditos conciliados: corrida completa
+    cuits_ventas = ventas["CUIT"].astype(str).str.replace(r"\D", "", regex=True)
+    conciliados = res.loc[(res["fecha"] <= corte) & (res["conciliation_status"] == "MATCHED"), "cuit_banco"]
+    cuit = next(c for c in sorted(set(conciliados)) if (cuits_ventas == c).sum() >= 3)
+    ventas_dia1 = ventas.drop(ventas.index[cuits_ventas == cuit][-1:])
+    with tempfile.TemporaryDirectory() as tmp:
+        ruta_estado = os.path.join(tmp, "estado.json")
+        dia1 = MotorConciliacion(pd.DataFrame()).procesar_real_incremental([primera_mitad], ventas_dia1, ruta_estado)
+        dia2 = MotorConciliacion(pd.DataFrame()).procesar_real_incremental([banco], ventas, ruta_estado)
+    res1 = dia1["resultados"]
+    assert (res1.loc[res1["cuit_banco"] == cuit, "conciliation_status"] == "MATCHED").any()
+    assert dia2["incremental"]["recalculo_completo"] == f"ventas nuevas de un cliente ya conciliado (CUIT {cuit})"
+    pd.testing.assert_frame_equal(dia2["resultados"], completo["resultados"])
+    assert dia2["stats"] == completo["stats"]
+    print(f"  Recalculo completo: {dia2['incremental']['recalculo_completo']}")
+
+    # Un archivo de estado por banco + filtros
+    base = estado_incremental("estados", [banco])
+    assert base == estado_incremental("estados", [banco], filtro_tipo_movimiento="Ambos")
+    assert base != estado_incremental("estados", [banco], filtro_tipo_movimiento="Solo Créditos")
+    assert base != estado_incremental("estados", [banco], medios_pago_filtro=["Santander"])
+    print("  PASSED\n")
+
+
+def test_store_local():
+    print("=" * 60)
+    print("TEST 5: Historico local (SQLite)")
+    print("=" * 60)
+
+    banco, ventas = _cargar_datos_reales()
+    resultado = MotorConciliacion(pd.DataFrame()).procesar_real([banco], ventas)
+    res = resultado["resultados"]
+    sin_match = (resultado["detalle_facturas"]["Estado Conciliacion"] == "Sin Match").sum()
+    creditos_excluidos = ((res["tipo"] == "CREDITO") & (res["conciliation_status"] == "EXCLUDED")).sum()
+
+    with StoreLocal(":memory:") as store:
+        store.guardar_corrida(resultado)
+        store.guardar_corrida(resultado)  # misma corrida dos veces: no duplica abiertas
+
+        assert len(store.corridas()) == 2
+        abiertas = store.facturas_abiertas()
+        assert len(abiertas) == sin_match
+        assert len(store.creditos_sin_match(dias=0, hoy="2026-02-01")) == creditos_excluidos
+
+        cuit = abiertas["cuit"].dropna().iloc[0]
+        assert (store.facturas_abiertas(cuit)["cuit"] == cuit).all()
+
+        print(f"  Facturas abiertas: {len(abiertas)}")
+        print(f"  Creditos sin match: {creditos_excluidos}")
+    print("  PASSED\n")
+
+
+def _resultados_demo():
+    extractos = [
+        pd.read_csv(os.path.join(DATA_DIR, "test", f))
+        for f in ["extracto_galicia_dic2025.csv", "extracto_santander_dic2025.csv", "extracto_mercadopago_dic2025.csv"]
+    ]
+    ventas = pd.read_csv(os.path.join(DATA_DIR, "contagram", "ventas_pendientes_dic2025.csv"))
+    compras = pd.read_csv(os.path.join(DATA_DIR, "contagram", "compras_pendientes_dic2025.csv"))
+    tabla_param = pd.read_csv(os.path.join(DATA_DIR, "config", "tabla_parametrica.csv"))
+    return MotorConciliacion(tabla_param).procesar(extractos, ventas, compras)["resultados"]
+
+
+def _historico_sqlite():
+    """Stand-in SQLite de la tabla historico_conciliaciones de TiDB."""
+    conn = sqlite3.connect(":memory:")
+    conn.execute("""
+        CREATE TABLE historico_conciliaciones (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            fecha_ejecucion TEXT NOT NULL, fecha_movimiento TEXT, banco TEXT, tipo TEXT,
+            clasificacion TEXT, descripcion TEXT, monto REAL, match_nivel TEXT,
+            match_detalle TEXT, confianza REAL, nombre_contagram TEXT, id_contagram INTEGER,
+            cuit TEXT, factura_match TEXT, monto_factura REAL, diferencia_monto REAL,
+            diferencia_pct REAL, referencia TEXT,
+            run_id TEXT, clave_movimiento TEXT, hash_fila TEXT,
+            UNIQUE (run_id, clave_movimiento)
+        )
+    """)
+    return conn
+
+
+def test_upsert_lotes_historico():
+    print("=" * 60)
+    print("TEST 6: Upsert por lotes en historico_conciliaciones")
+    print("=" * 60)
+
+    df = _resultados_demo()
+    conn = _historico_sqlite()
+    res = insertar_conciliacion(conn, df, run_id="corrida1", batch_size=7)
+
+    assert res["registros_insertados"] == len(df)
+    assert res["filas_por_segundo"] > 0
+    n = conn.execute("SELECT COUNT(*) FROM historico_conciliaciones").fetchone()[0]
+    assert n == len(df)
+    total = conn.execute("SELECT SUM(monto) FROM historico_conciliaciones").fetchone()[0]
+    assert abs(total - df["monto"].sum()) < 0.01
+    fecha = conn.execute("SELECT fecha_movimiento FROM historico_conciliaciones WHERE id = 1").fetchone()[0]
+    assert fecha == df["fecha"].iloc[0].strftime("%Y-%m-%d")
+    print(f"  {res['registros_insertados']} filas en {res['segundos']}s ({res['filas_por_segundo']:,.0f} filas/s)")
+
+    # Guardar de nuevo la misma corrida: no escribe nada
+    res = insertar_conciliacion(conn, df, run_id="corrida1", batch_size=7)
+    assert res["registros_insertados"] == 0 and res["registros_actualizados"] == 0
+    assert res["registros_sin_cambios"] == len(df)
+
+    # Una fila cambiada: solo esa se actualiza
+    df_mod = df.copy()
+    df_mod.loc[df_mod.index[0], "match_nivel"] = "no_match"
+    res = insertar_conciliacion(conn, df_mod, run_id="corrida1", batch_size=7)
+    assert res["registros_actualizados"] == 1 and res["registros_insertados"] == 0
+    n = conn.execute("SELECT COUNT(*) FROM historico_conciliaciones").fetchone()[0]
+    assert n == len(df)
+    conn.close()
+    print("  Re-guardado idempotente: OK")
+    print("  PASSED\n")
+
+
+def test_historico_paginado():
+    print("=" * 60)
+    print("TEST 7: Lectura paginada del historico (keyset)")
+    print("=" * 60)
+
+    df = _resultados_demo()
+    conn = _historico_sqlite()
+    insertar_conciliacion(conn, df, run_id="corrida1")
+    # Una fila sin fecha: debe aparecer al final de la ultima pagina
+    conn.execute(
+        "INSERT INTO historico_conciliaciones (fecha_ejecucion, run_id, clave_movimiento, monto) "
+        "VALUES ('2026-01-01', 'corrida1', 'sin_fecha', 1)"
+    )
+
+    ids, paginas, cursor = [], 0, None
+    while True:
+        pagina = leer_historico(conn, columnas=["id", "monto"], limite=50, despues_de=cursor)
+        assert list(pagina["filas"].columns) == ["id", "monto"]
+        ids.extend(pagina["filas"]["id"].tolist())
+        paginas += 1
+        cursor = pagina["siguiente"]
+        if cursor is None:
+            break
+    assert len(ids) == len(df) + 1
+    assert len(set(ids)) == len(ids), "FAIL: filas repetidas entre paginas"
+    assert cursor is None and paginas == (len(df) + 1 + 49) // 50
+
+    fechas = leer_historico(conn, limite=len(df) + 10)["filas"]["fecha_movimiento"]
+    assert pd.isna(fechas.iloc[-1])
+    assert fechas.iloc[:-1].is_monotonic_decreasing
+
+    # Filtros
+    nivel = df["match_nivel"].iloc[0]
+    filtrado = leer_historico(conn, status=[nivel], fecha_desde="2025-12-01", fecha_hasta="2025-12-31", limite=10_000)
+    esperado = (df["match_nivel"] == nivel).sum()
+    assert len(filtrado["filas"]) == esperado
+    assert (filtrado["filas"]["match_nivel"] == nivel).all()
+
+    cuit = df["cuit"].dropna().loc[lambda c: c != ""].iloc[0]
+    por_cuit = leer_historico(conn, cuit=cuit, limite=10_000)["filas"]
+    assert len(por_cuit) == (df["cuit"] == cuit).sum()
+    conn.close()
+
+    print(f"  {len(ids)} filas en {paginas} paginas de 50")
+    print("  PASSED\n")
+
+
+def test_cache_resultados():
+    print("=" * 60)
+    print("TEST 8: Cache de resultados por corrida")
+    print("=" * 60)
+
+    banco, ventas = _cargar_datos_reales()
+    cache = CacheResultados(max_corridas=2)
+    llamadas = []
+
+    def correr(config):
+        motor = MotorConciliacion(pd.DataFrame())
+        run_id = motor.id_corrida_real([banco], ventas, match_config=config)
+
+        def calcular():
+            llamadas.append(run_id)
+            return motor.procesar_real([banco], ventas, match_config=config)
+
+        return cache.obtener_o_calcular(run_id, calcular)
+
+    r1, hit1 = correr(None)
+    r2, hit2 = correr(None)
+    assert not hit1 and hit2 and len(llamadas) == 1
+    pd.testing.assert_frame_equal(r1["resultados"], r2["resultados"])
+    assert r1["run_id"] == r2["run_id"]
+
+    # Con Copy-on-Write (pandas 3) el resultado devuelto comparte los datos del
+    # cache; con pandas 2 es una copia. En los dos casos escribir sobre lo
+    # devuelto no altera el cache
+    cacheado = cache._datos[r1["run_id"]]["resultados"]
+    montos = cacheado["monto"].tolist()
+    assert r2["resultados"] is not cacheado
+    if modulo_cache.COPY_ON_WRITE:
+        assert np.shares_memory(r2["resultados"]["monto"].to_numpy(), cacheado["monto"].to_numpy())
+    copy_on_write_real = modulo_cache.COPY_ON_WRITE
+    for copy_on_write in sorted({copy_on_write_real, False}):
+        modulo_cache.COPY_ON_WRITE = copy_on_write
+        try:
+            r2, _ = correr(None)
+        finally:
+            modulo_cache.COPY_ON_WRITE = copy_on_write_real
+        r2["resultados"].loc[r2["resultados"].index[0], "monto"] = -1.0
+        r2["resultados"].iloc[1:, r2["resultados"].columns.get_loc("monto")] = 0.0
+        r2["resultados"]["columna_nueva"] = 1
+        r2["resultados"]["monto"] = 0
+        r2["stats"]["cobros"]["match_exacto"] = -1
+        r3, _ = correr(None)
+        assert r3["resultados"]["monto"].tolist() == montos, copy_on_write
+        assert "columna_nueva" not in r3["resultados"].columns
+        assert r3["stats"]["cobros"]["match_exacto"] >= 0
+
+    # Las huellas de los archivos se calculan una vez y dan el mismo run_id
+    motor = MotorConciliacion(pd.DataFrame())
+    huellas = motor.huellas_real([banco], ventas)
+    assert motor.id_corrida_real([banco], ventas, huellas=huellas) == r1["run_id"]
+    import src.motor_conciliacion as modulo_motor
+    import src.pipeline as modulo_pipeline
+    hasheados = []
+    original = modulo_motor.hash_dataframe
+
+    def contar(df):
+        hasheados.append(len(df))
+        return original(df)
+
+    modulo_motor.hash_dataframe = modulo_pipeline.hash_dataframe = contar
+    try:
+        motor.procesar_real([banco], ventas)
+    finally:
+        modulo_motor.hash_dataframe = modulo_pipeline.hash_dataframe = original
+    assert sorted(hasheados) == sorted([len(banco), len(ventas)]), hasheados
+
+    # Otra tolerancia es otra corrida; con max 2, la menos usada sale del cache
+    _, hit = correr({"tolerancia_monto_pct": 0.01})
+    assert not hit
+    correr({"tolerancia_monto_pct": 0.02})
+    assert len(cache) == 2
+    _, hit = correr({"tolerancia_monto_pct": 0.02})
+    assert hit
+    print(f"  hits={cache.hits} misses={cache.misses} corridas ejecutadas={len(llamadas)}")
+    print("  PASSED\n")
+
+
+def test_pipeline_etapas():
+    print("=" * 60)
+    print("TEST 9: Pipeline real con etapas memoizadas")
+    print("=" * 60)
+
+    banco, ventas = _cargar_datos_reales()
+    cache_etapas.limpiar()
+    MotorConciliacion(pd.DataFrame()).procesar_real([banco], ventas)
+
+    config = {"tolerancia_monto_pct": 0.01}
+    r = MotorConciliacion(pd.DataFrame()).procesar_real([banco], ventas, match_config=config)
+    en_cache = {t["etapa"]: t["cache"] for t in r["tiempos_etapas"]}
+    for t in r["tiempos_etapas"]:
+        print(f"  {t['etapa']:<25} {t['segundos']:.3f}s {'(cache)' if t['cache'] else ''}")
+
+    # Cambiar una tolerancia solo re-ejecuta conciliacion y salidas
+    assert en_cache["normalizar_extracto"] and en_cache["normalizar_ventas"]
+    assert not en_cache["conciliar"] and not en_cache["salidas"]
+
+    # Mismo resultado que sin cache
+    cache_etapas.limpiar()
+    limpio = MotorConciliacion(pd.DataFrame()).procesar_real([banco], ventas, match_config=config)
+    pd.testing.assert_frame_equal(r["resultados"], limpio["resultados"])
+    pd.testing.assert_frame_equal(r["detalle_facturas"], limpio["detalle_facturas"])
+    assert r["stats"] == limpio["stats"]
+    print("  PASSED\n")
+
+
+def test_tabla_candidatos():
+    print("=" * 60)
+    print("TEST 10: Tabla de candidatos (what-if de tolerancias)")
+    print("=" * 60)
+
+    banco, ventas = _cargar_datos_reales()
+    extracto = normalizar(banco, detectar_banco(banco))
+    ventas_norm = normalizar_ventas_contagram(ventas)
+    tabla = TablaCandidatos(extracto, ventas_norm)
+    print(f"  Pares candidatos: {len(tabla.tabla)}")
+
+    # Mismo resultado que conciliar_real con la config default y con otras
+    configs = [
+        None,
+        {"tolerancia_monto_pct": 0.02, "tolerancia_monto_abs": 500.0, "ventana_dias_nivel1": 10},
+        {"ventana_dias_nivel1": 5, "ventana_dias_nivel2": 7},
+    ]
+    for config in configs:
+        inicio = time.perf_counter()
+        df, usadas = tabla.asignar(config)
+        segundos = time.perf_counter() - inicio
+        esperado, usadas_esperadas = conciliar_real(extracto, ventas_norm, config)
+        pd.testing.assert_frame_equal(df, esperado)
+        assert usadas == usadas_esperadas
+        print(f"  {config}: {segundos:.3f}s")
+        assert segundos < 1.0
+
+    # Fuera de los limites de la tabla no se puede re-umbralizar
+    try:
+        tabla.asignar({"tolerancia_monto_pct": 0.5})
+        assert False, "Deberia fallar fuera de los limites"
+    except ValueError:
+        pass
+    print("  PASSED\n")
+
+
+def test_barrido_tolerancias():
+    print("=" * 60)
+    print("TEST 11: Barrido de calibracion de tolerancias")
+    print("=" * 60)
+
+    banco, ventas = _cargar_datos_reales()
+    extracto = normalizar(banco, detectar_banco(banco))
+    tabla = TablaCandidatos(extracto, normalizar_ventas_contagram(ventas))
+
+    grilla = {
+        "tolerancia_monto_pct": [0.001, 0.005, 0.02],
+        "tolerancia_monto_abs": [1.0, 500.0],
+        "ventana_dias_nivel1": [15, 30],
+    }
+    inicio = time.perf_counter()
+    barrido = barrido_tolerancias(tabla, grilla)
+    print(f"  {len(barrido)} puntos en {time.perf_counter() - inicio:.2f}s")
+    assert len(barrido) == 12
+
+    # Cada punto coincide con la asignacion completa
+    fila = barrido[
+        (barrido["tolerancia_monto_pct"] == 0.005)
+        & (barrido["tolerancia_monto_abs"] == 1.0)
+        & (barrido["ventana_dias_nivel1"] == 30)
+    ].iloc[0]
+    df, _ = tabla.asignar()
+    cob = df[df["clasificacion"] == "cobranza"]
+    assert fila["matched"] == (cob["conciliation_status"] == "MATCHED").sum()
+    assert fila["suggested"] == (cob["conciliation_status"] == "SUGGESTED").sum()
+    assert fila["excluded"] == (cob["conciliation_status"] == "EXCLUDED").sum()
+    assert abs(fila["monto_matched"] - cob[cob["conciliation_status"] == "MATCHED"]["monto"].sum()) < 0.01
+
+    # simular (what-if de Inicio) da los mismos KPIs que los stats de la corrida completa
+    config_wi = {"tolerancia_monto_pct": 0.02, "ventana_dias_nivel1": 15}
+    completo = MotorConciliacion(pd.DataFrame()).procesar_real([banco], ventas, match_config=config_wi)
+    kpis, cob_stats = simular(completo["tabla_candidatos"], config_wi), completo["stats"]["cobros"]
+    assert (kpis["matched"], kpis["suggested"], kpis["excluded"], kpis["tasa_conciliacion"]) == (
+        cob_stats["match_exacto"], cob_stats["probable_duda_id"], cob_stats["no_match"], cob_stats["tasa_conciliacion"],
+    )
+
+    # En estos datos, la grilla mas floja da al menos tantos matches como la mas estricta
+    assert barrido.groupby("ventana_dias_nivel1")["matched"].apply(
+        lambda s: s.iloc[-1] >= s.iloc[0]
+    ).all()
+
+    try:
+        barrido_tolerancias(tabla, {"tolerancia_inventada": [1]})
+        assert False, "Deberia rechazar parametros desconocidos"
+    except ValueError:
+        pass
+    print("  PASSED\n")
+
+
+def test_busqueda_indexada():
+    print("=" * 60)
+    print("TEST 12: Busqueda indexada en tablas de resultados")
+    print("=" * 60)
+
+    df = pd.DataFrame({
+        "Cliente": ["PRITTY S.A.", "Placeres Terrenales", None, "Distribuidora Norte"],
+        "CUIT": ["30-50012345-6", "20-11111111-1", "27-22222222-2", ""],
+        "Nro Factura": ["A-0001-00001234", "A-0001-00005678", "B-0002-00000001", "A-0001-00009999"],
+        "Total Venta": [150000.0, 89999.5, 1200.0, 150000.0],
+        "Medio de Cobro": ["Santander", "Caja GRANDE", "Santander", "Santander"],
+    })
+    indice = IndiceBusqueda(df)
+    assert "Medio de Cobro" not in indice.columnas
+
+    assert list(indice.filtrar(df, "pritty").index) == [0]
+    assert list(indice.filtrar(df, "30500123456").index) == [0]      # CUIT sin guiones
+    assert list(indice.filtrar(df, "30-50012345").index) == [0]
+    assert list(indice.filtrar(df, "150000").index) == [0, 3]        # monto
+    assert list(indice.filtrar(df, "00005678").index) == [1]         # factura
+    assert list(indice.filtrar(df, "a-0001 norte").index) == [3]     # AND de palabras
+    assert indice.filtrar(df, "(").empty                             # sin regex
+    assert len(indice.filtrar(df, "  ")) == len(df)
+
+    # Sobre un subconjunto filtrado de la tabla original
+    sub = df[df["Total Venta"] > 1000]
+    assert list(indice.filtrar(sub, "terrenales").index) == [1]
+
+    # Cache por corrida + tabla en el estado de sesion
+    estado = {}
+    assert indice_sesion(estado, "run1", "detalle", df) is indice_sesion(estado, "run1", "detalle", df)
+    assert indice_sesion(estado, "run2", "detalle", df) is not indice_sesion(estado, "run1", "detalle", df)
+    print("  PASSED\n")
+
+
+def test_vistas_precalculadas():
+    print("=" * 60)
+    print("TEST 13: Vistas precalculadas por corrida")
+    print("=" * 60)
+
+    banco, ventas = _cargar_datos_reales()
+    r = MotorConciliacion(pd.DataFrame()).procesar_real([banco], ventas)
+    vistas = r["vistas"]
+    df = r["resultados"]
+    det = r["detalle_facturas"]
+
+    assert vistas["cobros"].equals(df[df["tipo"] == "CREDITO"])
+    pagos = df[(df["tipo"] == "DEBITO") & (df["clasificacion"] != "gasto_bancario")]
+    assert vistas["pagos"].equals(pagos)
+    sin_ident = vistas["cobros_sin_identificar"]
+    assert ((sin_ident["conciliation_status"] == "EXCLUDED") | (sin_ident["match_nivel"] == "no_match")).all()
+    assert len(vistas["facturas_pendientes"]) + len(vistas["facturas_conciliadas"]) == len(det)
+    assert len(vistas["excepciones_contagram"]) == (det["Estado Conciliacion"] == "Sin Match").sum()
+    assert vistas["excepciones_banco"] is r["excepciones"]
+
+    por_cliente = vistas["por_cliente"]
+    assert abs(por_cliente["Monto Pendiente"].sum() - det["Total Venta"].sum()) < 0.01
+    assert por_cliente["Cant. Facturas"].sum() == len(det)
+    assert vistas["por_banco"]["Movs"].sum() == len(df)
+    print(f"  {len(vistas)} vistas, {len(por_cliente)} clientes, {len(vistas['por_banco'])} bancos")
+
+    # La etapa de vistas se sirve del cache si la corrida no cambia
+    r2 = MotorConciliacion(pd.DataFrame()).procesar_real([banco], ventas)
+    assert {t["etapa"]: t["cache"] for t in r2["tiempos_etapas"]}["vistas"]
+
+    # Resultados sin vistas (corridas viejas) las calculan al leerlas
+    viejo = {k: v for k, v in r.items() if k != "vistas"}
+    assert obtener_vistas(viejo)["cobros"].equals(vistas["cobros"])
+    assert "vistas" in viejo
+    print("  PASSED\n")
+
+
+def _esperar(trabajo, timeout=60):
+    limite = time.time() + timeout
+    while not trabajo.terminado and time.time() < limite:
+        time.sleep(0.05)
+    assert trabajo.terminado, "el trabajo no termino a tiempo"
+
+
+def test_trabajos_segundo_plano():
+    print("=" * 60)
+    print("TEST 14: Conciliacion en segundo plano (progreso + cancelacion)")
+    print("=" * 60)
+
+    banco, ventas = _cargar_datos_reales()
+    gestor = GestorTrabajos()
+    cache_etapas.limpiar()
+
+    # Corrida completa: progreso por etapa y por credito, resultado adjuntado
+    avances = []
+
+    def correr(trabajo):
+        def progreso(etapa, fraccion, detalle):
+            avances.append((etapa, fraccion, detalle))
+            trabajo.reportar(etapa, fraccion, detalle)
+        return MotorConciliacion(pd.DataFrame()).procesar_real([banco], ventas, progreso=progreso)
+
+    trabajo = gestor.lanzar(correr, sesion={"modo_real": True, "barrido_tolerancias": None})
+    _esperar(trabajo)
+    assert trabajo.estado == "terminado", trabajo.error
+    etapas = [e for e, _, _ in avances]
+    assert etapas[0] == "normalizar_extracto" and etapas[-1] == "fin"
+    assert any(e == "conciliar" and d for e, _, d in avances), "sin progreso por credito"
+    fracciones = [f for _, f, _ in avances]
+    assert fracciones == sorted(fracciones) and fracciones[-1] == 1.0
+    print(f"  {len(avances)} avisos de progreso, {trabajo.progreso()['segundos']} s")
+
+    estado = {"trabajo_id": trabajo.id, "barrido_tolerancias": "viejo"}
+    assert adjuntar_trabajo(estado, gestor) is trabajo
+    assert estado["resultado"] is trabajo.resultado and estado["modo_real"]
+    assert "trabajo_id" not in estado and "barrido_tolerancias" not in estado
+
+    # Cancelacion en medio de la asignacion: corta y no deja la etapa en cache
+    cfg = {"tolerancia_monto_abs": 3.0}
+
+    def correr_y_cancelar(trabajo):
+        def progreso(etapa, fraccion, detalle):
+            if etapa == "conciliar" and detalle.startswith("50/"):
+                trabajo.cancelar()
+            trabajo.reportar(etapa, fraccion, detalle)
+        return MotorConciliacion(pd.DataFrame()).procesar_real([banco], ventas, match_config=cfg, progreso=progreso)
+
+    cancelado = gestor.lanzar(correr_y_cancelar)
+    _esperar(cancelado)
+    assert cancelado.estado == "cancelado" and cancelado.resultado is None
+    assert cancelado.etapa == "conciliar"
+    estado = {"trabajo_id": cancelado.id, "resultado": "anterior"}
+    adjuntar_trabajo(estado, gestor)
+    assert estado["resultado"] == "anterior" and "trabajo_id" not in estado
+    print(f"  Cancelado en {cancelado.etapa} ({cancelado.detalle})")
+
+    r = MotorConciliacion(pd.DataFrame()).procesar_real([banco], ventas, match_config=cfg)
+    assert not {t["etapa"]: t["cache"] for t in r["tiempos_etapas"]}["conciliar"]
+    extracto = normalizar(banco, detectar_banco(banco)).sort_values("fecha").reset_index(drop=True)
+    esperado, _ = conciliar_real(extracto, normalizar_ventas_contagram(ventas), cfg)
+    pd.testing.assert_frame_equal(r["resultados"], esperado)
+
+    # Errores de la corrida quedan en el trabajo
+    fallido = gestor.lanzar(lambda trabajo: 1 / 0)
+    _esperar(fallido)
+    assert fallido.estado == "error" and "ZeroDivisionError" in fallido.error
+    print("  PASSED\n")
+
+
+def test_eventos_motor():
+    print("=" * 60)
+    print("TEST 15: Eventos del motor (etapas, filas, progreso)")
+    print("=" * 60)
+
+    banco, ventas = _cargar_datos_reales()
+    cache_etapas.limpiar()
+    motor = MotorConciliacion(pd.DataFrame())
+    eventos = []
+    quitar = motor.suscribir(eventos.append)
+    r = motor.procesar_real([banco], ventas)
+
+    tipos = [e["tipo"] for e in eventos]
+    assert tipos[0] == CORRIDA_INICIO and tipos[-1] == CORRIDA_FIN
+    assert eventos[0]["run_id"] == eventos[-1]["run_id"] == r["run_id"]
+    inicios = [e["etapa"] for e in eventos if e["tipo"] == ETAPA_INICIO]
+    fines = [e for e in eventos if e["tipo"] == ETAPA_FIN]
+    assert inicios == [t["etapa"] for t in r["tiempos_etapas"]] == [e["etapa"] for e in fines]
+    assert eventos[1]["filas_entrada"] == {"extractos": len(banco)}
+    fin_conciliar = next(e for e in fines if e["etapa"] == "conciliar")
+    assert fin_conciliar["filas_salida"]["resultados"] == len(r["resultados"])
+
+    progreso = [e for e in eventos if e["tipo"] == PROGRESO]
+    fases = {e["fase"] for e in progreso if e["etapa"] == "conciliar"}
+    assert fases == {"fase1", "desglose"}, fases
+    fracciones = [e["fraccion"] for e in eventos if "fraccion" in e]
+    assert fracciones == sorted(fracciones) and fracciones[-1] == 1.0
+    print(f"  {len(eventos)} eventos ({len(progreso)} de progreso) en {len(inicios)} etapas")
+
+    # Con etapas en cache no hay progreso interno, pero si inicio / fin
+    eventos.clear()
+    motor.procesar_real([banco], ventas)
+    assert all(e["cache"] for e in eventos if e["tipo"] == ETAPA_FIN)
+    assert not any(e["tipo"] == PROGRESO for e in eventos)
+
+    # Sin suscriptores no se emite nada
+    quitar()
+    eventos.clear()
+    motor.procesar_real([banco], ventas, match_config={"tolerancia_monto_abs": 2.0})
+    assert eventos == [] and not motor.eventos.activo
+
+    # Demo: progreso por movimiento desde el matcher
+    extracto = pd.read_csv(os.path.join(DATA_DIR, "test", "extracto_galicia_dic2025.csv")).head(60)
+    ventas_demo = pd.read_csv(os.path.join(DATA_DIR, "contagram", "ventas_pendientes_dic2025.csv"))
+    compras_demo = pd.read_csv(os.path.join(DATA_DIR, "contagram", "compras_pendientes_dic2025.csv"))
+    tabla_param = pd.read_csv(os.path.join(DATA_DIR, "config", "tabla_parametrica.csv"))
+    demo = MotorConciliacion(tabla_param)
+    eventos_demo = []
+    demo.suscribir(eventos_demo.append)
+    demo.procesar([extracto], ventas_demo, compras_demo)
+    etapas_demo = [e["etapa"] for e in eventos_demo if e["tipo"] == ETAPA_INICIO]
+    assert etapas_demo == ["normalizar", "clasificar", "matching", "salidas"]
+    hechos = [e["hechos"] for e in eventos_demo if e["tipo"] == PROGRESO]
+    assert hechos == list(range(0, 60, 25))
+    print(f"  Demo: {len(eventos_demo)} eventos")
+    print("  PASSED\n")
+
+
+def test_resultado_compacto():
+    print("=" * 60)
+    print("TEST 16: Resultado compacto en session_state")
+    print("=" * 60)
+
+    banco, ventas = _cargar_datos_reales()
+    r = MotorConciliacion(pd.DataFrame()).procesar_real([banco], ventas)
+    c = compactar_resultado(r)
+
+    df = c["resultados"]
+    for col in ["banco", "tipo", "clasificacion", "conciliation_status", "conciliation_tag", "match_nivel"]:
+        assert isinstance(df[col].dtype, pd.CategoricalDtype), col
+    assert isinstance(c["detalle_facturas"]["Estado Conciliacion"].dtype, pd.CategoricalDtype)
+    assert isinstance(c["cobranzas_csv"]["Status"].dtype, pd.CategoricalDtype)
+    # Mismos valores que las tablas originales
+    pd.testing.assert_frame_equal(df.astype(r["resultados"].dtypes.to_dict()), r["resultados"])
+    assert c["stats"] is r["stats"] and c["tabla_candidatos"] is r["tabla_candidatos"]
+
+    # Vistas: mismas filas, armadas desde la tabla base
+    for nombre, vista in r["vistas"].items():
+        compacta = c["vistas"][nombre]
+        assert list(compacta.index) == list(vista.index), nombre
+        assert list(compacta.columns) == list(vista.columns), nombre
+    assert set(c["vistas"]) == set(r["vistas"])
+    assert c["vistas"]["excepciones_banco"] is c["excepciones"]
+    assert obtener_vistas(c) is c["vistas"]
+    assert compactar_resultado(c) is c
+
+    # Reporte de memoria: la sesion compacta ocupa menos, sin contar dos veces
+    antes = memoria_sesion({"resultado": r, "datos_ventas": ventas})
+    despues = memoria_sesion({"resultado": c})
+    assert despues["MB"].sum() < antes["MB"].sum() * 0.6
+    duplicado = memoria_sesion({"resultado": c, "otra_clave": c["resultados"]})
+    assert abs(duplicado["MB"].sum() - despues["MB"].sum()) < 1e-9
+    print(f"  Sesion: {antes['MB'].sum():.2f} MB -> {despues['MB'].sum():.2f} MB")
+    print("  PASSED\n")
+
+
+def test_benchmark_escalado():
+    print("=" * 60)
+    print("TEST 17: Benchmark por etapas y comparacion con baseline")
+    print("=" * 60)
+
+    datos = cargar_datos_diciembre()
+    banco2, ventas2 = escalar_datos(*datos, 2)
+    assert len(banco2) == 2 * len(datos[0]) and len(ventas2) == 2 * len(datos[1])
+    assert ventas2["Id"].is_unique
+
+    resultado = ejecutar_benchmark([1, 2], datos=datos)
+    e1, e2 = resultado["escalas"]["1"], resultado["escalas"]["2"]
+    # Las etapas son las de PIPELINE_REAL (medidas desde perf, sin cache)
+    assert list(e1["etapas"]) == ETAPAS and "conciliar" in ETAPAS
+    assert all({"segundos", "pico_mb"} <= set(m) for m in e1["etapas"].values())
+    # Las replicas tienen CUIT propios: el doble de datos concilia el doble
+    assert e2["match_exacto"] == 2 * e1["match_exacto"] > 0
+
+    assert comparar_con_baseline(resultado, resultado) == []
+    lenta = copy.deepcopy(resultado)
+    lenta["escalas"]["2"]["etapas"]["conciliar"]["segundos"] += 5
+    regresiones = comparar_con_baseline(lenta, resultado)
+    assert [(r["escala"], r["etapa"], r["medida"]) for r in regresiones] == [("2", "conciliar", "segundos")]
+    print(f"  1x: {e1['total_segundos']:.2f}s, 2x: {e2['total_segundos']:.2f}s")
+    print("  PASSED\n")
+
+
+def test_generador_datos():
+    print("=" * 60)
+    print("TEST 18: Generador parametrico de datos (formato real)")
+    print("=" * 60)
+
+    params = dict(semilla=7, n_clientes=150, facturas_por_cliente=4, meses=2,
+                  pct_pagos_divididos=0.2, pct_mixtos=0.1, ruido_nombres=0.3)
+    extracto, ventas = generar_datos(**params)
+    otro_extracto, otras_ventas = generar_datos(**params)
+    pd.testing.assert_frame_equal(extracto, otro_extracto)
+    pd.testing.assert_frame_equal(ventas, otras_ventas)
+
+    assert len(ventas) == 150 * 4 * 2 and ventas["Id"].is_unique
+    assert detectar_banco(extracto) == "santander_real"
+    assert ventas["Emisión"].dt.month.isin([12, 1]).all()
+
+    # Las transferencias de cada cliente suman lo cobrado por Santander
+    # (incluidos los pagos divididos), salvo clientes con ventas mixtas
+    norm = normalizar(extracto, "santander_real")
+    creditos = norm[norm["tipo"] == "CREDITO"]
+    assert creditos["cuit_banco"].str.len().eq(11).all()
+    vn = normalizar_ventas_contagram(ventas)
+    assert (vn["santander_parts_count"] > 1).any()
+    con_mixtas = set(vn.loc[vn["contiene_caja_grande"], "cuit_limpio"])
+    santander = vn[vn["contiene_santander"] & ~vn["cuit_limpio"].isin(con_mixtas)]
+    esperado = santander.groupby("cuit_limpio")["Monto Total"].sum()
+    banco = creditos[~creditos["cuit_banco"].isin(con_mixtas)].groupby("cuit_banco")["monto"].sum()
+    assert ((banco.reindex(esperado.index) - esperado).abs() < 0.01).all()
+
+    # El motor real concilia las facturas Santander de un solo pago y desglosa las mixtas
+    r = MotorConciliacion(pd.DataFrame()).procesar_real([extracto], ventas)
+    res = r["resultados"]
+    tags = res["conciliation_tag"].value_counts()
+    simples = (vn["santander_parts_count"] == 1) & ~vn["contiene_caja_grande"]
+    assert (res["conciliation_status"] == "MATCHED").sum() >= simples.sum()
+    assert tags.get("PARCIAL_SANTANDER_OK", 0) == vn["contiene_caja_grande"].sum()
+
+    try:
+        generar_datos(pct_pagos_divididos=0.6, pct_otros_medios=0.6)
+        assert False, "deberia rechazar porcentajes que suman mas de 1"
+    except ValueError:
+        pass
+    print(f"  {len(extracto)} movimientos, {len(ventas)} ventas, {(res['conciliation_status'] == 'MATCHED').sum()} conciliados")
+    print("  PASSED\n")
+
+
+# Segundos medidos por escenario de estres (peor de 3 corridas) y margen del tope
+SEGUNDOS_ESTRES = {
+    "tabla_parametrica_grande": 5.6,
+    "cliente_muchas_facturas": 1.3,
+    "cliente_muchas_facturas_demo": 1.3,
+    "textos_unicode_largos": 1.2,
+    "creditos_mismo_cuit": 0.5,
+    "muchas_mixtas": 0.9,
+}
+MARGEN_SEGUNDOS_ESTRES = 2.5
+
+# Busquedas combinatorias esperadas por escenario: {funcion: (tope max_por_llamada, tope combinaciones, cortes)}.
+# Los conteos son deterministas; los topes dejan ~20% sobre lo medido. Los escenarios
+# de 100 facturas agotan el presupuesto a proposito (una vez por credito).
+COMBINACIONES_ESTRES = {
+    "tabla_parametrica_grande": {},
+    "cliente_muchas_facturas": {"_sum_match_disponibles": (MAX_COMBINACIONES, 20 * MAX_COMBINACIONES, 20)},
+    "cliente_muchas_facturas_demo": {"_match_monto_suma": (MAX_COMBINACIONES, 20 * MAX_COMBINACIONES, 20)},
+    "textos_unicode_largos": {},
+    "creditos_mismo_cuit": {
+        "_sum_match_disponibles": (32, 9_000, 0),
+        "_buscar_desglose": (MAX_COMBINACIONES, 5 * MAX_COMBINACIONES, 5),
+    },
+    "muchas_mixtas": {
+        "_sum_match_disponibles": (1_000, 750_000, 0),
+        "_buscar_desglose": (30, 7_500, 0),
+    },
+}
+
+# Movimientos marcados con busqueda_truncada: los creditos cuya suma se corto y,
+# en creditos_mismo_cuit, el pool de creditos del CUIT cuyo desglose se corto
+TRUNCADOS_ESTRES = {
+    "tabla_parametrica_grande": 0,
+    "cliente_muchas_facturas": 20,
+    "cliente_muchas_facturas_demo": 20,
+    "textos_unicode_largos": 0,
+    "creditos_mismo_cuit": 300,
+    "muchas_mixtas": 0,
+}
+
+
+def test_escenarios_estres():
+    print("=" * 60)
+    print("TEST 19: Escenarios de estres (matching combinatorio)")
+    print("=" * 60)
+
+    # Presupuesto por busqueda
+    with contar_combinaciones() as contadores:
+        with Busqueda("prueba", maximo=10) as busqueda:
+            combos = list(busqueda.combinaciones(range(100), 3))
+    assert len(combos) == 10 and busqueda.agotada
+    assert contadores["prueba"] == {"llamadas": 1, "combinaciones": 10, "max_por_llamada": 10, "cortes": 1}
+
+    assert {e["nombre"] for e in escenarios_default()} == set(COMBINACIONES_ESTRES) == set(SEGUNDOS_ESTRES) == set(TRUNCADOS_ESTRES)
+    for escenario in escenarios_default():
+        nombre = escenario["nombre"]
+        cache_etapas.limpiar()
+        r = correr_escenario(escenario)
+        tope = SEGUNDOS_ESTRES[nombre] * MARGEN_SEGUNDOS_ESTRES
+        assert r["segundos"] < tope, f"{nombre}: {r['segundos']:.2f}s (tope {tope:.2f}s)"
+        esperadas = COMBINACIONES_ESTRES[nombre]
+        assert set(r["combinaciones"]) == set(esperadas), (nombre, r["combinaciones"])
+        for funcion, (tope_llamada, tope_total, cortes) in esperadas.items():
+            datos = r["combinaciones"][funcion]
+            assert datos["max_por_llamada"] <= tope_llamada, (nombre, funcion, datos)
+            assert datos["combinaciones"] <= tope_total, (nombre, funcion, datos)
+            assert datos["cortes"] == cortes, (nombre, funcion, datos)
+        assert len(r["resultado"]["resultados"]) > 0
+        # Los movimientos de una busqueda cortada quedan marcados y con la nota para revisarlos
+        res = r["resultado"]["resultados"]
+        truncados = res[res["busqueda_truncada"]]
+        nota = truncados["match_detalle"] if escenario["modo"] == "demo" else truncados["conciliation_reason"]
+        assert len(truncados) == TRUNCADOS_ESTRES[nombre], (nombre, len(truncados))
+        assert nota.str.endswith(NOTA_TRUNCADA).all()
+        total = sum(d["combinaciones"] for d in r["combinaciones"].values())
+        print(f"  {nombre:<30}{r['segundos']:>6.2f}s  {total:>9} combinaciones")
+
+    # Unicode largo: el normalizador y el fuzzy no se cuelgan ni rompen
+    texto = textos_unicode_largos(n_filas=1)["entradas"]["ventas"]["Cliente"].iloc[0]
+    inicio = time.perf_counter()
+    score = calcular_similitud(texto, texto[::-1])
+    assert 0.0 <= score <= 1.0 and time.perf_counter() - inicio < 2.0
+    print("  PASSED\n")
+
+
+def test_metricas_perf():
+    print("=" * 60)
+    print("TEST 20: Metricas de performance por corrida (perf)")
+    print("=" * 60)
+
+    banco, ventas = _cargar_datos_reales()
+    cache_etapas.limpiar()
+    r = MotorConciliacion(pd.DataFrame()).procesar_real([banco], ventas)
+    perf = r["perf"]
+    assert [e["etapa"] for e in perf["etapas"]] == [t["etapa"] for t in r["tiempos_etapas"]]
+    assert perf["etapas"][0]["filas_entrada"] == {"extractos": len(banco)}
+    conciliar = next(e for e in perf["etapas"] if e["etapa"] == "conciliar")
+    assert conciliar["filas_salida"]["resultados"] == len(r["resultados"])
+    # El modo real matchea por CUIT: la tabla de candidatos no compara nombres
+    assert perf["comparaciones_fuzzy"] == 0
+    assert perf["combinaciones"]["total"] == sum(
+        d["combinaciones"] for d in perf["combinaciones"]["por_funcion"].values()
+    ) > 0
+    assert perf["caches"]["etapas"]["tasa"] == 0.0
+    assert perf["clientes_lentos"] and perf["clientes_lentos"][0]["segundos"] >= perf["clientes_lentos"][-1]["segundos"]
+    if perf["memoria"]["rss_pico_mb"] is not None:
+        assert perf["memoria"]["rss_pico_mb"] > 0
+    json.dumps(perf)
+
+    # Misma corrida: todas las etapas salen del cache y no se compara nada
+    r2 = MotorConciliacion(pd.DataFrame()).procesar_real([banco], ventas)
+    assert r2["perf"]["caches"]["etapas"]["tasa"] == 1.0
+    assert r2["perf"]["comparaciones_fuzzy"] == 0 and r2["perf"]["combinaciones"]["total"] == 0
+
+    # Demo e incremental tambien devuelven perf
+    extractos = [
+        pd.read_csv(os.path.join(DATA_DIR, "test", f))
+        for f in ["extracto_galicia_dic2025.csv", "extracto_santander_dic2025.csv", "extracto_mercadopago_dic2025.csv"]
+    ]
+    demo = MotorConciliacion(pd.read_csv(os.path.join(DATA_DIR, "config", "tabla_parametrica.csv"))).procesar(
+        extractos,
+        pd.read_csv(os.path.join(DATA_DIR, "contagram", "ventas_pendientes_dic2025.csv")),
+        pd.read_csv(os.path.join(DATA_DIR, "contagram", "compras_pendientes_dic2025.csv")),
+    )
+    assert [e["etapa"] for e in demo["perf"]["etapas"]] == ["normalizar", "clasificar", "matching", "salidas"]
+    assert demo["perf"]["comparaciones_fuzzy"] > 0
+    with tempfile.TemporaryDirectory() as tmp:
+        inc = MotorConciliacion(pd.DataFrame()).procesar_real_incremental(
+            [banco], ventas, os.path.join(tmp, "estado.json"),
+        )
+    assert [e["etapa"] for e in inc["perf"]["etapas"]] == ["preparar", "conciliar", "salidas"]
+
+    # contar_combinaciones anidado: el bloque de afuera ve lo del de adentro
+    with contar_combinaciones() as afuera:
+        with contar_combinaciones():
+            with Busqueda("prueba") as busqueda:
+                list(busqueda.combinaciones(range(5), 2))
+    assert afuera["prueba"]["combinaciones"] == 10
+
+    # Se guarda con la corrida; un .db viejo (sin perf_json) se migra al abrirlo
+    with tempfile.TemporaryDirectory() as tmp:
+        ruta = os.path.join(tmp, "viejo.db")
+        conn = sqlite3.connect(ruta)
+        conn.execute(
+            "CREATE TABLE corridas (id INTEGER PRIMARY KEY AUTOINCREMENT, fecha_ejecucion TEXT NOT NULL, "
+            "modo TEXT, fecha_desde TEXT, fecha_hasta TEXT, total_movimientos INTEGER, "
+            "total_facturas INTEGER, stats_json TEXT)"
+        )
+        conn.commit()
+        conn.close()
+        with StoreLocal(ruta) as store:
+            corrida_id = store.guardar_corrida(r)
+            assert store.perf_corrida(corrida_id) == perf
+
+    print(f"  {perf['segundos']:.2f}s, {perf['comparaciones_fuzzy']} comparaciones fuzzy, "
+          f"{perf['combinaciones']['total']} combinaciones, RSS pico {perf['memoria']['rss_pico_mb']} MB")
+    print("  PASSED\n")
+
+
+def test_perfil_memoria():
+    print("=" * 60)
+    print("TEST 21: Perfil de memoria por etapa (opt-in)")
+    print("=" * 60)
+
+    import tracemalloc
+
+    extracto, ventas = generar_datos(semilla=5, n_clientes=40)
+
+    # Apagado (default): ni tracemalloc ni clave en perf
+    cache_etapas.limpiar()
+    r = MotorConciliacion(pd.DataFrame(), perfil_memoria=False).procesar_real([extracto], ventas)
+    assert "perfil_memoria" not in r["perf"] and not tracemalloc.is_tracing()
+
+    cache_etapas.limpiar()
+    r = MotorConciliacion(pd.DataFrame(), perfil_memoria=True).procesar_real([extracto], ventas)
+    perfil = r["perf"]["perfil_memoria"]
+    assert not tracemalloc.is_tracing()
+    assert [e["etapa"] for e in perfil["etapas"]] == [t["etapa"] for t in r["tiempos_etapas"]]
+    assert perfil["pico_mb"] == max(e["pico_mb"] for e in perfil["etapas"]) > 0
+    candidatos = next(e for e in perfil["etapas"] if e["etapa"] == "candidatos")
+    assert candidatos["top"] and candidatos["top"][0]["sitio"].startswith(os.path.join("src", "candidatos.py"))
+    assert all(e["pico_mb"] >= e["neto_mb"] for e in perfil["etapas"])
+    json.dumps(perfil)
+
+    # Dos corridas perfiladas a la vez (ej. dos trabajos en segundo plano): la
+    # segunda arranca con la primera en curso y termina despues. Se serializan;
+    # la primera no para tracemalloc con la segunda a mitad de camino
+    import threading
+    from concurrent.futures import ThreadPoolExecutor
+
+    primera_arranco, primera_termino = threading.Event(), threading.Event()
+    datos_primera = generar_datos(semilla=6, n_clientes=40)
+    datos_segunda = generar_datos(semilla=7, n_clientes=40)
+
+    def primera():
+        motor = MotorConciliacion(pd.DataFrame(), perfil_memoria=True)
+        motor.suscribir(lambda ev: ev["tipo"] == ETAPA_INICIO and primera_arranco.set())
+        try:
+            return motor.procesar_real([datos_primera[0]], datos_primera[1])
+        finally:
+            primera_termino.set()
+
+    def segunda():
+        assert primera_arranco.wait(60)
+        motor = MotorConciliacion(pd.DataFrame(), perfil_memoria=True)
+        motor.suscribir(lambda ev: ev["tipo"] == ETAPA_FIN and primera_termino.wait(60))
+        return motor.procesar_real([datos_segunda[0]], datos_segunda[1])
+
+    cache_etapas.limpiar()
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        concurrentes = [f.result() for f in [pool.submit(primera), pool.submit(segunda)]]
+    assert not tracemalloc.is_tracing()
+    for rc in concurrentes:
+        etapas_perfil = rc["perf"]["perfil_memoria"]["etapas"]
+        assert [e["etapa"] for e in etapas_perfil] == [t["etapa"] for t in rc["tiempos_etapas"]]
+        assert rc["perf"]["perfil_memoria"]["pico_mb"] > 0
+
+    # Switch por variable de entorno
+    anterior = os.environ.get(VARIABLE_ENTORNO)
+    try:
+        os.environ[VARIABLE_ENTORNO] = "1"
+        assert MotorConciliacion(pd.DataFrame()).perfil_memoria
+        os.environ[VARIABLE_ENTORNO] = "0"
+        assert not MotorConciliacion(pd.DataFrame()).perfil_memoria
+    finally:
+        if anterior is None:
+            os.environ.pop(VARIABLE_ENTORNO, None)
+        else:
+            os.environ[VARIABLE_ENTORNO] = anterior
+
+    for e in perfil["etapas"]:
+        sitio = e["top"][0]["sitio"] if e["top"] else "-"
+        print(f"  {e['etapa']:<26}pico {e['pico_mb']:>7.2f} MB  {sitio}")
+    print("  PASSED\n")
+
+
+def test_tracing_spans():
+    print("=" * 60)
+    print("TEST 22: Spans anidados exportados a JSON lines")
+    print("=" * 60)
+
+    extracto, ventas = generar_datos(semilla=9, n_clientes=30)
+    with tempfile.TemporaryDirectory() as tmp:
+        ruta = os.path.join(tmp, "trazas.jsonl")
+
+        # Sin configurar no se escribe nada
+        tracing.configurar(None)
+        cache_etapas.limpiar()
+        MotorConciliacion(pd.DataFrame()).procesar_real([extracto], ventas)
+        assert not os.path.exists(ruta)
+
+        tracing.configurar(ruta)
+        try:
+            cache_etapas.limpiar()
+            r = MotorConciliacion(pd.DataFrame()).procesar_real([extracto], ventas)
+            with StoreLocal(":memory:") as store:
+                store.guardar_corrida(r)
+            try:
+                with tracing.span("prueba.error"):
+                    raise ValueError("falla")
+            except ValueError:
+                pass
+        finally:
+            tracing.configurar(None)
+
+        spans = tracing.leer_spans(ruta, run_id=r["run_id"])
+        por_nombre = {s["nombre"]: s for s in spans}
+        raiz = por_nombre["motor.real"]
+        assert raiz["padre_id"] is None and raiz["atributos"]["run_id"] == r["run_id"]
+        assert raiz["atributos"]["bancos"] == ["santander_real"]
+        assert raiz["atributos"]["filas_extracto"] == len(extracto)
+        etapas = [s for s in spans if s["nombre"].startswith("etapa.")]
+        assert [s["atributos"]["etapa"] for s in sorted(etapas, key=lambda s: s["inicio"])] == [
+            t["etapa"] for t in r["tiempos_etapas"]
+        ]
+        assert all(s["padre_id"] == raiz["span_id"] and s["trace_id"] == raiz["trace_id"] for s in etapas)
+        assert por_nombre["normalizar.extracto"]["padre_id"] == por_nombre["etapa.normalizar_extracto"]["span_id"]
+        assert por_nombre["etapa.conciliar"]["atributos"]["filas_salida"]["resultados"] == len(r["resultados"])
+        assert por_nombre["db.guardar_corrida"]["atributos"]["movimientos"] == len(r["resultados"])
+        assert tracing.leer_spans(ruta, run_id="no-existe") == []
+        error = [s for s in tracing.leer_spans(ruta) if s["nombre"] == "prueba.error"]
+        assert error and error[0]["error"].startswith("ValueError")
+
+        chrome = tracing.a_chrome_trace(spans)
+        assert len(chrome["traceEvents"]) == len(spans)
+        assert all(e["ph"] == "X" and e["dur"] >= 1 for e in chrome["traceEvents"])
+        assert tracing.main([ruta, "-o", os.path.join(tmp, "trazas.json")]) == 0
+
+    assert tracing.fragmento_cuit("30-71234567-8") == tracing.fragmento_cuit("30712345678")
+    assert 0 <= tracing.fragmento_cuit("30712345678") < tracing.FRAGMENTOS_CUIT
+    assert tracing.fragmento_cuit("") is None
+    print(f"  {len(spans)} spans en la traza de la corrida ({len(etapas)} etapas)")
+    print("  PASSED\n")
+
+
+def test_cli_conciliar():
+    print("=" * 60)
+    print("TEST 23: CLI de conciliacion (conciliar.py)")
+    print("=" * 60)
+
+    extracto, ventas = generar_datos(semilla=11, n_clientes=40)
+    with tempfile.TemporaryDirectory() as tmp:
+        ruta_extracto, ruta_ventas = guardar_datos(extracto, ventas, os.path.join(tmp, "datos"))
+        salida = os.path.join(tmp, "salida")
+
+        # La carpeta tiene extracto y ventas: el listado de Contagram no se toma como extracto
+        assert conciliar.expandir_extractos([os.path.dirname(ruta_extracto)], excluir=ruta_ventas) == [ruta_extracto]
+        cache_etapas.limpiar()
+        codigo = conciliar.main([
+            os.path.dirname(ruta_extracto), "--contagram", ruta_ventas, "--salida", salida,
+            "--tipo-movimiento", "creditos", "--config", "tolerancia_monto_pct=0.01",
+        ])
+        assert codigo == 0
+        with open(os.path.join(salida, conciliar.ARCHIVO_STATS), encoding="utf-8") as f:
+            stats = json.load(f)
+        cobranzas = pd.read_csv(os.path.join(salida, conciliar.ARCHIVO_COBRANZAS), encoding="utf-8-sig")
+        excepciones = pd.read_excel(os.path.join(salida, conciliar.ARCHIVO_EXCEPCIONES))
+
+        # Mismo resultado que el motor con los DataFrames en memoria
+        cache_etapas.limpiar()
+        r = MotorConciliacion(pd.DataFrame()).procesar_real(
+            [pd.read_excel(ruta_extracto)], pd.read_excel(ruta_ventas),
+            match_config={"tolerancia_monto_pct": 0.01}, filtro_tipo_movimiento="Solo Créditos",
+        )
+        for clave in ("total_movimientos", "match_exacto", "probable_duda_id", "no_match"):
+            assert stats["stats"][clave] == r["stats"][clave], clave
+        assert stats["config"] == {"tolerancia_monto_pct": 0.01}
+        assert stats["filtros"]["tipo_movimiento"] == "Solo Créditos"
+        assert stats["extractos"] == [ruta_extracto]
+        assert stats["perf"]["etapas"] and stats["run_id"]
+        assert set(cobranzas["Status"]) <= set(conciliar.ESTADOS_DEFAULT)
+        esperadas = r["cobranzas_csv"]["Status"].isin(conciliar.ESTADOS_DEFAULT).sum()
+        assert len(cobranzas) == stats["cobranzas_exportadas"] == esperadas
+        assert len(excepciones) == stats["excepciones"] == len(r["excepciones"])
+
+        # Errores de entrada: codigo 1, sin excepcion
+        assert conciliar.main([os.path.join(tmp, "no_existe.xlsx"), "-c", ruta_ventas, "--salida", salida]) == 1
+        assert conciliar.main([ruta_extracto, "-c", ruta_ventas, "--config", "no_existe=1"]) == 1
+        assert conciliar.main([ruta_extracto, "-c", ruta_ventas, "--config", "sin_valor"]) == 1
+    print(f"  {stats['stats']['total_movimientos']} movimientos, {len(cobranzas)} cobranzas exportadas")
+    print("  PASSED\n")
+
+
+def test_lote_conciliaciones():
+    print("=" * 60)
+    print("TEST 24: Conciliacion en lote (pool de procesos, fallas aisladas)")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for semilla in (1, 2):
+            extracto, ventas = generar_datos(semilla=semilla, n_clientes=30)
+            guardar_datos(extracto, ventas, os.path.join(tmp, f"p{semilla}"))
+        with open(os.path.join(tmp, "malo.csv"), "w", encoding="utf-8") as f:
+            f.write("a,b\n1,2\n")
+        manifiesto = os.path.join(tmp, "lote.json")
+        with open(manifiesto, "w", encoding="utf-8") as f:
+            json.dump({"defaults": {"tipo_movimiento": "creditos"}, "corridas": [
+                {"nombre": "p1", "extractos": ["p1/extracto_santander.xlsx"], "contagram": "p1/ventas_contagram.xlsx"},
+                {"nombre": "malo", "extractos": ["malo.csv"], "contagram": "p1/ventas_contagram.xlsx"},
+                {"nombre": "p2", "extractos": ["p2"], "contagram": "p2/ventas_contagram.xlsx",
+                 "config": {"tolerancia_monto_pct": 0.01}},
+            ]}, f)
+        salida = os.path.join(tmp, "salida")
+
+        # Una corrida con error no corta el lote: el resto termina y el codigo de salida es 1
+        assert conciliar_lote.main([manifiesto, "--workers", "2", "--salida", salida]) == 1
+        with open(os.path.join(salida, conciliar_lote.ARCHIVO_LOTE), encoding="utf-8") as f:
+            lote = json.load(f)
+        assert (lote["corridas"], lote["ok"], lote["errores"]) == (3, 2, 1)
+        resumen = {r["nombre"]: r for r in lote["resumen"]}
+        assert [r["nombre"] for r in lote["resumen"]] == ["p1", "malo", "p2"]
+        assert resumen["malo"]["estado"] == "ERROR" and "Banco no soportado" in resumen["malo"]["error"]
+
+        hojas = pd.read_excel(os.path.join(salida, conciliar_lote.ARCHIVO_RESUMEN), sheet_name=None)
+        assert list(hojas) == ["Resumen", "Cobranzas", "Excepciones"]
+        assert list(hojas["Resumen"]["estado"]) == ["OK", "ERROR", "OK"]
+        for nombre in ("p1", "p2"):
+            with open(os.path.join(salida, nombre, conciliar.ARCHIVO_STATS), encoding="utf-8") as f:
+                stats = json.load(f)
+            assert resumen[nombre]["run_id"] == stats["run_id"]
+            assert resumen[nombre]["total_movimientos"] == stats["stats"]["total_movimientos"]
+            assert (hojas["Cobranzas"]["Corrida"] == nombre).sum() == stats["cobranzas_exportadas"]
+        assert stats["config"] == {"tolerancia_monto_pct": 0.01}
+        assert stats["filtros"]["tipo_movimiento"] == "Solo Créditos"
+
+        # Un proceso que muere (no una excepcion) solo tira su corrida, no las del resto
+        # (el parche llega a los hijos porque heredan el modulo con fork)
+        if multiprocessing.get_start_method() == "fork":
+            original = conciliar.conciliar_archivos
+
+            def _conciliar_o_morir(extractos, contagram, *args, **kwargs):
+                if "morir" in contagram:
+                    os._exit(3)
+                return original(extractos, contagram, *args, **kwargs)
+
+            corridas = conciliar_lote.leer_manifiesto(manifiesto)
+            base = dict(corridas[0])
+            corridas = [
+                {**base, "nombre": f"c{i}", "contagram": base["contagram"] + ("#morir" if i == 2 else "")}
+                for i in range(6)
+            ]
+            conciliar.conciliar_archivos = _conciliar_o_morir
+            try:
+                r = conciliar_lote.correr_lote(corridas, os.path.join(tmp, "salida_caida"), workers=2)
+            finally:
+                conciliar.conciliar_archivos = original
+            estados_caida = [x["resumen"]["estado"] for x in r]
+            assert estados_caida == ["OK", "OK", "ERROR", "OK", "OK", "OK"], estados_caida
+            assert "termino abruptamente" in r[2]["resumen"]["error"]
+
+        # Mismo resultado en este proceso (workers=1) y con manifiesto CSV
+        manifiesto_csv = os.path.join(tmp, "lote.csv")
+        pd.DataFrame([{"nombre": "p2", "extractos": "p2/extracto_santander.xlsx",
+                       "contagram": "p2/ventas_contagram.xlsx", "tipo_movimiento": "creditos"}]).to_csv(
+            manifiesto_csv, index=False)
+        corridas = conciliar_lote.leer_manifiesto(manifiesto_csv)
+        corridas[0]["config"] = {"tolerancia_monto_pct": 0.01}
+        r = conciliar_lote.correr_lote(corridas, os.path.join(tmp, "salida_csv"), workers=1)
+        assert r[0]["resumen"]["estado"] == "OK"
+        assert r[0]["resumen"]["total_movimientos"] == resumen["p2"]["total_movimientos"]
+        assert r[0]["resumen"]["match_exacto"] == resumen["p2"]["match_exacto"]
+
+        # Manifiesto invalido: codigo 1 sin correr nada
+        with open(manifiesto, "w", encoding="utf-8") as f:
+            json.dump([{"nombre": "x", "extractos": ["a.xlsx"], "contagram": "b.xlsx"},
+                       {"nombre": "x", "extractos": ["c.xlsx"], "contagram": "b.xlsx"}], f)
+        assert conciliar_lote.main([manifiesto, "--salida", os.path.join(tmp, "otra")]) == 1
+        assert not os.path.exists(os.path.join(tmp, "otra"))
+    print(f"  {lote['ok']} corridas OK, {lote['errores']} con error aislada")
+    print("  PASSED\n")
+
+
 if __name__ == "__main__":
     test_normalizacion()
     test_clasificacion()
     test_motor_ternario()
+    test_conciliacion_incremental()
+    test_store_local()
+    test_upsert_lotes_historico()
+    test_historico_paginado()
+    test_cache_resultados()
+    test_pipeline_etapas()
+    test_tabla_candidatos()
+    test_barrido_tolerancias()
+    test_busqueda_indexada()
+    test_vistas_precalculadas()
+    test_trabajos_segundo_plano()
+    test_eventos_motor()
+    test_resultado_compacto()
+    test_benchmark_escalado()
+    test_generador_datos()
+    test_escenarios_estres()
+    test_metricas_perf()
+    test_perfil_memoria()
+    test_tracing_spans()
+    test_cli_conciliar()
+    test_lote_conciliaciones()
     print("=" * 60)
     print("TODOS LOS TESTS PASARON EXITOSAMENTE")
     print("=" * 60)